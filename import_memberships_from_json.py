@@ -2,31 +2,25 @@ import logging
 import os
 import json
 import argparse
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timezone
 from logging.handlers import RotatingFileHandler
+from typing import List
 
 from reports_api.common.globals import GlobalsSingleton
 from reports_api.database.db_manager import DatabaseManager
 
+MEMBERSHIP_VERBS = {"modify-add", "modify-remove"}
 
-def import_memberships(data_dir):
-    logger = logging.getLogger("import")
-    file_handler = RotatingFileHandler('./import.log', backupCount=5, maxBytes=50000)
-    logging.basicConfig(level=logging.INFO,
-                        format="%(asctime)s [%(filename)s:%(lineno)d] [%(levelname)s] %(message)s",
-                        handlers=[logging.StreamHandler(), file_handler])
-
-    logger = GlobalsSingleton.get().log
-    logger.debug("Processing - slices_slice_id_post")
-
-    global_obj = GlobalsSingleton.get()
-    db = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
-                         password=global_obj.config.database_config.get("db-password"),
-                         database=global_obj.config.database_config.get("db-name"),
-                         db_host=global_obj.config.database_config.get("db-host"),
-                         logger=logger)
 
-    for filename in os.listdir(data_dir):
+def load_events(data_dir) -> List[dict]:
+    """
+    Membership events from the cs_event_data JSON files, sorted by csel_timestamp.
+    Events with the same timestamp keep the order of their file names. Timestamps are UTC and
+    timezone-aware, like the ones stored in the membership table.
+    """
+    events = []
+    for filename in sorted(os.listdir(data_dir)):
         if not filename.endswith(".json"):
             continue
 
@@ -37,52 +31,108 @@ def import_memberships(data_dir):
                 data = json.load(f)
 
             verb = data.get("csel_eventdetail_verb")
-            if verb not in {"modify-add", "modify-remove"}:
+            if verb not in MEMBERSHIP_VERBS:
                 continue
 
-            timestamp_str = data.get("csel_timestamp")
-            ts = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f")
-
-            user_uuid = data.get("csel_eventdetail_attr_value", "").replace("usr:", "")
-            project_uuid = data.get("csel_identifier_prj_uuid")
+            events.append({
+                "file": file_path,
+                "verb": verb,
+                "timestamp": datetime.strptime(data.get("csel_timestamp"),
+                                               "%Y-%m-%d %H:%M:%S,%f").replace(tzinfo=timezone.utc),
+                "user_uuid": data.get("csel_eventdetail_attr_value", "").replace("usr:", ""),
+                "project_uuid": data.get("csel_identifier_prj_uuid")
+            })
+        except Exception as e:
+            print(f"[ERROR] {file_path}: {e}")
 
-            user_id = db.get_user_id_by_uuid(user_uuid)
-            project_id = db.get_project_id_by_uuid(project_uuid)
+    events.sort(key=lambda e: e["timestamp"])
+    return events
+
+
+def replay(events: List[dict], user_ids: dict, project_ids: dict, active_memberships: List[dict]) -> List[dict]:
+    """
+    Replay sorted events over the memberships that are active now.
+
+    An add opens a "member" membership at the event time, unless that membership is already
+    stored; a remove closes the oldest active membership of that user in that project that
+    started at or before the event.
+
+    :param events: events as returned by load_events()
+    :param user_ids: user_uuid -> user id
+    :param project_ids: project_uuid -> project id
+    :param active_memberships: active memberships as returned by DatabaseManager.get_active_memberships()
+    :return: the memberships opened or closed, as taken by DatabaseManager.add_or_update_memberships()
+    """
+    active = defaultdict(list)
+    stored = {}
+    for m in active_memberships:
+        m = dict(m)
+        active[(m["user_id"], m["project_id"])].append(m)
+        stored[(m["user_id"], m["project_id"], m["membership_type"], m["start_time"])] = m
+
+    written = {}
+    for event in events:
+        user_id = user_ids.get(event["user_uuid"])
+        project_id = project_ids.get(event["project_uuid"])
+
+        if not user_id or not project_id:
+            print(f"[WARN] Could not resolve IDs for user/project in: {event['file']}")
+            continue
 
-            if not user_id or not project_id:
-                print(f"[WARN] Could not resolve IDs for user/project in: {file_path}")
+        pair = (user_id, project_id)
+        if event["verb"] == "modify-add":
+            key = (user_id, project_id, "member", event["timestamp"])
+            membership = written.get(key) or stored.get(key)
+            if membership is None:
+                membership = {"user_id": user_id, "project_id": project_id, "start_time": event["timestamp"],
+                              "membership_type": "member"}
+            written[key] = membership
+            if not membership.get("active"):
+                active[pair].append(membership)
+            membership.update(end_time=None, active=True)
+
+        elif event["verb"] == "modify-remove":
+            started = [n for n, m in enumerate(active[pair])
+                       if m["start_time"] is None or m["start_time"] <= event["timestamp"]]
+            if not started:
+                print(f"[WARN] No active membership to remove for {event['user_uuid']} in {event['project_uuid']}")
                 continue
 
-            if verb == "modify-add":
-                db.add_or_update_membership(
-                    user_id=user_id,
-                    project_id=project_id,
-                    start_time=ts,
-                    end_time=None,
-                    membership_type="member",
-                    active=True
-                )
-                print(f"[ADD] {user_uuid} -> {project_uuid} @ {ts}")
-
-            elif verb == "modify-remove":
-                membership = db.get_active_membership(user_id=user_id, project_id=project_id)
-
-                if not membership:
-                    print(f"[WARN] No active membership to remove for {user_uuid} in {project_uuid}")
-                    continue
-
-                db.add_or_update_membership(
-                    user_id=user_id,
-                    project_id=project_id,
-                    start_time=membership.start_time,
-                    end_time=ts,
-                    membership_type=membership.membership_type,
-                    active=False
-                )
-                print(f"[REMOVE] {user_uuid} -> {project_uuid} @ {ts}")
+            oldest = min(started, key=lambda n: (active[pair][n]["start_time"] is not None,
+                                                 active[pair][n]["start_time"]))
+            membership = active[pair].pop(oldest)
+            membership.update(end_time=event["timestamp"], active=False)
+            written[(user_id, project_id, membership["membership_type"], membership["start_time"])] = membership
 
-        except Exception as e:
-            print(f"[ERROR] {file_path}: {e}")
+    return list(written.values())
+
+
+def import_memberships(data_dir):
+    logger = logging.getLogger("import")
+    file_handler = RotatingFileHandler('./import.log', backupCount=5, maxBytes=50000)
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(filename)s:%(lineno)d] [%(levelname)s] %(message)s",
+                        handlers=[logging.StreamHandler(), file_handler])
+
+    logger = GlobalsSingleton.get().log
+    logger.debug("Processing - import_memberships")
+
+    global_obj = GlobalsSingleton.get()
+    db = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
+                         password=global_obj.config.database_config.get("db-password"),
+                         database=global_obj.config.database_config.get("db-name"),
+                         db_host=global_obj.config.database_config.get("db-host"),
+                         logger=logger)
+
+    events = load_events(data_dir)
+    user_ids = db.get_user_ids_by_uuid([e["user_uuid"] for e in events])
+    project_ids = db.get_project_ids_by_uuid([e["project_uuid"] for e in events])
+    active_memberships = db.get_active_memberships(user_ids=list(user_ids.values()),
+                                                   project_ids=list(project_ids.values()))
+
+    memberships = replay(events, user_ids, project_ids, active_memberships)
+    written = db.add_or_update_memberships(memberships)
+    print(f"[DONE] {len(events)} events replayed, {written} memberships written")
 
 
 if __name__ == "__main__":
@@ -1,18 +1,69 @@
 #!/usr/bin/env python3
 import logging
+import threading
 
 import connexion
 import waitress as waitress
 
 from reports_api.common.globals import Globals, GlobalsSingleton
+from reports_api.common.ingest_queue import IngestQueue, IngestWriter
+from reports_api.database.capacity_snapshot import CapacityCache
+from reports_api.database.db_manager import DatabaseManager
+from reports_api.database.occupancy_file import OccupancyFile
+from reports_api.database.reservation_index import ReservationIndex
 from reports_api.openapi_server import encoder
 rest_port_str = 8080
 
 #Globals.config_file = "test_config.yml"
 
 
+def load_reservation_index():
+    global_obj = GlobalsSingleton.get()
+    runtime_config = global_obj.config.runtime_config
+    if not runtime_config.get("reservation_index.enable", False):
+        return
+    index = ReservationIndex.configure(
+        max_age_seconds=int(runtime_config.get("reservation_index.max_age_seconds", 300)),
+        history_days=int(runtime_config.get("reservation_index.history_days", 7)))
+    db_mgr = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
+                             password=global_obj.config.database_config.get("db-password"),
+                             database=global_obj.config.database_config.get("db-name"),
+                             db_host=global_obj.config.database_config.get("db-host"),
+                             logger=global_obj.log)
+    try:
+        index.reload(db_mgr.get_session())
+        global_obj.log.info("Reservation index loaded")
+    except Exception as e:
+        # Requests fall back to the database and retry the load once the index is stale
+        global_obj.log.exception(f"Failed to load reservation index: {e}")
+
+
+def start_ingest_writer():
+    """Queue slice / sliver posts and write them from a background thread, when enabled."""
+    global_obj = GlobalsSingleton.get()
+    runtime_config = global_obj.config.runtime_config
+    if not runtime_config.get("ingest_queue.enable", False):
+        return
+    queue = IngestQueue.configure(path=runtime_config.get("ingest_queue.path", "/var/lib/reports/ingest.sqlite"))
+    db_mgr = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
+                             password=global_obj.config.database_config.get("db-password"),
+                             database=global_obj.config.database_config.get("db-name"),
+                             db_host=global_obj.config.database_config.get("db-host"),
+                             logger=global_obj.log)
+    IngestWriter(queue, db_mgr, batch_size=int(runtime_config.get("ingest_queue.batch_size", 200)),
+                 max_attempts=int(runtime_config.get("ingest_queue.max_attempts", 5)),
+                 logger=global_obj.log).start()
+
+
 def main():
-    GlobalsSingleton.get()
+    runtime_config = GlobalsSingleton.get().config.runtime_config
+    if runtime_config.get("capacity_cache.enable", True):
+        CapacityCache.configure(max_age_seconds=int(runtime_config.get("capacity_cache.max_age_seconds", 300)))
+    if runtime_config.get("occupancy_file.enable", False):
+        OccupancyFile.configure(path=runtime_config.get("occupancy_file.path", "/var/lib/reports/occupancy.bin"),
+                                max_age_seconds=int(runtime_config.get("occupancy_file.max_age_seconds", 900)))
+    threading.Thread(target=load_reservation_index, daemon=True).start()
+    start_ingest_writer()
     logging.getLogger('sqlalchemy.engine.Engine').setLevel(logging.WARNING)
     app = connexion.App(__name__, specification_dir='openapi_server/openapi/')
     app.app.json_encoder = encoder.JSONEncoder
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Write-behind queue for POST /slices/{slice_id} and POST /slivers/{slice_id}/{sliver_id}.
+
+Validated bodies are appended to a SQLite file in WAL mode and acknowledged with 202; the
+entry is on disk before the request returns. An IngestWriter thread drains the queue in
+sequence order, folding each batch into one slice per slice_id and writing the batch with
+DatabaseManager.import_slices() in one transaction. Within a batch, later posts win field by
+field the way the upserts do (empty values never overwrite), so each slice ends up as if its
+posts had been written one by one, in order.
+
+When a batch fails, its entries are retried one at a time; once an entry of a slice fails, the
+slice's later entries wait for it. An entry that keeps failing is parked after max_attempts
+and counted as failed. Connection errors charge no attempt: the writer backs off and retries
+the batch.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from reports_api.database.db_manager import SLIVER_OPTIONAL_COLUMNS
+
+INGEST_KINDS = ("slice", "sliver")
+DATETIME_FIELDS = ("lease_start", "lease_end", "closed_at")
+# Fields of a slice post, and those a sliver post carries for its slice
+SLICE_FIELDS = ("slice_name", "project_uuid", "project_name", "user_uuid", "user_email", "state", "lease_start",
+                "lease_end")
+SLIVER_SLICE_FIELDS = ("slice_name", "project_uuid", "project_name", "user_uuid", "user_email", "lease_start",
+                       "lease_end")
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(row: dict) -> dict:
+    for name in DATETIME_FIELDS:
+        if isinstance(row.get(name), str):
+            row[name] = datetime.fromisoformat(row[name])
+    return row
+
+
+def _merge(stored: dict, posted: dict, fields=None) -> dict:
+    """Overwrite the fields of stored with the non-empty values of posted."""
+    for name in fields or posted:
+        if posted.get(name):
+            stored[name] = posted[name]
+    return stored
+
+
+def _merge_children(stored: List[dict], posted: List[dict], key: str) -> List[dict]:
+    children = {c[key]: dict(c) for c in stored}
+    for c in posted:
+        children[c[key]] = _merge(children[c[key]], c) if c[key] in children else dict(c)
+    return list(children.values())
+
+
+def is_outage(error: Exception) -> bool:
+    """True for errors of the connection rather than of the data written."""
+    return isinstance(error, (OperationalError, InterfaceError)) or getattr(error, "connection_invalidated", False)
+
+
+def fold(entries: List[dict]) -> List[dict]:
+    """
+    Fold queued posts, in sequence order, into slices as DatabaseManager.import_slices() takes them.
+
+    :param entries: dicts with kind, slice_guid and row, as returned by IngestQueue.take()
+    :return: one slice per slice_guid, in the order the slices were first posted
+    """
+    slices = {}
+    for entry in entries:
+        row = entry["row"]
+        s = slices.setdefault(entry["slice_guid"], {"slice_guid": entry["slice_guid"], "state": None,
+                                                    "project_uuid": None, "user_uuid": None, "slivers": {}})
+        if entry["kind"] == "slice":
+            _merge(s, row, SLICE_FIELDS)
+            continue
+
+        _merge(s, row, SLIVER_SLICE_FIELDS)
+        stored = s["slivers"].get(row["sliver_guid"])
+        if stored is None:
+            s["slivers"][row["sliver_guid"]] = dict(row)
+            continue
+        # Sliver references are overwritten as posted, optional columns only by non-empty values
+        for name, value in row.items():
+            if name == "components":
+                stored[name] = _merge_children(stored[name], value, "component_guid")
+            elif name == "interfaces":
+                stored[name] = _merge_children(stored[name], value, "interface_guid")
+            elif name not in SLIVER_OPTIONAL_COLUMNS or value:
+                stored[name] = value
+    return [dict(s, slivers=list(s["slivers"].values())) for s in slices.values()]
+
+
+class IngestQueue:
+    """Durable FIFO of validated slice / sliver posts in a SQLite WAL file."""
+    _instance = None
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._posted = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: a post is acknowledged only once its entry survives a power loss
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS ingest_queue (
+                                  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                                  kind TEXT NOT NULL,
+                                  slice_guid TEXT NOT NULL,
+                                  payload TEXT NOT NULL,
+                                  enqueued_at REAL NOT NULL,
+                                  attempts INTEGER NOT NULL DEFAULT 0,
+                                  failed INTEGER NOT NULL DEFAULT 0,
+                                  error TEXT)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_queue_failed ON ingest_queue (failed, seq)")
+
+    @classmethod
+    def get(cls) -> Optional["IngestQueue"]:
+        """The process-wide ingest queue, or None when write-behind is off."""
+        return cls._instance
+
+    @classmethod
+    def configure(cls, path: str) -> "IngestQueue":
+        cls._instance = cls(path=path)
+        return cls._instance
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def put(self, kind: str, slice_guid: str, row: dict) -> int:
+        """
+        Append a post.
+
+        :param kind: "slice" or "sliver"
+        :param slice_guid: slice the post belongs to; posts of one slice are written in order
+        :param row: the slice row, or the sliver row as add_or_update_slivers() takes it
+        :return: sequence number of the entry
+        """
+        if kind not in INGEST_KINDS:
+            raise ValueError(f"Unknown ingest kind: {kind}")
+        payload = json.dumps(row, default=_encode)
+        with self._lock:
+            seq = self._conn.execute("INSERT INTO ingest_queue (kind, slice_guid, payload, enqueued_at) "
+                                     "VALUES (?, ?, ?, ?)", (kind, slice_guid, payload, time.time())).lastrowid
+        self.notify()
+        return seq
+
+    def notify(self):
+        """Wake a writer blocked in wait()."""
+        self._posted.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Block until something is posted or timeout seconds pass."""
+        posted = self._posted.wait(timeout)
+        self._posted.clear()
+        return posted
+
+    def take(self, limit: int) -> List[dict]:
+        """The oldest pending entries, without removing them; see ack() and retry()."""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, kind, slice_guid, payload, attempts FROM ingest_queue "
+                                      "WHERE failed = 0 ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [{"seq": seq, "kind": kind, "slice_guid": slice_guid, "row": _decode(json.loads(payload)),
+                 "attempts": attempts} for seq, kind, slice_guid, payload, attempts in rows]
+
+    def ack(self, seqs: List[int]):
+        """Remove written entries."""
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM ingest_queue WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def retry(self, seq: int, error: str, max_attempts: int) -> bool:
+        """
+        Charge an entry a failed attempt; it is parked once it has failed max_attempts times.
+
+        :return: True when the entry was parked
+        """
+        with self._lock:
+            self._conn.execute("UPDATE ingest_queue SET attempts = attempts + 1, error = ?, "
+                               "failed = CASE WHEN attempts + 1 >= ? THEN 1 ELSE 0 END WHERE seq = ?",
+                               (error, max_attempts, seq))
+            return bool(self._conn.execute("SELECT failed FROM ingest_queue WHERE seq = ?", (seq,)).fetchone()[0])
+
+    def stats(self) -> dict:
+        """Queue depth, parked entries and the age in seconds of the oldest pending entry."""
+        with self._lock:
+            depth, oldest = self._conn.execute("SELECT count(*), min(enqueued_at) FROM ingest_queue "
+                                               "WHERE failed = 0").fetchone()
+            failed = self._conn.execute("SELECT count(*) FROM ingest_queue WHERE failed = 1").fetchone()[0]
+        return {"depth": depth, "failed": failed,
+                "oldest_age_seconds": round(time.time() - oldest, 3) if oldest is not None else 0}
+
+
+class IngestWriter:
+    """Background thread writing queued posts to the database in batches."""
+
+    def __init__(self, queue: IngestQueue, db_mgr, batch_size: int = 200, max_attempts: int = 5,
+                 idle_seconds: float = 1.0, backoff_seconds: float = 5.0, logger: logging.Logger = None):
+        self.queue = queue
+        self.db_mgr = db_mgr
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.idle_seconds = idle_seconds
+        self.backoff_seconds = backoff_seconds
+        self.logger = logger or logging.getLogger("reports_api.ingest")
+        self.written = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self.queue.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                result = self.drain_once()
+            except Exception as e:
+                self.logger.exception(f"Ingest writer failed: {e}")
+                result = {"taken": 0, "outage": True}
+            if result.get("outage"):
+                self._stop.wait(self.backoff_seconds)
+            elif result["taken"] < self.batch_size:
+                self.queue.wait(self.idle_seconds)
+
+    def drain_once(self) -> dict:
+        """
+        Write one batch.
+
+        :return: counts of entries taken, written and parked; "outage" when the database was unavailable
+        """
+        entries = self.queue.take(self.batch_size)
+        result = {"taken": len(entries), "written": 0, "parked": 0, "outage": False}
+        if not entries:
+            return result
+        try:
+            self.db_mgr.import_slices(fold(entries), skip_existing=False)
+            self.queue.ack([e["seq"] for e in entries])
+            result["written"] = len(entries)
+        except Exception as e:
+            if is_outage(e):
+                self.logger.warning(f"Ingest batch of {len(entries)} not written, database unavailable: {e}")
+                result["outage"] = True
+                return result
+            self.logger.warning(f"Ingest batch of {len(entries)} failed, retrying one at a time: {e}")
+            result.update(self._one_at_a_time(entries))
+        self.written += result["written"]
+        stats = self.queue.stats()
+        self.logger.info(f"Ingest: {result['written']}/{len(entries)} written, queue depth {stats['depth']}, "
+                         f"{stats['failed']} failed, oldest {stats['oldest_age_seconds']}s")
+        return result
+
+    def _one_at_a_time(self, entries: List[dict]) -> dict:
+        written, failures, blocked, outage = 0, [], set(), False
+        for entry in entries:
+            if entry["slice_guid"] in blocked:
+                continue
+            try:
+                self.db_mgr.import_slices(fold([entry]), skip_existing=False)
+                self.queue.ack([entry["seq"]])
+                written += 1
+            except Exception as e:
+                if is_outage(e):
+                    outage = True
+                    break
+                failures.append((entry, str(e)))
+                blocked.add(entry["slice_guid"])
+
+        parked = 0
+        for entry, error in failures:
+            if self.queue.retry(entry["seq"], error, self.max_attempts):
+                parked += 1
+                self.logger.error(f"Ingest entry {entry['seq']} ({entry['kind']} of slice {entry['slice_guid']}) "
+                                  f"parked after {self.max_attempts} attempts: {error}")
+        return {"written": written, "parked": parked, "outage": outage}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Background jobs for find-slot searches and calendars too long for a request.
+
+Jobs run in a pool of worker processes, each with its own DatabaseManager. Progress
+and cancellation flags live in dicts shared through a multiprocessing manager: a
+worker reports (hours scanned, total hours) through the progress callback of
+find_slot() / get_calendar(), and that callback raises JobCancelled once the job
+has been cancelled. Results are kept in this process until result_ttl_seconds after
+the job finished; job ids are only known to the API process that accepted them.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+JOB_KINDS = ("find_slot", "calendar")
+
+_db_mgr = None  # one DatabaseManager per worker process
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+def reporter(job_id: str, progress, cancelled) -> Callable[[int, int], None]:
+    """The progress callback handed to find_slot() / get_calendar() for one job."""
+    def report(scanned: int, total: int):
+        if cancelled.get(job_id):
+            raise JobCancelled(job_id)
+        progress[job_id] = (scanned, total)
+    return report
+
+
+def run_job(job_id: str, kind: str, params: dict, db_config: dict, progress, cancelled):
+    """Worker entry point: run one find_slot or calendar job and return its result."""
+    global _db_mgr
+    report = reporter(job_id, progress, cancelled)
+    report(0, 0)
+    if _db_mgr is None:
+        from reports_api.database.db_manager import DatabaseManager
+        _db_mgr = DatabaseManager(user=db_config.get("db-user"), password=db_config.get("db-password"),
+                                  database=db_config.get("db-name"), db_host=db_config.get("db-host"),
+                                  logger=logging.getLogger("reports_api.jobs"))
+    if kind == "find_slot":
+        return _db_mgr.find_slot(**params, progress=report)
+    return _db_mgr.get_calendar(**params, progress=report)
+
+
+class _Job:
+    def __init__(self, job_id: str, kind: str, future: Future):
+        self.id = job_id
+        self.kind = kind
+        self.future = future
+        self.submitted_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.finished = None  # monotonic time the job finished, for expiry
+
+
+class JobManager:
+    """Queue of find-slot / calendar jobs with polling, cancellation and result expiry."""
+    _instance = None
+
+    def __init__(self, db_config: dict, workers: int = 2, result_ttl_seconds: int = 3600,
+                 runner: Callable = run_job):
+        self.db_config = dict(db_config)
+        self.workers = workers
+        self.result_ttl_seconds = result_ttl_seconds
+        self.runner = runner
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancelled = None
+
+    @classmethod
+    def get(cls) -> Optional["JobManager"]:
+        """The process-wide job manager, or None when it has not been configured."""
+        return cls._instance
+
+    @classmethod
+    def configure(cls, db_config: dict, workers: int = 2, result_ttl_seconds: int = 3600) -> "JobManager":
+        cls._instance = cls(db_config=db_config, workers=workers, result_ttl_seconds=result_ttl_seconds)
+        return cls._instance
+
+    def _start(self):
+        """Start the worker pool and the shared dicts on first use; caller holds the lock."""
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                for job in self._jobs.values():
+                    job.future.cancel()
+                    self._cancelled[job.id] = True
+                self._executor.shutdown(wait=True)
+                self._manager.shutdown()
+                self._executor = None
+                self._manager = None
+            self._jobs.clear()
+
+    def submit(self, kind: str, params: dict) -> dict:
+        """
+        Queue a job.
+
+        :param kind: "find_slot" or "calendar"
+        :param params: keyword arguments of DatabaseManager.find_slot() / get_calendar()
+        :return: the job status
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._expire()
+            self._start()
+            future = self._executor.submit(self.runner, job_id, kind, params, self.db_config,
+                                           self._progress, self._cancelled)
+            job = _Job(job_id, kind, future)
+            self._jobs[job_id] = job
+        future.add_done_callback(lambda _: self._finished(job))
+        return self.status(job_id)
+
+    def _finished(self, job: _Job):
+        job.finished_at = datetime.now(timezone.utc)
+        job.finished = time.monotonic()
+
+    def _expire(self):
+        """Drop jobs whose result has been kept for result_ttl_seconds; caller holds the lock."""
+        now = time.monotonic()
+        for job_id in [job.id for job in self._jobs.values()
+                       if job.finished is not None and now - job.finished > self.result_ttl_seconds]:
+            self._forget(job_id)
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._progress.pop(job_id, None)
+        self._cancelled.pop(job_id, None)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """Status of a job, with its result once completed; None for unknown or expired jobs."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            started = job_id in self._progress
+            scanned, total = self._progress.get(job_id, (0, 0))
+            cancelled = bool(self._cancelled.get(job_id))
+        result = {"id": job.id, "kind": job.kind, "submitted_at": job.submitted_at.isoformat(),
+                  "progress": {"hours_scanned": scanned, "total_hours": total}}
+        future = job.future
+        if not future.done():
+            if cancelled:
+                result["status"] = "cancelling"
+            else:
+                result["status"] = "running" if started else "queued"
+            return result
+
+        result["finished_at"] = (job.finished_at or datetime.now(timezone.utc)).isoformat()
+        try:
+            error = future.exception()
+        except CancelledError:
+            result["status"] = "cancelled"
+            return result
+        if isinstance(error, JobCancelled):
+            result["status"] = "cancelled"
+        elif error is not None:
+            result["status"] = "failed"
+            result["error"] = str(error)
+        else:
+            result["status"] = "completed"
+            result["result"] = future.result()
+        return result
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a queued or running job; a running job stops at its next progress report.
+        A finished job is discarded instead. Returns the job status, or None for unknown jobs.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            finished = job.future.done()
+            if not finished:
+                self._cancelled[job_id] = True
+                job.future.cancel()
+        status = self.status(job_id)
+        if finished:
+            with self._lock:
+                self._forget(job_id)
+        return status
@@ -1,15 +1,24 @@
-from sqlalchemy import ForeignKey, TIMESTAMP, Index, JSON, Boolean, UniqueConstraint, func
+from sqlalchemy import ForeignKey, TIMESTAMP, Index, JSON, Boolean, func, Computed
+from sqlalchemy.dialects.postgresql import TSTZRANGE
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy import Column, String, Integer, Sequence
 
 Base = declarative_base()
 
+# Closed [lease_start, lease_end] range; NULL when either end is missing or the lease is inverted
+LEASE_RANGE_SQL = ("CASE WHEN lease_start IS NOT NULL AND lease_end IS NOT NULL AND lease_start <= lease_end "
+                   "THEN tstzrange(lease_start, lease_end, '[]') END")
+
 
 class Sites(Base):
     __tablename__ = 'sites'
     id = Column(Integer, Sequence('sites.id', start=1, increment=1), autoincrement=True, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
 
+    __table_args__ = (
+        Index('uq_sites_name', 'name', unique=True),
+    )
+
 
 class Hosts(Base):
     __tablename__ = 'hosts'
@@ -18,6 +27,7 @@ class Hosts(Base):
     name = Column(String, nullable=False, index=True)
     __table_args__ = (
         Index('idx_hosts_name_site', 'name', 'site_id'),
+        Index('uq_hosts_name', 'name', unique=True),
     )
 
 
@@ -36,6 +46,7 @@ class Projects(Base):
     #memberships = relationship("Membership", back_populates="project", cascade="all, delete-orphan")
     __table_args__ = (
         Index('idx_projects_uuid_name', 'project_uuid', 'project_name'),
+        Index('uq_projects_project_uuid', 'project_uuid', unique=True),
     )
 
 
@@ -56,6 +67,7 @@ class Users(Base):
     #memberships = relationship("Membership", back_populates="user", cascade="all, delete-orphan")
     __table_args__ = (
         Index('idx_users_uuid_email', 'user_uuid', 'user_email'),
+        Index('uq_users_user_uuid', 'user_uuid', unique=True),
     )
 
 
@@ -70,13 +82,19 @@ class Membership(Base):
     end_time = Column(TIMESTAMP(timezone=True), nullable=True)
     membership_type = Column(String)
     active = Column(Boolean, default=True, nullable=False)
+    # [start_time, end_time], open-ended while end_time is NULL
+    time_range = Column(TSTZRANGE, Computed(
+        "CASE WHEN start_time IS NOT NULL AND (end_time IS NULL OR start_time <= end_time) "
+        "THEN tstzrange(start_time, end_time, '[]') END", persisted=True), nullable=True)
 
     #user = relationship("Users", back_populates="memberships")
     #project = relationship("Projects", back_populates="memberships")
 
     __table_args__ = (
-        # Optional: enforce uniqueness of membership period if needed
-        UniqueConstraint('user_id', 'project_id', 'membership_type', 'start_time',),
+        # One row per membership period; NULL start_time / membership_type compare equal
+        Index('uq_membership_user_project_type_start', 'user_id', 'project_id', 'membership_type', 'start_time',
+              unique=True, postgresql_nulls_not_distinct=True),
+        Index('idx_membership_time_range', 'time_range', postgresql_using='gist'),
     )
 
 
@@ -90,11 +108,15 @@ class Slices(Base):
     state = Column(Integer, nullable=False, index=True)
     lease_start = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
     lease_end = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
+    lease_range = Column(TSTZRANGE, Computed(LEASE_RANGE_SQL, persisted=True), nullable=True)
 
     __table_args__ = (
         Index('idx_slice_lease_range', 'lease_start', 'lease_end'),
+        Index('idx_slices_lease_tstzrange', 'lease_range', postgresql_using='gist'),
+        Index('idx_slices_lease_range_null', 'lease_start', postgresql_where=lease_range.is_(None)),
         Index('idx_slices_user_project', 'user_id', 'project_id'),
         Index('idx_slices_state_project', 'state', 'project_id'),
+        Index('uq_slices_slice_guid', 'slice_guid', unique=True),
     )
 
 
@@ -122,9 +144,16 @@ class Slivers(Base):
     lease_start = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
     lease_end = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
     closed_at = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
+    lease_range = Column(TSTZRANGE, Computed(LEASE_RANGE_SQL, persisted=True), nullable=True)
 
     __table_args__ = (
         Index('idx_sliver_lease_range', 'lease_start', 'lease_end'),
+        Index('idx_slivers_lease_tstzrange', 'lease_range', postgresql_using='gist'),
+        Index('idx_slivers_lease_range_null', 'lease_start', postgresql_where=lease_range.is_(None)),
+        # Calendar / find-slot scans: active slivers by lease overlap, usage columns read from the index
+        Index('idx_slivers_active_lease_tstzrange', 'lease_range', postgresql_using='gist',
+              postgresql_include=['host_id', 'core', 'ram', 'disk'],
+              postgresql_where=state.in_([1, 2, 4, 5])),
         Index('idx_slivers_user_project', 'user_id', 'project_id'),
         Index('idx_slivers_site_host', 'site_id', 'host_id'),
         Index('idx_slivers_project_slice', 'project_id', 'slice_id'),
@@ -132,6 +161,7 @@ class Slivers(Base):
         Index('idx_slivers_ip_subnet', 'ip_subnet'),
         Index('idx_slivers_ip_v4', 'ip_v4'),
         Index('idx_slivers_ip_v6', 'ip_v6'),
+        Index('uq_slivers_sliver_guid', 'sliver_guid', unique=True),
     )
 
 
@@ -217,3 +247,80 @@ class Interfaces(Base):
         Index('idx_interfaces_sliver_bdf', 'sliver_id', 'bdf'),
         Index('idx_interfaces_sliver_site', 'sliver_id', 'site_id'),
     )
+
+
+class HostHourlyAllocation(Base):
+    __tablename__ = 'host_hourly_allocation'
+    host_id = Column(Integer, ForeignKey('hosts.id'), primary_key=True)
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    cores = Column(Integer, nullable=False, default=0)
+    ram = Column(Integer, nullable=False, default=0)
+    disk = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_host_hourly_allocation_hour', 'hour'),
+    )
+
+
+class HostHourlyComponentAllocation(Base):
+    __tablename__ = 'host_hourly_component_allocation'
+    host_id = Column(Integer, ForeignKey('hosts.id'), primary_key=True)
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    component = Column(String, primary_key=True)
+    allocated = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_host_hourly_component_allocation_hour', 'hour'),
+    )
+
+
+class LinkHourlyAllocation(Base):
+    __tablename__ = 'link_hourly_allocation'
+    site_a_id = Column(Integer, ForeignKey('sites.id'), primary_key=True)
+    site_b_id = Column(Integer, ForeignKey('sites.id'), primary_key=True)
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    bandwidth = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_link_hourly_allocation_hour', 'hour'),
+    )
+
+
+class FacilityPortHourlyAllocation(Base):
+    __tablename__ = 'facility_port_hourly_allocation'
+    name = Column(String, primary_key=True)
+    site_id = Column(Integer, ForeignKey('sites.id'), primary_key=True)
+    vlan = Column(String, primary_key=True)
+    hour = Column(TIMESTAMP(timezone=True), primary_key=True)
+    # Number of slivers holding this VLAN during the hour
+    holders = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_facility_port_hourly_allocation_hour', 'hour'),
+    )
+
+
+class SliverAllocationLedger(Base):
+    """What each sliver currently contributes to the hourly allocation tables."""
+    __tablename__ = 'sliver_allocation_ledger'
+    sliver_id = Column(Integer, ForeignKey('slivers.id', ondelete='CASCADE'), primary_key=True)
+    first_hour = Column(TIMESTAMP(timezone=True), nullable=False)
+    last_hour = Column(TIMESTAMP(timezone=True), nullable=False)
+    contribution = Column(JSON, nullable=False)
+
+
+class HourlyAllocationState(Base):
+    """Single row: the hour range the hourly allocation tables cover."""
+    __tablename__ = 'hourly_allocation_state'
+    id = Column(Integer, primary_key=True)
+    covered_from = Column(TIMESTAMP(timezone=True), nullable=False)
+    covered_until = Column(TIMESTAMP(timezone=True), nullable=False)
+    rebuilt_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SyncState(Base):
+    """Per entity type: the last_updated watermark of the last successful Core API sync."""
+    __tablename__ = 'sync_state'
+    entity_type = Column(String, primary_key=True)
+    watermark = Column(TIMESTAMP(timezone=True), nullable=True)
+    synced_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
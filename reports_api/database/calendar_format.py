@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Calendar response formats.
+
+Every slot is first reduced to an allocation record of plain arrays whose rows
+follow the order of CalendarLayout:
+
+    {"hosts":           [[cores, ram, disk, <allocated per host component>], ...],
+     "sites":           [[cores, ram, disk, <allocated per site component>], ...],
+     "links":           [bandwidth allocated, ...],
+     "facility_ports":  [[vlans_allocated, vlans_available], ...]}
+
+Component columns are in sorted key order. "hosts" is left out at level=site,
+"links" / "facility_ports" when there are none.
+
+    full     the original per-slot objects with capacity and available values
+    compact  capacities once, then one allocation record per slot
+    changes  capacities once, then runs {"slot", "count", ...record} of identical slots
+"""
+from typing import Iterable, Iterator, List
+
+CALENDAR_FORMATS = ("full", "compact", "changes")
+CALENDAR_LEVELS = ("host", "site")
+
+RESOURCE_FIELDS = ("cores", "ram", "disk")
+
+
+class CalendarLayout:
+    """Capacities and row order of the hosts, sites, links and facility ports of one calendar query."""
+
+    def __init__(self, host_cap_map: dict, link_cap_map: dict, fp_cap_map: dict, level: str = "host"):
+        self.level = level
+        self.hosts = []
+        self.sites = []
+        self.host_rows = []     # (host_id, site index, [(component key, lowercase key, site component position)])
+        self.host_site = {}     # host_id -> site index
+        self.host_components = {}  # host_id -> components as in host_rows
+        site_index = {}
+        for host_id, cap in host_cap_map.items():
+            s = cap["site"]
+            if s not in site_index:
+                site_index[s] = len(self.sites)
+                self.sites.append({"name": s, "cores_capacity": 0, "ram_capacity": 0, "disk_capacity": 0,
+                                   "components": {}})
+            site = self.sites[site_index[s]]
+            for field in RESOURCE_FIELDS:
+                site[f"{field}_capacity"] += cap[f"{field}_capacity"]
+            for comp_key, comp_cap in cap["components"].items():
+                site["components"][comp_key] = site["components"].get(comp_key, 0) + comp_cap
+            self.host_site[host_id] = site_index[s]
+            self.hosts.append({"name": cap["name"], "site": s,
+                               "cores_capacity": cap["cores_capacity"], "ram_capacity": cap["ram_capacity"],
+                               "disk_capacity": cap["disk_capacity"],
+                               "components": dict(sorted(cap["components"].items()))})
+
+        # Component columns follow sorted keys, the order JSON with sort_keys sends the capacities in
+        for site in self.sites:
+            site["components"] = dict(sorted(site["components"].items()))
+        site_positions = [{key: n for n, key in enumerate(site["components"])} for site in self.sites]
+        for host_id, cap in host_cap_map.items():
+            i = self.host_site[host_id]
+            components = [(key, key.lower(), site_positions[i][key]) for key in sorted(cap["components"])]
+            self.host_rows.append((host_id, i, components))
+            self.host_components[host_id] = components
+
+        self.links = [{"name": cap["name"], "site_a": cap["site_a"], "site_b": cap["site_b"], "layer": cap["layer"],
+                       "bandwidth_capacity": cap["bandwidth_capacity"]} for cap in link_cap_map.values()]
+        self.ports = [{"name": cap["name"], "site": cap["site"], "device_name": cap["device_name"],
+                       "local_name": cap["local_name"], "vlan_range": cap["vlan_range"],
+                       "total_vlans": cap["total_vlans"]} for cap in fp_cap_map.values()]
+
+    def record(self, alloc_map: dict, comp_alloc_map: dict, links: list, facility_ports: list) -> dict:
+        """
+        Allocation record of one slot.
+
+        :param alloc_map: host_id -> {"cores", "ram", "disk"} allocated
+        :param comp_alloc_map: host_id -> {component key: allocated}, matched case-insensitively
+        :param links: bandwidth allocated per link, in link_cap_map order
+        :param facility_ports: [vlans_allocated, vlans_available] per port, in fp_cap_map order
+        """
+        site_rows = [[0] * (len(RESOURCE_FIELDS) + len(site["components"])) for site in self.sites]
+        result = {}
+        if self.level == "host":
+            host_rows = []
+            for host_id, i, components in self.host_rows:
+                alloc = alloc_map.get(host_id)
+                row = [alloc["cores"], alloc["ram"], alloc["disk"]] if alloc else [0, 0, 0]
+                comp_alloc = comp_alloc_map.get(host_id)
+                comp_alloc_lower = {k.lower(): v for k, v in comp_alloc.items()} if comp_alloc else {}
+                site_row = site_rows[i]
+                for n in range(3):
+                    site_row[n] += row[n]
+                for _, lower, pos in components:
+                    allocated = comp_alloc_lower.get(lower, 0)
+                    row.append(allocated)
+                    site_row[3 + pos] += allocated
+                host_rows.append(row)
+            result["hosts"] = host_rows
+        else:
+            # Only hosts with usage in this slot are visited
+            for host_id, alloc in alloc_map.items():
+                i = self.host_site.get(host_id)
+                if i is not None:
+                    site_row = site_rows[i]
+                    site_row[0] += alloc["cores"]
+                    site_row[1] += alloc["ram"]
+                    site_row[2] += alloc["disk"]
+            for host_id, comp_alloc in comp_alloc_map.items():
+                i = self.host_site.get(host_id)
+                if i is None or not comp_alloc:
+                    continue
+                comp_alloc_lower = {k.lower(): v for k, v in comp_alloc.items()}
+                for _, lower, pos in self.host_components[host_id]:
+                    site_rows[i][3 + pos] += comp_alloc_lower.get(lower, 0)
+        result["sites"] = site_rows
+        if self.links:
+            result["links"] = links
+        if self.ports:
+            result["facility_ports"] = facility_ports
+        return result
+
+    # -------------------- RENDERING --------------------
+    @staticmethod
+    def _expand(cap: dict, row: list, keys: list) -> dict:
+        entry = {k: v for k, v in cap.items() if k != "components"}
+        for n, field in enumerate(RESOURCE_FIELDS):
+            entry[f"{field}_allocated"] = row[n]
+            entry[f"{field}_available"] = cap[f"{field}_capacity"] - row[n]
+        entry["components"] = {key: {"capacity": cap["components"][key], "allocated": row[3 + n],
+                                     "available": cap["components"][key] - row[3 + n]}
+                               for n, key in enumerate(keys)}
+        return entry
+
+    def full_slot(self, slot_start: str, slot_end: str, record: dict) -> dict:
+        """Expand a record into the original per-slot object."""
+        entry = {"start": slot_start, "end": slot_end}
+        if "hosts" in record:
+            entry["hosts"] = [self._expand(cap, row, list(cap["components"]))
+                              for cap, row in zip(self.hosts, record["hosts"])]
+        entry["sites"] = [self._expand(cap, row, list(cap["components"]))
+                          for cap, row in zip(self.sites, record["sites"])]
+        if record.get("links"):
+            entry["links"] = [dict(cap, bandwidth_allocated=allocated,
+                                   bandwidth_available=cap["bandwidth_capacity"] - allocated)
+                              for cap, allocated in zip(self.links, record["links"])]
+        if record.get("facility_ports"):
+            entry["facility_ports"] = [dict(cap, vlans_allocated=allocated, vlans_available=available)
+                                       for cap, (allocated, available) in zip(self.ports, record["facility_ports"])]
+        return entry
+
+    def header(self, fmt: str, interval: str, query_start: str, query_end: str, total: int) -> dict:
+        """Top-level fields of a response; for compact / changes these carry the capacities."""
+        if fmt == "full":
+            return {"interval": interval, "query_start": query_start, "query_end": query_end, "total": total}
+        result = {"format": fmt, "level": self.level, "interval": interval,
+                  "query_start": query_start, "query_end": query_end, "total": total,
+                  "sites": self.sites}
+        if self.level == "host":
+            result["hosts"] = self.hosts
+        if self.links:
+            result["links"] = self.links
+        if self.ports:
+            result["facility_ports"] = self.ports
+        return result
+
+    def response(self, fmt: str, slots: list, records: List[dict], interval: str,
+                 query_start: str, query_end: str) -> dict:
+        """
+        :param fmt: one of CALENDAR_FORMATS
+        :param slots: (start, end) ISO strings per slot
+        :param records: allocation record per slot
+        """
+        result = self.header(fmt, interval, query_start, query_end, len(records))
+        if fmt == "full":
+            result["data"] = [self.full_slot(slot_start, slot_end, record)
+                              for (slot_start, slot_end), record in zip(slots, records)]
+        elif fmt == "compact":
+            result["allocations"] = records
+        else:
+            result["changes"] = changes(records)
+        return result
+
+    def stream(self, fmt: str, rows: Iterable[tuple], interval: str, query_start: str, query_end: str,
+               total: int) -> Iterator[dict]:
+        """
+        The response as a sequence of items: the header first, then one full slot, one
+        record (with its "slot" index) or one run per item as rows are produced.
+
+        :param rows: (start, end, record) per slot in time order, start / end ISO strings
+        """
+        yield self.header(fmt, interval, query_start, query_end, total)
+        if fmt == "full":
+            for slot_start, slot_end, record in rows:
+                yield self.full_slot(slot_start, slot_end, record)
+        elif fmt == "compact":
+            for i, (_, _, record) in enumerate(rows):
+                yield dict(record, slot=i)
+        else:
+            yield from iter_changes(record for _, _, record in rows)
+
+
+def iter_changes(records: Iterable[dict]) -> Iterator[dict]:
+    """Run-length encode records: one {"slot", "count", ...record} per run of identical consecutive slots."""
+    run = None
+    for i, record in enumerate(records):
+        if run is not None and run[1] == record:
+            run[0]["count"] += 1
+            continue
+        if run is not None:
+            yield dict(run[0], **run[1])
+        run = ({"slot": i, "count": 1}, record)
+    if run is not None:
+        yield dict(run[0], **run[1])
+
+
+def changes(records: List[dict]) -> List[dict]:
+    return list(iter_changes(records))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Capacity maps shared across calendar and find-slot requests.
+
+The capacity tables only change through the capacity POST endpoints, so the
+host / link / facility port maps are loaded once and revalidated by a cheap
+max(updated_at) / count(*) probe instead of re-running the joins per request.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+from sqlalchemy import func
+
+from reports_api.database import HostCapacities, LinkCapacities, FacilityPortCapacities
+
+
+def capacity_watermark(session) -> tuple:
+    """(max(updated_at), count) of the host, link and facility port capacity tables, in one round trip."""
+    columns = []
+    for table in (HostCapacities, LinkCapacities, FacilityPortCapacities):
+        columns.append(session.query(func.max(table.updated_at)).scalar_subquery())
+        columns.append(session.query(func.count(table.id)).scalar_subquery())
+    return tuple(session.query(*columns).one())
+
+
+class CapacitySnapshot:
+    """
+    Host, link and facility port capacities as loaded at one watermark.
+
+    Snapshots are shared by every request and thread; the maps and the dicts in
+    them must be treated as read-only. The filter methods return new top-level maps
+    in load order.
+    """
+
+    def __init__(self, host_cap_map: dict, link_cap_map: dict, fp_cap_map: dict, vlan_bitmaps: dict,
+                 watermark: tuple = None):
+        self.host_cap_map = host_cap_map
+        self.link_cap_map = link_cap_map
+        self.fp_cap_map = fp_cap_map
+        self.vlan_bitmaps = vlan_bitmaps  # fp_cap_map key -> bitmap of its vlan_range
+        self.watermark = watermark
+        hosts_by_site = defaultdict(list)
+        for host_id, cap in host_cap_map.items():
+            hosts_by_site[cap["site"]].append(host_id)
+        self.hosts_by_site = dict(hosts_by_site)
+
+    def hosts(self, site=None, host=None, exclude_site=None, exclude_host=None) -> dict:
+        if not (site or host or exclude_site or exclude_host):
+            return self.host_cap_map
+        return {host_id: cap for host_id, cap in self.host_cap_map.items()
+                if (not site or cap["site"] in site) and (not host or cap["name"] in host)
+                and not (exclude_site and cap["site"] in exclude_site)
+                and not (exclude_host and cap["name"] in exclude_host)}
+
+    def links(self, site=None, exclude_site=None) -> dict:
+        if not (site or exclude_site):
+            return self.link_cap_map
+        return {pair: cap for pair, cap in self.link_cap_map.items()
+                if (not site or pair[0] in site or pair[1] in site)
+                and not (exclude_site and (pair[0] in exclude_site or pair[1] in exclude_site))}
+
+    def facility_ports(self, site=None, exclude_site=None) -> dict:
+        if not (site or exclude_site):
+            return self.fp_cap_map
+        return {key: cap for key, cap in self.fp_cap_map.items()
+                if (not site or cap["site"] in site) and not (exclude_site and cap["site"] in exclude_site)}
+
+
+class CapacityCache:
+    """
+    Process-wide CapacitySnapshot. Every use probes capacity_watermark() and reloads
+    only when a table's max(updated_at) or row count moved. Writes made through this
+    process invalidate it directly, and snapshots older than max_age_seconds are
+    reloaded regardless, to bound what a probe can miss (updated_at is the writing
+    transaction's start time, so a long transaction can commit behind the watermark).
+    """
+    _instance = None
+
+    def __init__(self, max_age_seconds: int = 300):
+        self.max_age_seconds = max_age_seconds
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> Optional["CapacityCache"]:
+        """The process-wide cache, or None when it has not been configured."""
+        return cls._instance
+
+    @classmethod
+    def configure(cls, max_age_seconds: int = 300) -> "CapacityCache":
+        cls._instance = cls(max_age_seconds=max_age_seconds)
+        return cls._instance
+
+    def current(self) -> Optional[CapacitySnapshot]:
+        """The last loaded snapshot, without probing; None before the first load."""
+        return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self, session, loader: Callable[[object, tuple], CapacitySnapshot]) -> CapacitySnapshot:
+        """
+        The current snapshot, reloaded through loader(session, watermark) when the
+        watermark moved; concurrent callers wait for a single reload.
+        """
+        watermark = capacity_watermark(session)
+        snapshot = self._snapshot
+        if self._valid(snapshot, watermark):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._valid(snapshot, watermark):
+                snapshot = loader(session, watermark)
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            return snapshot
+
+    def _valid(self, snapshot: Optional[CapacitySnapshot], watermark: tuple) -> bool:
+        return snapshot is not None and snapshot.watermark == watermark and \
+            time.monotonic() - self._loaded_at <= self.max_age_seconds
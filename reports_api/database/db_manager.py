@@ -29,17 +29,43 @@ import threading
 import time
 from collections import defaultdict
 from contextlib import contextmanager
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Union
 
-from sqlalchemy import create_engine, and_, or_, func, distinct, not_
+from sqlalchemy import create_engine, and_, or_, func, distinct, not_, case, literal, literal_column, select, \
+    TIMESTAMP, update, cast, false, tuple_, JSON
+from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB
 from sqlalchemy.orm import sessionmaker, scoped_session
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from reports_api.database import Slices, Slivers, Hosts, Sites, Users, Projects, Components, Interfaces, Base, \
-    Membership, HostCapacities, LinkCapacities, FacilityPortCapacities
+    Membership, HostCapacities, LinkCapacities, FacilityPortCapacities, SyncState
+from reports_api.database.capacity_snapshot import CapacityCache, CapacitySnapshot
+from reports_api.database.calendar_format import CALENDAR_FORMATS, CALENDAR_LEVELS, CalendarLayout
+from reports_api.database.hourly_allocation import HourlyAllocationStore, floor_hour
+from reports_api.database.occupancy_file import OccupancyFile, write_occupancy_file
+from reports_api.database.occupancy import HourlyOccupancy, LinkTimeline, link_intervals
+from reports_api.database.reservation_index import ReservationIndex
+from reports_api.database.staging_loader import StagingLoader
+from reports_api.database.time_filters import lease_overlaps, lease_overlaps_closed, membership_overlaps
 from reports_api.response_code.slice_sliver_states import SliceState, SliverStates
 
 
+# Columns the add_or_update_* upserts only overwrite with non-empty values
+PROJECT_OPTIONAL_COLUMNS = ("project_name", "project_type", "active", "expires_on", "retired_date")
+USER_OPTIONAL_COLUMNS = ("user_email", "active", "name", "affiliation", "google_scholar", "scopus", "bastion_login")
+SLICE_OPTIONAL_COLUMNS = ("project_id", "user_id", "slice_name", "state", "lease_start", "lease_end")
+SLIVER_OPTIONAL_COLUMNS = ("node_id", "ip_subnet", "ip_v4", "ip_v6", "image", "core", "ram", "disk",
+                           "bandwidth", "lease_start", "lease_end", "closed_at", "error")
+COMPONENT_OPTIONAL_COLUMNS = ("type", "model", "bdfs", "node_id", "component_node_id")
+INTERFACE_OPTIONAL_COLUMNS = ("site_id", "vlan", "bdf", "local_name", "device_name", "name")
+MEMBERSHIP_KEYS = ["user_id", "project_id", "membership_type", "start_time"]
+# Bookkeeping columns: a change to these alone does not rewrite a row
+TOUCH_COLUMNS = ("last_updated", "updated_at", "synced_at")
+# The "inserted" column returned by upserts (xmax = 0), NULL for rows left unchanged
+UPSERT_STATUS = {True: "created", False: "updated", None: "unchanged"}
+
+
 @contextmanager
 def session_scope(psql_db_engine):
     """Provide a transactional scope around a series of operations."""
@@ -54,40 +80,51 @@ def session_scope(psql_db_engine):
         session.close()
 
 
-def _parse_vlan_range(range_str: str) -> set:
-    """Parse '100-200,300-350' → {100, 101, ..., 200, 300, ..., 350}"""
-    vlans = set()
+@lru_cache(maxsize=1024)
+def _parse_vlan_range(range_str: str) -> int:
+    """Parse '100-200,300-350' → VLAN bitmap with bits 100..200 and 300..350 set"""
+    bits = 0
     if not range_str:
-        return vlans
+        return bits
     for part in range_str.split(','):
         part = part.strip()
         if '-' in part:
             start, end = part.split('-', 1)
-            vlans.update(range(int(start), int(end) + 1))
+            start, end = int(start), int(end)
+            if end >= start:
+                bits |= ((1 << (end - start + 1)) - 1) << start
         elif part.isdigit():
-            vlans.add(int(part))
-    return vlans
-
-
-def _format_vlan_set_as_range(vlan_set: set) -> str:
-    """Format {100,101,102,105,110} → '100-102,105,110'"""
-    if not vlan_set:
-        return ""
-    sorted_vlans = sorted(vlan_set)
-    ranges = []
-    start = prev = sorted_vlans[0]
-    for v in sorted_vlans[1:]:
-        if v == prev + 1:
-            prev = v
-        else:
-            ranges.append(f"{start}-{prev}" if start != prev else str(start))
-            start = prev = v
-    ranges.append(f"{start}-{prev}" if start != prev else str(start))
-    return ",".join(ranges)
+            bits |= 1 << int(part)
+    return bits
+
+
+def _vlan_runs(bits: int):
+    """Yield (first, last) for each run of consecutive set bits, lowest first"""
+    offset = 0
+    while bits:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        offset += skip
+        length = (bits ^ (bits + 1)).bit_length() - 1
+        yield offset, offset + length - 1
+        bits >>= length
+        offset += length
+
+
+def _format_vlan_bitmap(bits: int) -> str:
+    """Format bitmap with bits 100,101,102,105,110 set → '100-102,105,110'"""
+    return ",".join(f"{start}-{end}" if start != end else str(start) for start, end in _vlan_runs(bits))
+
+
+def _vlan_bitmap_members(bits: int) -> List[str]:
+    """VLANs set in a bitmap as strings, sorted the way vlans_allocated has always been sorted"""
+    return sorted(str(v) for start, end in _vlan_runs(bits) for v in range(start, end + 1))
 
 
 class DatabaseManager:
     DEFAULT_TIME_WINDOW_DAYS = 30
+    CALENDAR_ENGINES = ("python", "sql")
+    CALENDAR_CHUNK_SLOTS = 168
 
     def __init__(self, user: str, password: str, database: str, db_host: str, logger: logging.Logger):
         """
@@ -116,6 +153,9 @@ class DatabaseManager:
             if slice:
                 session.delete(slice_object)
                 session.commit()
+                index = ReservationIndex.get()
+                if index is not None:
+                    index.invalidate()
                 return True
             return False
         finally:
@@ -145,6 +185,113 @@ class DatabaseManager:
         finally:
             session.rollback()
 
+    # -------------------- UPSERT HELPERS --------------------
+    @staticmethod
+    def _changed(table, values: dict):
+        """
+        True where the stored row differs from `values` in any column other than the
+        last_updated / updated_at bookkeeping columns. JSON is compared as jsonb.
+        """
+        conditions = []
+        for name, value in values.items():
+            if name in TOUCH_COLUMNS:
+                continue
+            column = table.c[name]
+            if isinstance(column.type, JSON):
+                conditions.append(cast(column, JSONB).is_distinct_from(cast(value, JSONB)))
+            else:
+                conditions.append(column.is_distinct_from(value))
+        return or_(*conditions) if conditions else false()
+
+    @staticmethod
+    def _count(stats: Optional[dict], written: int, total: int):
+        if stats is not None:
+            stats["written"] = stats.get("written", 0) + written
+            stats["unchanged"] = stats.get("unchanged", 0) + total - written
+
+    @staticmethod
+    def _upsert(session, table, keys: List[str], rows: List[dict], keep=(), insert_only=(), returning=None,
+                stats: dict = None) -> list:
+        """
+        Multi-row INSERT ... ON CONFLICT (keys) DO UPDATE as one statement.
+
+        Columns in keep are only overwritten by non-NULL values (COALESCE with the stored value),
+        columns in insert_only are only written by the insert, every other column is overwritten,
+        and updated_at, where the table has one, is set to now() on conflict. Rows must share keys
+        and must not repeat a conflict key.
+
+        Existing rows whose values would not change are not updated at all: no new row version,
+        no index churn, and last_updated / updated_at keep their value.
+
+        :param returning: columns to return for every row, inserted, updated or unchanged; must include
+            the key columns when rows has more than one row. Other expressions are NULL for unchanged rows.
+        :param stats: incremented with the number of rows "written" (inserted or updated) and "unchanged"
+        :return: the returned rows, or [] without returning
+        """
+        if not rows:
+            return []
+        stmt = pg_insert(table).values(rows)
+        set_ = {}
+        for name in rows[0]:
+            if name in keys or name in insert_only:
+                continue
+            set_[name] = func.coalesce(stmt.excluded[name], table.c[name]) if name in keep else stmt.excluded[name]
+        if "updated_at" in table.c:
+            set_["updated_at"] = func.now()
+        if not set_:
+            set_[keys[0]] = stmt.excluded[keys[0]]
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c[k] for k in keys], set_=set_,
+                                          where=DatabaseManager._changed(
+                                              table, {k: v for k, v in set_.items() if k not in keys}))
+        if returning is None:
+            result = session.execute(stmt)
+            DatabaseManager._count(stats, result.rowcount, len(rows))
+            return []
+        written = session.execute(stmt.returning(*returning)).all()
+        DatabaseManager._count(stats, len(written), len(rows))
+        if len(written) == len(rows):
+            return written
+
+        # Unchanged rows are skipped by ON CONFLICT ... WHERE and return nothing; read them instead
+        if written:
+            found = {tuple(getattr(row, k) for k in keys) for row in written}
+            missing = [row for row in rows if tuple(row[k] for k in keys) not in found]
+        else:
+            missing = rows
+        columns = [c if getattr(c, "table", None) is table else literal(None).label(c.name) for c in returning]
+        criteria = tuple_(*[table.c[k] for k in keys]).in_([tuple(row[k] for k in keys) for row in missing])
+        return written + session.execute(select(*columns).where(criteria)).all()
+
+    def _upsert_one(self, session, table, keys: List[str], values: dict, keep=(), insert_only=(), required=(),
+                    returning: str = "id", stats: dict = None):
+        """
+        _upsert() for one row, returning one column.
+
+        The proposed row is checked against NOT NULL before ON CONFLICT applies, so when a column in
+        required is None the row can only be updated: it is updated in place when it exists and the
+        upsert (which then fails as a plain insert would) is only attempted when it does not.
+        """
+        column = table.c[returning]
+        if any(values.get(name) is None for name in required):
+            criteria = [table.c[k] == values[k] for k in keys]
+            assignments = {name: value for name, value in values.items()
+                           if name not in keys and name not in insert_only and value is not None}
+            row = None
+            if assignments:
+                if "updated_at" in table.c:
+                    assignments["updated_at"] = func.now()
+                row = session.execute(update(table).where(*criteria, self._changed(table, assignments))
+                                      .values(assignments).returning(column)).first()
+            if row is not None:
+                self._count(stats, 1, 1)
+                return row[0]
+            row = session.execute(select(column).where(*criteria)).first()
+            if row is not None:
+                self._count(stats, 0, 1)
+                return row[0]
+        return self._upsert(session, table, keys, [values], keep=keep, insert_only=insert_only,
+                            returning=[column], stats=stats)[0][0]
+
     # -------------------- ADD OR UPDATE DATA --------------------
     def add_or_update_project(
             self,
@@ -174,36 +321,15 @@ class DatabaseManager:
 
         session = self.get_session()
         try:
-            project = session.query(Projects).filter(Projects.project_uuid == project_uuid).first()
-            if project:
-                if project_name is not None:
-                    project.project_name = project_name
-                if project_type is not None:
-                    project.project_type = project_type
-                if active is not None:
-                    project.active = active
-                if created_date is not None:
-                    project.created_date = created_date
-                if expires_on is not None:
-                    project.expires_on = expires_on
-                if retired_date is not None:
-                    project.retired_date = retired_date
-                project.last_updated = last_updated or datetime.utcnow()
-            else:
-                project = Projects(
-                    project_uuid=project_uuid,
-                    project_name=project_name,
-                    project_type=project_type,
-                    active=active,
-                    created_date=created_date or datetime.utcnow(),
-                    expires_on=expires_on,
-                    retired_date=retired_date,
-                    last_updated=last_updated or datetime.utcnow(),
-                )
-                session.add(project)
-
+            now = datetime.utcnow()
+            project_id = self._upsert_one(
+                session, Projects.__table__, ["project_uuid"],
+                {"project_uuid": project_uuid, "project_name": project_name, "project_type": project_type,
+                 "active": active, "created_date": created_date or now, "expires_on": expires_on,
+                 "retired_date": retired_date, "last_updated": last_updated or now},
+                keep=PROJECT_OPTIONAL_COLUMNS, insert_only=() if created_date is not None else ("created_date",))
             session.commit()
-            return project.id
+            return project_id
         finally:
             session.rollback()
 
@@ -238,42 +364,110 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            user = session.query(Users).filter(Users.user_uuid == user_uuid).first()
-            if user:
-                if user_email is not None:
-                    user.user_email = user_email
-                if active is not None:
-                    user.active = active
-                if name is not None:
-                    user.name = name
-                if affiliation is not None:
-                    user.affiliation = affiliation
-                if registered_on is not None:
-                    user.registered_on = registered_on
-                user.last_updated = last_updated or datetime.utcnow()
-                if google_scholar is not None:
-                    user.google_scholar = google_scholar
-                if scopus is not None:
-                    user.scopus = scopus
-                if bastion_login is not None:
-                    user.bastion_login = bastion_login
-            else:
-                user = Users(
-                    user_uuid=user_uuid,
-                    user_email=user_email,
-                    active=active,
-                    name=name,
-                    affiliation=affiliation,
-                    registered_on=registered_on or datetime.utcnow(),
-                    last_updated=last_updated or datetime.utcnow(),
-                    google_scholar=google_scholar,
-                    scopus=scopus,
-                    bastion_login=bastion_login
-                )
-                session.add(user)
+            now = datetime.utcnow()
+            user_id = self._upsert_one(
+                session, Users.__table__, ["user_uuid"],
+                {"user_uuid": user_uuid, "user_email": user_email, "active": active, "name": name,
+                 "affiliation": affiliation, "registered_on": registered_on or now, "last_updated": last_updated or now,
+                 "google_scholar": google_scholar, "scopus": scopus, "bastion_login": bastion_login},
+                keep=USER_OPTIONAL_COLUMNS, insert_only=() if registered_on is not None else ("registered_on",),
+                required=("user_email",))
+            session.commit()
+            return user_id
+        finally:
+            session.rollback()
+
+    def add_or_update_projects(self, projects: List[dict], statuses: dict = None) -> dict:
+        """
+        add_or_update_project() for many projects in one transaction: one multi-row upsert for
+        the projects given a created_date and one for the rest.
+
+        :param projects: dicts keyed like the add_or_update_project() arguments; only project_uuid is required
+        :param statuses: filled with project_uuid -> "created", "updated" or "unchanged"
+        :return: project_uuid -> project id
+        """
+        now = datetime.utcnow()
+        groups = {True: {}, False: {}}
+        for p in projects:
+            dated = p.get("created_date") is not None
+            groups[not dated].pop(p["project_uuid"], None)
+            groups[dated][p["project_uuid"]] = {
+                "project_uuid": p["project_uuid"], "created_date": p.get("created_date") or now,
+                "last_updated": p.get("last_updated") or now,
+                **{column: p.get(column) for column in PROJECT_OPTIONAL_COLUMNS}}
+        if not groups[True] and not groups[False]:
+            return {}
+        session = self.get_session()
+        try:
+            table = Projects.__table__
+            inserted = literal_column("xmax = 0").label("inserted")
+            ids = {}
+            for dated, rows in groups.items():
+                for row in self._upsert(session, table, ["project_uuid"], list(rows.values()),
+                                        keep=PROJECT_OPTIONAL_COLUMNS, insert_only=() if dated else ("created_date",),
+                                        returning=[table.c.project_uuid, table.c.id, inserted]):
+                    uuid, project_id, created = row
+                    ids[uuid] = project_id
+                    if statuses is not None:
+                        statuses[uuid] = UPSERT_STATUS[created]
+            session.commit()
+            return ids
+        finally:
+            session.rollback()
+
+    def add_or_update_users(self, users: List[dict], statuses: dict = None) -> dict:
+        """
+        add_or_update_user() for many users in one transaction: one multi-row upsert for the
+        users given a registered_on date and one for the rest. Users without an email can only
+        be updated; those not stored yet are left out.
 
+        :param users: dicts keyed like the add_or_update_user() arguments; only user_uuid is required
+        :param statuses: filled with user_uuid -> "created", "updated" or "unchanged", for the users stored
+        :return: user_uuid -> user id, for the users stored
+        """
+        now = datetime.utcnow()
+        groups = {True: {}, False: {}}
+        for u in users:
+            dated = u.get("registered_on") is not None
+            groups[not dated].pop(u["user_uuid"], None)
+            groups[dated][u["user_uuid"]] = {
+                "user_uuid": u["user_uuid"], "registered_on": u.get("registered_on") or now,
+                "last_updated": u.get("last_updated") or now,
+                **{column: u.get(column) for column in USER_OPTIONAL_COLUMNS}}
+        if not groups[True] and not groups[False]:
+            return {}
+        session = self.get_session()
+        try:
+            table = Users.__table__
+            inserted = literal_column("xmax = 0").label("inserted")
+            ids, found_statuses = {}, {}
+            for dated, rows in groups.items():
+                for uuid, row in rows.items():
+                    if row["user_email"] is not None:
+                        continue
+                    assignments = {name: value for name, value in row.items()
+                                   if name != "user_uuid" and value is not None
+                                   and (dated or name != "registered_on")}
+                    found = session.execute(update(table).where(table.c.user_uuid == uuid,
+                                                                self._changed(table, assignments))
+                                            .values(assignments).returning(table.c.id)).first()
+                    found_statuses[uuid] = "updated"
+                    if found is None:
+                        found = session.execute(select(table.c.id).where(table.c.user_uuid == uuid)).first()
+                        found_statuses[uuid] = "unchanged"
+                    if found is not None:
+                        ids[uuid] = found[0]
+                for row in self._upsert(session, table, ["user_uuid"],
+                                        [row for row in rows.values() if row["user_email"] is not None],
+                                        keep=USER_OPTIONAL_COLUMNS, insert_only=() if dated else ("registered_on",),
+                                        returning=[table.c.user_uuid, table.c.id, inserted]):
+                    uuid, user_id, created = row
+                    ids[uuid] = user_id
+                    found_statuses[uuid] = UPSERT_STATUS[created]
             session.commit()
-            return user.id
+            if statuses is not None:
+                statuses.update((uuid, found_statuses[uuid]) for uuid in ids)
+            return ids
         finally:
             session.rollback()
 
@@ -301,27 +495,30 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            existing = session.query(Membership).filter_by(
-                user_id=user_id,
-                project_id=project_id,
-                start_time=start_time,
-                membership_type=membership_type
-            ).first()
+            self._upsert(session, Membership.__table__, MEMBERSHIP_KEYS,
+                         [{"user_id": user_id, "project_id": project_id, "start_time": start_time,
+                           "membership_type": membership_type, "end_time": end_time, "active": active}])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
 
-            if existing:
-                existing.end_time = end_time
-                existing.active = active
-            else:
-                membership = Membership(
-                    user_id=user_id,
-                    project_id=project_id,
-                    start_time=start_time,
-                    end_time=end_time,
-                    membership_type=membership_type,
-                    active=active
-                )
-                session.add(membership)
+    def add_or_update_memberships(self, memberships: List[dict]) -> int:
+        """
+        add_or_update_membership() for many memberships, in one multi-row upsert and one transaction.
+
+        :param memberships: dicts with user_id, project_id, start_time, end_time, membership_type and active
+        :return: number of memberships written
+        """
+        rows = {tuple(m[k] for k in MEMBERSHIP_KEYS): {k: m[k] for k in MEMBERSHIP_KEYS + ["end_time", "active"]}
+                for m in memberships}
+        if not rows:
+            return 0
+        session = self.get_session()
+        try:
+            self._upsert(session, Membership.__table__, MEMBERSHIP_KEYS, list(rows.values()))
             session.commit()
+            return len(rows)
         except Exception:
             session.rollback()
             raise
@@ -336,34 +533,14 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            slice_obj = session.query(Slices).filter(Slices.slice_guid == slice_guid).first()
-            if slice_obj:
-                if project_id:
-                    slice_obj.project_id = project_id
-                if user_id:
-                    slice_obj.user_id = user_id
-                if slice_name:
-                    slice_obj.slice_name = slice_name
-                if state:
-                    slice_obj.state = state
-                if lease_start:
-                    slice_obj.lease_start = lease_start
-                if lease_end:
-                    slice_obj.lease_end = lease_end
-            else:
-                slice_obj = Slices(
-                    project_id=project_id,
-                    user_id=user_id,
-                    slice_guid=slice_guid,
-                    slice_name=slice_name,
-                    state=state,
-                    lease_start=lease_start,
-                    lease_end=lease_end
-                )
-                session.add(slice_obj)
-
+            slice_id = self._upsert_one(
+                session, Slices.__table__, ["slice_guid"],
+                {"slice_guid": slice_guid, "project_id": project_id or None, "user_id": user_id or None,
+                 "slice_name": slice_name or None, "state": state or None, "lease_start": lease_start or None,
+                 "lease_end": lease_end or None},
+                keep=SLICE_OPTIONAL_COLUMNS, required=("state",))
             session.commit()
-            return slice_obj.id
+            return slice_id
         finally:
             session.rollback()
 
@@ -397,70 +574,21 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            sliver = session.query(Slivers).filter(Slivers.sliver_guid == sliver_guid).first()
-
-            if sliver:
-                sliver.project_id = project_id
-                sliver.slice_id = slice_id
-                sliver.user_id = user_id
-                sliver.host_id = host_id
-                sliver.site_id = site_id
-                sliver.state = state
-                sliver.sliver_type = sliver_type.lower()
-                if ip_subnet:
-                    sliver.ip_subnet = ip_subnet
-                if ip_v4:
-                    sliver.ip_v4 = ip_v4
-                if ip_v6:
-                    sliver.ip_v6 = ip_v6
-                if image:
-                    sliver.image = image
-                if core:
-                    sliver.core = core
-                if ram:
-                    sliver.ram = ram
-                if disk:
-                    sliver.disk = disk
-                if bandwidth:
-                    sliver.bandwidth = bandwidth
-                if lease_start:
-                    sliver.lease_start = lease_start
-                if lease_end:
-                    sliver.lease_end = lease_end
-                if closed_at:
-                    sliver.closed_at = closed_at
-                if error:
-                    sliver.error = error
-                if node_id:
-                    sliver.node_id = node_id
-            else:
-                sliver = Slivers(
-                    project_id=project_id,
-                    slice_id=slice_id,
-                    user_id=user_id,
-                    host_id=host_id,
-                    site_id=site_id,
-                    sliver_guid=sliver_guid,
-                    node_id=node_id,
-                    state=state,
-                    sliver_type=sliver_type.lower(),
-                    ip_subnet=ip_subnet,
-                    ip_v4=ip_v4,
-                    ip_v6=ip_v6,
-                    image=image,
-                    core=core,
-                    ram=ram,
-                    disk=disk,
-                    bandwidth=bandwidth,
-                    lease_start=lease_start,
-                    lease_end=lease_end,
-                    closed_at=closed_at,
-                    error=error
-                )
-                session.add(sliver)
-
-            session.commit()
-            return sliver.id
+            optional = {"node_id": node_id, "ip_subnet": ip_subnet, "ip_v4": ip_v4, "ip_v6": ip_v6, "image": image,
+                        "core": core, "ram": ram, "disk": disk, "bandwidth": bandwidth, "lease_start": lease_start,
+                        "lease_end": lease_end, "closed_at": closed_at, "error": error}
+            stats = {}
+            sliver_id = self._upsert_one(
+                session, Slivers.__table__, ["sliver_guid"],
+                {"sliver_guid": sliver_guid, "project_id": project_id, "slice_id": slice_id, "user_id": user_id,
+                 "host_id": host_id, "site_id": site_id, "state": state, "sliver_type": sliver_type.lower(),
+                 **{column: value or None for column, value in optional.items()}},
+                keep=SLIVER_OPTIONAL_COLUMNS, stats=stats)
+            if stats["written"]:
+                HourlyAllocationStore(session).refresh_sliver(sliver_id)
+                session.commit()
+                self._mark_reservation_dirty(sliver_id)
+            return sliver_id
         finally:
             session.rollback()
 
@@ -473,35 +601,15 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            component = session.query(Components).filter(
-                Components.component_guid == component_guid, Components.sliver_id == sliver_id
-            ).first()
-
-            if component:
-                if component_type:
-                    component.type = component_type.lower()
-                if model:
-                    component.model = model.lower()
-                if bdfs:
-                    component.bdfs = bdfs  # Store as JSON
-                if node_id:
-                    component.node_id = node_id
-                if component_node_id:
-                    component.component_node_id = component_node_id
-            else:
-                component = Components(
-                    sliver_id=sliver_id,
-                    component_guid=component_guid,
-                    type=component_type.lower() if component_type else None,
-                    model=model.lower() if model else None,
-                    bdfs=bdfs,
-                    node_id=node_id,
-                    component_node_id=component_node_id
-                )
-                session.add(component)
-
-            session.commit()
-            return component.component_guid
+            stats = {}
+            self._upsert(session, Components.__table__, ["sliver_id", "component_guid"],
+                         [self._component_row(sliver_id, component_guid, component_type, model, bdfs, node_id,
+                                              component_node_id)], keep=COMPONENT_OPTIONAL_COLUMNS, stats=stats)
+            if stats["written"]:
+                HourlyAllocationStore(session).refresh_sliver(sliver_id)
+                session.commit()
+                self._mark_reservation_dirty(sliver_id)
+            return component_guid
         finally:
             session.rollback()
 
@@ -512,41 +620,254 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            interface = session.query(Interfaces).filter(
-                Interfaces.interface_guid == interface_guid, Interfaces.sliver_id == sliver_id
-            ).first()
+            stats = {}
+            self._upsert(session, Interfaces.__table__, ["sliver_id", "interface_guid"],
+                         [self._interface_row(sliver_id, interface_guid, vlan, bdf, local_name, device_name, name,
+                                              site_id)], keep=INTERFACE_OPTIONAL_COLUMNS, stats=stats)
+            if stats["written"]:
+                HourlyAllocationStore(session).refresh_sliver(sliver_id)
+                session.commit()
+                self._mark_reservation_dirty(sliver_id)
+            return interface_guid
+        finally:
+            session.rollback()
 
-            if interface:
-                if local_name:
-                    interface.local_name = local_name
-                if vlan:
-                    interface.vlan = vlan
-                if bdf:
-                    interface.bdf = bdf
-                if device_name:
-                    interface.device_name = device_name
-                if name:
-                    interface.name = name
-                if site_id:
-                    interface.site_id = site_id
-            else:
-                interface = Interfaces(
-                    sliver_id=sliver_id,
-                    interface_guid=interface_guid,
-                    local_name=local_name,
-                    device_name=device_name,
-                    vlan=vlan,
-                    bdf=bdf,
-                    name=name,
-                    site_id=site_id
-                )
-                session.add(interface)
+    @staticmethod
+    def _component_row(sliver_id, component_guid, component_type, model, bdfs, node_id, component_node_id) -> dict:
+        return {"sliver_id": sliver_id, "component_guid": component_guid,
+                "type": component_type.lower() if component_type else None, "model": model.lower() if model else None,
+                "bdfs": bdfs or None, "node_id": node_id or None, "component_node_id": component_node_id or None}
+
+    @staticmethod
+    def _interface_row(sliver_id, interface_guid, vlan, bdf, local_name, device_name, name, site_id) -> dict:
+        return {"sliver_id": sliver_id, "interface_guid": interface_guid, "site_id": site_id or None,
+                "vlan": vlan or None, "bdf": bdf or None, "local_name": local_name or None,
+                "device_name": device_name or None, "name": name or None}
+
+    # -------------------- BULK SLIVER INGEST --------------------
+    def add_or_update_slivers(self, slice_guid: str, slivers: List[dict]) -> dict:
+        """
+        Adds or updates the slivers of one slice, with their components and interfaces, in a
+        single transaction.
+
+        Projects, users, sites, hosts and slivers are each written with one multi-row upsert, and
+        components and interfaces likewise. Field semantics match add_or_update_sliver(),
+        add_or_update_component() and add_or_update_interface(): empty values never overwrite
+        stored ones. The slice's lease is set to span the batch's slivers.
+
+        :param slice_guid: slice the slivers belong to
+        :param slivers: dicts with project_uuid, project_name, user_uuid, user_email, slice_name,
+            site, host, sliver_guid, state, sliver_type, the optional sliver columns, and lists of
+            component and interface dicts keyed like add_or_update_component() / add_or_update_interface()
+        :return: sliver_guid -> "created", "updated" or "unchanged"; a sliver whose components
+            or interfaces changed counts as updated
+        """
+        if not slivers:
+            return {}
+        session = self.get_session()
+        try:
+            now = datetime.utcnow()
+            project_ids = self._resolve_projects(session, slivers, now)
+            user_ids = self._resolve_users(session, slivers, now)
+
+            first = slivers[0]
+            slice_id = self._upsert_one(
+                session, Slices.__table__, ["slice_guid"],
+                {"slice_guid": slice_guid, "project_id": project_ids.get(first["project_uuid"]),
+                 "user_id": user_ids.get(first["user_uuid"]),
+                 "slice_name": next((s["slice_name"] for s in slivers if s.get("slice_name")), None),
+                 "state": None,
+                 "lease_start": min((s["lease_start"] for s in slivers if s.get("lease_start")), default=None),
+                 "lease_end": max((s["lease_end"] for s in slivers if s.get("lease_end")), default=None)},
+                keep=SLICE_OPTIONAL_COLUMNS, required=("state",))
+
+            statuses, sliver_ids = self._write_slivers(session, slivers, {slice_guid: slice_id}, project_ids,
+                                                       user_ids, slice_guid=slice_guid)
+            if sliver_ids:
+                HourlyAllocationStore(session).refresh_slivers(sliver_ids)
+            session.commit()
+            for sliver_id in sliver_ids:
+                self._mark_reservation_dirty(sliver_id)
+            return {s["sliver_guid"]: statuses[s["sliver_guid"]] for s in slivers}
+        finally:
+            session.rollback()
+
+    def import_slices(self, slices: List[dict], skip_existing: bool = True) -> dict:
+        """
+        Writes several slices with their slivers, components and interfaces in one transaction,
+        using one multi-row upsert per table.
+
+        :param slices: dicts with slice_guid, slice_name, project_uuid, project_name, user_uuid,
+            user_email, state, lease_start, lease_end and a list of slivers as taken by
+            add_or_update_slivers(); a slice without state must already be stored
+        :param skip_existing: leave slices that are already stored, and their slivers, untouched
+        :return: counts of slices written and skipped, of slivers written, and of rows written and left
+            unchanged
+        """
+        session = self.get_session()
+        try:
+            slices = list({s["slice_guid"]: s for s in slices}.values())
+            skipped = 0
+            if skip_existing and slices:
+                existing = {row[0] for row in session.query(Slices.slice_guid).filter(
+                    Slices.slice_guid.in_([s["slice_guid"] for s in slices]))}
+                skipped = len(existing)
+                slices = [s for s in slices if s["slice_guid"] not in existing]
+            if not slices:
+                return {"slices": 0, "skipped": skipped, "slivers": 0, "rows": 0, "unchanged": 0}
+
+            now = datetime.utcnow()
+            slivers = [dict(sliver, slice_guid=s["slice_guid"]) for s in slices for sliver in s["slivers"]]
+            project_ids = self._resolve_projects(session, slices + slivers, now)
+            user_ids = self._resolve_users(session, slices + slivers, now)
+            table = Slices.__table__
+            stats = {}
+            rows = [{"slice_guid": s["slice_guid"], "project_id": project_ids.get(s["project_uuid"]),
+                     "user_id": user_ids.get(s["user_uuid"]), "slice_name": s.get("slice_name") or None,
+                     "state": s.get("state"), "lease_start": s.get("lease_start") or None,
+                     "lease_end": s.get("lease_end") or None} for s in slices]
+            slice_ids = dict(self._upsert(
+                session, table, ["slice_guid"], [row for row in rows if row["state"] is not None],
+                keep=SLICE_OPTIONAL_COLUMNS, returning=[table.c.slice_guid, table.c.id], stats=stats))
+            # Slices posted only through their slivers carry no state and can only be updated in place
+            for row in rows:
+                if row["state"] is None:
+                    slice_ids[row["slice_guid"]] = self._upsert_one(
+                        session, table, ["slice_guid"], row, keep=SLICE_OPTIONAL_COLUMNS, required=("state",),
+                        stats=stats)
+
+            statuses, sliver_ids = self._write_slivers(session, slivers, slice_ids, project_ids, user_ids,
+                                                       stats=stats)
+            HourlyAllocationStore(session).refresh_slivers(sliver_ids)
+            session.commit()
+            for sliver_id in sliver_ids:
+                self._mark_reservation_dirty(sliver_id)
+            return {"slices": len(slices), "skipped": skipped,
+                    "slivers": sum(1 for status in statuses.values() if status != "unchanged"),
+                    "rows": stats["written"], "unchanged": stats["unchanged"]}
+        finally:
+            session.rollback()
 
+    def copy_load(self, slices: List[dict] = (), memberships: List[dict] = (), skip_existing: bool = True) -> dict:
+        """
+        Loads slices (with their slivers, components and interfaces) and memberships through
+        COPY into staging tables and a set-based merge, in one transaction. Much faster than
+        import_slices() for large back-fills; see staging_loader.
+
+        :param slices: slices as taken by import_slices()
+        :param memberships: dicts with user_uuid, project_uuid, membership_type, start_time,
+            end_time and active; memberships of unknown users or projects are dropped
+        :param skip_existing: leave slices that are already stored, and their slivers, untouched
+        :return: counts of slices written and skipped, of slivers and memberships written, and of rows
+            written and staged but left unchanged
+        """
+        session = self.get_session()
+        try:
+            loader = StagingLoader(session, slice_keep=SLICE_OPTIONAL_COLUMNS, sliver_keep=SLIVER_OPTIONAL_COLUMNS,
+                                   component_keep=COMPONENT_OPTIONAL_COLUMNS,
+                                   interface_keep=INTERFACE_OPTIONAL_COLUMNS, touch=TOUCH_COLUMNS)
+            result = loader.load(slices=slices, memberships=memberships, skip_existing=skip_existing)
+            sliver_ids = result["sliver_ids"]
+            HourlyAllocationStore(session).refresh_slivers(sliver_ids)
             session.commit()
-            return interface.interface_guid
+            for sliver_id in sliver_ids:
+                self._mark_reservation_dirty(sliver_id)
+            rows = sum(result[t] for t in ("slices", "slivers", "components", "interfaces", "memberships"))
+            return {"slices": result["slices"], "skipped": result["skipped"], "slivers": result["slivers"],
+                    "memberships": result["memberships"], "rows": rows,
+                    "unchanged": result["staged"] - result["pruned"] - rows}
         finally:
             session.rollback()
 
+    def _write_slivers(self, session, slivers: List[dict], slice_ids: dict, project_ids: dict, user_ids: dict,
+                       slice_guid: str = None, stats: dict = None) -> tuple:
+        """
+        Upsert slivers, then their components and interfaces, one multi-row statement per table.
+        Sites and hosts are resolved here; slivers carry their slice_guid unless slice_guid is given.
+
+        :return: (sliver_guid -> "created" / "updated" / "unchanged", ids of the slivers that were
+            written or whose components or interfaces were)
+        """
+        site_ids = self._resolve_names(session, Sites.__table__, {s["site"]: {} for s in slivers if s.get("site")})
+        host_ids = self._resolve_names(session, Hosts.__table__,
+                                       {s["host"]: {"site_id": site_ids.get(s.get("site"))}
+                                        for s in slivers if s.get("host")})
+        rows = {}
+        for s in slivers:
+            rows[s["sliver_guid"]] = {
+                "sliver_guid": s["sliver_guid"], "project_id": project_ids.get(s["project_uuid"]),
+                "slice_id": slice_ids[slice_guid or s["slice_guid"]], "user_id": user_ids.get(s["user_uuid"]),
+                "host_id": host_ids.get(s.get("host")), "site_id": site_ids.get(s.get("site")),
+                "state": s["state"], "sliver_type": s["sliver_type"].lower(),
+                **{column: s.get(column) or None for column in SLIVER_OPTIONAL_COLUMNS}}
+        table = Slivers.__table__
+        # xmax is 0 only for a freshly inserted row version
+        inserted = literal_column("xmax = 0").label("inserted")
+        written = self._upsert(session, table, ["sliver_guid"], list(rows.values()), keep=SLIVER_OPTIONAL_COLUMNS,
+                               returning=[table.c.sliver_guid, table.c.id, inserted], stats=stats)
+        sliver_ids = {row.sliver_guid: row.id for row in written}
+        statuses = {row.sliver_guid: UPSERT_STATUS[row.inserted] for row in written}
+
+        components, interfaces = {}, {}
+        for s in slivers:
+            sliver_id = sliver_ids[s["sliver_guid"]]
+            for c in s.get("components") or []:
+                components[(sliver_id, c["component_guid"])] = self._component_row(
+                    sliver_id, c["component_guid"], c.get("component_type"), c.get("model"), c.get("bdfs"),
+                    c.get("node_id"), c.get("component_node_id"))
+            for i in s.get("interfaces") or []:
+                interfaces[(sliver_id, i["interface_guid"])] = self._interface_row(
+                    sliver_id, i["interface_guid"], i.get("vlan"), i.get("bdf"), i.get("local_name"),
+                    i.get("device_name"), i.get("name"), site_ids.get(s.get("site")))
+        dirty = {sliver_ids[guid] for guid, status in statuses.items() if status != "unchanged"}
+        for child, keys, children, keep in (
+                (Components.__table__, ["sliver_id", "component_guid"], components, COMPONENT_OPTIONAL_COLUMNS),
+                (Interfaces.__table__, ["sliver_id", "interface_guid"], interfaces, INTERFACE_OPTIONAL_COLUMNS)):
+            changed = self._upsert(session, child, keys, list(children.values()), keep=keep, stats=stats,
+                                   returning=[child.c[k] for k in keys] + [inserted])
+            dirty.update(row.sliver_id for row in changed if row.inserted is not None)
+
+        by_id = {sliver_id: guid for guid, sliver_id in sliver_ids.items()}
+        for sliver_id in dirty:
+            if statuses[by_id[sliver_id]] == "unchanged":
+                statuses[by_id[sliver_id]] = "updated"
+        return statuses, sorted(dirty)
+
+    def _resolve_projects(self, session, records: List[dict], now: datetime) -> dict:
+        rows = {}
+        for s in records:
+            if s.get("project_uuid"):
+                name = s.get("project_name") or rows.get(s["project_uuid"], {}).get("project_name")
+                rows[s["project_uuid"]] = {"project_uuid": s["project_uuid"], "project_name": name,
+                                           "created_date": now, "last_updated": now}
+        table = Projects.__table__
+        return dict(self._upsert(session, table, ["project_uuid"], list(rows.values()),
+                                 keep=("project_name",), insert_only=("created_date",),
+                                 returning=[table.c.project_uuid, table.c.id]))
+
+    def _resolve_users(self, session, records: List[dict], now: datetime) -> dict:
+        rows = {}
+        for s in records:
+            if s.get("user_uuid"):
+                email = s.get("user_email") or rows.get(s["user_uuid"], {}).get("user_email")
+                rows[s["user_uuid"]] = {"user_uuid": s["user_uuid"], "user_email": email,
+                                        "registered_on": now, "last_updated": now}
+        table = Users.__table__
+        # Users without an email can only be updated (user_email is NOT NULL)
+        ids = {uuid: self._upsert_one(session, table, ["user_uuid"], row, keep=("user_email",),
+                                      insert_only=("registered_on",), required=("user_email",))
+               for uuid, row in rows.items() if row["user_email"] is None}
+        ids.update(self._upsert(session, table, ["user_uuid"],
+                                [row for row in rows.values() if row["user_email"] is not None],
+                                keep=("user_email",), insert_only=("registered_on",),
+                                returning=[table.c.user_uuid, table.c.id]))
+        return ids
+
+    def _resolve_names(self, session, table, rows: dict) -> dict:
+        """Site or host ids by name, inserting the missing ones; existing rows are left as they are."""
+        return dict(self._upsert(session, table, ["name"], [dict(values, name=name) for name, values in rows.items()],
+                                 insert_only=("site_id",), returning=[table.c.name, table.c.id]))
+
     # -------------------- ADD OR UPDATE HOST --------------------
     def add_or_update_host(self, host_name: str, site_id: int) -> int:
         """
@@ -554,13 +875,10 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            host = session.query(Hosts).filter(Hosts.name == host_name).first()
-            if not host:
-                host = Hosts(name=host_name, site_id=site_id)
-                session.add(host)
-
+            host_id = self._upsert_one(session, Hosts.__table__, ["name"], {"name": host_name, "site_id": site_id},
+                                       insert_only=("site_id",))
             session.commit()
-            return host.id
+            return host_id
         finally:
             session.rollback()
 
@@ -571,13 +889,9 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            site = session.query(Sites).filter(Sites.name == site_name).first()
-            if not site:
-                site = Sites(name=site_name)
-                session.add(site)
-
+            site_id = self._upsert_one(session, Sites.__table__, ["name"], {"name": site_name})
             session.commit()
-            return site.id
+            return site_id
         finally:
             session.rollback()
 
@@ -590,26 +904,15 @@ class DatabaseManager:
             site_id = self.add_or_update_site(site_name)
             host_id = self.add_or_update_host(host_name, site_id)
 
-            capacity = session.query(HostCapacities).filter(HostCapacities.host_id == host_id).first()
-            if capacity:
-                capacity.site_id = site_id
-                capacity.cores_capacity = cores
-                capacity.ram_capacity = ram
-                capacity.disk_capacity = disk
-                capacity.components = components
-            else:
-                capacity = HostCapacities(
-                    host_id=host_id,
-                    site_id=site_id,
-                    cores_capacity=cores,
-                    ram_capacity=ram,
-                    disk_capacity=disk,
-                    components=components
-                )
-                session.add(capacity)
-
+            stats = {}
+            capacity_id = self._upsert_one(
+                session, HostCapacities.__table__, ["host_id"],
+                {"host_id": host_id, "site_id": site_id, "cores_capacity": cores, "ram_capacity": ram,
+                 "disk_capacity": disk, "components": components}, stats=stats)
             session.commit()
-            return capacity.id
+            if stats["written"]:
+                self._invalidate_capacities()
+            return capacity_id
         finally:
             session.rollback()
 
@@ -625,24 +928,15 @@ class DatabaseManager:
             site_a_id = self.add_or_update_site(site_a_name)
             site_b_id = self.add_or_update_site(site_b_name)
 
-            capacity = session.query(LinkCapacities).filter(LinkCapacities.name == link_name).first()
-            if capacity:
-                capacity.site_a_id = site_a_id
-                capacity.site_b_id = site_b_id
-                capacity.layer = layer
-                capacity.bandwidth_capacity = bandwidth
-            else:
-                capacity = LinkCapacities(
-                    name=link_name,
-                    site_a_id=site_a_id,
-                    site_b_id=site_b_id,
-                    layer=layer,
-                    bandwidth_capacity=bandwidth
-                )
-                session.add(capacity)
-
+            stats = {}
+            capacity_id = self._upsert_one(
+                session, LinkCapacities.__table__, ["name"],
+                {"name": link_name, "site_a_id": site_a_id, "site_b_id": site_b_id, "layer": layer,
+                 "bandwidth_capacity": bandwidth}, stats=stats)
             session.commit()
-            return capacity.id
+            if stats["written"]:
+                self._invalidate_capacities()
+            return capacity_id
         finally:
             session.rollback()
 
@@ -656,34 +950,40 @@ class DatabaseManager:
         try:
             site_id = self.add_or_update_site(site_name)
 
-            capacity = session.query(FacilityPortCapacities).filter(
-                FacilityPortCapacities.name == port_name,
-                FacilityPortCapacities.site_id == site_id,
-                FacilityPortCapacities.device_name == device_name,
-                FacilityPortCapacities.local_name == local_name
-            ).first()
-            if capacity:
-                capacity.device_name = device_name
-                capacity.local_name = local_name
-                capacity.vlan_range = vlan_range
-                capacity.total_vlans = total_vlans
-            else:
-                capacity = FacilityPortCapacities(
-                    name=port_name,
-                    site_id=site_id,
-                    device_name=device_name,
-                    local_name=local_name,
-                    vlan_range=vlan_range,
-                    total_vlans=total_vlans
-                )
-                session.add(capacity)
-
+            stats = {}
+            capacity_id = self._upsert_one(
+                session, FacilityPortCapacities.__table__, ["name", "site_id", "device_name", "local_name"],
+                {"name": port_name, "site_id": site_id, "device_name": device_name, "local_name": local_name,
+                 "vlan_range": vlan_range, "total_vlans": total_vlans}, stats=stats)
             session.commit()
-            return capacity.id
+            if stats["written"]:
+                self._invalidate_capacities()
+            return capacity_id
         finally:
             session.rollback()
 
     # -------------------- SHARED CALENDAR QUERY HELPERS --------------------
+    def _load_capacity_snapshot(self, session, watermark: tuple = None) -> CapacitySnapshot:
+        _, host_cap_map = self._query_host_capacities(session)
+        _, link_cap_map = self._query_link_capacities(session)
+        _, fp_cap_map = self._query_fp_capacities(session)
+        vlan_bitmaps = {key: _parse_vlan_range(cap["vlan_range"]) for key, cap in fp_cap_map.items()}
+        return CapacitySnapshot(host_cap_map, link_cap_map, fp_cap_map, vlan_bitmaps, watermark=watermark)
+
+    def _capacity_snapshot(self, session) -> Optional[CapacitySnapshot]:
+        """The shared capacity snapshot, or None when the capacity cache is not configured."""
+        cache = CapacityCache.get()
+        return cache.snapshot(session, self._load_capacity_snapshot) if cache is not None else None
+
+    @staticmethod
+    def _vlan_bitmaps(fp_cap_map: dict) -> list:
+        """Parsed vlan_range per port, in fp_cap_map order, from the capacity snapshot when there is one."""
+        cache = CapacityCache.get()
+        snapshot = cache.current() if cache is not None else None
+        cached = snapshot.vlan_bitmaps if snapshot is not None else {}
+        return [cached[key] if key in cached else _parse_vlan_range(cap["vlan_range"])
+                for key, cap in fp_cap_map.items()]
+
     @staticmethod
     def _query_host_capacities(session, site=None, host=None, exclude_site=None, exclude_host=None):
         cap_query = session.query(
@@ -787,8 +1087,7 @@ class DatabaseManager:
             ).filter(
                 Slivers.host_id.in_(host_ids),
                 Slivers.state.in_(active_states),
-                Slivers.lease_start < end_time,
-                Slivers.lease_end > start_time
+                lease_overlaps(Slivers, start_time, end_time)
             ).all()
 
         sliver_ids = [s.id for s in slivers_in_range]
@@ -817,8 +1116,7 @@ class DatabaseManager:
             ).filter(
                 Slivers.sliver_type.in_(cross_site_types),
                 Slivers.state.in_(active_states),
-                Slivers.lease_start < end_time,
-                Slivers.lease_end > start_time
+                lease_overlaps(Slivers, start_time, end_time)
             ).all()
 
             net_sliver_ids = [s.id for s in net_slivers_in_range]
@@ -854,295 +1152,546 @@ class DatabaseManager:
                 Interfaces.name.in_(fp_names),
                 Interfaces.site_id.isnot(None),
                 Slivers.state.in_(active_states),
-                Slivers.lease_start < end_time,
-                Slivers.lease_end > start_time
+                lease_overlaps(Slivers, start_time, end_time)
             ).all()
         return fp_iface_slivers
 
+    @staticmethod
+    def _mark_reservation_dirty(sliver_id: int):
+        index = ReservationIndex.get()
+        if index is not None:
+            index.mark_dirty(sliver_id)
+
+    @staticmethod
+    def _invalidate_capacities():
+        cache = CapacityCache.get()
+        if cache is not None:
+            cache.invalidate()
+
+    def _query_reservations(self, session, host_ids, link_cap_map, fp_cap_map, start_time, end_time):
+        """
+        Active slivers overlapping [start_time, end_time): compute slivers with their components,
+        network slivers with their sites, and facility-port interfaces.
+
+        Served from the process-wide ReservationIndex when it is configured, within its staleness
+        bound and loaded back to start_time; read from the database otherwise.
+        """
+        index = ReservationIndex.get()
+        if index is not None:
+            index.ensure_fresh(session)
+            if index.covers(start_time):
+                slivers_in_range, comp_by_sliver = index.compute_slivers(host_ids, start_time, end_time)
+                net_slivers_in_range, net_sliver_interfaces = index.network_slivers(
+                    link_cap_map, start_time, end_time)
+                fp_iface_slivers = index.fp_slivers(fp_cap_map, start_time, end_time)
+                return slivers_in_range, comp_by_sliver, net_slivers_in_range, net_sliver_interfaces, \
+                    fp_iface_slivers
+
+        slivers_in_range, comp_by_sliver = self._query_compute_slivers(session, host_ids, start_time, end_time)
+        net_slivers_in_range, net_sliver_interfaces = self._query_network_slivers(
+            session, link_cap_map, start_time, end_time)
+        fp_iface_slivers = self._query_fp_slivers(session, fp_cap_map, start_time, end_time)
+        return slivers_in_range, comp_by_sliver, net_slivers_in_range, net_sliver_interfaces, fp_iface_slivers
+
     # -------------------- CALENDAR QUERY --------------------
+    @staticmethod
+    def _calendar_delta(interval: str) -> timedelta:
+        if interval == "week":
+            return timedelta(weeks=1)
+        elif interval == "hour":
+            return timedelta(hours=1)
+        return timedelta(days=1)
+
+    def _validate_calendar_args(self, engine: str, fmt: str, level: str):
+        if engine not in self.CALENDAR_ENGINES:
+            raise ValueError(f"Unknown calendar engine: {engine}")
+        if fmt not in CALENDAR_FORMATS:
+            raise ValueError(f"Unknown calendar format: {fmt}")
+        if level not in CALENDAR_LEVELS:
+            raise ValueError(f"Unknown calendar level: {level}")
+
+    def _calendar_capacities(self, session, site, host, exclude_site, exclude_host):
+        """host_cap_map, link_cap_map, fp_cap_map; all empty when nothing has capacity."""
+        snapshot = self._capacity_snapshot(session)
+        if snapshot is not None:
+            host_cap_map = snapshot.hosts(site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host)
+            link_cap_map = snapshot.links(site=site, exclude_site=exclude_site)
+            fp_cap_map = snapshot.facility_ports(site=site, exclude_site=exclude_site)
+            return host_cap_map, link_cap_map, fp_cap_map
+        capacities, host_cap_map = self._query_host_capacities(
+            session, site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host)
+        link_capacities, link_cap_map = self._query_link_capacities(
+            session, site=site, exclude_site=exclude_site)
+        fp_capacities, fp_cap_map = self._query_fp_capacities(
+            session, site=site, exclude_site=exclude_site)
+        if not capacities and not link_capacities and not fp_capacities:
+            return {}, {}, {}
+        return host_cap_map, link_cap_map, fp_cap_map
+
+    def _calendar_rows(self, session, layout: CalendarLayout, start_time: datetime, end_time: datetime,
+                       delta: timedelta, engine: str, host_cap_map: dict, link_cap_map: dict, fp_cap_map: dict,
+                       progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Yield (slot_start, slot_end, record) in time order. Usage is computed for
+        CALENDAR_CHUNK_SLOTS slots at a time, so memory does not grow with the range.
+
+        :param progress: called as progress(hours covered, total hours) after each chunk
+        """
+        total_hours = -((start_time - end_time) // timedelta(hours=1))
+        chunk_start = start_time
+        while chunk_start < end_time:
+            chunk_end = min(chunk_start + self.CALENDAR_CHUNK_SLOTS * delta, end_time)
+            yield from self._calendar_chunk(session, layout, chunk_start, chunk_end, delta, engine,
+                                            host_cap_map, link_cap_map, fp_cap_map)
+            if progress:
+                progress(min(-((start_time - chunk_end) // timedelta(hours=1)), total_hours), total_hours)
+            chunk_start = chunk_end
+
+    def _calendar_chunk(self, session, layout: CalendarLayout, start_time: datetime, end_time: datetime,
+                        delta: timedelta, engine: str, host_cap_map: dict, link_cap_map: dict, fp_cap_map: dict):
+        host_ids = list(host_cap_map.keys())
+        slots = []
+        slot_start = start_time
+        while slot_start < end_time:
+            slot_end = min(slot_start + delta, end_time)
+            slots.append((slot_start, slot_end))
+            slot_start = slot_end
+
+        # Hourly slots over a covered, hour-aligned range come straight from the hourly allocation tables
+        hourly = None
+        if delta == timedelta(hours=1) and end_time == start_time + len(slots) * delta:
+            hourly = self._load_hourly_allocation(
+                session, start_time, len(slots), host_ids=host_ids,
+                links=bool(link_cap_map), facility_ports=bool(fp_cap_map))
+
+        if hourly is not None:
+            slot_allocs = list(zip(hourly.host, hourly.comp))
+            link_usage = {pair: series for pair, series in hourly.link.items() if pair in link_cap_map}
+            fp_vlan_usage = dict(hourly.fp)
+        else:
+            slivers_in_range, comp_by_sliver, net_slivers_in_range, net_sliver_interfaces, fp_iface_slivers = \
+                self._query_reservations(session, host_ids if engine == "python" else [],
+                                         link_cap_map, fp_cap_map, start_time, end_time)
+            if engine == "sql":
+                slot_allocs = self._query_compute_allocation_by_slot(
+                    session, host_ids, start_time, end_time, delta, len(slots))
+            else:
+                slot_allocs = self._compute_allocation_by_slot(slots, slivers_in_range, comp_by_sliver)
+
+            # Resolve each network sliver to its site pair once; per-slot link usage is then a lookup
+            link_timelines = {pair: LinkTimeline(intervals) for pair, intervals in
+                              link_intervals(net_slivers_in_range, net_sliver_interfaces).items()
+                              if pair in link_cap_map}
+            link_usage = {pair: [timeline.allocated(slot_start, slot_end) for slot_start, slot_end in slots]
+                          for pair, timeline in link_timelines.items()}
+
+            fp_vlan_usage = defaultdict(lambda: [0] * len(slots))  # (name, site) -> VLAN bitmap per slot
+            for f in fp_iface_slivers:
+                if not f.vlan:
+                    continue
+                bit = 1 << int(f.vlan)
+                series = fp_vlan_usage[(f.fp_name, f.site_name)]
+                first = max((f.lease_start - start_time) // delta, 0)
+                last = min(-((start_time - f.lease_end) // delta), len(slots))
+                for i in range(first, last):
+                    series[i] |= bit
+
+        # One allocation record per slot
+        vlan_ranges = self._vlan_bitmaps(fp_cap_map)
+        for i, ((slot_start, slot_end), (alloc_map, comp_alloc_map)) in enumerate(zip(slots, slot_allocs)):
+            links_row = [link_usage[pair][i] if pair in link_usage else 0 for pair in link_cap_map]
+            fp_row = []
+            for (fp_name, s_name, _, _), vlan_range_bits in zip(fp_cap_map, vlan_ranges):
+                # Allocations are tracked per (name, site) — shared across ports
+                series = fp_vlan_usage.get((fp_name, s_name))
+                allocated_bits = series[i] if series else 0
+                fp_row.append([_vlan_bitmap_members(allocated_bits),
+                               _format_vlan_bitmap(vlan_range_bits & ~allocated_bits)])
+            yield slot_start.isoformat(), slot_end.isoformat(), \
+                layout.record(alloc_map, comp_alloc_map, links_row, fp_row)
+
     def get_calendar(self, start_time: datetime, end_time: datetime,
                      interval: str = "day",
                      site: Optional[List[str]] = None, host: Optional[List[str]] = None,
                      exclude_site: Optional[List[str]] = None,
-                     exclude_host: Optional[List[str]] = None) -> dict:
+                     exclude_host: Optional[List[str]] = None,
+                     engine: str = "python", fmt: str = "full", level: str = "host",
+                     progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        Per-slot capacity and allocation for hosts, sites, links and facility ports.
+
+        :param engine: "python" loads the active slivers in range and aggregates them here;
+                       "sql" lets PostgreSQL aggregate compute usage per slot and host, so only
+                       hosts x slots rows are returned. Both produce the same result.
+        :param fmt: "full", "compact" or "changes"; see reports_api.database.calendar_format
+        :param level: "host", or "site" to report site totals only
+        :param progress: called as progress(hours covered, total hours) as the range is computed
+        """
+        self._validate_calendar_args(engine, fmt, level)
         session = self.get_session()
         try:
-            capacities, host_cap_map = self._query_host_capacities(
+            host_cap_map, link_cap_map, fp_cap_map = self._calendar_capacities(
                 session, site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host)
-            host_ids = list(host_cap_map.keys())
+            layout = CalendarLayout(host_cap_map, link_cap_map, fp_cap_map, level=level)
+            rows = []
+            if host_cap_map or link_cap_map or fp_cap_map:
+                rows = list(self._calendar_rows(session, layout, start_time, end_time,
+                                                self._calendar_delta(interval), engine,
+                                                host_cap_map, link_cap_map, fp_cap_map, progress=progress))
+            return layout.response(fmt, [(slot_start, slot_end) for slot_start, slot_end, _ in rows],
+                                   [record for _, _, record in rows], interval=interval,
+                                   query_start=start_time.isoformat(), query_end=end_time.isoformat())
+        finally:
+            session.rollback()
 
-            link_capacities, link_cap_map = self._query_link_capacities(
-                session, site=site, exclude_site=exclude_site)
+    def stream_calendar(self, start_time: datetime, end_time: datetime,
+                        interval: str = "day",
+                        site: Optional[List[str]] = None, host: Optional[List[str]] = None,
+                        exclude_site: Optional[List[str]] = None,
+                        exclude_host: Optional[List[str]] = None,
+                        engine: str = "python", fmt: str = "full", level: str = "host") -> Iterator[dict]:
+        """
+        get_calendar() as a generator: the response header first, then each slot (full),
+        record (compact) or run (changes) in time order as it is computed.
+        """
+        self._validate_calendar_args(engine, fmt, level)
+        return self._stream_calendar(start_time, end_time, interval, site, host, exclude_site, exclude_host,
+                                     engine, fmt, level)
 
-            fp_capacities, fp_cap_map = self._query_fp_capacities(
-                session, site=site, exclude_site=exclude_site)
+    def _stream_calendar(self, start_time, end_time, interval, site, host, exclude_site, exclude_host,
+                         engine, fmt, level):
+        session = self.get_session()
+        try:
+            host_cap_map, link_cap_map, fp_cap_map = self._calendar_capacities(
+                session, site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host)
+            layout = CalendarLayout(host_cap_map, link_cap_map, fp_cap_map, level=level)
+            delta = self._calendar_delta(interval)
+            rows = iter(())
+            total = 0
+            if host_cap_map or link_cap_map or fp_cap_map:
+                rows = self._calendar_rows(session, layout, start_time, end_time, delta, engine,
+                                           host_cap_map, link_cap_map, fp_cap_map)
+                total = -((start_time - end_time) // delta)
+            yield from layout.stream(fmt, rows, interval=interval, query_start=start_time.isoformat(),
+                                     query_end=end_time.isoformat(), total=total)
+        finally:
+            session.rollback()
 
-            # Return empty if no capacities at all
-            if not capacities and not link_capacities and not fp_capacities:
-                return {"data": [], "interval": interval,
-                        "query_start": start_time.isoformat(), "query_end": end_time.isoformat(), "total": 0}
+    @staticmethod
+    def _compute_allocation_by_slot(slots, slivers_in_range, comp_by_sliver) -> list:
+        """
+        Aggregate compute usage per slot in Python.
 
-            # Generate time slots
-            if interval == "week":
-                delta = timedelta(weeks=1)
-            elif interval == "hour":
-                delta = timedelta(hours=1)
-            else:
-                delta = timedelta(days=1)
-
-            slots = []
-            slot_start = start_time
-            while slot_start < end_time:
-                slot_end = min(slot_start + delta, end_time)
-                slots.append((slot_start, slot_end))
-                slot_start = slot_end
-
-            slivers_in_range, comp_by_sliver = self._query_compute_slivers(
-                session, host_ids, start_time, end_time)
-
-            net_slivers_in_range, net_sliver_interfaces = self._query_network_slivers(
-                session, link_cap_map, start_time, end_time)
-
-            fp_iface_slivers = self._query_fp_slivers(session, fp_cap_map, start_time, end_time)
-
-            # Build per-slot results
-            result_data = []
-            for slot_start, slot_end in slots:
-                # ── Compute allocation per host ──
-                alloc_map = defaultdict(lambda: {"cores": 0, "ram": 0, "disk": 0})
-                comp_alloc_map = defaultdict(lambda: defaultdict(int))
-
-                for sliver in slivers_in_range:
-                    if sliver.lease_start < slot_end and sliver.lease_end > slot_start:
-                        h = sliver.host_id
-                        alloc_map[h]["cores"] += sliver.core or 0
-                        alloc_map[h]["ram"] += sliver.ram or 0
-                        alloc_map[h]["disk"] += sliver.disk or 0
-                        for comp_key, _ in comp_by_sliver.get(sliver.id, []):
-                            comp_alloc_map[h][comp_key] += 1
-
-                # Build per-host results
-                hosts_result = []
-                site_agg = {}
-                for host_id, cap in host_cap_map.items():
-                    alloc = alloc_map.get(host_id, {"cores": 0, "ram": 0, "disk": 0})
-                    comp_alloc = comp_alloc_map.get(host_id, {})
-
-                    comp_result = {}
-                    # Build lowercase-keyed alloc map for case-insensitive matching
-                    comp_alloc_lower = {k.lower(): v for k, v in comp_alloc.items()}
-                    for comp_key, comp_cap in cap["components"].items():
-                        comp_allocated = comp_alloc_lower.get(comp_key.lower(), 0)
-                        comp_result[comp_key] = {
-                            "capacity": comp_cap,
-                            "allocated": comp_allocated,
-                            "available": comp_cap - comp_allocated
-                        }
-
-                    host_entry = {
-                        "name": cap["name"], "site": cap["site"],
-                        "cores_capacity": cap["cores_capacity"],
-                        "cores_allocated": alloc["cores"],
-                        "cores_available": cap["cores_capacity"] - alloc["cores"],
-                        "ram_capacity": cap["ram_capacity"],
-                        "ram_allocated": alloc["ram"],
-                        "ram_available": cap["ram_capacity"] - alloc["ram"],
-                        "disk_capacity": cap["disk_capacity"],
-                        "disk_allocated": alloc["disk"],
-                        "disk_available": cap["disk_capacity"] - alloc["disk"],
-                        "components": comp_result
-                    }
-                    hosts_result.append(host_entry)
-
-                    # Aggregate to site level
-                    s = cap["site"]
-                    if s not in site_agg:
-                        site_agg[s] = {"name": s,
-                                       "cores_capacity": 0, "cores_allocated": 0, "cores_available": 0,
-                                       "ram_capacity": 0, "ram_allocated": 0, "ram_available": 0,
-                                       "disk_capacity": 0, "disk_allocated": 0, "disk_available": 0,
-                                       "components": {}}
-                    for field in ["cores", "ram", "disk"]:
-                        site_agg[s][f"{field}_capacity"] += host_entry[f"{field}_capacity"]
-                        site_agg[s][f"{field}_allocated"] += host_entry[f"{field}_allocated"]
-                        site_agg[s][f"{field}_available"] += host_entry[f"{field}_available"]
-                    for comp_key, comp_data in comp_result.items():
-                        if comp_key not in site_agg[s]["components"]:
-                            site_agg[s]["components"][comp_key] = {"capacity": 0, "allocated": 0, "available": 0}
-                        for k in ["capacity", "allocated", "available"]:
-                            site_agg[s]["components"][comp_key][k] += comp_data[k]
-
-                # ── Link bandwidth allocation per slot ──
-                links_result = []
-                if link_cap_map:
-                    link_bw_alloc = defaultdict(int)  # sorted site pair -> total bw allocated
-                    for ns in net_slivers_in_range:
-                        if ns.lease_start < slot_end and ns.lease_end > slot_start:
-                            sites_list = net_sliver_interfaces.get(ns.id, [])
-                            unique_sites = sorted(set(sites_list))
-                            if len(unique_sites) == 2:
-                                pair = tuple(unique_sites)
-                                link_bw_alloc[pair] += ns.bandwidth or 0
-
-                    for pair, cap in link_cap_map.items():
-                        allocated = link_bw_alloc.get(pair, 0)
-                        links_result.append({
-                            "name": cap["name"],
-                            "site_a": cap["site_a"],
-                            "site_b": cap["site_b"],
-                            "layer": cap["layer"],
-                            "bandwidth_capacity": cap["bandwidth_capacity"],
-                            "bandwidth_allocated": allocated,
-                            "bandwidth_available": cap["bandwidth_capacity"] - allocated
-                        })
-
-                # ── Facility port VLAN allocation per slot ──
-                fp_result = []
-                if fp_cap_map:
-                    fp_vlan_alloc = defaultdict(set)  # (name, site) -> set of vlans
-                    for fp_iface in fp_iface_slivers:
-                        if fp_iface.lease_start < slot_end and fp_iface.lease_end > slot_start:
-                            key = (fp_iface.fp_name, fp_iface.site_name)
-                            if fp_iface.vlan:
-                                fp_vlan_alloc[key].add(fp_iface.vlan)
-
-                    for (fp_name, s_name, dev_name, loc_name), cap in fp_cap_map.items():
-                        # Allocations are tracked per (name, site) — shared across ports
-                        allocated_vlans = {int(v) for v in fp_vlan_alloc.get((fp_name, s_name), set()) if v}
-                        capacity_set = _parse_vlan_range(cap["vlan_range"])
-                        available_set = capacity_set - allocated_vlans
-                        fp_result.append({
-                            "name": cap["name"],
-                            "site": cap["site"],
-                            "device_name": cap["device_name"],
-                            "local_name": cap["local_name"],
-                            "vlan_range": cap["vlan_range"],
-                            "total_vlans": cap["total_vlans"],
-                            "vlans_allocated": sorted([str(v) for v in allocated_vlans]),
-                            "vlans_available": _format_vlan_set_as_range(available_set)
-                        })
-
-                slot_entry = {
-                    "start": slot_start.isoformat(),
-                    "end": slot_end.isoformat(),
-                    "hosts": hosts_result,
-                    "sites": list(site_agg.values())
-                }
-                if links_result:
-                    slot_entry["links"] = links_result
-                if fp_result:
-                    slot_entry["facility_ports"] = fp_result
+        :return: one (alloc_map, comp_alloc_map) per slot, where alloc_map is
+                 host_id -> {"cores", "ram", "disk"} and comp_alloc_map is host_id -> {component key: count}
+        """
+        slot_allocs = []
+        for slot_start, slot_end in slots:
+            alloc_map = defaultdict(lambda: {"cores": 0, "ram": 0, "disk": 0})
+            comp_alloc_map = defaultdict(lambda: defaultdict(int))
+
+            for sliver in slivers_in_range:
+                if sliver.lease_start < slot_end and sliver.lease_end > slot_start:
+                    h = sliver.host_id
+                    alloc_map[h]["cores"] += sliver.core or 0
+                    alloc_map[h]["ram"] += sliver.ram or 0
+                    alloc_map[h]["disk"] += sliver.disk or 0
+                    for comp_key, _ in comp_by_sliver.get(sliver.id, []):
+                        comp_alloc_map[h][comp_key] += 1
+            slot_allocs.append((alloc_map, comp_alloc_map))
+        return slot_allocs
 
-                result_data.append(slot_entry)
+    @staticmethod
+    def _query_compute_allocation_by_slot(session, host_ids, start_time, end_time, delta, n_slots) -> list:
+        """
+        Aggregate compute usage per slot in PostgreSQL.
 
-            return {
-                "data": result_data,
-                "interval": interval,
-                "query_start": start_time.isoformat(),
-                "query_end": end_time.isoformat(),
-                "total": len(result_data)
-            }
+        Slots are generated with generate_series and joined to active slivers on lease
+        overlap; usage is grouped by slot and host, with a second grouping by component key.
+        Slot i covers [start_time + i * delta, min(start_time + (i + 1) * delta, end_time)),
+        matching the slots get_calendar builds.
+
+        :return: same shape as _compute_allocation_by_slot
+        """
+        slot_allocs = [(defaultdict(lambda: {"cores": 0, "ram": 0, "disk": 0}),
+                        defaultdict(lambda: defaultdict(int))) for _ in range(n_slots)]
+        if not host_ids or not n_slots:
+            return slot_allocs
+
+        active_states = [1, 2, 4, 5]
+        slots = func.generate_series(0, n_slots - 1).table_valued("idx").render_derived(name="slots")
+        # Step in seconds so a day is always 24 hours, whatever the session time zone
+        step = func.make_interval(0, 0, 0, 0, 0, 0, delta.total_seconds())
+        range_start = literal(start_time, TIMESTAMP(timezone=True))
+        range_end = literal(end_time, TIMESTAMP(timezone=True))
+        slot_start = range_start + slots.c.idx * step
+        slot_end = func.least(range_start + (slots.c.idx + 1) * step, range_end)
+        overlap = or_(
+            Slivers.lease_range.overlaps(func.tstzrange(slot_start, slot_end, '()')),
+            and_(Slivers.lease_range.is_(None), Slivers.lease_start < slot_end, Slivers.lease_end > slot_start)
+        )
+        sliver_filter = (
+            Slivers.host_id.in_(host_ids),
+            Slivers.state.in_(active_states),
+            lease_overlaps(Slivers, start_time, end_time)
+        )
+
+        usage_rows = session.query(
+            slots.c.idx, Slivers.host_id,
+            func.coalesce(func.sum(Slivers.core), 0).label("cores"),
+            func.coalesce(func.sum(Slivers.ram), 0).label("ram"),
+            func.coalesce(func.sum(Slivers.disk), 0).label("disk")
+        ).select_from(slots).join(Slivers, overlap).filter(*sliver_filter).group_by(slots.c.idx, Slivers.host_id).all()
+
+        for row in usage_rows:
+            slot_allocs[row.idx][0][row.host_id] = {"cores": row.cores, "ram": row.ram, "disk": row.disk}
+
+        comp_key = case((and_(Components.model.isnot(None), Components.model != ''),
+                         Components.type + '-' + Components.model), else_=Components.type)
+        comp_rows = session.query(
+            slots.c.idx, Slivers.host_id, comp_key.label("comp_key"), func.count().label("count")
+        ).select_from(slots).join(Slivers, overlap
+        ).join(Components, Components.sliver_id == Slivers.id
+        ).filter(*sliver_filter).group_by(slots.c.idx, Slivers.host_id, comp_key).all()
+
+        for row in comp_rows:
+            slot_allocs[row.idx][1][row.host_id][row.comp_key] += row.count
+
+        return slot_allocs
+
+    def rebuild_hourly_allocation(self) -> int:
+        """
+        Recompute the hourly allocation tables from the slivers table.
+
+        :return: number of slivers that contribute to the tables
+        """
+        session = self.get_session()
+        try:
+            count = HourlyAllocationStore(session).rebuild()
+            session.commit()
+            return count
+        finally:
+            session.rollback()
+
+    @staticmethod
+    def _load_hourly_allocation(session, start_time: datetime, n_hours: int, host_ids: list,
+                                links: bool, facility_ports: bool):
+        """
+        Pre-aggregated hourly usage: from the shared occupancy file when one is configured,
+        current and covering the range, otherwise from the hourly allocation tables.
+        """
+        occupancy_file = OccupancyFile.get()
+        if occupancy_file is not None:
+            hourly = occupancy_file.load(start_time, n_hours, host_ids=host_ids,
+                                         links=links, facility_ports=facility_ports)
+            if hourly is not None:
+                return hourly
+        return HourlyAllocationStore(session).load(start_time, n_hours, host_ids=host_ids,
+                                                   links=links, facility_ports=facility_ports)
+
+    def publish_occupancy_file(self, path: str, history_days: int = 7, horizon_days: int = 60) -> Optional[int]:
+        """
+        Write hosts x hours usage for [now - history_days, now + horizon_days) from the hourly
+        allocation tables to the memory-mapped occupancy file at path.
+
+        :return: the published generation, or None when the tables do not cover the horizon
+        """
+        session = self.get_session()
+        try:
+            start_time = floor_hour(datetime.now(timezone.utc)) - timedelta(days=history_days)
+            n_hours = (history_days + horizon_days) * 24
+            host_ids = [row.id for row in session.query(Hosts.id).all()]
+            hourly = HourlyAllocationStore(session).load(start_time, n_hours, host_ids=host_ids)
+            if hourly is None:
+                return None
+            return write_occupancy_file(path, hourly)
         finally:
             session.rollback()
 
     # -------------------- FIND SLOT QUERY --------------------
+    @staticmethod
+    def _split_resources(resources: List[dict]) -> tuple:
+        """compute, link and facility port requests."""
+        return ([r for r in resources if r.get("type") == "compute"],
+                [r for r in resources if r.get("type") == "link"],
+                [r for r in resources if r.get("type") == "facility_port"])
+
+    def _find_slot_capacities(self, session, host_site_filter: Optional[list], links: bool, facility_ports: bool):
+        """host_cap_map, link_cap_map, fp_cap_map and hosts grouped by site."""
+        snapshot = self._capacity_snapshot(session)
+        if snapshot is not None:
+            host_cap_map = snapshot.hosts(site=host_site_filter)
+            link_cap_map = snapshot.link_cap_map if links else {}
+            fp_cap_map = snapshot.fp_cap_map if facility_ports else {}
+            if not host_site_filter:
+                return host_cap_map, link_cap_map, fp_cap_map, snapshot.hosts_by_site
+        else:
+            capacities, host_cap_map = self._query_host_capacities(session, site=host_site_filter)
+            link_capacities, link_cap_map = self._query_link_capacities(session) if links else ([], {})
+            fp_capacities, fp_cap_map = self._query_fp_capacities(session) if facility_ports else ([], {})
+
+        # Group hosts by site for efficient lookup
+        hosts_by_site = defaultdict(list)
+        for host_id, cap in host_cap_map.items():
+            hosts_by_site[cap["site"]].append(host_id)
+        return host_cap_map, link_cap_map, fp_cap_map, hosts_by_site
+
+    def _find_slot_occupancy(self, session, start_time: datetime, total_hours: int,
+                             host_cap_map: dict, link_cap_map: dict, fp_cap_map: dict) -> HourlyOccupancy:
+        """
+        Per-hour usage over the whole range, computed once; hour-aligned ranges are read
+        from the occupancy file or the hourly allocation tables when they cover them.
+        """
+        host_ids = list(host_cap_map.keys())
+        hourly = self._load_hourly_allocation(
+            session, start_time, total_hours, host_ids=host_ids,
+            links=bool(link_cap_map), facility_ports=bool(fp_cap_map))
+        if hourly is not None:
+            return HourlyOccupancy.from_hourly_allocation(hourly, host_cap_map)
+
+        end_time = start_time + timedelta(hours=total_hours)
+        slivers_in_range, comp_by_sliver, net_slivers_in_range, net_sliver_interfaces, fp_iface_slivers = \
+            self._query_reservations(session, host_ids, link_cap_map, fp_cap_map, start_time, end_time)
+        return HourlyOccupancy.from_slivers(
+            start_time=start_time, total_hours=total_hours,
+            host_cap_map=host_cap_map, slivers_in_range=slivers_in_range, comp_by_sliver=comp_by_sliver,
+            net_slivers_in_range=net_slivers_in_range, net_sliver_interfaces=net_sliver_interfaces,
+            fp_iface_slivers=fp_iface_slivers)
+
+    @staticmethod
+    def _find_slot_search(occupancy: HourlyOccupancy, duration: int, max_results: int, resources: List[dict],
+                          host_cap_map: dict, hosts_by_site: dict, link_cap_map: dict, fp_cap_map: dict,
+                          progress: Optional[Callable[[int, int], None]] = None) -> list:
+        """(start hour, placement) per window found; see HourlyOccupancy.search."""
+        compute_requests, link_requests, fp_requests = DatabaseManager._split_resources(resources)
+
+        # No capacity data for a requested resource type
+        if (compute_requests and not host_cap_map) or (link_requests and not link_cap_map) or \
+                (fp_requests and not fp_cap_map):
+            return []
+        if occupancy.total_hours < duration:
+            return []
+
+        # Compute requests are checked through a per-hour bitmap and links / facility ports
+        # through range-max tables, so each candidate window costs O(1) per resource.
+        return occupancy.search(
+            duration=duration, max_results=max_results,
+            compute_requests=compute_requests, link_requests=link_requests, fp_requests=fp_requests,
+            host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+            link_cap_map=link_cap_map, fp_cap_map=fp_cap_map, progress=progress)
+
+    @staticmethod
+    def _find_slot_result(start_time: datetime, end_time: datetime, duration: int, found: list,
+                          resources: List[dict], host_cap_map: dict) -> dict:
+        compute_requests = [r for r in resources if r.get("type") == "compute"]
+        windows = []
+        for h, placement in found:
+            window_start = start_time + timedelta(hours=h)
+            window_end = window_start + timedelta(hours=duration)
+            window = {
+                "start": window_start.isoformat(),
+                "end": window_end.isoformat()
+            }
+            if placement:
+                window["hosts"] = [host_cap_map[placement[i]]["name"] for i in range(len(compute_requests))]
+            windows.append(window)
+
+        return {
+            "windows": windows,
+            "total": len(windows),
+            "search_start": start_time.isoformat(),
+            "search_end": end_time.isoformat(),
+            "duration_hours": duration
+        }
+
     def find_slot(self, start_time: datetime, end_time: datetime,
                   duration: int, resources: List[dict],
-                  max_results: int = 1) -> dict:
+                  max_results: int = 1, progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        Earliest windows of `duration` hours in [start_time, end_time) where all resources fit.
+
+        :param progress: called as progress(hours scanned, total hours) during the search
+        """
         session = self.get_session()
         try:
-            # Collect all sites referenced by compute requests
-            compute_sites = set()
-            for r in resources:
-                if r.get("type") == "compute" and r.get("site"):
-                    compute_sites.add(r["site"])
-
-            # Collect all sites referenced by link requests
-            link_sites = set()
-            for r in resources:
-                if r.get("type") == "link":
-                    link_sites.add(r["site_a"])
-                    link_sites.add(r["site_b"])
-
-            # Collect all sites referenced by facility port requests
-            fp_sites = set()
-            for r in resources:
-                if r.get("type") == "facility_port" and r.get("site"):
-                    fp_sites.add(r["site"])
-
-            all_sites = compute_sites | link_sites | fp_sites
-
             # Query capacities - for compute, pass site filter only if all compute requests have a site
-            compute_requests = [r for r in resources if r.get("type") == "compute"]
+            compute_requests, link_requests, fp_requests = self._split_resources(resources)
+            compute_sites = {r["site"] for r in compute_requests if r.get("site")}
             has_siteless_compute = any(not r.get("site") for r in compute_requests)
             host_site_filter = list(compute_sites) if compute_sites and not has_siteless_compute else None
 
-            capacities, host_cap_map = self._query_host_capacities(
-                session, site=host_site_filter)
-            host_ids = list(host_cap_map.keys())
-
-            link_requests = [r for r in resources if r.get("type") == "link"]
-            link_capacities, link_cap_map = (
-                self._query_link_capacities(session) if link_requests else ([], {}))
-
-            fp_requests = [r for r in resources if r.get("type") == "facility_port"]
-            fp_capacities, fp_cap_map = (
-                self._query_fp_capacities(session) if fp_requests else ([], {}))
+            host_cap_map, link_cap_map, fp_cap_map, hosts_by_site = self._find_slot_capacities(
+                session, host_site_filter, links=bool(link_requests), facility_ports=bool(fp_requests))
 
             # Early exit if no capacity data for requested resource types
-            if compute_requests and not host_cap_map:
+            if (compute_requests and not host_cap_map) or (link_requests and not link_cap_map) or \
+                    (fp_requests and not fp_cap_map):
                 return self._empty_find_slot_result(start_time, end_time, duration)
-            if link_requests and not link_cap_map:
-                return self._empty_find_slot_result(start_time, end_time, duration)
-            if fp_requests and not fp_cap_map:
-                return self._empty_find_slot_result(start_time, end_time, duration)
-
-            # Query active slivers
-            slivers_in_range, comp_by_sliver = self._query_compute_slivers(
-                session, host_ids, start_time, end_time)
-
-            net_slivers_in_range, net_sliver_interfaces = self._query_network_slivers(
-                session, link_cap_map, start_time, end_time)
 
-            fp_iface_slivers = self._query_fp_slivers(session, fp_cap_map, start_time, end_time)
-
-            # Group hosts by site for efficient lookup
-            hosts_by_site = defaultdict(list)
-            for host_id, cap in host_cap_map.items():
-                hosts_by_site[cap["site"]].append(host_id)
-
-            # Generate hourly slots for sliding window
             total_hours = int((end_time - start_time).total_seconds() // 3600)
             if total_hours < duration:
                 return self._empty_find_slot_result(start_time, end_time, duration)
 
-            # Sliding window search
-            windows = []
-            for h in range(total_hours - duration + 1):
-                window_start = start_time + timedelta(hours=h)
-                window_end = window_start + timedelta(hours=duration)
-
-                if self._check_window(
-                    window_start, window_end, duration,
-                    compute_requests, link_requests, fp_requests,
-                    host_cap_map, hosts_by_site, slivers_in_range, comp_by_sliver,
-                    link_cap_map, net_slivers_in_range, net_sliver_interfaces,
-                    fp_cap_map, fp_iface_slivers
-                ):
-                    windows.append({
-                        "start": window_start.isoformat(),
-                        "end": window_end.isoformat()
-                    })
-                    if len(windows) >= max_results:
-                        break
+            occupancy = self._find_slot_occupancy(session, start_time, total_hours,
+                                                  host_cap_map, link_cap_map, fp_cap_map)
+            found = self._find_slot_search(occupancy, duration, max_results, resources,
+                                           host_cap_map, hosts_by_site, link_cap_map, fp_cap_map,
+                                           progress=progress)
+            return self._find_slot_result(start_time, end_time, duration, found, resources, host_cap_map)
+        finally:
+            session.rollback()
 
-            return {
-                "windows": windows,
-                "total": len(windows),
-                "search_start": start_time.isoformat(),
-                "search_end": end_time.isoformat(),
-                "duration_hours": duration
-            }
+    def find_slot_batch(self, requests: List[dict], joint: bool = False) -> dict:
+        """
+        Evaluate several find_slot() requests against one capacity snapshot and one
+        per-hour occupancy built over the union of their ranges.
+
+        :param requests: find_slot() keyword arguments per request (start_time, end_time, duration,
+                         resources, max_results); start times must be whole hours apart
+        :param joint: evaluate in order and reserve each request's first window before the next
+                      one is searched, so the windows returned all fit together; each result then
+                      holds at most that one window
+        :return: {"results": [find_slot() result per request], "total", "joint"}, plus "feasible"
+                 (every request got a window) in joint mode
+        """
+        session = self.get_session()
+        try:
+            all_resources = [r for req in requests for r in req["resources"]]
+            _, link_requests, fp_requests = self._split_resources(all_resources)
+            host_cap_map, link_cap_map, fp_cap_map, hosts_by_site = self._find_slot_capacities(
+                session, None, links=bool(link_requests), facility_ports=bool(fp_requests))
+
+            base_start = min(req["start_time"] for req in requests)
+            spans = []
+            for req in requests:
+                first, rest = divmod(req["start_time"] - base_start, timedelta(hours=1))
+                if rest:
+                    raise ValueError("start times in a batch must be whole hours apart")
+                spans.append((first, int((req["end_time"] - req["start_time"]).total_seconds() // 3600)))
+            total_hours = max(first + n for first, n in spans)
+            occupancy = self._find_slot_occupancy(session, base_start, total_hours,
+                                                  host_cap_map, link_cap_map, fp_cap_map)
+
+            results = []
+            for req, (first, n) in zip(requests, spans):
+                duration = req["duration"]
+                found = self._find_slot_search(occupancy.window(first, n), duration, req.get("max_results", 1),
+                                               req["resources"], host_cap_map, hosts_by_site,
+                                               link_cap_map, fp_cap_map)
+                if joint:
+                    compute_requests, link_reqs, fp_reqs = self._split_resources(req["resources"])
+                    # Windows that only fit hour by hour have no single host to charge
+                    found = [(h, placement) for h, placement in found
+                             if placement is not None or not compute_requests][:1]
+                    for h, placement in found:
+                        occupancy.reserve(first + h, duration, compute_requests, placement, link_reqs, fp_reqs)
+                results.append(self._find_slot_result(req["start_time"], req["end_time"], duration, found,
+                                                      req["resources"], host_cap_map))
+
+            result = {"results": results, "total": len(results), "joint": joint}
+            if joint:
+                result["feasible"] = all(r["total"] for r in results)
+            return result
         finally:
             session.rollback()
 
@@ -1162,137 +1711,20 @@ class DatabaseManager:
                       host_cap_map, hosts_by_site, slivers_in_range, comp_by_sliver,
                       link_cap_map, net_slivers_in_range, net_sliver_interfaces,
                       fp_cap_map, fp_iface_slivers):
-        # Check compute requests using greedy bin-packing
-        if compute_requests:
-            for dh in range(duration):
-                hour_start = window_start + timedelta(hours=dh)
-                hour_end = hour_start + timedelta(hours=1)
-
-                # Build remaining capacity for each host at this hour
-                remaining = {}
-                for host_id, cap in host_cap_map.items():
-                    remaining[host_id] = {
-                        "cores": cap["cores_capacity"],
-                        "ram": cap["ram_capacity"],
-                        "disk": cap["disk_capacity"],
-                        "components": {k.lower(): v for k, v in cap["components"].items()}
-                    }
-
-                # Subtract existing allocations for this hour
-                for sliver in slivers_in_range:
-                    if sliver.lease_start < hour_end and sliver.lease_end > hour_start:
-                        h = sliver.host_id
-                        if h in remaining:
-                            remaining[h]["cores"] -= sliver.core or 0
-                            remaining[h]["ram"] -= sliver.ram or 0
-                            remaining[h]["disk"] -= sliver.disk or 0
-                            for comp_key, _ in comp_by_sliver.get(sliver.id, []):
-                                comp_key_lower = comp_key.lower()
-                                if comp_key_lower in remaining[h]["components"]:
-                                    remaining[h]["components"][comp_key_lower] -= 1
-
-                # Greedy bin-pack each compute request
-                for req in compute_requests:
-                    req_cores = req.get("cores", 0)
-                    req_ram = req.get("ram", 0)
-                    req_disk = req.get("disk", 0)
-                    req_components = req.get("components", {})
-                    req_site = req.get("site")
-
-                    # Determine candidate hosts
-                    if req_site:
-                        candidate_hosts = [hid for hid in hosts_by_site.get(req_site, [])
-                                           if hid in remaining]
-                    else:
-                        candidate_hosts = list(remaining.keys())
-
-                    placed = False
-                    for host_id in candidate_hosts:
-                        rem = remaining[host_id]
-                        if rem["cores"] < req_cores:
-                            continue
-                        if rem["ram"] < req_ram:
-                            continue
-                        if rem["disk"] < req_disk:
-                            continue
-
-                        # Check components
-                        comp_ok = True
-                        for comp_key, comp_count in req_components.items():
-                            if rem["components"].get(comp_key.lower(), 0) < comp_count:
-                                comp_ok = False
-                                break
-                        if not comp_ok:
-                            continue
-
-                        # Place on this host — subtract from remaining
-                        rem["cores"] -= req_cores
-                        rem["ram"] -= req_ram
-                        rem["disk"] -= req_disk
-                        for comp_key, comp_count in req_components.items():
-                            rem["components"][comp_key.lower()] -= comp_count
-                        placed = True
-                        break
-
-                    if not placed:
-                        return False
-
-        # Check link requests
-        for req in link_requests:
-            pair = tuple(sorted([req["site_a"], req["site_b"]]))
-            cap_entry = link_cap_map.get(pair)
-            if not cap_entry:
-                return False
-            bw_cap = cap_entry["bandwidth_capacity"]
-            req_bw = req["bandwidth"]
-
-            for dh in range(duration):
-                hour_start = window_start + timedelta(hours=dh)
-                hour_end = hour_start + timedelta(hours=1)
-
-                bw_used = 0
-                for ns in net_slivers_in_range:
-                    if ns.lease_start < hour_end and ns.lease_end > hour_start:
-                        sites_list = net_sliver_interfaces.get(ns.id, [])
-                        unique_sites = sorted(set(sites_list))
-                        if len(unique_sites) == 2 and tuple(unique_sites) == pair:
-                            bw_used += ns.bandwidth or 0
-
-                if bw_cap - bw_used < req_bw:
-                    return False
-
-        # Check facility port requests
-        for req in fp_requests:
-            req_name = req["name"]
-            req_site = req["site"]
-            req_vlans = req["vlans"]
-
-            # Find matching facility port capacity
-            matching_fp = None
-            for (fp_name, s_name, dev_name, loc_name), cap in fp_cap_map.items():
-                if fp_name == req_name and s_name == req_site:
-                    matching_fp = cap
-                    break
-            if not matching_fp:
-                return False
-
-            total_vlans = matching_fp["total_vlans"]
-
-            for dh in range(duration):
-                hour_start = window_start + timedelta(hours=dh)
-                hour_end = hour_start + timedelta(hours=1)
-
-                vlans_in_use = set()
-                for fp_iface in fp_iface_slivers:
-                    if (fp_iface.fp_name == req_name and fp_iface.site_name == req_site and
-                            fp_iface.lease_start < hour_end and fp_iface.lease_end > hour_start):
-                        if fp_iface.vlan:
-                            vlans_in_use.add(fp_iface.vlan)
-
-                if total_vlans - len(vlans_in_use) < req_vlans:
-                    return False
-
-        return True
+        """
+        Check whether all requests fit in every hour of a single window.
+        find_slot evaluates the whole search range at once; this is the one-window form.
+        """
+        occupancy = HourlyOccupancy.from_slivers(
+            start_time=window_start, total_hours=duration,
+            host_cap_map=host_cap_map, slivers_in_range=slivers_in_range, comp_by_sliver=comp_by_sliver,
+            net_slivers_in_range=net_slivers_in_range, net_sliver_interfaces=net_sliver_interfaces,
+            fp_iface_slivers=fp_iface_slivers)
+        return bool(occupancy.search(
+            duration=duration, max_results=1,
+            compute_requests=compute_requests, link_requests=link_requests, fp_requests=fp_requests,
+            host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+            link_cap_map=link_cap_map, fp_cap_map=fp_cap_map))
 
     # -------------------- QUERY DATA --------------------
     @staticmethod
@@ -1300,11 +1732,7 @@ class DatabaseManager:
         if start is not None or end is not None:
             lease_end_filter = True  # Initialize with True to avoid NoneType comparison
             if start is not None and end is not None:
-                lease_end_filter = or_(
-                    and_(start <= table.lease_end, table.lease_end <= end),
-                    and_(start <= table.lease_start, table.lease_start <= end),
-                    and_(table.lease_start <= start, table.lease_end >= end)
-                )
+                lease_end_filter = lease_overlaps_closed(table, start, end)
             elif start is not None:
                 lease_end_filter = start <= table.lease_end
             elif end is not None:
@@ -1806,12 +2234,8 @@ class DatabaseManager:
                     # Apply time-based filter on Membership if time window is specified
                     st = start_time or (end_time - timedelta(days=self.DEFAULT_TIME_WINDOW_DAYS))
                     et = end_time or (start_time + timedelta(days=self.DEFAULT_TIME_WINDOW_DAYS))
-                    filters.append(
-                        or_(
-                            and_(Membership.start_time <= et, Membership.end_time >= st),  # overlapping window
-                            and_(Membership.start_time <= et, Membership.end_time.is_(None))  # still active
-                        )
-                    )
+                    # Overlapping window, or still active
+                    filters.append(membership_overlaps(st, et))
                     self.logger.info(f"Query Users filtering on membership start: {st} end: {et}")
             # User filters
             if user_email:
@@ -2899,6 +3323,96 @@ class DatabaseManager:
         finally:
             session.close()
 
+    def get_user_ids_by_uuid(self, user_uuids: List[str]) -> dict:
+        """
+        Resolve internal user IDs for several user UUIDs in one query.
+
+        :param user_uuids: UUIDs of the users
+        :return: user_uuid -> user.id for the users found
+        """
+        session = self.get_session()
+        try:
+            return dict(session.query(Users.user_uuid, Users.id).filter(Users.user_uuid.in_(set(user_uuids))).all())
+        finally:
+            session.close()
+
+    def get_project_ids_by_uuid(self, project_uuids: List[str]) -> dict:
+        """
+        Resolve internal project IDs for several project UUIDs in one query.
+
+        :param project_uuids: UUIDs of the projects
+        :return: project_uuid -> project.id for the projects found
+        """
+        session = self.get_session()
+        try:
+            return dict(session.query(Projects.project_uuid, Projects.id).filter(
+                Projects.project_uuid.in_(set(project_uuids))).all())
+        finally:
+            session.close()
+
+    def get_active_memberships(self, user_ids: List[int], project_ids: List[int]) -> List[dict]:
+        """
+        Active memberships of the given users in the given projects, in one query.
+
+        :return: dicts with user_id, project_id, start_time, end_time, membership_type and active
+        """
+        session = self.get_session()
+        try:
+            rows = session.query(Membership).filter(Membership.active.is_(True),
+                                                    Membership.user_id.in_(set(user_ids)),
+                                                    Membership.project_id.in_(set(project_ids))).all()
+            return [{"user_id": m.user_id, "project_id": m.project_id, "start_time": m.start_time,
+                     "end_time": m.end_time, "membership_type": m.membership_type, "active": m.active}
+                    for m in rows]
+        finally:
+            session.close()
+
+    def get_memberships_by_user(self, user_ids: List[int]) -> dict:
+        """
+        All memberships of the given users, in one query.
+
+        :return: user_id -> list of dicts with user_id, project_id, start_time, end_time, membership_type and active
+        """
+        session = self.get_session()
+        try:
+            result = defaultdict(list)
+            for m in session.query(Membership).filter(Membership.user_id.in_(set(user_ids))).all():
+                result[m.user_id].append({"user_id": m.user_id, "project_id": m.project_id,
+                                          "start_time": m.start_time, "end_time": m.end_time,
+                                          "membership_type": m.membership_type, "active": m.active})
+            return dict(result)
+        finally:
+            session.close()
+
+    def get_sync_watermark(self, entity_type: str) -> Optional[datetime]:
+        """
+        Watermark recorded by the last successful sync of an entity type.
+
+        :param entity_type: e.g. "users" or "projects"
+        :return: last_updated of the newest entity synced, or None before the first sync
+        """
+        session = self.get_session()
+        try:
+            state = session.get(SyncState, entity_type)
+            return state.watermark if state else None
+        finally:
+            session.close()
+
+    def set_sync_watermark(self, entity_type: str, watermark: Optional[datetime]):
+        """
+        Record the watermark of a successful sync of an entity type.
+
+        :param entity_type: e.g. "users" or "projects"
+        :param watermark: last_updated of the newest entity synced
+        """
+        session = self.get_session()
+        try:
+            self._upsert(session, SyncState.__table__, ["entity_type"],
+                         [{"entity_type": entity_type, "watermark": watermark, "synced_at": func.now()}])
+            session.commit()
+        finally:
+            session.rollback()
+
     def get_active_membership(self, user_id: int, project_id: int) -> Membership | None:
         """
         Retrieve the active membership for a given user and project.
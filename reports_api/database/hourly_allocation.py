@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from reports_api.database import Slivers, Components, Interfaces, Sites, FacilityPortCapacities, \
+    HostHourlyAllocation, HostHourlyComponentAllocation, LinkHourlyAllocation, FacilityPortHourlyAllocation, \
+    SliverAllocationLedger, HourlyAllocationState
+from reports_api.database.occupancy import HOUR
+from reports_api.database.time_filters import lease_overlaps
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ACTIVE_STATES = [1, 2, 4, 5]
+CROSS_SITE_TYPES = ['l2ptp', 'l2sts']
+
+
+def floor_hour(t: datetime) -> datetime:
+    return t - (t - EPOCH) % HOUR
+
+
+def ceil_hour(t: datetime) -> datetime:
+    floor = floor_hour(t)
+    return floor if floor == t else floor + HOUR
+
+
+def is_hour_aligned(t: datetime) -> bool:
+    return (t - EPOCH) % HOUR == timedelta(0)
+
+
+def empty_contribution() -> dict:
+    return {"host_id": None, "cores": 0, "ram": 0, "disk": 0, "components": {}, "link": None, "ports": []}
+
+
+class HourlyAllocation:
+    """
+    Pre-aggregated usage for `n_hours` consecutive hours starting at `start_time`, read
+    from the hourly allocation tables.
+
+    host:  per hour, host_id -> {"cores", "ram", "disk"}
+    comp:  per hour, host_id -> {component key: count}
+    link:  sorted site-name pair -> [bandwidth per hour]
+    fp:    (fp_name, site_name) -> [VLAN bitmap per hour]
+    """
+
+    def __init__(self, start_time: datetime, n_hours: int):
+        self.start_time = start_time
+        self.n_hours = n_hours
+        self.host = [defaultdict(lambda: {"cores": 0, "ram": 0, "disk": 0}) for _ in range(n_hours)]
+        self.comp = [defaultdict(lambda: defaultdict(int)) for _ in range(n_hours)]
+        self.link = defaultdict(lambda: [0] * n_hours)
+        self.fp = defaultdict(lambda: [0] * n_hours)
+
+    def index(self, hour: datetime) -> int:
+        return (hour - self.start_time) // HOUR
+
+
+class HourlyAllocationStore:
+    """
+    Maintains host/link/facility-port usage per UTC hour so calendar and find-slot
+    queries over hour-aligned ranges can read hosts x hours rows instead of scanning slivers.
+
+    Each sliver's contribution is recorded in sliver_allocation_ledger; refresh_sliver()
+    subtracts the recorded contribution and adds the current one. The tables cover
+    [covered_from, covered_until) as recorded in hourly_allocation_state; rebuild()
+    recomputes everything and moves that range to
+    [now - HISTORY_DAYS, now + HORIZON_DAYS). Until the first rebuild nothing is maintained.
+    """
+    HISTORY_DAYS = 30
+    HORIZON_DAYS = 180
+
+    def __init__(self, session):
+        self.session = session
+
+    # -------------------- COVERAGE --------------------
+    def coverage(self) -> Optional[Tuple[datetime, datetime]]:
+        state = self.session.query(HourlyAllocationState).filter(HourlyAllocationState.id == 1).first()
+        if state is None:
+            return None
+        return state.covered_from, state.covered_until
+
+    def covers(self, start_time: datetime, n_hours: int) -> bool:
+        """True when [start_time, start_time + n_hours) is hour aligned and inside the covered range."""
+        if n_hours <= 0 or not is_hour_aligned(start_time):
+            return False
+        coverage = self.coverage()
+        if coverage is None:
+            return False
+        covered_from, covered_until = coverage
+        return covered_from <= start_time and start_time + n_hours * HOUR <= covered_until
+
+    # -------------------- CONTRIBUTIONS --------------------
+    def _contributions(self, *criteria) -> Dict[int, Tuple[datetime, datetime, dict]]:
+        """
+        Current contribution of every active sliver matching criteria.
+
+        :return: sliver_id -> (lease_start, lease_end, contribution)
+        """
+        slivers = self.session.query(
+            Slivers.id, Slivers.host_id, Slivers.sliver_type, Slivers.core, Slivers.ram, Slivers.disk,
+            Slivers.bandwidth, Slivers.lease_start, Slivers.lease_end
+        ).filter(
+            Slivers.state.in_(ACTIVE_STATES),
+            Slivers.lease_start.isnot(None),
+            Slivers.lease_end.isnot(None),
+            *criteria
+        ).all()
+
+        result = {}
+        for s in slivers:
+            contribution = empty_contribution()
+            if s.host_id:
+                contribution.update(host_id=s.host_id, cores=s.core or 0, ram=s.ram or 0, disk=s.disk or 0)
+            result[s.id] = (s.lease_start, s.lease_end, contribution)
+        if not result:
+            return result
+
+        sliver_ids = list(result.keys())
+        comp_rows = self.session.query(
+            Components.sliver_id, Components.type, Components.model
+        ).filter(Components.sliver_id.in_(sliver_ids)).all()
+        for cr in comp_rows:
+            contribution = result[cr.sliver_id][2]
+            if contribution["host_id"] is None:
+                continue
+            key = f"{cr.type}-{cr.model}" if cr.model else cr.type
+            contribution["components"][key] = contribution["components"].get(key, 0) + 1
+
+        iface_rows = self.session.query(
+            Interfaces.sliver_id, Interfaces.name, Interfaces.vlan, Interfaces.site_id, Sites.name.label("site_name")
+        ).join(Sites, Interfaces.site_id == Sites.id
+        ).filter(Interfaces.sliver_id.in_(sliver_ids)).all()
+        fp_names = {row.name for row in self.session.query(FacilityPortCapacities.name).distinct()}
+        iface_sites = defaultdict(dict)
+        for row in iface_rows:
+            iface_sites[row.sliver_id][row.site_name] = row.site_id
+            ports = result[row.sliver_id][2]["ports"]
+            if row.name in fp_names and row.vlan and [row.name, row.site_id, row.vlan] not in ports:
+                ports.append([row.name, row.site_id, row.vlan])
+
+        for s in slivers:
+            sites = iface_sites.get(s.id, {})
+            if s.sliver_type in CROSS_SITE_TYPES and s.bandwidth and len(sites) == 2:
+                site_a, site_b = sorted(sites)
+                result[s.id][2]["link"] = [sites[site_a], sites[site_b], s.bandwidth]
+        return result
+
+    @staticmethod
+    def _is_empty(contribution: dict) -> bool:
+        return not (contribution["cores"] or contribution["ram"] or contribution["disk"]
+                    or contribution["components"] or contribution["link"] or contribution["ports"])
+
+    @staticmethod
+    def _hour_range(lease_start: datetime, lease_end: datetime,
+                    covered_from: datetime, covered_until: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """Covered hours [first, last) that a lease overlaps, or None."""
+        first = max(floor_hour(lease_start), covered_from)
+        last = min(ceil_hour(lease_end), covered_until)
+        return (first, last) if first < last else None
+
+    # -------------------- INCREMENTAL UPDATES --------------------
+    def _apply(self, contribution: dict, first: datetime, last: datetime, sign: int):
+        hours = []
+        hour = first
+        while hour < last:
+            hours.append(hour)
+            hour += HOUR
+
+        host_id = contribution["host_id"]
+        if host_id and (contribution["cores"] or contribution["ram"] or contribution["disk"]):
+            table = HostHourlyAllocation.__table__
+            stmt = insert(table).values([
+                {"host_id": host_id, "hour": h, "cores": sign * contribution["cores"],
+                 "ram": sign * contribution["ram"], "disk": sign * contribution["disk"]} for h in hours])
+            self.session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.host_id, table.c.hour],
+                set_={"cores": table.c.cores + stmt.excluded.cores, "ram": table.c.ram + stmt.excluded.ram,
+                      "disk": table.c.disk + stmt.excluded.disk}))
+            if sign < 0:
+                self.session.query(HostHourlyAllocation).filter(
+                    HostHourlyAllocation.host_id == host_id,
+                    HostHourlyAllocation.hour >= first, HostHourlyAllocation.hour < last,
+                    HostHourlyAllocation.cores == 0, HostHourlyAllocation.ram == 0, HostHourlyAllocation.disk == 0
+                ).delete(synchronize_session=False)
+
+        if host_id and contribution["components"]:
+            table = HostHourlyComponentAllocation.__table__
+            stmt = insert(table).values([
+                {"host_id": host_id, "hour": h, "component": key, "allocated": sign * count}
+                for key, count in contribution["components"].items() for h in hours])
+            self.session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.host_id, table.c.hour, table.c.component],
+                set_={"allocated": table.c.allocated + stmt.excluded.allocated}))
+            if sign < 0:
+                self.session.query(HostHourlyComponentAllocation).filter(
+                    HostHourlyComponentAllocation.host_id == host_id,
+                    HostHourlyComponentAllocation.hour >= first, HostHourlyComponentAllocation.hour < last,
+                    HostHourlyComponentAllocation.allocated == 0
+                ).delete(synchronize_session=False)
+
+        if contribution["link"]:
+            site_a_id, site_b_id, bandwidth = contribution["link"]
+            table = LinkHourlyAllocation.__table__
+            stmt = insert(table).values([
+                {"site_a_id": site_a_id, "site_b_id": site_b_id, "hour": h, "bandwidth": sign * bandwidth}
+                for h in hours])
+            self.session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.site_a_id, table.c.site_b_id, table.c.hour],
+                set_={"bandwidth": table.c.bandwidth + stmt.excluded.bandwidth}))
+            if sign < 0:
+                self.session.query(LinkHourlyAllocation).filter(
+                    LinkHourlyAllocation.site_a_id == site_a_id, LinkHourlyAllocation.site_b_id == site_b_id,
+                    LinkHourlyAllocation.hour >= first, LinkHourlyAllocation.hour < last,
+                    LinkHourlyAllocation.bandwidth == 0
+                ).delete(synchronize_session=False)
+
+        if contribution["ports"]:
+            table = FacilityPortHourlyAllocation.__table__
+            stmt = insert(table).values([
+                {"name": name, "site_id": site_id, "vlan": vlan, "hour": h, "holders": sign}
+                for name, site_id, vlan in contribution["ports"] for h in hours])
+            self.session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.name, table.c.site_id, table.c.vlan, table.c.hour],
+                set_={"holders": table.c.holders + stmt.excluded.holders}))
+            if sign < 0:
+                self.session.query(FacilityPortHourlyAllocation).filter(
+                    FacilityPortHourlyAllocation.hour >= first, FacilityPortHourlyAllocation.hour < last,
+                    FacilityPortHourlyAllocation.holders <= 0
+                ).delete(synchronize_session=False)
+
+    def refresh_sliver(self, sliver_id: int):
+        """
+        Bring the hourly tables in line with the sliver's current state, lease, components
+        and interfaces. Runs in the caller's transaction; the caller commits.
+        """
+        self.refresh_slivers([sliver_id])
+
+    def refresh_slivers(self, sliver_ids: List[int]):
+        """
+        refresh_sliver() for several slivers, reading their ledgers and current
+        contributions in one query each. Runs in the caller's transaction; the caller commits.
+        """
+        if not sliver_ids:
+            return
+        coverage = self.coverage()
+        if coverage is None:
+            return
+        ledgers = self.session.query(SliverAllocationLedger).filter(
+            SliverAllocationLedger.sliver_id.in_(sliver_ids)).with_for_update().all()
+        for ledger in ledgers:
+            self._apply(ledger.contribution, ledger.first_hour, ledger.last_hour, sign=-1)
+            self.session.delete(ledger)
+
+        current = self._contributions(Slivers.id.in_(sliver_ids))
+        for sliver_id in sliver_ids:
+            if sliver_id not in current:
+                continue
+            lease_start, lease_end, contribution = current[sliver_id]
+            hour_range = self._hour_range(lease_start, lease_end, *coverage)
+            if hour_range is None or self._is_empty(contribution):
+                continue
+            self._apply(contribution, hour_range[0], hour_range[1], sign=1)
+            self.session.add(SliverAllocationLedger(sliver_id=sliver_id, first_hour=hour_range[0],
+                                                    last_hour=hour_range[1], contribution=contribution))
+
+    # -------------------- REBUILD --------------------
+    def rebuild(self, now: datetime = None) -> int:
+        """
+        Recompute all hourly tables and the ledger from the slivers table.
+
+        :return: number of slivers that contribute
+        """
+        now = now or datetime.now(timezone.utc)
+        covered_from = floor_hour(now) - timedelta(days=self.HISTORY_DAYS)
+        covered_until = floor_hour(now) + timedelta(days=self.HORIZON_DAYS)
+        n = (covered_until - covered_from) // HOUR
+
+        for model in (SliverAllocationLedger, HostHourlyAllocation, HostHourlyComponentAllocation,
+                      LinkHourlyAllocation, FacilityPortHourlyAllocation):
+            self.session.query(model).delete(synchronize_session=False)
+
+        contributions = self._contributions(lease_overlaps(Slivers, covered_from, covered_until))
+
+        host_diffs = defaultdict(lambda: [[0] * (n + 1) for _ in range(3)])
+        comp_diffs = defaultdict(lambda: [0] * (n + 1))
+        link_diffs = defaultdict(lambda: [0] * (n + 1))
+        port_diffs = defaultdict(lambda: [0] * (n + 1))
+        ledgers = []
+        for sliver_id, (lease_start, lease_end, contribution) in contributions.items():
+            hour_range = self._hour_range(lease_start, lease_end, covered_from, covered_until)
+            if hour_range is None or self._is_empty(contribution):
+                continue
+            first = (hour_range[0] - covered_from) // HOUR
+            last = (hour_range[1] - covered_from) // HOUR
+            host_id = contribution["host_id"]
+            if host_id:
+                for diff, value in zip(host_diffs[host_id], (contribution["cores"], contribution["ram"],
+                                                             contribution["disk"])):
+                    diff[first] += value
+                    diff[last] -= value
+                for key, count in contribution["components"].items():
+                    comp_diffs[(host_id, key)][first] += count
+                    comp_diffs[(host_id, key)][last] -= count
+            if contribution["link"]:
+                site_a_id, site_b_id, bandwidth = contribution["link"]
+                link_diffs[(site_a_id, site_b_id)][first] += bandwidth
+                link_diffs[(site_a_id, site_b_id)][last] -= bandwidth
+            for name, site_id, vlan in contribution["ports"]:
+                port_diffs[(name, site_id, vlan)][first] += 1
+                port_diffs[(name, site_id, vlan)][last] -= 1
+            ledgers.append({"sliver_id": sliver_id, "first_hour": hour_range[0], "last_hour": hour_range[1],
+                            "contribution": contribution})
+
+        def running(diff):
+            total = 0
+            for h in range(n):
+                total += diff[h]
+                yield covered_from + h * HOUR, total
+
+        rows = []
+        for host_id, (cores, ram, disk) in host_diffs.items():
+            for (hour, c), (_, r), (_, d) in zip(running(cores), running(ram), running(disk)):
+                if c or r or d:
+                    rows.append({"host_id": host_id, "hour": hour, "cores": c, "ram": r, "disk": d})
+        self._bulk_insert(HostHourlyAllocation, rows)
+        self._bulk_insert(HostHourlyComponentAllocation, [
+            {"host_id": host_id, "hour": hour, "component": key, "allocated": v}
+            for (host_id, key), diff in comp_diffs.items() for hour, v in running(diff) if v])
+        self._bulk_insert(LinkHourlyAllocation, [
+            {"site_a_id": a, "site_b_id": b, "hour": hour, "bandwidth": v}
+            for (a, b), diff in link_diffs.items() for hour, v in running(diff) if v])
+        self._bulk_insert(FacilityPortHourlyAllocation, [
+            {"name": name, "site_id": site_id, "vlan": vlan, "hour": hour, "holders": v}
+            for (name, site_id, vlan), diff in port_diffs.items() for hour, v in running(diff) if v])
+        self._bulk_insert(SliverAllocationLedger, ledgers)
+
+        state = self.session.query(HourlyAllocationState).filter(HourlyAllocationState.id == 1).first()
+        if state is None:
+            state = HourlyAllocationState(id=1, covered_from=covered_from, covered_until=covered_until)
+            self.session.add(state)
+        else:
+            state.covered_from = covered_from
+            state.covered_until = covered_until
+            state.rebuilt_at = now
+        return len(ledgers)
+
+    def _bulk_insert(self, model, rows: List[dict], batch_size: int = 10000):
+        for i in range(0, len(rows), batch_size):
+            self.session.execute(insert(model.__table__), rows[i:i + batch_size])
+
+    # -------------------- READ --------------------
+    def load(self, start_time: datetime, n_hours: int, host_ids: list = None,
+             links: bool = True, facility_ports: bool = True) -> Optional[HourlyAllocation]:
+        """
+        Read pre-aggregated usage for [start_time, start_time + n_hours), or None when
+        the range is not hour aligned or not covered.
+        """
+        if not self.covers(start_time, n_hours):
+            return None
+        end_time = start_time + n_hours * HOUR
+        result = HourlyAllocation(start_time, n_hours)
+
+        if host_ids:
+            rows = self.session.query(HostHourlyAllocation).filter(
+                HostHourlyAllocation.host_id.in_(host_ids),
+                HostHourlyAllocation.hour >= start_time, HostHourlyAllocation.hour < end_time).all()
+            for row in rows:
+                result.host[result.index(row.hour)][row.host_id] = {"cores": row.cores, "ram": row.ram,
+                                                                    "disk": row.disk}
+            rows = self.session.query(HostHourlyComponentAllocation).filter(
+                HostHourlyComponentAllocation.host_id.in_(host_ids),
+                HostHourlyComponentAllocation.hour >= start_time, HostHourlyComponentAllocation.hour < end_time).all()
+            for row in rows:
+                result.comp[result.index(row.hour)][row.host_id][row.component] += row.allocated
+
+        if links:
+            site_a = aliased(Sites)
+            site_b = aliased(Sites)
+            rows = self.session.query(
+                site_a.name.label("site_a"), site_b.name.label("site_b"),
+                LinkHourlyAllocation.hour, LinkHourlyAllocation.bandwidth
+            ).join(site_a, LinkHourlyAllocation.site_a_id == site_a.id
+            ).join(site_b, LinkHourlyAllocation.site_b_id == site_b.id
+            ).filter(LinkHourlyAllocation.hour >= start_time, LinkHourlyAllocation.hour < end_time).all()
+            for row in rows:
+                result.link[tuple(sorted([row.site_a, row.site_b]))][result.index(row.hour)] += row.bandwidth
+
+        if facility_ports:
+            rows = self.session.query(
+                FacilityPortHourlyAllocation.name, Sites.name.label("site_name"),
+                FacilityPortHourlyAllocation.vlan, FacilityPortHourlyAllocation.hour
+            ).join(Sites, FacilityPortHourlyAllocation.site_id == Sites.id
+            ).filter(
+                FacilityPortHourlyAllocation.holders > 0,
+                FacilityPortHourlyAllocation.hour >= start_time, FacilityPortHourlyAllocation.hour < end_time).all()
+            for row in rows:
+                result.fp[(row.name, row.site_name)][result.index(row.hour)] |= 1 << int(row.vlan)
+
+        return result
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from reports_api.database.placement import PlacementSolver
+
+HOUR = timedelta(hours=1)
+PROGRESS_HOURS = 24  # hours between progress callbacks while scanning
+
+
+def hour_span(lease_start: datetime, lease_end: datetime, start_time: datetime, total_hours: int) -> Tuple[int, int]:
+    """
+    Return the [first, last) hour indexes of a search range that a lease overlaps.
+
+    Hour h covers [start_time + h, start_time + h + 1); a lease overlaps it when
+    lease_start < hour_end and lease_end > hour_start.
+    """
+    first = (lease_start - start_time) // HOUR
+    last = -((start_time - lease_end) // HOUR)
+    return max(first, 0), min(last, total_hours)
+
+
+def _prefix_sum(diff: List[int]) -> List[int]:
+    """Turn a difference array of length n + 1 into n running totals."""
+    out = []
+    running = 0
+    for d in diff[:-1]:
+        running += d
+        out.append(running)
+    return out
+
+
+def link_intervals(net_slivers_in_range: list, net_sliver_interfaces: dict) -> Dict[tuple, List[tuple]]:
+    """
+    Resolve each network sliver to the site pair it connects, once.
+
+    Slivers whose interfaces do not span exactly two sites, or that carry no
+    bandwidth, are dropped.
+
+    :return: sorted site pair -> [(lease_start, lease_end, bandwidth)]
+    """
+    intervals = defaultdict(list)
+    for ns in net_slivers_in_range:
+        if not ns.bandwidth:
+            continue
+        unique_sites = sorted(set(net_sliver_interfaces.get(ns.id, [])))
+        if len(unique_sites) == 2:
+            intervals[tuple(unique_sites)].append((ns.lease_start, ns.lease_end, ns.bandwidth))
+    return intervals
+
+
+class LinkTimeline:
+    """
+    Bandwidth step function for one link, answering "how much is allocated
+    during [start, end)" in O(log n).
+
+    A lease overlaps [start, end) when lease_start < end and lease_end > start. For
+    well-formed leases that is (leases starting before end) minus (leases ending
+    at or before start), so both sides are a bisect into a sorted, prefix-summed list.
+    """
+
+    def __init__(self, intervals: List[tuple]):
+        starts = []
+        ends = []
+        # lease_end <= lease_start would break the subtraction above; keep those aside
+        self.malformed = []
+        for lease_start, lease_end, bandwidth in intervals:
+            if lease_start < lease_end:
+                starts.append((lease_start, bandwidth))
+                ends.append((lease_end, bandwidth))
+            else:
+                self.malformed.append((lease_start, lease_end, bandwidth))
+        starts.sort(key=lambda x: x[0])
+        ends.sort(key=lambda x: x[0])
+        self.starts = [t for t, _ in starts]
+        self.ends = [t for t, _ in ends]
+        self.start_totals = self._running([bw for _, bw in starts])
+        self.end_totals = self._running([bw for _, bw in ends])
+
+    @staticmethod
+    def _running(values: List[int]) -> List[int]:
+        out = [0]
+        for v in values:
+            out.append(out[-1] + v)
+        return out
+
+    def allocated(self, start: datetime, end: datetime) -> int:
+        total = self.start_totals[bisect_left(self.starts, end)] - self.end_totals[bisect_right(self.ends, start)]
+        for lease_start, lease_end, bandwidth in self.malformed:
+            if lease_start < end and lease_end > start:
+                total += bandwidth
+        return total
+
+
+class HourlyOccupancy:
+    """
+    Per-hour resource usage over a search range, built once per find_slot call.
+
+    host_usage:  host_id -> {"cores": [...], "ram": [...], "disk": [...], "components": {key: [...]}}
+    link_usage:  sorted site pair -> [bandwidth allocated per hour]
+    fp_usage:    (fp_name, site_name) -> [distinct VLANs in use per hour]
+    host_changes: hours at which some host's usage may differ from the previous hour
+    """
+
+    def __init__(self, start_time: datetime, total_hours: int):
+        self.start_time = start_time
+        self.total_hours = total_hours
+        self.host_usage = {}
+        self.link_usage = {}
+        self.fp_usage = {}
+        self.host_changes = [False] * total_hours
+        self._range_max_cache = {}
+
+    @classmethod
+    def from_slivers(cls, start_time: datetime, total_hours: int,
+                     host_cap_map: dict, slivers_in_range: list, comp_by_sliver: dict,
+                     net_slivers_in_range: list = None, net_sliver_interfaces: dict = None,
+                     fp_iface_slivers: list = None) -> "HourlyOccupancy":
+        occupancy = cls(start_time=start_time, total_hours=total_hours)
+        occupancy._add_compute(host_cap_map, slivers_in_range, comp_by_sliver)
+        occupancy._add_network(net_slivers_in_range or [], net_sliver_interfaces or {})
+        occupancy._add_facility_ports(fp_iface_slivers or [])
+        return occupancy
+
+    @classmethod
+    def from_hourly_allocation(cls, allocation, host_cap_map: dict) -> "HourlyOccupancy":
+        """
+        Build from rows already aggregated per hour (see HourlyAllocationStore.load) instead of slivers.
+        """
+        n = allocation.n_hours
+        occupancy = cls(start_time=allocation.start_time, total_hours=n)
+        for host_id, cap in host_cap_map.items():
+            occupancy.host_usage[host_id] = {
+                "cores": [0] * n, "ram": [0] * n, "disk": [0] * n,
+                "components": {k.lower(): [0] * n for k in cap["components"]}
+            }
+        for h in range(n):
+            for host_id, alloc in allocation.host[h].items():
+                usage = occupancy.host_usage.get(host_id)
+                if usage is not None:
+                    for field in ("cores", "ram", "disk"):
+                        usage[field][h] = alloc[field]
+            for host_id, comps in allocation.comp[h].items():
+                usage = occupancy.host_usage.get(host_id)
+                if usage is None:
+                    continue
+                for comp_key, count in comps.items():
+                    series = usage["components"].get(comp_key.lower())
+                    if series is not None:
+                        series[h] += count
+
+        for usage in occupancy.host_usage.values():
+            for series in (usage["cores"], usage["ram"], usage["disk"], *usage["components"].values()):
+                for h in range(1, n):
+                    if series[h] != series[h - 1]:
+                        occupancy.host_changes[h] = True
+
+        occupancy.link_usage = dict(allocation.link)
+        occupancy.fp_usage = {key: [bits.bit_count() for bits in series] for key, series in allocation.fp.items()}
+        return occupancy
+
+    def _add_compute(self, host_cap_map: dict, slivers_in_range: list, comp_by_sliver: dict):
+        n = self.total_hours
+        diffs = {}
+        for host_id, cap in host_cap_map.items():
+            diffs[host_id] = {
+                "cores": [0] * (n + 1), "ram": [0] * (n + 1), "disk": [0] * (n + 1),
+                "components": {k.lower(): [0] * (n + 1) for k in cap["components"]}
+            }
+
+        for sliver in slivers_in_range:
+            diff = diffs.get(sliver.host_id)
+            if diff is None:
+                continue
+            first, last = hour_span(sliver.lease_start, sliver.lease_end, self.start_time, n)
+            if first >= last:
+                continue
+            self.host_changes[first] = True
+            if last < n:
+                self.host_changes[last] = True
+            for field, value in (("cores", sliver.core), ("ram", sliver.ram), ("disk", sliver.disk)):
+                if value:
+                    diff[field][first] += value
+                    diff[field][last] -= value
+            for comp_key, _ in comp_by_sliver.get(sliver.id, []):
+                comp_diff = diff["components"].get(comp_key.lower())
+                if comp_diff is not None:
+                    comp_diff[first] += 1
+                    comp_diff[last] -= 1
+
+        for host_id, diff in diffs.items():
+            self.host_usage[host_id] = {
+                "cores": _prefix_sum(diff["cores"]),
+                "ram": _prefix_sum(diff["ram"]),
+                "disk": _prefix_sum(diff["disk"]),
+                "components": {k: _prefix_sum(v) for k, v in diff["components"].items()}
+            }
+
+    def _add_network(self, net_slivers_in_range: list, net_sliver_interfaces: dict):
+        n = self.total_hours
+        for pair, intervals in link_intervals(net_slivers_in_range, net_sliver_interfaces).items():
+            diff = [0] * (n + 1)
+            for lease_start, lease_end, bandwidth in intervals:
+                first, last = hour_span(lease_start, lease_end, self.start_time, n)
+                if first < last:
+                    diff[first] += bandwidth
+                    diff[last] -= bandwidth
+            self.link_usage[pair] = _prefix_sum(diff)
+
+    def _add_facility_ports(self, fp_iface_slivers: list):
+        n = self.total_hours
+        # A VLAN counts once per hour no matter how many slivers hold it, so merge
+        # the hour spans per (port, vlan) before counting.
+        spans = defaultdict(list)
+        for fp_iface in fp_iface_slivers:
+            if not fp_iface.vlan:
+                continue
+            first, last = hour_span(fp_iface.lease_start, fp_iface.lease_end, self.start_time, n)
+            if first < last:
+                spans[((fp_iface.fp_name, fp_iface.site_name), fp_iface.vlan)].append((first, last))
+
+        diffs = defaultdict(lambda: [0] * (n + 1))
+        for (key, _vlan), vlan_spans in spans.items():
+            diff = diffs[key]
+            vlan_spans.sort()
+            cur_first, cur_last = vlan_spans[0]
+            for first, last in vlan_spans[1:]:
+                if first <= cur_last:
+                    cur_last = max(cur_last, last)
+                else:
+                    diff[cur_first] += 1
+                    diff[cur_last] -= 1
+                    cur_first, cur_last = first, last
+            diff[cur_first] += 1
+            diff[cur_last] -= 1
+        self.fp_usage = {key: _prefix_sum(diff) for key, diff in diffs.items()}
+
+    # -------------------- SHARING --------------------
+    def window(self, first: int, total_hours: int) -> "HourlyOccupancy":
+        """
+        Usage over hours [first, first + total_hours) as its own occupancy, so requests
+        over sub-ranges of one build can be searched. The whole range returns self,
+        keeping its range-max tables.
+        """
+        if first == 0 and total_hours == self.total_hours:
+            return self
+        last = first + total_hours
+        view = HourlyOccupancy(self.start_time + first * HOUR, total_hours)
+        view.host_usage = {
+            host_id: {"cores": usage["cores"][first:last], "ram": usage["ram"][first:last],
+                      "disk": usage["disk"][first:last],
+                      "components": {k: v[first:last] for k, v in usage["components"].items()}}
+            for host_id, usage in self.host_usage.items()}
+        view.link_usage = {pair: series[first:last] for pair, series in self.link_usage.items()}
+        view.fp_usage = {key: series[first:last] for key, series in self.fp_usage.items()}
+        view.host_changes = self.host_changes[first:last]
+        return view
+
+    def reserve(self, first: int, duration: int, compute_requests: list, placement: Optional[Dict[int, int]],
+                link_requests: list, fp_requests: list):
+        """
+        Add the usage of granted requests over hours [first, first + duration), so later
+        searches see them as allocated.
+
+        :param placement: compute request index -> host id, as returned by search()
+        """
+        n = self.total_hours
+        last = min(first + duration, n)
+        if compute_requests and placement is None:
+            raise ValueError("compute requests need a placement to be reserved")
+
+        def add(series: List[int], value: int):
+            for h in range(first, last):
+                series[h] += value
+
+        for i, req in enumerate(compute_requests):
+            usage = self.host_usage[placement[i]]
+            for field in ("cores", "ram", "disk"):
+                if req.get(field):
+                    add(usage[field], req[field])
+            for comp_key, count in req.get("components", {}).items():
+                series = usage["components"].get(comp_key.lower())
+                if series is not None:
+                    add(series, count)
+        if compute_requests:
+            self.host_changes[first] = True
+            if last < n:
+                self.host_changes[last] = True
+        for req in link_requests:
+            pair = tuple(sorted([req["site_a"], req["site_b"]]))
+            add(self.link_usage.setdefault(pair, [0] * n), req["bandwidth"])
+        for req in fp_requests:
+            add(self.fp_usage.setdefault((req["name"], req["site"]), [0] * n), req["vlans"])
+        self._range_max_cache.clear()
+
+    # -------------------- FEASIBILITY --------------------
+    def remaining_state(self, solver: PlacementSolver, hour: int = None, window: Tuple[int, int] = None) -> tuple:
+        """
+        Remaining capacity vectors of solver.hosts, either at one hour or, for a window,
+        against the peak usage over its hours (what a sliver pinned to a host must fit under).
+        """
+        state = []
+        for hid, cap in zip(solver.hosts, solver.capacity):
+            usage = self.host_usage.get(hid)
+            if usage is None:
+                state.append(cap)
+                continue
+            series = (usage["cores"], usage["ram"], usage["disk"],
+                      *(usage["components"].get(k) for k in solver.comp_keys))
+            vector = []
+            for c, values in zip(cap, series):
+                if values is None:
+                    vector.append(c)
+                elif window is None:
+                    vector.append(c - values[hour])
+                else:
+                    vector.append(c - max(values[window[0]:window[1]]))
+            state.append(tuple(vector))
+        return tuple(state)
+
+    def compute_feasible_hours(self, solver: Optional[PlacementSolver],
+                               progress: Optional[Callable[[int, int], None]] = None) -> List[bool]:
+        """
+        Per-hour feasibility bitmap for the compute requests.
+
+        Placement is only re-run at hours where host usage changed, and the solver
+        memoizes by occupancy state, so each distinct state is solved once.
+
+        :param progress: called as progress(hours scanned, total hours) once a day of hours
+                         and at the end; it may raise to abort the scan
+        """
+        n = self.total_hours
+        if solver is None or not solver.requests:
+            if progress:
+                progress(n, n)
+            return [True] * n
+        ok = [False] * n
+        fits = False
+        for h in range(n):
+            if progress and h and h % PROGRESS_HOURS == 0:
+                progress(h, n)
+            if h == 0 or self.host_changes[h]:
+                fits = solver.solve(self.remaining_state(solver, hour=h)) is not None
+            ok[h] = fits
+        if progress:
+            progress(n, n)
+        return ok
+
+    def range_checks(self, link_requests: list, fp_requests: list,
+                     link_cap_map: dict, fp_cap_map: dict) -> Optional[List[Tuple["RangeMax", int]]]:
+        """
+        Build one (RangeMax, limit) pair per link / facility-port request: a window fits
+        the request when the max usage over its hours is <= limit.
+        Returns None when some request can never fit.
+        """
+        checks = []
+        for req in link_requests:
+            pair = tuple(sorted([req["site_a"], req["site_b"]]))
+            cap_entry = link_cap_map.get(pair)
+            if not cap_entry:
+                return None
+            limit = cap_entry["bandwidth_capacity"] - req["bandwidth"]
+            if limit < 0:
+                return None
+            usage = self.link_usage.get(pair)
+            if usage:
+                checks.append((self._range_max(("link", pair), usage), limit))
+
+        for req in fp_requests:
+            matching_fp = _match_facility_port(fp_cap_map, req["name"], req["site"])
+            if not matching_fp:
+                return None
+            limit = matching_fp["total_vlans"] - req["vlans"]
+            if limit < 0:
+                return None
+            key = (req["name"], req["site"])
+            usage = self.fp_usage.get(key)
+            if usage:
+                checks.append((self._range_max(("fp", key), usage), limit))
+        return checks
+
+    def search(self, duration: int, max_results: int,
+               compute_requests: list, link_requests: list, fp_requests: list,
+               host_cap_map: dict, hosts_by_site: dict, link_cap_map: dict,
+               fp_cap_map: dict,
+               progress: Optional[Callable[[int, int], None]] = None) -> List[Tuple[int, Optional[Dict[int, int]]]]:
+        """
+        Find up to max_results windows of `duration` hours where every request fits.
+
+        :return: list of (start hour, placement) where placement maps each compute request
+                 index to a host that can hold it for the whole window, or None when the
+                 window only fits hour by hour
+        """
+        checks = self.range_checks(link_requests, fp_requests, link_cap_map, fp_cap_map)
+        if checks is None:
+            if progress:
+                progress(self.total_hours, self.total_hours)
+            return []
+        solver = PlacementSolver(compute_requests, host_cap_map, hosts_by_site) if compute_requests else None
+        compute_ok = self.compute_feasible_hours(solver, progress=progress)
+        results = []
+        for start in find_windows(compute_ok, checks, duration=duration, max_results=max_results):
+            placement = None
+            if solver is not None:
+                placement = solver.solve(self.remaining_state(solver, window=(start, start + duration)))
+            results.append((start, placement))
+        return results
+
+    def _range_max(self, key: tuple, usage: List[int]) -> "RangeMax":
+        table = self._range_max_cache.get(key)
+        if table is None:
+            table = RangeMax(usage)
+            self._range_max_cache[key] = table
+        return table
+
+
+class RangeMax:
+    """
+    Sparse table over a fixed list of values: O(n log n) to build, O(1) max over any [lo, hi).
+    """
+
+    def __init__(self, values: List[int]):
+        self.levels = [list(values)]
+        span = 1
+        while span * 2 <= len(values):
+            prev = self.levels[-1]
+            self.levels.append([max(prev[i], prev[i + span]) for i in range(len(prev) - span)])
+            span *= 2
+
+    def query(self, lo: int, hi: int) -> int:
+        k = (hi - lo).bit_length() - 1
+        level = self.levels[k]
+        return max(level[lo], level[hi - (1 << k)])
+
+    def last_above(self, lo: int, hi: int, limit: int) -> int:
+        """Largest index in [lo, hi) whose value exceeds limit, or -1 if there is none."""
+        if self.query(lo, hi) <= limit:
+            return -1
+        # max over [j, hi) only shrinks as j grows, so binary search for the last j where it exceeds limit
+        a, b = lo, hi - 1
+        while a < b:
+            mid = (a + b + 1) // 2
+            if self.query(mid, hi) > limit:
+                a = mid
+            else:
+                b = mid - 1
+        return a
+
+
+def _match_facility_port(fp_cap_map: dict, name: str, site: str):
+    for (fp_name, s_name, _dev_name, _loc_name), cap in fp_cap_map.items():
+        if fp_name == name and s_name == site:
+            return cap
+    return None
+
+
+def find_windows(compute_ok: List[bool], checks: List[Tuple[RangeMax, int]],
+                 duration: int, max_results: int) -> List[int]:
+    """
+    Return up to max_results start hours whose [start, start + duration) hours fit every request.
+
+    compute_ok is the per-hour compute bitmap; checks are the per-resource range-max
+    tables from HourlyOccupancy.range_checks. Whenever a window fails because of
+    hour j, every window starting at or before j fails too, so the search resumes at j + 1.
+    """
+    n = len(compute_ok)
+    last_bad = []
+    bad = -1
+    for h, fits in enumerate(compute_ok):
+        if not fits:
+            bad = h
+        last_bad.append(bad)
+
+    starts = []
+    t = 0
+    while t + duration <= n and len(starts) < max_results:
+        end = t + duration
+        jump = last_bad[end - 1]
+        if jump < t:
+            jump = -1
+            for table, limit in checks:
+                jump = max(jump, table.last_above(t, end, limit))
+        if jump >= t:
+            t = jump + 1
+            continue
+        starts.append(t)
+        t += 1
+    return starts
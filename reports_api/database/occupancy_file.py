@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Hosts x hours occupancy published as a memory-mapped file.
+
+One refresher process writes the file (see reports_api.sync.publish_occupancy_file);
+every API worker maps it read-only and shares the same pages. Layout, little endian:
+
+    header      HEADER (magic, version, n_hours, generation, published_at,
+                start hour, directory offset/length, data offset)
+    directory   JSON: {"hosts": [host_id], "components": [[host_id, key]],
+                       "links": [[site_a, site_b]], "ports": [[fp_name, site_name]]}
+    data        int64  cores, ram, disk series per host    (n_hosts x 3 x n_hours)
+                int64  series per (host, component key)    (n_components x n_hours)
+                int64  bandwidth series per site pair      (n_links x n_hours)
+                uint64 4096-bit VLAN bitmap per port-hour  (n_ports x n_hours x 64)
+
+A new generation is written to a temporary file and renamed over the old one, so a
+reader sees either the previous or the next file in full; mappings already open keep
+the old inode alive until they are dropped.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Optional
+
+from reports_api.database.hourly_allocation import EPOCH, HourlyAllocation, is_hour_aligned
+from reports_api.database.occupancy import HOUR
+
+MAGIC = b"FABOCC\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQdqQQQ")
+VLAN_WORDS = 64  # 4096 VLAN ids / 64 bits
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _directory(allocation: HourlyAllocation) -> dict:
+    hosts = set()
+    components = set()
+    for hour in range(allocation.n_hours):
+        hosts.update(allocation.host[hour].keys())
+        for host_id, comps in allocation.comp[hour].items():
+            components.update((host_id, key) for key in comps)
+    return {"hosts": sorted(hosts), "components": [list(c) for c in sorted(components)],
+            "links": [list(pair) for pair in sorted(allocation.link)],
+            "ports": [list(port) for port in sorted(allocation.fp)]}
+
+
+def read_generation(path: str) -> int:
+    """Generation of the file at path, or 0 when there is no valid file."""
+    try:
+        with open(path, "rb") as f:
+            magic, version, _, generation, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return 0
+    return generation if magic == MAGIC and version == VERSION else 0
+
+
+def write_occupancy_file(path: str, allocation: HourlyAllocation) -> int:
+    """
+    Publish allocation at path with a generation one above the current file's.
+
+    :return: the new generation
+    """
+    n = allocation.n_hours
+    directory = _directory(allocation)
+    directory_bytes = json.dumps(directory).encode()
+    data_offset = _align(HEADER.size + len(directory_bytes))
+    generation = read_generation(path) + 1
+    start_hour = (allocation.start_time - EPOCH) // HOUR
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, n, generation, time.time(), start_hour,
+                                HEADER.size, len(directory_bytes), data_offset))
+            f.write(directory_bytes)
+            f.write(b"\0" * (data_offset - HEADER.size - len(directory_bytes)))
+            for host_id in directory["hosts"]:
+                for field in ("cores", "ram", "disk"):
+                    array("q", (allocation.host[h][host_id][field] if host_id in allocation.host[h] else 0
+                                for h in range(n))).tofile(f)
+            for host_id, key in directory["components"]:
+                array("q", (allocation.comp[h][host_id][key] if host_id in allocation.comp[h] else 0
+                            for h in range(n))).tofile(f)
+            for a, b in directory["links"]:
+                array("q", allocation.link[(a, b)]).tofile(f)
+            for name, site in directory["ports"]:
+                for bits in allocation.fp[(name, site)]:
+                    f.write(bits.to_bytes(VLAN_WORDS * 8, "little"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return generation
+
+
+class _Mapping:
+    """One mapped generation of the file with its parsed directory."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat_key = self._stat_key(os.fstat(f.fileno()))
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_hours, self.generation, self.published_at, start_hour, \
+            directory_offset, directory_length, data_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} occupancy file")
+        self.start_time = EPOCH + start_hour * HOUR
+        directory = json.loads(self.mm[directory_offset:directory_offset + directory_length])
+
+        n = self.n_hours
+        self.hosts = {host_id: i for i, host_id in enumerate(directory["hosts"])}
+        self.components = {}
+        for i, (host_id, key) in enumerate(directory["components"]):
+            self.components.setdefault(host_id, []).append((key, i))
+        self.links = [tuple(pair) for pair in directory["links"]]
+        self.ports = [tuple(port) for port in directory["ports"]]
+
+        data = memoryview(self.mm)[data_offset:]
+        host_end = len(self.hosts) * 3 * n * 8
+        comp_end = host_end + len(directory["components"]) * n * 8
+        link_end = comp_end + len(self.links) * n * 8
+        self.host_data = data[:host_end].cast("q")
+        self.comp_data = data[host_end:comp_end].cast("q")
+        self.link_data = data[comp_end:link_end].cast("q")
+        self.port_data = data[link_end:link_end + len(self.ports) * n * VLAN_WORDS * 8]
+
+    @staticmethod
+    def _stat_key(st) -> tuple:
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class OccupancyFile:
+    """
+    Read side of the published occupancy file; returns the same HourlyAllocation as
+    HourlyAllocationStore.load(), so calendar and find-slot read it the same way.
+    Files older than max_age_seconds are ignored.
+    """
+    _instance = None
+
+    def __init__(self, path: str, max_age_seconds: int = 900):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._mapping = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> Optional["OccupancyFile"]:
+        """The process-wide reader, or None when it has not been configured."""
+        return cls._instance
+
+    @classmethod
+    def configure(cls, path: str, max_age_seconds: int = 900) -> "OccupancyFile":
+        cls._instance = cls(path=path, max_age_seconds=max_age_seconds)
+        return cls._instance
+
+    def _current(self) -> Optional[_Mapping]:
+        """Map the file, re-mapping when the refresher has renamed a new generation into place."""
+        try:
+            stat_key = _Mapping._stat_key(os.stat(self.path))
+        except OSError:
+            return None
+        with self._lock:
+            if self._mapping is None or self._mapping.stat_key != stat_key:
+                try:
+                    self._mapping = _Mapping(self.path)
+                except (OSError, ValueError, struct.error):
+                    self._mapping = None
+            return self._mapping
+
+    @property
+    def generation(self) -> int:
+        mapping = self._current()
+        return mapping.generation if mapping else 0
+
+    def load(self, start_time: datetime, n_hours: int, host_ids: list = None,
+             links: bool = True, facility_ports: bool = True) -> Optional[HourlyAllocation]:
+        """
+        Usage for [start_time, start_time + n_hours), or None when there is no current
+        file or it does not cover the range.
+        """
+        if n_hours <= 0 or not is_hour_aligned(start_time):
+            return None
+        mapping = self._current()
+        if mapping is None or time.time() - mapping.published_at > self.max_age_seconds:
+            return None
+        first = (start_time - mapping.start_time) // HOUR
+        if first < 0 or first + n_hours > mapping.n_hours:
+            return None
+        last = first + n_hours
+        n = mapping.n_hours
+        result = HourlyAllocation(start_time, n_hours)
+
+        for host_id in host_ids or []:
+            i = mapping.hosts.get(host_id)
+            if i is not None:
+                base = i * 3 * n
+                cores = mapping.host_data[base + first:base + last]
+                ram = mapping.host_data[base + n + first:base + n + last]
+                disk = mapping.host_data[base + 2 * n + first:base + 2 * n + last]
+                for h in range(n_hours):
+                    if cores[h] or ram[h] or disk[h]:
+                        result.host[h][host_id] = {"cores": cores[h], "ram": ram[h], "disk": disk[h]}
+            for key, c in mapping.components.get(host_id, []):
+                series = mapping.comp_data[c * n + first:c * n + last]
+                for h in range(n_hours):
+                    if series[h]:
+                        result.comp[h][host_id][key] += series[h]
+
+        if links:
+            for i, pair in enumerate(mapping.links):
+                series = mapping.link_data[i * n + first:i * n + last]
+                if any(series):
+                    result.link[pair] = series.tolist()
+
+        if facility_ports:
+            width = VLAN_WORDS * 8
+            for i, port in enumerate(mapping.ports):
+                base = (i * n + first) * width
+                bitmaps = [int.from_bytes(mapping.port_data[base + h * width:base + (h + 1) * width], "little")
+                           for h in range(n_hours)]
+                if any(bitmaps):
+                    result.fp[port] = bitmaps
+
+        return result
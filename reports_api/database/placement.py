@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from typing import Dict, List, Optional, Tuple
+
+Vector = Tuple[int, ...]
+
+
+class PlacementSolver:
+    """
+    Places a fixed set of compute requests onto hosts.
+
+    Every host and request is reduced to a vector (cores, ram, disk, <requested components>).
+    solve() takes the remaining-capacity vector of each relevant host and returns
+    {request index: host id}, or None when the requests cannot all be placed.
+
+    Strategies, in order:
+      1. best-fit decreasing: requests sorted by dominant resource share, each placed on
+         the host it leaves tightest
+      2. first-fit in request order
+      3. depth-first search over host choices, bounded by MAX_SEARCH_NODES
+
+    Results are memoized per remaining-capacity state, so hours that share an
+    occupancy state are solved once.
+    """
+    MAX_SEARCH_NODES = 20000
+
+    def __init__(self, compute_requests: List[dict], host_cap_map: dict, hosts_by_site: dict):
+        self.comp_keys = sorted({k.lower() for r in compute_requests for k in r.get("components", {})})
+
+        self.requests = []
+        self.candidates = []
+        relevant = set()
+        for req in compute_requests:
+            comps = {k.lower(): v for k, v in req.get("components", {}).items()}
+            self.requests.append((req.get("cores", 0), req.get("ram", 0), req.get("disk", 0),
+                                  *(comps.get(k, 0) for k in self.comp_keys)))
+            if req.get("site"):
+                hosts = [hid for hid in hosts_by_site.get(req["site"], []) if hid in host_cap_map]
+            else:
+                hosts = list(host_cap_map.keys())
+            self.candidates.append(hosts)
+            relevant.update(hosts)
+
+        # Keep host_cap_map order so ties resolve the way first-fit always did
+        self.hosts = [hid for hid in host_cap_map if hid in relevant]
+        self.host_index = {hid: i for i, hid in enumerate(self.hosts)}
+        self.capacity = [self.capacity_vector(host_cap_map[hid]) for hid in self.hosts]
+        candidate_sets = [set(c) for c in self.candidates]
+        self.profile = [tuple(hid in c for c in candidate_sets) for hid in self.hosts]
+        self.order = self._dominant_order()
+
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def capacity_vector(self, cap: dict) -> Vector:
+        comps = {k.lower(): v for k, v in cap["components"].items()}
+        return (cap["cores_capacity"], cap["ram_capacity"], cap["disk_capacity"],
+                *(comps.get(k, 0) for k in self.comp_keys))
+
+    def _dominant_order(self) -> List[int]:
+        def dominant_share(i):
+            totals = [0] * len(self.requests[i])
+            for hid in self.candidates[i]:
+                for d, v in enumerate(self.capacity[self.host_index[hid]]):
+                    totals[d] += v
+            share = 0.0
+            for d, need in enumerate(self.requests[i]):
+                if need > 0:
+                    share = max(share, need / totals[d] if totals[d] > 0 else float("inf"))
+            return share
+        return sorted(range(len(self.requests)), key=dominant_share, reverse=True)
+
+    # -------------------- SOLVE --------------------
+    def solve(self, state: Tuple[Vector, ...]) -> Optional[Dict[int, int]]:
+        """
+        :param state: remaining-capacity vector for each host in self.hosts, in that order
+        :return: {request index: host id} or None
+        """
+        if state in self._memo:
+            self.hits += 1
+            return self._memo[state]
+        self.misses += 1
+        result = None
+        for strategy in (self._best_fit_decreasing, self._first_fit, self._search):
+            result = strategy(state)
+            if result is not None:
+                break
+        self._memo[state] = result
+        return result
+
+    @staticmethod
+    def _fits(rem: List[int], need: Vector) -> bool:
+        for have, want in zip(rem, need):
+            if have < want:
+                return False
+        return True
+
+    @staticmethod
+    def _take(rem: List[int], need: Vector, sign: int = 1):
+        for d, want in enumerate(need):
+            rem[d] -= sign * want
+
+    def _slack(self, rem: List[int], need: Vector, host: int) -> float:
+        cap = self.capacity[host]
+        return sum((have - want) / c for have, want, c in zip(rem, need, cap) if c > 0)
+
+    def _best_fit_decreasing(self, state) -> Optional[Dict[int, int]]:
+        remaining = [list(v) for v in state]
+        placement = {}
+        for i in self.order:
+            need = self.requests[i]
+            best, best_slack = None, None
+            for hid in self.candidates[i]:
+                h = self.host_index[hid]
+                if not self._fits(remaining[h], need):
+                    continue
+                slack = self._slack(remaining[h], need, h)
+                if best is None or slack < best_slack:
+                    best, best_slack = h, slack
+            if best is None:
+                return None
+            self._take(remaining[best], need)
+            placement[i] = self.hosts[best]
+        return placement
+
+    def _first_fit(self, state) -> Optional[Dict[int, int]]:
+        remaining = [list(v) for v in state]
+        placement = {}
+        for i, need in enumerate(self.requests):
+            for hid in self.candidates[i]:
+                h = self.host_index[hid]
+                if self._fits(remaining[h], need):
+                    self._take(remaining[h], need)
+                    placement[i] = hid
+                    break
+            else:
+                return None
+        return placement
+
+    def _search(self, state) -> Optional[Dict[int, int]]:
+        remaining = [list(v) for v in state]
+        placement = {}
+        budget = [self.MAX_SEARCH_NODES]
+
+        def place(pos: int) -> bool:
+            if pos == len(self.order):
+                return True
+            budget[0] -= 1
+            if budget[0] < 0:
+                return False
+            i = self.order[pos]
+            need = self.requests[i]
+            tried = set()
+            for hid in self.candidates[i]:
+                h = self.host_index[hid]
+                rem = remaining[h]
+                # Hosts in identical states that serve the same requests are interchangeable
+                signature = (tuple(rem), self.capacity[h], self.profile[h])
+                if signature in tried or not self._fits(rem, need):
+                    continue
+                tried.add(signature)
+                self._take(rem, need)
+                placement[i] = hid
+                if place(pos + 1):
+                    return True
+                self._take(rem, need, sign=-1)
+                del placement[i]
+            return False
+
+        return dict(placement) if place(0) else None
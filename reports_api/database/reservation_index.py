@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from reports_api.database import Slivers, Components, Interfaces, Sites
+
+ACTIVE_STATES = [1, 2, 4, 5]
+CROSS_SITE_TYPES = ['l2ptp', 'l2sts']
+
+ComputeReservation = namedtuple("ComputeReservation", ["id", "host_id", "core", "ram", "disk",
+                                                       "lease_start", "lease_end"])
+NetworkReservation = namedtuple("NetworkReservation", ["id", "bandwidth", "lease_start", "lease_end"])
+PortReservation = namedtuple("PortReservation", ["fp_name", "site_name", "vlan", "lease_start", "lease_end"])
+
+
+class IntervalList:
+    """
+    Intervals sorted by start. An interval [s, e) overlaps [start, end) only if
+    start - max_span < s < end, so a query bisects to that slice and filters it.
+    """
+
+    def __init__(self):
+        self.entries = []  # (lease_start, key, lease_end, item)
+        self.max_span = timedelta(0)
+
+    def add(self, key, lease_start: datetime, lease_end: datetime, item):
+        insort(self.entries, (lease_start, key, lease_end, item), key=lambda x: (x[0], x[1]))
+        self.max_span = max(self.max_span, lease_end - lease_start)
+
+    def remove(self, key, lease_start: datetime):
+        i = bisect_left(self.entries, (lease_start, key), key=lambda x: (x[0], x[1]))
+        while i < len(self.entries) and self.entries[i][0] == lease_start and self.entries[i][1] == key:
+            del self.entries[i]
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        lo = bisect_left(self.entries, start - self.max_span, key=lambda x: x[0])
+        hi = bisect_left(self.entries, end, key=lambda x: x[0])
+        return [item for lease_start, _, lease_end, item in self.entries[lo:hi]
+                if lease_start < end and lease_end > start]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _Snapshot:
+    """Everything the index holds, built off to the side and swapped in whole on reload."""
+
+    def __init__(self):
+        self.compute = defaultdict(IntervalList)   # host_id -> ComputeReservation
+        self.network = IntervalList()              # NetworkReservation
+        self.ports = defaultdict(IntervalList)     # fp_name -> PortReservation
+        self.components = {}                       # sliver_id -> [(component key, guid)]
+        self.interfaces = {}                       # sliver_id -> [site name]
+        self.by_sliver = defaultdict(list)         # sliver_id -> [(IntervalList, key, lease_start)]
+
+    def add(self, sliver, components: list, iface_rows: list):
+        ls, le = sliver.lease_start, sliver.lease_end
+        if sliver.host_id:
+            target = self.compute[sliver.host_id]
+            target.add(sliver.id, ls, le, ComputeReservation(sliver.id, sliver.host_id, sliver.core, sliver.ram,
+                                                             sliver.disk, ls, le))
+            self.by_sliver[sliver.id].append((target, sliver.id, ls))
+            if components:
+                self.components[sliver.id] = components
+        if sliver.sliver_type in CROSS_SITE_TYPES:
+            self.network.add(sliver.id, ls, le, NetworkReservation(sliver.id, sliver.bandwidth, ls, le))
+            self.by_sliver[sliver.id].append((self.network, sliver.id, ls))
+            self.interfaces[sliver.id] = [row.site_name for row in iface_rows]
+        for n, row in enumerate(iface_rows):
+            if row.name:
+                target = self.ports[row.name]
+                key = (sliver.id, n)
+                target.add(key, ls, le, PortReservation(row.name, row.site_name, row.vlan, ls, le))
+                self.by_sliver[sliver.id].append((target, key, ls))
+
+    def remove(self, sliver_id: int):
+        for target, key, lease_start in self.by_sliver.pop(sliver_id, []):
+            target.remove(key, lease_start)
+        self.components.pop(sliver_id, None)
+        self.interfaces.pop(sliver_id, None)
+
+
+class ReservationIndex:
+    """
+    Long-lived, per-process index of active and future slivers, keyed by host,
+    site pair (network slivers) and facility port name, for calendar and find-slot.
+
+    Loaded with every active sliver whose lease ends after now - history_days, reloaded
+    in full once it is older than max_age_seconds, and patched between reloads for the
+    slivers the write path marks dirty. Queries starting before the loaded history, or
+    made while the index is stale, fall back to the database.
+    """
+    _instance = None
+
+    def __init__(self, max_age_seconds: int = 300, history_days: int = 7):
+        self.max_age_seconds = max_age_seconds
+        self.history_days = history_days
+        self.loaded_at = None
+        self.covered_from = None
+        self._snapshot = _Snapshot()
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> Optional["ReservationIndex"]:
+        """The process-wide index, or None when it has not been configured."""
+        return cls._instance
+
+    @classmethod
+    def configure(cls, max_age_seconds: int = 300, history_days: int = 7) -> "ReservationIndex":
+        cls._instance = cls(max_age_seconds=max_age_seconds, history_days=history_days)
+        return cls._instance
+
+    # -------------------- LOADING --------------------
+    @staticmethod
+    def _load(session, covered_from: datetime, sliver_ids: List[int] = None) -> Dict[int, tuple]:
+        criteria = [Slivers.state.in_(ACTIVE_STATES), Slivers.lease_start.isnot(None), Slivers.lease_end.isnot(None)]
+        if sliver_ids is not None:
+            criteria.append(Slivers.id.in_(sliver_ids))
+        else:
+            criteria.append(Slivers.lease_end > covered_from)
+        slivers = session.query(
+            Slivers.id, Slivers.host_id, Slivers.sliver_type, Slivers.core, Slivers.ram, Slivers.disk,
+            Slivers.bandwidth, Slivers.lease_start, Slivers.lease_end
+        ).filter(*criteria).all()
+        if not slivers:
+            return {}
+        ids = [s.id for s in slivers]
+
+        components = defaultdict(list)
+        for cr in session.query(Components.sliver_id, Components.type, Components.model,
+                                Components.component_guid).filter(Components.sliver_id.in_(ids)).all():
+            key = f"{cr.type}-{cr.model}" if cr.model else cr.type
+            components[cr.sliver_id].append((key, cr.component_guid))
+
+        interfaces = defaultdict(list)
+        for row in session.query(Interfaces.sliver_id, Interfaces.name, Interfaces.vlan,
+                                 Sites.name.label("site_name")
+                                 ).join(Sites, Interfaces.site_id == Sites.id
+                                        ).filter(Interfaces.sliver_id.in_(ids), Interfaces.site_id.isnot(None)).all():
+            interfaces[row.sliver_id].append(row)
+
+        return {s.id: (s, components.get(s.id, []), interfaces.get(s.id, [])) for s in slivers}
+
+    def reload(self, session):
+        """Rebuild the whole index from the database and swap it in."""
+        now = datetime.now(timezone.utc)
+        covered_from = now - timedelta(days=self.history_days)
+        with self._lock:
+            self._dirty.clear()
+        snapshot = _Snapshot()
+        for sliver, components, iface_rows in self._load(session, covered_from).values():
+            snapshot.add(sliver, components, iface_rows)
+        with self._lock:
+            self._snapshot = snapshot
+            self.covered_from = covered_from
+            self.loaded_at = time.monotonic()
+
+    def mark_dirty(self, sliver_id: int):
+        """Called from the sliver write path: re-read this sliver before the next query."""
+        with self._lock:
+            self._dirty.add(sliver_id)
+
+    def invalidate(self):
+        """Force a full reload before the next query, e.g. after a cascading delete."""
+        with self._lock:
+            self.loaded_at = None
+
+    def is_fresh(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at <= self.max_age_seconds
+
+    def ensure_fresh(self, session):
+        """Reload when stale (one thread at a time), otherwise apply pending write-path updates."""
+        if not self.is_fresh():
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    self.reload(session)
+                finally:
+                    self._reload_lock.release()
+            return
+        with self._lock:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+        if not dirty:
+            return
+        loaded = self._load(session, self.covered_from, sliver_ids=dirty)
+        with self._lock:
+            for sliver_id in dirty:
+                self._snapshot.remove(sliver_id)
+                if sliver_id in loaded:
+                    self._snapshot.add(*loaded[sliver_id])
+
+    def covers(self, start_time: datetime) -> bool:
+        return self.is_fresh() and start_time >= self.covered_from
+
+    # -------------------- QUERIES --------------------
+    def compute_slivers(self, host_ids: list, start_time: datetime, end_time: datetime):
+        """Same shape as DatabaseManager._query_compute_slivers."""
+        with self._lock:
+            snapshot = self._snapshot
+            slivers_in_range = []
+            for host_id in host_ids:
+                if host_id in snapshot.compute:
+                    slivers_in_range.extend(snapshot.compute[host_id].overlapping(start_time, end_time))
+            comp_by_sliver = {s.id: snapshot.components[s.id] for s in slivers_in_range
+                              if s.id in snapshot.components}
+        return slivers_in_range, comp_by_sliver
+
+    def network_slivers(self, link_cap_map: dict, start_time: datetime, end_time: datetime):
+        """Same shape as DatabaseManager._query_network_slivers."""
+        if not link_cap_map:
+            return [], {}
+        with self._lock:
+            snapshot = self._snapshot
+            net_slivers_in_range = snapshot.network.overlapping(start_time, end_time)
+            net_sliver_interfaces = {s.id: snapshot.interfaces.get(s.id, []) for s in net_slivers_in_range}
+        return net_slivers_in_range, net_sliver_interfaces
+
+    def fp_slivers(self, fp_cap_map: dict, start_time: datetime, end_time: datetime):
+        """Same shape as DatabaseManager._query_fp_slivers."""
+        if not fp_cap_map:
+            return []
+        fp_names = set(k[0] for k in fp_cap_map.keys())
+        with self._lock:
+            snapshot = self._snapshot
+            result = []
+            for name in fp_names:
+                if name in snapshot.ports:
+                    result.extend(snapshot.ports[name].overlapping(start_time, end_time))
+        return result
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+COPY-based bulk load.
+
+Rows are streamed with COPY into UNLOGGED staging tables, then merged into the real tables
+by one INSERT ... SELECT ... ON CONFLICT statement per table. Surrogate ids are resolved by
+joining on the natural keys, so nothing round-trips through Python. Field semantics match
+the add_or_update_* upserts: empty values never overwrite stored ones, and rows that would
+not change are not rewritten.
+"""
+import io
+import json
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+STAGING_TABLES = {
+    "staging_slices": [("seq", "BIGINT"), ("slice_guid", "TEXT"), ("slice_name", "TEXT"),
+                       ("project_uuid", "TEXT"), ("project_name", "TEXT"), ("user_uuid", "TEXT"),
+                       ("user_email", "TEXT"), ("state", "INTEGER"), ("lease_start", "TIMESTAMPTZ"),
+                       ("lease_end", "TIMESTAMPTZ")],
+    "staging_slivers": [("seq", "BIGINT"), ("slice_guid", "TEXT"), ("sliver_guid", "TEXT"),
+                        ("project_uuid", "TEXT"), ("project_name", "TEXT"), ("user_uuid", "TEXT"),
+                        ("user_email", "TEXT"), ("site", "TEXT"), ("host", "TEXT"), ("state", "INTEGER"),
+                        ("sliver_type", "TEXT"), ("node_id", "TEXT"), ("ip_subnet", "TEXT"), ("ip_v4", "TEXT"),
+                        ("ip_v6", "TEXT"), ("image", "TEXT"), ("core", "INTEGER"), ("ram", "INTEGER"),
+                        ("disk", "INTEGER"), ("bandwidth", "INTEGER"), ("lease_start", "TIMESTAMPTZ"),
+                        ("lease_end", "TIMESTAMPTZ"), ("closed_at", "TIMESTAMPTZ"), ("error", "TEXT")],
+    "staging_components": [("seq", "BIGINT"), ("sliver_guid", "TEXT"), ("component_guid", "TEXT"),
+                           ("type", "TEXT"), ("model", "TEXT"), ("bdfs", "JSON"), ("node_id", "TEXT"),
+                           ("component_node_id", "TEXT")],
+    "staging_interfaces": [("seq", "BIGINT"), ("sliver_guid", "TEXT"), ("interface_guid", "TEXT"),
+                           ("vlan", "TEXT"), ("bdf", "TEXT"), ("local_name", "TEXT"), ("device_name", "TEXT"),
+                           ("name", "TEXT")],
+    "staging_memberships": [("seq", "BIGINT"), ("user_uuid", "TEXT"), ("project_uuid", "TEXT"),
+                            ("membership_type", "TEXT"), ("start_time", "TIMESTAMPTZ"), ("end_time", "TIMESTAMPTZ"),
+                            ("active", "BOOLEAN")],
+}
+
+SLICE_COLUMNS = ("project_id", "user_id", "slice_name", "state", "lease_start", "lease_end")
+SLIVER_COLUMNS = ("project_id", "slice_id", "user_id", "host_id", "site_id", "state", "sliver_type", "node_id",
+                  "ip_subnet", "ip_v4", "ip_v6", "image", "core", "ram", "disk", "bandwidth", "lease_start",
+                  "lease_end", "closed_at", "error")
+COMPONENT_COLUMNS = ("type", "model", "bdfs", "node_id", "component_node_id")
+INTERFACE_COLUMNS = ("site_id", "vlan", "bdf", "local_name", "device_name", "name")
+
+
+JSON_COLUMNS = ("bdfs",)
+
+
+def _value(table: str, column: str, keep: Iterable[str]) -> str:
+    return f"COALESCE(EXCLUDED.{column}, {table}.{column})" if column in keep else f"EXCLUDED.{column}"
+
+
+def _assignments(table: str, columns: Iterable[str], keep: Iterable[str], touch: Iterable[str]) -> str:
+    """
+    SET list and WHERE of an ON CONFLICT DO UPDATE. Columns in `keep` are only overwritten by
+    non-NULL values, and rows that would not change, ignoring the `touch` bookkeeping columns,
+    are not updated at all.
+    """
+    keep = set(keep)
+    changed = []
+    for c in columns:
+        if c in touch:
+            continue
+        if c in JSON_COLUMNS:
+            changed.append(f"{table}.{c}::jsonb IS DISTINCT FROM ({_value(table, c, keep)})::jsonb")
+        else:
+            changed.append(f"{table}.{c} IS DISTINCT FROM {_value(table, c, keep)}")
+    return (", ".join(f"{c} = {_value(table, c, keep)}" for c in columns) +
+            f"\n            WHERE {' OR '.join(changed)}")
+
+
+def merge_statements(slice_keep: Iterable[str], sliver_keep: Iterable[str], component_keep: Iterable[str],
+                     interface_keep: Iterable[str], touch: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    (name, SQL) of the merge steps, in dependency order. Where the staging tables hold several
+    rows for one key, the last one staged wins; for project names and user emails the last
+    non-NULL one does. Slivers, components and interfaces return the ids of the slivers they
+    changed.
+    """
+    sliver_optional = [c for c in SLIVER_COLUMNS if c not in ("project_id", "slice_id", "user_id", "host_id",
+                                                              "site_id", "state", "sliver_type")]
+    return [
+        ("projects", f"""
+            INSERT INTO projects (id, project_uuid, project_name, created_date, last_updated)
+            SELECT nextval('"projects.id"'), project_uuid, project_name, now(), now()
+            FROM (SELECT DISTINCT ON (project_uuid) project_uuid, project_name
+                  FROM (SELECT seq, project_uuid, project_name FROM staging_slices
+                        UNION ALL SELECT seq, project_uuid, project_name FROM staging_slivers) AS staged
+                  WHERE project_uuid IS NOT NULL
+                  ORDER BY project_uuid, project_name IS NULL, seq DESC) AS p
+            ON CONFLICT (project_uuid) DO UPDATE SET
+                {_assignments("projects", ["project_name", "last_updated"], ["project_name"], touch)}"""),
+        # user_email is NOT NULL: users staged without one must already exist
+        ("users", f"""
+            INSERT INTO users (id, user_uuid, user_email, registered_on, last_updated)
+            SELECT nextval('"users.id"'), user_uuid, user_email, now(), now()
+            FROM (SELECT DISTINCT ON (user_uuid) user_uuid, user_email
+                  FROM (SELECT seq, user_uuid, user_email FROM staging_slices
+                        UNION ALL SELECT seq, user_uuid, user_email FROM staging_slivers) AS staged
+                  WHERE user_uuid IS NOT NULL
+                  ORDER BY user_uuid, user_email IS NULL, seq DESC) AS u
+            WHERE user_email IS NOT NULL
+            ON CONFLICT (user_uuid) DO UPDATE SET
+                {_assignments("users", ["user_email", "last_updated"], ["user_email"], touch)}"""),
+        ("sites", """
+            INSERT INTO sites (id, name)
+            SELECT nextval('"sites.id"'), site
+            FROM (SELECT DISTINCT site FROM staging_slivers WHERE site IS NOT NULL) AS s
+            WHERE NOT EXISTS (SELECT 1 FROM sites WHERE sites.name = s.site)
+            ON CONFLICT (name) DO NOTHING"""),
+        ("hosts", """
+            INSERT INTO hosts (id, name, site_id)
+            SELECT nextval('"hosts.id"'), h.host, sites.id
+            FROM (SELECT DISTINCT ON (host) host, site FROM staging_slivers WHERE host IS NOT NULL
+                  ORDER BY host, site IS NULL, seq DESC) AS h
+            LEFT JOIN sites ON sites.name = h.site
+            WHERE NOT EXISTS (SELECT 1 FROM hosts WHERE hosts.name = h.host)
+            ON CONFLICT (name) DO NOTHING"""),
+        ("slices", f"""
+            INSERT INTO slices (id, slice_guid, {", ".join(SLICE_COLUMNS)})
+            SELECT nextval('"slices.id"'), st.slice_guid, projects.id, users.id, st.slice_name, st.state,
+                   st.lease_start, st.lease_end
+            FROM (SELECT DISTINCT ON (slice_guid) * FROM staging_slices ORDER BY slice_guid, seq DESC) AS st
+            LEFT JOIN projects ON projects.project_uuid = st.project_uuid
+            LEFT JOIN users ON users.user_uuid = st.user_uuid
+            ON CONFLICT (slice_guid) DO UPDATE SET {_assignments("slices", SLICE_COLUMNS, slice_keep, touch)}"""),
+        # xmax is 0 only for a freshly inserted row version
+        ("slivers", f"""
+            INSERT INTO slivers (id, sliver_guid, {", ".join(SLIVER_COLUMNS)})
+            SELECT nextval('"slivers.id"'), sv.sliver_guid, projects.id, slices.id, users.id, hosts.id, sites.id,
+                   sv.state, lower(sv.sliver_type), {", ".join(f"sv.{c}" for c in sliver_optional)}
+            FROM (SELECT DISTINCT ON (sliver_guid) * FROM staging_slivers ORDER BY sliver_guid, seq DESC) AS sv
+            JOIN slices ON slices.slice_guid = sv.slice_guid
+            LEFT JOIN projects ON projects.project_uuid = sv.project_uuid
+            LEFT JOIN users ON users.user_uuid = sv.user_uuid
+            LEFT JOIN hosts ON hosts.name = sv.host
+            LEFT JOIN sites ON sites.name = sv.site
+            ON CONFLICT (sliver_guid) DO UPDATE SET {_assignments("slivers", SLIVER_COLUMNS, sliver_keep, touch)}
+            RETURNING slivers.id, xmax = 0"""),
+        ("components", f"""
+            INSERT INTO components (sliver_id, component_guid, {", ".join(COMPONENT_COLUMNS)})
+            SELECT * FROM (
+                SELECT DISTINCT ON (slivers.id, c.component_guid) slivers.id, c.component_guid, lower(c.type),
+                       lower(c.model), c.bdfs, c.node_id, c.component_node_id
+                FROM staging_components AS c JOIN slivers ON slivers.sliver_guid = c.sliver_guid
+                ORDER BY slivers.id, c.component_guid, c.seq DESC) AS c
+            ON CONFLICT (sliver_id, component_guid) DO UPDATE SET
+                {_assignments("components", COMPONENT_COLUMNS, component_keep, touch)}
+            RETURNING components.sliver_id"""),
+        ("interfaces", f"""
+            INSERT INTO interfaces (sliver_id, interface_guid, {", ".join(INTERFACE_COLUMNS)})
+            SELECT * FROM (
+                SELECT DISTINCT ON (slivers.id, i.interface_guid) slivers.id, i.interface_guid, slivers.site_id,
+                       i.vlan, i.bdf, i.local_name, i.device_name, i.name
+                FROM staging_interfaces AS i JOIN slivers ON slivers.sliver_guid = i.sliver_guid
+                ORDER BY slivers.id, i.interface_guid, i.seq DESC) AS i
+            ON CONFLICT (sliver_id, interface_guid) DO UPDATE SET
+                {_assignments("interfaces", INTERFACE_COLUMNS, interface_keep, touch)}
+            RETURNING interfaces.sliver_id"""),
+        # Memberships only reference users and projects that are already stored
+        ("memberships", f"""
+            INSERT INTO membership (user_id, project_id, membership_type, start_time, end_time, active)
+            SELECT * FROM (
+                SELECT DISTINCT ON (users.id, projects.id, m.membership_type, m.start_time)
+                       users.id, projects.id, m.membership_type, m.start_time, m.end_time, COALESCE(m.active, TRUE)
+                FROM staging_memberships AS m
+                JOIN users ON users.user_uuid = m.user_uuid
+                JOIN projects ON projects.project_uuid = m.project_uuid
+                ORDER BY users.id, projects.id, m.membership_type, m.start_time, m.seq DESC) AS m
+            ON CONFLICT (user_id, project_id, membership_type, start_time) DO UPDATE SET
+                {_assignments("membership", ["end_time", "active"], [], touch)}"""),
+    ]
+
+
+# Staged slices that are already stored, and everything staged under them
+PRUNE_EXISTING = [
+    "DELETE FROM staging_slices AS st USING slices WHERE slices.slice_guid = st.slice_guid",
+    "DELETE FROM staging_slivers AS sv USING slices WHERE slices.slice_guid = sv.slice_guid",
+    "DELETE FROM staging_components AS c "
+    "WHERE NOT EXISTS (SELECT 1 FROM staging_slivers AS sv WHERE sv.sliver_guid = c.sliver_guid)",
+    "DELETE FROM staging_interfaces AS i "
+    "WHERE NOT EXISTS (SELECT 1 FROM staging_slivers AS sv WHERE sv.sliver_guid = i.sliver_guid)",
+]
+
+
+def copy_value(value) -> str:
+    """One field in COPY's CSV format: NULL is an unquoted empty field, text is always quoted."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_buffer(rows: Iterable[tuple]) -> io.StringIO:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(copy_value(v) for v in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def staging_rows(slices: Iterable[dict] = (), memberships: Iterable[dict] = ()) -> dict:
+    """
+    Staging table -> rows in column order, numbered in the order given so that the last
+    value staged for a key wins the merge.
+
+    :param slices: slices as taken by DatabaseManager.import_slices()
+    :param memberships: dicts with user_uuid, project_uuid, membership_type, start_time, end_time, active
+    """
+    rows = {name: [] for name in STAGING_TABLES}
+    seq = 0
+    for s in slices:
+        seq += 1
+        rows["staging_slices"].append(
+            (seq, s["slice_guid"], s.get("slice_name") or None, s.get("project_uuid") or None,
+             s.get("project_name") or None, s.get("user_uuid") or None, s.get("user_email") or None, s.get("state"),
+             s.get("lease_start") or None, s.get("lease_end") or None))
+        for sv in s.get("slivers") or []:
+            seq += 1
+            rows["staging_slivers"].append(
+                (seq, s["slice_guid"], sv["sliver_guid"], sv.get("project_uuid") or None,
+                 sv.get("project_name") or None, sv.get("user_uuid") or None, sv.get("user_email") or None,
+                 sv.get("site") or None, sv.get("host") or None, sv["state"], sv["sliver_type"],
+                 *(sv.get(c) or None for c in ("node_id", "ip_subnet", "ip_v4", "ip_v6", "image", "core", "ram",
+                                               "disk", "bandwidth", "lease_start", "lease_end", "closed_at",
+                                               "error"))))
+            for c in sv.get("components") or []:
+                seq += 1
+                rows["staging_components"].append(
+                    (seq, sv["sliver_guid"], c["component_guid"], c.get("component_type") or None,
+                     c.get("model") or None, c.get("bdfs") or None, c.get("node_id") or None,
+                     c.get("component_node_id") or None))
+            for i in sv.get("interfaces") or []:
+                seq += 1
+                rows["staging_interfaces"].append(
+                    (seq, sv["sliver_guid"], i["interface_guid"], i.get("vlan") or None, i.get("bdf") or None,
+                     i.get("local_name") or None, i.get("device_name") or None, i.get("name") or None))
+    for m in memberships:
+        seq += 1
+        rows["staging_memberships"].append(
+            (seq, m["user_uuid"], m["project_uuid"], m.get("membership_type"), m.get("start_time"),
+             m.get("end_time"), m.get("active", True)))
+    return rows
+
+
+class StagingLoader:
+    """
+    Stages rows with COPY and merges them, in the caller's transaction; the caller commits.
+
+    The staging tables are truncated at the start and end of every load. TRUNCATE holds an
+    ACCESS EXCLUSIVE lock until commit, so concurrent loads run one after the other.
+    """
+
+    def __init__(self, session, slice_keep: Iterable[str], sliver_keep: Iterable[str],
+                 component_keep: Iterable[str], interface_keep: Iterable[str], touch: Iterable[str]):
+        self.session = session
+        self.statements = merge_statements(slice_keep, sliver_keep, component_keep, interface_keep, touch)
+
+    def _cursor(self):
+        return self.session.connection().connection.cursor()
+
+    @staticmethod
+    def create_tables(cursor):
+        for name, columns in STAGING_TABLES.items():
+            cursor.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {name} "
+                           f"({', '.join(f'{c} {t}' for c, t in columns)})")
+
+    def load(self, slices: Iterable[dict] = (), memberships: Iterable[dict] = (), skip_existing: bool = True) -> dict:
+        """
+        :return: counts of rows staged, pruned with the skipped slices and written (inserted or
+            changed) per table, and of slices skipped; "sliver_ids" lists the slivers that changed
+            or whose components or interfaces did, and "created" how many slivers are new
+        """
+        rows = staging_rows(slices, memberships)
+        cursor = self._cursor()
+        try:
+            self.create_tables(cursor)
+            cursor.execute(f"TRUNCATE {', '.join(STAGING_TABLES)}")
+            for name, table_rows in rows.items():
+                if table_rows:
+                    columns = ", ".join(c for c, _ in STAGING_TABLES[name])
+                    cursor.copy_expert(f"COPY {name} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                                       copy_buffer(table_rows))
+
+            result = {"staged": sum(len(r) for r in rows.values()), "skipped": 0, "pruned": 0}
+            if skip_existing and rows["staging_slices"]:
+                for i, statement in enumerate(PRUNE_EXISTING):
+                    cursor.execute(statement)
+                    if i == 0:
+                        result["skipped"] = cursor.rowcount
+                    result["pruned"] += cursor.rowcount
+
+            changed = set()
+            for name, statement in self.statements:
+                cursor.execute(statement)
+                if name == "slivers":
+                    written = cursor.fetchall()
+                    changed.update(row[0] for row in written)
+                    result["created"] = sum(1 for row in written if row[1])
+                    result[name] = len(written)
+                elif name in ("components", "interfaces"):
+                    written = cursor.fetchall()
+                    changed.update(row[0] for row in written)
+                    result[name] = len(written)
+                else:
+                    result[name] = cursor.rowcount
+            result["sliver_ids"] = sorted(changed)
+            cursor.execute(f"TRUNCATE {', '.join(STAGING_TABLES)}")
+            return result
+        finally:
+            cursor.close()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Lease / membership overlap filters written against the generated tstzrange columns,
+so PostgreSQL can answer them from the GiST indexes.
+
+The range columns are NULL for rows with a missing or inverted interval. Those rows
+are matched with the plain column comparison instead, which keeps every filter
+returning exactly what the equivalent comparison on the timestamp columns returns.
+"""
+from datetime import datetime
+from typing import Union
+
+from sqlalchemy import and_, or_, func
+
+from reports_api.database import Membership, Slices, Slivers
+
+
+def lease_overlaps(table: Union[Slices, Slivers], start: datetime, end: datetime):
+    """lease_start < end AND lease_end > start"""
+    if not start < end:
+        # (start, end) would be an empty or invalid range
+        return and_(table.lease_start < end, table.lease_end > start)
+    return or_(
+        table.lease_range.overlaps(func.tstzrange(start, end, '()')),
+        and_(table.lease_range.is_(None), table.lease_start < end, table.lease_end > start)
+    )
+
+
+def lease_overlaps_closed(table: Union[Slices, Slivers], start: datetime, end: datetime):
+    """
+    The lease ends within [start, end], starts within [start, end], or spans it.
+    For a well-formed lease that is lease_start <= end AND lease_end >= start.
+    """
+    comparison = or_(
+        and_(start <= table.lease_end, table.lease_end <= end),
+        and_(start <= table.lease_start, table.lease_start <= end),
+        and_(table.lease_start <= start, table.lease_end >= end)
+    )
+    if start > end:
+        return comparison
+    return or_(
+        table.lease_range.overlaps(func.tstzrange(start, end, '[]')),
+        and_(table.lease_range.is_(None), comparison)
+    )
+
+
+def membership_overlaps(start: datetime, end: datetime):
+    """start_time <= end AND (end_time >= start OR end_time IS NULL)"""
+    if start > end:
+        return and_(Membership.start_time <= end,
+                    or_(Membership.end_time >= start, Membership.end_time.is_(None)))
+    return or_(
+        Membership.time_range.overlaps(func.tstzrange(start, end, '[]')),
+        and_(Membership.time_range.is_(None), Membership.start_time <= end, Membership.end_time >= start)
+    )
@@ -5,7 +5,7 @@ from reports_api.response_code.cors_response import cors_400
 
 
 def calendar_get(start_time, end_time, interval=None, site=None, host=None,
-                 exclude_site=None, exclude_host=None):  # noqa: E501
+                 exclude_site=None, exclude_host=None, engine=None, format_=None, level=None):  # noqa: E501
     """Get resource availability calendar
 
     Retrieve resource availability calendar showing capacity and allocation over time slots. # noqa: E501
@@ -24,11 +24,18 @@ def calendar_get(start_time, end_time, interval=None, site=None, host=None,
     :type exclude_site: List[str]
     :param exclude_host: Exclude hosts
     :type exclude_host: List[str]
+    :param engine: Aggregation engine (default from server configuration)
+    :type engine: str
+    :param format_: Response format: full, compact or changes (default: full)
+    :type format_: str
+    :param level: Aggregation level: host or site (default: host)
+    :type level: str
 
     :rtype: dict
     """
     return rc.calendar_get(start_time=start_time, end_time=end_time, interval=interval,
-                           site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host)
+                           site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host,
+                           engine=engine, fmt=format_, level=level)
 
 
 def calendar_find_slot(body):  # noqa: E501
@@ -46,6 +53,77 @@ def calendar_find_slot(body):  # noqa: E501
     return rc.calendar_find_slot(body=body)
 
 
+def calendar_find_slot_batch(body):  # noqa: E501
+    """Find available time slots for several resource requests
+
+    Evaluate a list of find-slot requests against one capacity and occupancy snapshot. # noqa: E501
+
+    :param body: Batch payload
+    :type body: dict
+
+    :rtype: dict
+    """
+    if connexion.request.is_json:
+        body = connexion.request.get_json()
+    return rc.calendar_find_slot_batch(body=body)
+
+
+def calendar_jobs_post(body):  # noqa: E501
+    """Submit a calendar job
+
+    Compute a calendar in the background; poll /calendar/jobs/{job_id} for the result. # noqa: E501
+
+    :param body: Calendar job payload
+    :type body: dict
+
+    :rtype: dict
+    """
+    if connexion.request.is_json:
+        body = connexion.request.get_json()
+    return rc.calendar_jobs_post(body=body)
+
+
+def calendar_find_slot_jobs_post(body):  # noqa: E501
+    """Submit a find-slot job
+
+    Search for available time windows in the background; poll /calendar/jobs/{job_id} for the result. # noqa: E501
+
+    :param body: Resource request payload
+    :type body: dict
+
+    :rtype: dict
+    """
+    if connexion.request.is_json:
+        body = connexion.request.get_json()
+    return rc.calendar_find_slot_jobs_post(body=body)
+
+
+def calendar_jobs_job_id_get(job_id):  # noqa: E501
+    """Get a calendar or find-slot job
+
+    Status and progress of a job, with its result once completed. # noqa: E501
+
+    :param job_id: Job identifier
+    :type job_id: str
+
+    :rtype: dict
+    """
+    return rc.calendar_jobs_job_id_get(job_id=job_id)
+
+
+def calendar_jobs_job_id_delete(job_id):  # noqa: E501
+    """Cancel a calendar or find-slot job
+
+    Cancel a queued or running job, or discard the result of a finished one. # noqa: E501
+
+    :param job_id: Job identifier
+    :type job_id: str
+
+    :rtype: dict
+    """
+    return rc.calendar_jobs_job_id_delete(job_id=job_id)
+
+
 def hosts_host_name_capacity_post(host_name, body):  # noqa: E501
     """Create/Update host capacity
 
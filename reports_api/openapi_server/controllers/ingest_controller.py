@@ -0,0 +1,12 @@
+from reports_api.response_code import ingest_controller as rc
+
+
+def ingest_queue_get():  # noqa: E501
+    """Ingest queue metrics
+
+    Depth of the write-behind ingest queue, parked entries and the age of the oldest pending entry. # noqa: E501
+
+
+    :rtype: dict
+    """
+    return rc.ingest_queue_get()
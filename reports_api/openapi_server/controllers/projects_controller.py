@@ -1,3 +1,5 @@
+import connexion
+
 from reports_api.response_code import projects_controller as rc
 
 
@@ -136,3 +138,18 @@ def projects_uuid_get(uuid):  # noqa: E501
     :rtype: Union[Projects, Tuple[Projects, int], Tuple[Projects, int, Dict[str, str]]
     """
     return rc.projects_get(uuid)
+
+
+def projects_bulk_post(body):  # noqa: E501
+    """Create/Update projects in bulk
+
+    Create/Update up to 10000 projects, one multi-row statement per batch. # noqa: E501
+
+    :param body: Projects to create/modify, keyed by project_uuid
+    :type body: list | bytes
+
+    :rtype: dict
+    """
+    if connexion.request.is_json:
+        body = connexion.request.get_json()
+    return rc.projects_bulk_post(body=body)
@@ -106,4 +106,21 @@ def slivers_slice_id_sliver_id_post(slice_id, sliver_id, body):  # noqa: E501
         if sliver_id != body.sliver_id:
             return cors_400(details="sliver_id in uri doesn't match sliver_id in body")
 
-    return rc.slivers_slice_id_sliver_id_post(body=body, slice_id=slice_id, sliver_id=sliver_id)
\ No newline at end of file
+    return rc.slivers_slice_id_sliver_id_post(body=body, slice_id=slice_id, sliver_id=sliver_id)
+
+
+def slices_slice_id_slivers_post(slice_id, body):  # noqa: E501
+    """Create/Update the slivers of a slice
+
+    Create/Update several slivers of one slice in one transaction. # noqa: E501
+
+    :param slice_id:
+    :type slice_id: str
+    :param body: Slivers to create/modify
+    :type body: list | bytes
+
+    :rtype: Union[SliverBatchResponse, Tuple[SliverBatchResponse, int], Tuple[SliverBatchResponse, int, Dict[str, str]]
+    """
+    if connexion.request.is_json:
+        body = [Sliver.from_dict(d) for d in connexion.request.get_json()]  # noqa: E501
+    return rc.slices_slice_id_slivers_post(body=body, slice_id=slice_id)
@@ -1,3 +1,5 @@
+import connexion
+
 from reports_api.response_code import users_controller as rc
 
 
@@ -140,3 +142,18 @@ def users_uuid_get(uuid):  # noqa: E501
     :rtype: Union[Users, Tuple[Users, int], Tuple[Users, int, Dict[str, str]]
     """
     return rc.users_uuid_get(uuid=uuid)
+
+
+def users_bulk_post(body):  # noqa: E501
+    """Create/Update users in bulk
+
+    Create/Update up to 10000 users, one multi-row statement per batch. # noqa: E501
+
+    :param body: Users to create/modify, keyed by user_uuid
+    :type body: list | bytes
+
+    :rtype: dict
+    """
+    if connexion.request.is_json:
+        body = connexion.request.get_json()
+    return rc.users_bulk_post(body=body)
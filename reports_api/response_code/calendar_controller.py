@@ -24,18 +24,31 @@
 #
 # Author: Komal Thareja (kthare10@renci.org)
 import json
+import threading
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional, Union
 
 from flask import Response
 
 from reports_api.common.globals import GlobalsSingleton
+from reports_api.common.jobs import JobManager
+from reports_api.database.calendar_format import CALENDAR_FORMATS, CALENDAR_LEVELS
 from reports_api.database.db_manager import DatabaseManager
-from reports_api.response_code.cors_response import cors_500, cors_401, cors_400, cors_response
+from reports_api.response_code.cors_response import cors_500, cors_401, cors_400, cors_404, cors_response, \
+    cors_stream_response
 from reports_api.response_code.utils import authorize, cors_success_response
 from reports_api.security.fabric_token import FabricToken
 from reports_api.openapi_server.models import Status200OkNoContentData, Status200OkNoContent
 
+FIND_SLOT_MAX_RANGE_DAYS = 90
+FIND_SLOT_MAX_RESULTS = 50
+FIND_SLOT_BATCH_MAX_REQUESTS = 50
+NDJSON = "application/x-ndjson"
+EVENT_STREAM = "text/event-stream"
+
+_job_manager_lock = threading.Lock()
+
 
 def _get_db_manager():
     global_obj = GlobalsSingleton.get()
@@ -46,8 +59,137 @@ def _get_db_manager():
                            logger=global_obj.log)
 
 
+def _get_job_manager() -> JobManager:
+    with _job_manager_lock:
+        job_mgr = JobManager.get()
+        if job_mgr is None:
+            global_obj = GlobalsSingleton.get()
+            runtime_config = global_obj.config.runtime_config
+            job_mgr = JobManager.configure(db_config=global_obj.config.database_config,
+                                           workers=int(runtime_config.get("jobs.workers", 2)),
+                                           result_ttl_seconds=int(runtime_config.get("jobs.result_ttl_seconds", 3600)))
+        return job_mgr
+
+
+def _job_limits() -> tuple:
+    """(max range in days, max find-slot results) for jobs."""
+    runtime_config = GlobalsSingleton.get().config.runtime_config
+    return int(runtime_config.get("jobs.max_range_days", 366)), int(runtime_config.get("jobs.max_results", 1000))
+
+
+def _calendar_stream_type(req) -> Optional[str]:
+    """NDJSON or EVENT_STREAM when the client asked for one of them by name, else None."""
+    for mimetype, _ in req.accept_mimetypes:
+        if mimetype in (NDJSON, EVENT_STREAM):
+            return mimetype
+    return None
+
+
+def _encode_calendar_stream(items, mimetype: str, logger):
+    """One JSON document per line (NDJSON) or per event (SSE: header, slot..., end)."""
+    try:
+        for n, item in enumerate(items):
+            data = json.dumps(item, separators=(",", ":"), sort_keys=True)
+            if mimetype == NDJSON:
+                yield data + "\n"
+            else:
+                yield f"event: {'header' if n == 0 else 'slot'}\ndata: {data}\n\n"
+        if mimetype == EVENT_STREAM:
+            yield "event: end\ndata: {}\n\n"
+    except Exception as exc:
+        # Headers are already sent; report the failure in-band
+        details = 'Oops! something went wrong with calendar_get(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        data = json.dumps({"error": details})
+        yield data + "\n" if mimetype == NDJSON else f"event: error\ndata: {data}\n\n"
+
+
+def _calendar_params(start_time, end_time, interval, site, host, exclude_site, exclude_host, engine, fmt, level,
+                     max_range_days: int = None) -> Union[dict, str]:
+    """Keyword arguments of DatabaseManager.get_calendar(), or what is wrong with them."""
+    if not start_time or not end_time:
+        return "start_time and end_time are required"
+
+    # URL decoding turns '+' into ' ' in timezone offsets like +00:00
+    start = datetime.fromisoformat(start_time.replace(' ', '+'))
+    end = datetime.fromisoformat(end_time.replace(' ', '+'))
+
+    if start >= end:
+        return "start_time must be before end_time"
+    if max_range_days and end - start > timedelta(days=max_range_days):
+        return f"Calendar range must not exceed {max_range_days} days"
+
+    if interval and interval not in ("hour", "day", "week"):
+        return "interval must be 'hour', 'day', or 'week'"
+
+    engine = engine or GlobalsSingleton.get().config.runtime_config.get("calendar.engine", "python")
+    if engine not in DatabaseManager.CALENDAR_ENGINES:
+        return f"engine must be one of {', '.join(DatabaseManager.CALENDAR_ENGINES)}"
+
+    if fmt and fmt not in CALENDAR_FORMATS:
+        return f"format must be one of {', '.join(CALENDAR_FORMATS)}"
+
+    if level and level not in CALENDAR_LEVELS:
+        return f"level must be one of {', '.join(CALENDAR_LEVELS)}"
+
+    return {"start_time": start, "end_time": end, "interval": interval or "day",
+            "site": site, "host": host, "exclude_site": exclude_site, "exclude_host": exclude_host,
+            "engine": engine, "fmt": fmt or "full", "level": level or "host"}
+
+
+def _find_slot_params(body: dict, max_range_days: int, max_results_limit: int) -> Union[dict, str]:
+    """Keyword arguments of DatabaseManager.find_slot(), or what is wrong with them."""
+    if not body:
+        return "Request body is required"
+
+    # Validate required fields
+    start_str = body.get("start")
+    end_str = body.get("end")
+    duration = body.get("duration")
+    resources = body.get("resources")
+    max_results = body.get("max_results", 1)
+
+    if not start_str or not end_str:
+        return "'start' and 'end' are required"
+    if not duration or not isinstance(duration, int) or duration <= 0:
+        return "'duration' must be a positive integer (hours)"
+    if not resources or not isinstance(resources, list) or len(resources) == 0:
+        return "'resources' must be a non-empty array"
+    if not isinstance(max_results, int) or max_results < 1 or max_results > max_results_limit:
+        return f"'max_results' must be an integer between 1 and {max_results_limit}"
+
+    start = datetime.fromisoformat(start_str)
+    end = datetime.fromisoformat(end_str)
+
+    if start >= end:
+        return "'start' must be before 'end'"
+
+    range_hours = (end - start).total_seconds() / 3600
+    if range_hours > max_range_days * 24:
+        return f"Search range must not exceed {max_range_days} days"
+    if duration > range_hours:
+        return "'duration' exceeds the search range"
+
+    # Validate each resource
+    valid_types = {"compute", "link", "facility_port"}
+    for i, r in enumerate(resources):
+        rtype = r.get("type")
+        if rtype not in valid_types:
+            return f"resources[{i}].type must be one of: {', '.join(valid_types)}"
+        if rtype == "link":
+            if not r.get("site_a") or not r.get("site_b") or r.get("bandwidth") is None:
+                return f"resources[{i}] (link): 'site_a', 'site_b', and 'bandwidth' are required"
+        elif rtype == "facility_port":
+            if not r.get("name") or not r.get("site") or r.get("vlans") is None:
+                return f"resources[{i}] (facility_port): 'name', 'site', and 'vlans' are required"
+
+    return {"start_time": start, "end_time": end, "duration": duration, "resources": resources,
+            "max_results": max_results}
+
+
 def calendar_get(start_time=None, end_time=None, interval=None, site=None, host=None,
-                 exclude_site=None, exclude_host=None):
+                 exclude_site=None, exclude_host=None, engine=None, fmt=None, level=None):
     logger = GlobalsSingleton.get().log
     try:
         logger.debug("Processing - calendar_get")
@@ -60,31 +202,28 @@ def calendar_get(start_time=None, end_time=None, interval=None, site=None, host=
         elif isinstance(ret_val, FabricToken):
             logger.debug("Authorized via Fabric token")
 
-        if not start_time or not end_time:
-            return cors_400(details="start_time and end_time are required")
-
-        # URL decoding turns '+' into ' ' in timezone offsets like +00:00
-        start_time = start_time.replace(' ', '+')
-        end_time = end_time.replace(' ', '+')
-
-        start = datetime.fromisoformat(start_time)
-        end = datetime.fromisoformat(end_time)
-
-        if start >= end:
-            return cors_400(details="start_time must be before end_time")
-
-        if interval and interval not in ("hour", "day", "week"):
-            return cors_400(details="interval must be 'hour', 'day', or 'week'")
+        params = _calendar_params(start_time=start_time, end_time=end_time, interval=interval,
+                                  site=site, host=host, exclude_site=exclude_site, exclude_host=exclude_host,
+                                  engine=engine, fmt=fmt, level=level)
+        if isinstance(params, str):
+            return cors_400(details=params)
 
         db_mgr = _get_db_manager()
-        result = db_mgr.get_calendar(start_time=start, end_time=end,
-                                     interval=interval or "day",
-                                     site=site, host=host,
-                                     exclude_site=exclude_site, exclude_host=exclude_host)
-
         from flask import request
-        response = cors_response(req=request, status_code=200,
-                                 body=json.dumps(result, indent=2, sort_keys=True))
+        stream_type = _calendar_stream_type(request)
+        if stream_type:
+            items = db_mgr.stream_calendar(**params)
+            return cors_stream_response(req=request, body=_encode_calendar_stream(items, stream_type, logger),
+                                        mimetype=stream_type)
+
+        result = db_mgr.get_calendar(**params)
+
+        if fmt in ("compact", "changes"):
+            # The point of these formats is size; no pretty-printing
+            body = json.dumps(result, separators=(",", ":"), sort_keys=True)
+        else:
+            body = json.dumps(result, indent=2, sort_keys=True)
+        response = cors_response(req=request, status_code=200, body=body)
         return response
     except Exception as exc:
         details = 'Oops! something went wrong with calendar_get(): {0}'.format(exc)
@@ -170,6 +309,38 @@ def calendar_find_slot(body=None):
         logger.debug("Processing - calendar_find_slot")
         ret_val = authorize()
 
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        params = _find_slot_params(body, max_range_days=FIND_SLOT_MAX_RANGE_DAYS,
+                                   max_results_limit=FIND_SLOT_MAX_RESULTS)
+        if isinstance(params, str):
+            return cors_400(details=params)
+
+        db_mgr = _get_db_manager()
+        result = db_mgr.find_slot(**params)
+
+        from flask import request
+        response = cors_response(req=request, status_code=200,
+                                 body=json.dumps(result, indent=2, sort_keys=True))
+        return response
+    except Exception as exc:
+        details = 'Oops! something went wrong with calendar_find_slot(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
+
+
+def calendar_find_slot_batch(body=None):
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - calendar_find_slot_batch")
+        ret_val = authorize()
+
         if isinstance(ret_val, Response):
             return ret_val
         elif isinstance(ret_val, dict):
@@ -180,58 +351,42 @@ def calendar_find_slot(body=None):
         if not body:
             return cors_400(details="Request body is required")
 
-        # Validate required fields
-        start_str = body.get("start")
-        end_str = body.get("end")
-        duration = body.get("duration")
-        resources = body.get("resources")
-        max_results = body.get("max_results", 1)
-
-        if not start_str or not end_str:
-            return cors_400(details="'start' and 'end' are required")
-        if not duration or not isinstance(duration, int) or duration <= 0:
-            return cors_400(details="'duration' must be a positive integer (hours)")
-        if not resources or not isinstance(resources, list) or len(resources) == 0:
-            return cors_400(details="'resources' must be a non-empty array")
-        if not isinstance(max_results, int) or max_results < 1 or max_results > 50:
-            return cors_400(details="'max_results' must be an integer between 1 and 50")
-
-        start = datetime.fromisoformat(start_str)
-        end = datetime.fromisoformat(end_str)
-
-        if start >= end:
-            return cors_400(details="'start' must be before 'end'")
-
-        range_hours = (end - start).total_seconds() / 3600
-        if range_hours > 30 * 24:
-            return cors_400(details="Search range must not exceed 30 days")
-        if duration > range_hours:
-            return cors_400(details="'duration' exceeds the search range")
-
-        # Validate each resource
-        valid_types = {"compute", "link", "facility_port"}
-        for i, r in enumerate(resources):
-            rtype = r.get("type")
-            if rtype not in valid_types:
-                return cors_400(details=f"resources[{i}].type must be one of: {', '.join(valid_types)}")
-            if rtype == "link":
-                if not r.get("site_a") or not r.get("site_b") or r.get("bandwidth") is None:
-                    return cors_400(details=f"resources[{i}] (link): 'site_a', 'site_b', and 'bandwidth' are required")
-            elif rtype == "facility_port":
-                if not r.get("name") or not r.get("site") or r.get("vlans") is None:
-                    return cors_400(details=f"resources[{i}] (facility_port): 'name', 'site', and 'vlans' are required")
+        requests = body.get("requests")
+        joint = body.get("joint", False)
+        if not requests or not isinstance(requests, list):
+            return cors_400(details="'requests' must be a non-empty array")
+        if len(requests) > FIND_SLOT_BATCH_MAX_REQUESTS:
+            return cors_400(details=f"'requests' must not hold more than {FIND_SLOT_BATCH_MAX_REQUESTS} requests")
+        if not isinstance(joint, bool):
+            return cors_400(details="'joint' must be a boolean")
+
+        batch = []
+        for i, r in enumerate(requests):
+            params = _find_slot_params(r, max_range_days=FIND_SLOT_MAX_RANGE_DAYS,
+                                       max_results_limit=FIND_SLOT_MAX_RESULTS)
+            if isinstance(params, str):
+                return cors_400(details=f"requests[{i}]: {params}")
+            batch.append(params)
+
+        # One occupancy is built over the union of the ranges, indexed by hour from the earliest start
+        first_start = min(p["start_time"] for p in batch)
+        last_end = max(p["end_time"] for p in batch)
+        if last_end - first_start > timedelta(days=FIND_SLOT_MAX_RANGE_DAYS):
+            return cors_400(details=f"The requests together must span at most {FIND_SLOT_MAX_RANGE_DAYS} days")
+        for i, p in enumerate(batch):
+            if (p["start_time"] - first_start) % timedelta(hours=1):
+                return cors_400(details=f"requests[{i}]: 'start' must be a whole number of hours "
+                                        f"after the earliest start in the batch")
 
         db_mgr = _get_db_manager()
-        result = db_mgr.find_slot(start_time=start, end_time=end,
-                                  duration=duration, resources=resources,
-                                  max_results=max_results)
+        result = db_mgr.find_slot_batch(requests=batch, joint=joint)
 
         from flask import request
         response = cors_response(req=request, status_code=200,
                                  body=json.dumps(result, indent=2, sort_keys=True))
         return response
     except Exception as exc:
-        details = 'Oops! something went wrong with calendar_find_slot(): {0}'.format(exc)
+        details = 'Oops! something went wrong with calendar_find_slot_batch(): {0}'.format(exc)
         logger.error(details)
         logger.error(traceback.format_exc())
         return cors_500(details=details)
@@ -271,3 +426,120 @@ def facility_ports_capacity_post(body=None):
         logger.error(details)
         logger.error(traceback.format_exc())
         return cors_500(details=details)
+
+
+def calendar_jobs_post(body=None):
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - calendar_jobs_post")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        if not body:
+            return cors_400(details="Request body is required")
+
+        max_range_days, _ = _job_limits()
+        params = _calendar_params(start_time=body.get("start_time"), end_time=body.get("end_time"),
+                                  interval=body.get("interval"), site=body.get("site"), host=body.get("host"),
+                                  exclude_site=body.get("exclude_site"), exclude_host=body.get("exclude_host"),
+                                  engine=body.get("engine"), fmt=body.get("format"), level=body.get("level"),
+                                  max_range_days=max_range_days)
+        if isinstance(params, str):
+            return cors_400(details=params)
+
+        job = _get_job_manager().submit("calendar", params)
+
+        from flask import request
+        return cors_response(req=request, status_code=202, body=json.dumps(job, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with calendar_jobs_post(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
+
+
+def calendar_find_slot_jobs_post(body=None):
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - calendar_find_slot_jobs_post")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        max_range_days, max_results = _job_limits()
+        params = _find_slot_params(body, max_range_days=max_range_days, max_results_limit=max_results)
+        if isinstance(params, str):
+            return cors_400(details=params)
+
+        job = _get_job_manager().submit("find_slot", params)
+
+        from flask import request
+        return cors_response(req=request, status_code=202, body=json.dumps(job, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with calendar_find_slot_jobs_post(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
+
+
+def calendar_jobs_job_id_get(job_id: str):
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - calendar_jobs_job_id_get")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        job = _get_job_manager().status(job_id)
+        if job is None:
+            return cors_404(details=f"Job {job_id} not found or expired")
+
+        from flask import request
+        return cors_response(req=request, status_code=200, body=json.dumps(job, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with calendar_jobs_job_id_get(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
+
+
+def calendar_jobs_job_id_delete(job_id: str):
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - calendar_jobs_job_id_delete")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        job = _get_job_manager().cancel(job_id)
+        if job is None:
+            return cors_404(details=f"Job {job_id} not found or expired")
+
+        from flask import request
+        return cors_response(req=request, status_code=200, body=json.dumps(job, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with calendar_jobs_job_id_delete(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
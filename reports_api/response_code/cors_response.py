@@ -26,7 +26,7 @@
 import datetime
 import json
 import os
-from typing import Union
+from typing import Iterable, Union
 
 from flask import request, Response
 
@@ -35,7 +35,7 @@ from reports_api.database import Hosts, Users
 from reports_api.openapi_server.models import Slices, Slivers, Version, \
     Status400BadRequestErrors, Status400BadRequest, Status401UnauthorizedErrors, \
     Status401Unauthorized, Status403ForbiddenErrors, Status403Forbidden, Status404NotFoundErrors, Status404NotFound, \
-    Status500InternalServerErrorErrors, Status500InternalServerError
+    Status500InternalServerErrorErrors, Status500InternalServerError, Status200OkNoContent
 
 _INDENT = int(os.getenv('OC_API_JSON_RESPONSE_INDENT', '4'))
 
@@ -64,6 +64,21 @@ def cors_response(req: request, status_code: int = 200, body: object = None, x_e
     response = Response()
     response.status_code = status_code
     response.data = body
+    return _add_cors_headers(req=req, response=response, x_error=x_error)
+
+
+def cors_stream_response(req: request, body: Iterable[str], mimetype: str) -> Response:
+    """
+    Return CORS Response object whose body is written out chunk by chunk as body yields
+    """
+    response = Response(body, status=200, mimetype=mimetype)
+    # Tell nginx not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return _add_cors_headers(req=req, response=response)
+
+
+def _add_cors_headers(req: request, response: Response, x_error: str = None) -> Response:
     response.headers['Access-Control-Allow-Origin'] = req.headers.get('Origin', '*')
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
@@ -104,6 +119,20 @@ def cors_200(response_body: Union[Slices, Slivers, Version, Hosts, Users] = None
     )
 
 
+def cors_202(response_body: Status200OkNoContent = None) -> cors_response:
+    """
+    Return 202 - Accepted
+    """
+    sanitized_response_body = sanitize_for_json(response_body.to_dict())
+    body = json.dumps(delete_none(sanitized_response_body), indent=_INDENT, sort_keys=True) \
+        if _INDENT != 0 else json.dumps(delete_none(sanitized_response_body), sort_keys=True)
+    return cors_response(
+        req=request,
+        status_code=202,
+        body=body
+    )
+
+
 def cors_400(details: str = None) -> cors_response:
     """
     Return 400 - Bad Request
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import traceback
+
+from flask import Response, request
+
+from reports_api.common.globals import GlobalsSingleton
+from reports_api.common.ingest_queue import IngestQueue
+from reports_api.response_code.cors_response import cors_500, cors_response
+from reports_api.response_code.utils import authorize
+from reports_api.security.fabric_token import FabricToken
+
+
+def ingest_queue_get():
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - ingest_queue_get")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            logger.debug("Authorized via Fabric token")
+
+        queue = IngestQueue.get()
+        if queue is None:
+            body = {"enabled": False, "depth": 0, "failed": 0, "oldest_age_seconds": 0}
+        else:
+            body = {"enabled": True, **queue.stats()}
+        return cors_response(req=request, status_code=200, body=json.dumps(body, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with ingest_queue_get(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
@@ -25,12 +25,14 @@
 # Author: Komal Thareja (kthare10@renci.org)
 import traceback
 from datetime import datetime, timezone
+from typing import Union
 
 from flask import Response
 
 from reports_api.common.globals import GlobalsSingleton
+from reports_api.common.ingest_queue import IngestQueue
 from reports_api.database.db_manager import DatabaseManager
-from reports_api.response_code.cors_response import cors_500, cors_401
+from reports_api.response_code.cors_response import cors_500, cors_401, cors_400, cors_202
 from reports_api.response_code.slice_sliver_states import SliverStates, SliceState
 from reports_api.response_code.utils import authorize, cors_success_response
 from reports_api.security.fabric_token import FabricToken
@@ -39,6 +41,20 @@ from reports_api.openapi_server.models.slice import Slice
 from reports_api.openapi_server.models.slices import Slices  # noqa: E501
 
 
+def _slice_row(body: Slice, slice_id: str) -> Union[dict, str]:
+    """Slice as the ingest queue takes it, or why it is rejected."""
+    if not body.slice_id:
+        return "'slice_id' is required"
+    if body.slice_id != slice_id:
+        return "slice_id in uri doesn't match slice_id in body"
+    state = SliceState.translate(body.state)
+    if state is None:
+        return "'state' is required"
+    return {"slice_name": body.slice_name, "project_uuid": body.project_id, "project_name": body.project_name,
+            "user_uuid": body.user_id, "user_email": body.user_email, "state": state,
+            "lease_start": body.lease_start, "lease_end": body.lease_end}
+
+
 def slices_get(start_time=None, end_time=None, user_id=None, user_email=None, project_id=None, slice_id=None,
                slice_state=None, sliver_id=None, sliver_type=None, sliver_state=None, component_type=None,
                component_model=None, bdf=None, vlan=None, ip_subnet=None, ip_v4=None, ip_v6=None, site=None, host=None, facility=None,
@@ -191,6 +207,22 @@ def slices_slice_id_post(slice_id, body: Slice):  # noqa: E501
         elif isinstance(ret_val, FabricToken):
             return cors_401(details=f"{ret_val.uuid}/{ret_val.email} is not authorized!")
 
+        queue = IngestQueue.get()
+        if queue is not None:
+            row = _slice_row(body, slice_id)
+            if isinstance(row, str):
+                return cors_400(details=row)
+            queue.put("slice", slice_guid=body.slice_id, row=row)
+            response_details = Status200OkNoContentData()
+            response_details.details = f"Slice '{slice_id}' has been accepted"
+            response = Status200OkNoContent()
+            response.data = [response_details]
+            response.size = len(response.data)
+            response.status = 202
+            response.type = 'no_content'
+            logger.debug("Queued - slices_slice_id_post")
+            return cors_202(response_body=response)
+
         global_obj = GlobalsSingleton.get()
         db_mgr = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
                                  password=global_obj.config.database_config.get("db-password"),
@@ -23,14 +23,17 @@
 #
 #
 # Author: Komal Thareja (kthare10@renci.org)
+import json
 import traceback
 from datetime import datetime
+from typing import List, Union
 
-from flask import Response
+from flask import Response, request
 
 from reports_api.common.globals import GlobalsSingleton
+from reports_api.common.ingest_queue import IngestQueue
 from reports_api.database.db_manager import DatabaseManager
-from reports_api.response_code.cors_response import cors_500, cors_401
+from reports_api.response_code.cors_response import cors_500, cors_401, cors_400, cors_202, cors_response
 from reports_api.response_code.slice_sliver_states import SliverStates, SliceState
 from reports_api.response_code.utils import authorize, cors_success_response
 from reports_api.security.fabric_token import FabricToken
@@ -38,6 +41,52 @@ from reports_api.openapi_server.models import Status200OkNoContentData, Status20
 from reports_api.openapi_server.models.sliver import Sliver
 from reports_api.openapi_server.models.slivers import Slivers  # noqa: E501
 
+SLIVER_BATCH_MAX_SLIVERS = 500
+
+
+def _get_db_manager():
+    global_obj = GlobalsSingleton.get()
+    return DatabaseManager(user=global_obj.config.database_config.get("db-user"),
+                           password=global_obj.config.database_config.get("db-password"),
+                           database=global_obj.config.database_config.get("db-name"),
+                           db_host=global_obj.config.database_config.get("db-host"),
+                           logger=global_obj.log)
+
+
+def _sliver_row(body: Sliver, slice_id: str) -> Union[dict, str]:
+    """Sliver as add_or_update_slivers() takes it, or why it is rejected."""
+    if not body.sliver_id:
+        return "'sliver_id' is required"
+    if body.slice_id != slice_id:
+        return "slice_id in uri doesn't match slice_id in body"
+    if not body.sliver_type:
+        return "'sliver_type' is required"
+    state = SliverStates.translate(body.state)
+    if state is None:
+        return "'state' is required"
+    row = {"project_uuid": body.project_id, "project_name": body.project_name, "user_uuid": body.user_id,
+           "user_email": body.user_email, "slice_name": body.slice_name, "site": body.site, "host": body.host,
+           "sliver_guid": body.sliver_id, "state": state, "sliver_type": body.sliver_type,
+           "node_id": body.node_id, "ip_subnet": body.ip_subnet, "ip_v4": body.ip_v4, "ip_v6": body.ip_v6,
+           "image": body.image, "core": body.core, "ram": body.ram, "disk": body.disk,
+           "bandwidth": body.bandwidth, "lease_start": body.lease_start, "lease_end": body.lease_end,
+           "closed_at": body.closed_at, "error": body.error, "components": [], "interfaces": []}
+    if body.components and body.components.data:
+        for c in body.components.data:
+            if not c.component_id:
+                return "'component_id' is required for every component"
+            row["components"].append({"component_guid": c.component_id, "component_type": c.type,
+                                      "model": c.model, "bdfs": c.bdfs, "node_id": c.node_id,
+                                      "component_node_id": c.component_node_id})
+    if body.interfaces and body.interfaces.data:
+        for ifc in body.interfaces.data:
+            if not ifc.interface_id:
+                return "'interface_id' is required for every interface"
+            row["interfaces"].append({"interface_guid": ifc.interface_id, "name": ifc.name,
+                                      "local_name": ifc.local_name, "device_name": ifc.device_name,
+                                      "bdf": ifc.bdf, "vlan": ifc.vlan})
+    return row
+
 
 def slivers_get(start_time=None, end_time=None, user_id=None, user_email=None, project_id=None, slice_id=None,
                 slice_state=None, sliver_id=None, sliver_type=None, sliver_state=None, component_type=None,
@@ -192,6 +241,24 @@ def slivers_slice_id_sliver_id_post(body: Sliver, slice_id: str, sliver_id: str)
         elif isinstance(ret_val, FabricToken):
             return cors_401(details=f"{ret_val.uuid}/{ret_val.email} is not authorized!")
 
+        queue = IngestQueue.get()
+        if queue is not None:
+            row = _sliver_row(body, slice_id)
+            if isinstance(row, str):
+                return cors_400(details=row)
+            if row["sliver_guid"] != sliver_id:
+                return cors_400(details="sliver_id in uri doesn't match sliver_id in body")
+            queue.put("sliver", slice_guid=slice_id, row=row)
+            response_details = Status200OkNoContentData()
+            response_details.details = f"Sliver '{sliver_id}' has been accepted"
+            response = Status200OkNoContent()
+            response.data = [response_details]
+            response.size = len(response.data)
+            response.status = 202
+            response.type = 'no_content'
+            logger.debug("Queued - slivers_slice_id_sliver_id_post")
+            return cors_202(response_body=response)
+
         global_obj = GlobalsSingleton.get()
         db_mgr = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
                                  password=global_obj.config.database_config.get("db-password"),
@@ -249,3 +316,68 @@ def slivers_slice_id_sliver_id_post(body: Sliver, slice_id: str, sliver_id: str)
         logger.error(details)
         logger.error(traceback.format_exc())
         return cors_500(details=details)
+
+
+def slices_slice_id_slivers_post(body: List[Sliver], slice_id: str):  # noqa: E501
+    """Create/Update the slivers of a slice
+
+    Create/Update several slivers of one slice, with their components and interfaces, in one
+    transaction. Slivers that fail validation are reported and skipped; the rest are written together.
+
+    :param body: Slivers to create/modify
+    :type body: List[Sliver]
+    :param slice_id:
+    :type slice_id: str
+
+    :rtype: SliverBatchResponse
+    """
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - slices_slice_id_slivers_post")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            # This is a 401 Unauthorized response, already constructed
+            return ret_val
+
+        elif isinstance(ret_val, dict):
+            # This was authorized via static bearer token (returns empty dict)
+            logger.debug("Authorized via bearer token")
+
+        elif isinstance(ret_val, FabricToken):
+            return cors_401(details=f"{ret_val.uuid}/{ret_val.email} is not authorized!")
+
+        if not body:
+            return cors_400(details="At least one sliver is required")
+        if len(body) > SLIVER_BATCH_MAX_SLIVERS:
+            return cors_400(details=f"At most {SLIVER_BATCH_MAX_SLIVERS} slivers may be posted at once")
+
+        results = []
+        rows = []
+        seen = set()
+        for sliver in body:
+            row = _sliver_row(sliver, slice_id)
+            if isinstance(row, dict) and row["sliver_guid"] in seen:
+                row = "Duplicate sliver_id in request"
+            if isinstance(row, str):
+                results.append({"sliver_id": sliver.sliver_id, "status": "rejected", "details": row})
+                continue
+            seen.add(row["sliver_guid"])
+            rows.append(row)
+            results.append({"sliver_id": row["sliver_guid"]})
+
+        statuses = _get_db_manager().add_or_update_slivers(slice_guid=slice_id, slivers=rows) if rows else {}
+        for result in results:
+            if "status" not in result:
+                result["status"] = statuses[result["sliver_id"]]
+
+        counts = {status: sum(1 for r in results if r["status"] == status)
+                  for status in ("created", "updated", "unchanged", "rejected")}
+        response = {"slice_id": slice_id, "results": results, "total": len(results), **counts}
+        logger.debug("Processed - slices_slice_id_slivers_post")
+        return cors_response(req=request, status_code=200, body=json.dumps(response, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with slices_slice_id_slivers_post(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
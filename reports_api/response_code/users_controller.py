@@ -23,22 +23,26 @@
 #
 #
 # Author: Komal Thareja (kthare10@renci.org)
+import json
 import traceback
 from datetime import datetime
 from typing import Optional
 
-from flask import Response
+from flask import Response, request
 
 from reports_api.common.globals import GlobalsSingleton
 from reports_api.database.db_manager import DatabaseManager
-from reports_api.response_code.cors_response import cors_500
+from reports_api.response_code.cors_response import cors_500, cors_400, cors_401, cors_response
 from reports_api.response_code.slice_sliver_states import SliverStates, SliceState
-from reports_api.response_code.utils import authorize, cors_success_response
+from reports_api.response_code.utils import authorize, cors_success_response, bulk_upsert, BULK_MAX_RECORDS
 from reports_api.security.fabric_token import FabricToken
 from reports_api.openapi_server.models import UserMemberships, UserMembership
 from reports_api.openapi_server.models.user import User
 from reports_api.openapi_server.models.users import Users  # noqa: E501
 
+USER_BULK_FIELDS = {"user_email": str, "active": bool, "name": str, "affiliation": str, "registered_on": datetime,
+                    "last_updated": datetime, "google_scholar": str, "scopus": str, "bastion_login": str}
+
 
 def users_get(start_time=None, end_time=None, user_id=None, user_email=None, project_id=None, slice_id=None,
               slice_state=None, sliver_id=None, sliver_type=None, sliver_state=None, component_type=None,
@@ -382,4 +386,48 @@ def users_uuid_get(uuid):  # noqa: E501
         details = 'Oops! something went wrong with users_uuid_get(): {0}'.format(exc)
         logger.error(details)
         logger.error(traceback.format_exc())
-        return cors_500(details=details)
\ No newline at end of file
+        return cors_500(details=details)
+
+
+def users_bulk_post(body: list):  # noqa: E501
+    """Create/Update users in bulk
+
+    Upsert up to BULK_MAX_RECORDS user records, one multi-row statement per batch. # noqa: E501
+
+    :param body: User records keyed by user_uuid
+    :type body: list
+
+    :rtype: dict
+    """
+    logger = GlobalsSingleton.get().log
+    try:
+        logger.debug("Processing - users_bulk_post")
+        ret_val = authorize()
+
+        if isinstance(ret_val, Response):
+            return ret_val
+        elif isinstance(ret_val, dict):
+            logger.debug("Authorized via bearer token")
+        elif isinstance(ret_val, FabricToken):
+            return cors_401(details=f"{ret_val.uuid}/{ret_val.email} is not authorized!")
+
+        if not body:
+            return cors_400(details="At least one record is required")
+        if len(body) > BULK_MAX_RECORDS:
+            return cors_400(details=f"At most {BULK_MAX_RECORDS} records may be posted at once")
+
+        global_obj = GlobalsSingleton.get()
+        db_mgr = DatabaseManager(user=global_obj.config.database_config.get("db-user"),
+                                 password=global_obj.config.database_config.get("db-password"),
+                                 database=global_obj.config.database_config.get("db-name"),
+                                 db_host=global_obj.config.database_config.get("db-host"),
+                                 logger=logger)
+        response = bulk_upsert(body, key="user_uuid", fields=USER_BULK_FIELDS, write=db_mgr.add_or_update_users,
+                               not_stored="'user_email' is required for users not stored yet")
+        logger.debug("Processed - users_bulk_post")
+        return cors_response(req=request, status_code=200, body=json.dumps(response, indent=2, sort_keys=True))
+    except Exception as exc:
+        details = 'Oops! something went wrong with users_bulk_post(): {0}'.format(exc)
+        logger.error(details)
+        logger.error(traceback.format_exc())
+        return cors_500(details=details)
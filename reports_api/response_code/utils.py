@@ -23,8 +23,9 @@
 #
 #
 # Author: Komal Thareja (kthare10@renci.org)
+from datetime import datetime
 from http.client import BAD_REQUEST, UNAUTHORIZED, FORBIDDEN, NOT_FOUND
-from typing import Union
+from typing import Callable, Dict, List, Union
 
 import connexion
 from flask import Response
@@ -35,6 +36,9 @@ from reports_api.response_code.cors_response import cors_400, cors_401, cors_403
     cors_200
 from reports_api.security.fabric_token import FabricToken
 
+BULK_MAX_RECORDS = 10000
+BULK_BATCH_SIZE = 1000
+
 
 def get_token() -> str:
     result = None
@@ -89,4 +93,72 @@ def authorize() -> Union[FabricToken, dict, Response]:
         if role.get("name") in allowed_roles:
             return fabric_token
 
-    return cors_401(details="User is not authorized!")
\ No newline at end of file
+    return cors_401(details="User is not authorized!")
+
+
+def _bulk_row(record, key: str, fields: Dict[str, type]) -> Union[dict, str]:
+    """Record of a bulk upsert with its timestamps parsed, or why it is rejected."""
+    if not isinstance(record, dict):
+        return "Record must be an object"
+    if not record.get(key) or not isinstance(record[key], str):
+        return f"'{key}' is required"
+    unknown = sorted(set(record) - set(fields) - {key})
+    if unknown:
+        return f"Unknown fields: {', '.join(unknown)}"
+    row = {key: record[key]}
+    for name, kind in fields.items():
+        value = record.get(name)
+        if value is None:
+            row[name] = None
+        elif kind is datetime:
+            try:
+                row[name] = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            except ValueError:
+                return f"'{name}' must be an ISO 8601 timestamp"
+        elif not isinstance(value, kind):
+            return f"'{name}' must be a {kind.__name__}"
+        else:
+            row[name] = value
+    return row
+
+
+def bulk_upsert(records: List[dict], key: str, fields: Dict[str, type],
+                write: Callable[[List[dict], dict], dict], not_stored: str = "Not stored") -> dict:
+    """
+    Validate records and upsert them in batches of BULK_BATCH_SIZE, one multi-row statement
+    per batch. Records that fail validation, repeat a key, or are not stored are rejected.
+
+    :param records: request body
+    :param key: the uuid field identifying a record
+    :param fields: other accepted fields -> type (datetime for ISO 8601 timestamps)
+    :param write: writes one batch and fills key -> "created" / "updated" / "unchanged", e.g.
+        DatabaseManager.add_or_update_users
+    :param not_stored: details of the records the write left out
+    :return: per-record results in request order, and counts per status
+    """
+    results = []
+    rows = []
+    seen = set()
+    for record in records:
+        row = _bulk_row(record, key, fields)
+        if isinstance(row, dict) and row[key] in seen:
+            row = f"Duplicate {key} in request"
+        if isinstance(row, str):
+            uuid = record.get(key) if isinstance(record, dict) else None
+            results.append({"uuid": uuid, "status": "rejected", "details": row})
+            continue
+        seen.add(row[key])
+        rows.append(row)
+        results.append({"uuid": row[key]})
+
+    statuses = {}
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        write(rows[start:start + BULK_BATCH_SIZE], statuses)
+    for result in results:
+        if "status" not in result:
+            result["status"] = statuses.get(result["uuid"], "rejected")
+            if result["status"] == "rejected":
+                result["details"] = not_stored
+    counts = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("created", "updated", "unchanged", "rejected")}
+    return {"results": results, "total": len(results), **counts}
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Bulk importer for exported slice_*.json files.
+
+Files are parsed into plain rows in a process pool while the previous batch is being
+written; each batch of slices is written in one transaction by DatabaseManager.import_slices()
+or, with --copy, by DatabaseManager.copy_load(). After every committed batch the (mtime, name)
+of its last file is saved to a checkpoint file, so an interrupted run resumes after the last
+committed batch and a later run only picks up files exported since.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from reports_api.openapi_server.util import deserialize_datetime
+from reports_api.response_code.slice_sliver_states import SliverStates
+
+SLICE_FILE_PATTERN = "slice_*.json"
+
+
+def _records(value) -> list:
+    """Components / interfaces as exported: a list, or a {"total", "data"} collection."""
+    if isinstance(value, dict):
+        value = value.get("data")
+    return value or []
+
+
+def _datetime(value):
+    return deserialize_datetime(value) if isinstance(value, str) else value
+
+
+def parse_slice_file(path: str) -> Tuple[str, Optional[dict]]:
+    """
+    Read one exported slice as DatabaseManager.import_slices() takes it. Runs in a worker process.
+
+    :return: ("ok", slice), ("skipped", None) for slices without a lease or slivers, or ("error", message)
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        lease_start = _datetime(data.get("lease_start"))
+        lease_end = _datetime(data.get("lease_end"))
+        if lease_start is None or lease_end is None or not data.get("slivers"):
+            return "skipped", None
+        if data.get("state") is None:
+            return "error", f"{path}: slice has no state"
+
+        slivers = []
+        for sliver in data["slivers"]:
+            state = sliver.get("state")
+            row = {"project_uuid": data.get("project_id"), "project_name": data.get("project_name"),
+                   "user_uuid": data.get("user_id"), "user_email": data.get("user_email"),
+                   "slice_name": data.get("slice_name"), "site": sliver.get("site"), "host": sliver.get("host"),
+                   "sliver_guid": sliver["sliver_id"],
+                   "state": SliverStates.translate(state) if isinstance(state, str) else state,
+                   "sliver_type": sliver.get("sliver_type") or sliver["type"],
+                   "node_id": sliver.get("node_id"), "ip_subnet": sliver.get("ip_subnet"),
+                   "ip_v4": sliver.get("ip_v4"), "ip_v6": sliver.get("ip_v6"), "image": sliver.get("image"),
+                   "core": sliver.get("core"), "ram": sliver.get("ram"), "disk": sliver.get("disk"),
+                   "bandwidth": sliver.get("bandwidth"), "error": sliver.get("error"),
+                   "closed_at": _datetime(sliver.get("closed_at")),
+                   # Exported slivers carry the slice's lease
+                   "lease_start": lease_start, "lease_end": lease_end,
+                   "components": [{"component_guid": c.get("component_guid") or c["component_id"],
+                                   "component_type": c.get("type"), "model": c.get("model"), "bdfs": c.get("bdfs"),
+                                   "node_id": c.get("node_id"), "component_node_id": c.get("component_node_id")}
+                                  for c in _records(sliver.get("components"))],
+                   "interfaces": [{"interface_guid": i.get("interface_guid") or i["interface_id"],
+                                   "name": i.get("name"), "local_name": i.get("local_name"),
+                                   "device_name": i.get("device_name"), "bdf": i.get("bdf"), "vlan": i.get("vlan")}
+                                  for i in _records(sliver.get("interfaces"))]}
+            if row["state"] is None:
+                return "error", f"{path}: sliver {row['sliver_guid']} has no state"
+            slivers.append(row)
+
+        return "ok", {"slice_guid": data["slice_id"], "slice_name": data.get("slice_name"),
+                      "project_uuid": data.get("project_id"), "project_name": data.get("project_name"),
+                      "user_uuid": data.get("user_id"), "user_email": data.get("user_email"),
+                      "state": int(data["state"]), "lease_start": lease_start, "lease_end": lease_end,
+                      "slivers": slivers}
+    except Exception as e:
+        return "error", f"{path}: {e}"
+
+
+class Checkpoint:
+    """(mtime, name) of the last imported file, kept in a JSON file replaced atomically."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.position = None
+        self.failed = []
+        if path.exists():
+            with open(path, "r") as f:
+                state = json.load(f)
+            self.position = (state["mtime"], state["name"])
+            self.failed = state.get("failed", [])
+
+    def save(self, position: Tuple[float, str], failed: List[str]):
+        self.position = position
+        self.failed = failed
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"mtime": position[0], "name": position[1], "failed": failed}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class SliceImporter:
+    """Imports exported slices in batches, resuming from a checkpoint."""
+
+    def __init__(self, db_mgr, slices_dir: str, checkpoint_path: str, workers: int = 4, batch_size: int = 200,
+                 skip_existing: bool = True, use_copy: bool = False, logger: logging.Logger = None):
+        self.db_mgr = db_mgr
+        self.slices_dir = Path(slices_dir)
+        if not self.slices_dir.exists():
+            raise FileNotFoundError(f"Slice directory not found: {slices_dir}")
+        self.checkpoint = Checkpoint(Path(checkpoint_path))
+        self.workers = workers
+        self.batch_size = batch_size
+        self.skip_existing = skip_existing
+        self.use_copy = use_copy
+        self.logger = logger or logging.getLogger("import_slices")
+
+    def pending_files(self) -> List[Tuple[float, str]]:
+        """(mtime, name) of the files after the checkpoint, oldest first."""
+        with os.scandir(self.slices_dir) as entries:
+            files = sorted((entry.stat().st_mtime, entry.name) for entry in entries
+                           if entry.is_file() and Path(entry.name).match(SLICE_FILE_PATTERN))
+        if self.checkpoint.position is None:
+            return files
+        return [f for f in files if f > tuple(self.checkpoint.position)]
+
+    def _batches(self, pool, files: List[Tuple[float, str]]) -> Iterator[Tuple[list, List[Future]]]:
+        """Batches of files with their parse futures; the next batch is parsing while one is written."""
+        pending = None
+        for i in range(0, len(files), self.batch_size):
+            batch = files[i:i + self.batch_size]
+            futures = [pool.submit(parse_slice_file, str(self.slices_dir / name)) for _, name in batch]
+            if pending is not None:
+                yield pending
+            pending = (batch, futures)
+        if pending is not None:
+            yield pending
+
+    def run(self) -> dict:
+        files = self.pending_files()
+        totals = {"files": 0, "slices": 0, "skipped": 0, "slivers": 0, "rows": 0, "unchanged": 0, "failed": 0}
+        self.logger.info(f"{len(files)} files to import from {self.slices_dir}")
+        failed = list(self.checkpoint.failed)
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for batch, futures in self._batches(pool, files):
+                slices = []
+                for (_, name), future in zip(batch, futures):
+                    status, value = future.result()
+                    if status == "ok":
+                        slices.append(value)
+                    elif status == "skipped":
+                        totals["skipped"] += 1
+                    else:
+                        self.logger.error(f"Failed to parse {value}")
+                        failed.append(name)
+                        totals["failed"] += 1
+                if self.use_copy:
+                    written = self.db_mgr.copy_load(slices=slices, skip_existing=self.skip_existing)
+                else:
+                    written = self.db_mgr.import_slices(slices, skip_existing=self.skip_existing)
+                self.checkpoint.save(batch[-1], failed)
+
+                totals["files"] += len(batch)
+                for key in ("slices", "skipped", "slivers", "rows", "unchanged"):
+                    totals[key] += written[key]
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.logger.info(f"{totals['files']}/{len(files)} files, {totals['slices']} slices, "
+                                 f"{totals['rows']} rows, {totals['unchanged']} unchanged: "
+                                 f"{totals['files'] / elapsed:.1f} files/s, {totals['rows'] / elapsed:.1f} rows/s")
+        totals["seconds"] = round(time.monotonic() - started, 3)
+        return totals
+
+
+if __name__ == "__main__":
+    from reports_api.common.globals import Globals, GlobalsSingleton
+    from reports_api.database.db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Import exported slice JSON files into the reports database")
+    parser.add_argument("--config", help=f"Path to YAML config file (default: {Globals.config_file})")
+    parser.add_argument("--slices_dir", default="./exported_slices", help="Directory containing slice_*.json files")
+    parser.add_argument("--checkpoint", default="./import_slices.checkpoint.json",
+                        help="Checkpoint file; delete it to import everything again")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parser processes")
+    parser.add_argument("--batch_size", type=int, default=200, help="Slices written per transaction")
+    parser.add_argument("--update_existing", action="store_true",
+                        help="Overwrite slices that are already stored instead of skipping them")
+    parser.add_argument("--copy", action="store_true",
+                        help="Load through COPY into staging tables and a set-based merge")
+    args = parser.parse_args()
+
+    if args.config:
+        config_path = Path(args.config)
+        if not config_path.exists():
+            raise FileNotFoundError(f"Config file not found: {config_path}")
+        Globals.config_file = str(config_path)
+
+    logger = logging.getLogger("import_slices")
+    file_handler = RotatingFileHandler('./import_slices.log', backupCount=5, maxBytes=1_000_000)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(filename)s:%(lineno)d] [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler(), file_handler]
+    )
+
+    global_obj = GlobalsSingleton.get()
+    db_mgr = DatabaseManager(
+        user=global_obj.config.database_config.get("db-user"),
+        password=global_obj.config.database_config.get("db-password"),
+        database=global_obj.config.database_config.get("db-name"),
+        db_host=global_obj.config.database_config.get("db-host"),
+        logger=logger
+    )
+
+    importer = SliceImporter(db_mgr=db_mgr, slices_dir=args.slices_dir, checkpoint_path=args.checkpoint,
+                             workers=args.workers, batch_size=args.batch_size,
+                             skip_existing=not args.update_existing, use_copy=args.copy, logger=logger)
+    totals = importer.run()
+    logger.info(f"Import complete: {totals}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# MIT License
+#
+# Copyright (component) 2025 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from logging.handlers import RotatingFileHandler
+
+from reports_api.common.globals import Globals, GlobalsSingleton
+from reports_api.database.db_manager import DatabaseManager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the hosts x hours occupancy file read by the API workers")
+    parser.add_argument("--config", help=f"Path to YAML config file (default: {Globals.config_file})")
+    parser.add_argument("--loop", type=int, default=0,
+                        help="Republish every LOOP seconds instead of once")
+    args = parser.parse_args()
+
+    if args.config:
+        config_path = Path(args.config)
+        if not config_path.exists():
+            raise FileNotFoundError(f"Config file not found: {config_path}")
+        Globals.config_file = str(config_path)
+
+    logger = logging.getLogger("publish_occupancy_file")
+    file_handler = RotatingFileHandler('./publish_occupancy_file.log', backupCount=5, maxBytes=1_000_000)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(filename)s:%(lineno)d] [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler(), file_handler]
+    )
+
+    global_obj = GlobalsSingleton.get()
+    runtime_config = global_obj.config.runtime_config
+    path = runtime_config.get("occupancy_file.path", "/var/lib/reports/occupancy.bin")
+    history_days = int(runtime_config.get("occupancy_file.history_days", 7))
+    horizon_days = int(runtime_config.get("occupancy_file.horizon_days", 60))
+    db_mgr = DatabaseManager(
+        user=global_obj.config.database_config.get("db-user"),
+        password=global_obj.config.database_config.get("db-password"),
+        database=global_obj.config.database_config.get("db-name"),
+        db_host=global_obj.config.database_config.get("db-host"),
+        logger=logger
+    )
+
+    while True:
+        generation = db_mgr.publish_occupancy_file(path, history_days=history_days, horizon_days=horizon_days)
+        if generation is None:
+            logger.warning("Hourly allocation tables do not cover the horizon; run rebuild_hourly_allocation first.")
+        else:
+            logger.info(f"Published occupancy file {path} generation {generation}.")
+        if args.loop <= 0:
+            break
+        time.sleep(args.loop)
@@ -25,7 +25,14 @@
 # Author: Komal Thareja (kthare10@renci.org)
 import argparse
 import logging
+import threading
+import time
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
 import yaml
 from pathlib import Path
 
@@ -33,30 +40,125 @@ from logging.handlers import RotatingFileHandler
 
 import requests
 from dateutil.parser import isoparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from reports_api.common.globals import GlobalsSingleton
 from reports_api.database.db_manager import DatabaseManager
 
 
-class UserSyncScript:
-    def __init__(self, endpoint: str, token: str, logger: logging.Logger):
+def _timestamp(record: dict, key: str):
+    return isoparse(record[key]) if record.get(key) else None
+
+
+def changed_since(entries: list, watermark: Optional[datetime]) -> Tuple[list, Optional[datetime]]:
+    """
+    Entries whose last_updated is after the watermark (every entry without a watermark, and
+    entries without a last_updated always), and the newest last_updated seen.
+    """
+    changed = []
+    newest = watermark
+    for entry in entries:
+        updated = _timestamp(entry, "last_updated")
+        if watermark is None or updated is None or updated > watermark:
+            changed.append(entry)
+        if updated is not None and (newest is None or updated > newest):
+            newest = updated
+    return changed, newest
+
+
+def membership_key(m: dict) -> tuple:
+    return m["user_id"], m["project_id"], m["membership_type"], m["start_time"]
+
+
+class RateLimiter:
+    """Spaces calls to acquire() at least 1/rate seconds apart across threads; rate <= 0 disables it."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CoreApiClient:
+    """
+    Pooled HTTP client for the Core API metrics endpoints.
+
+    One requests.Session with a connection pool sized to the concurrency is shared by the
+    worker threads; failed requests (connection errors, 429 and 5xx) are retried with
+    exponential backoff, and requests are rate limited across all threads.
+    """
+
+    def __init__(self, endpoint: str, token: str, concurrency: int = 8, rate_limit: float = 20.0,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 15):
         self.endpoint = endpoint
         self.token = token
-        self.logger = logger
-
-    @property
-    def headers(self):
-        return {
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_limit)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
             "accept": "application/json",
             "Authorization": f"Bearer {self.token}"
-        }
+        })
+
+    def get_results(self, path: str) -> list:
+        self.limiter.acquire()
+        with self.lock:
+            self.requests += 1
+        resp = self.session.get(f"{self.endpoint}/core-api-metrics/{path}", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json().get("results", [])
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator[Tuple[object, object]]:
+        """
+        (item, fn(item)) in order, with up to `concurrency` calls in flight and a bounded
+        number of results waiting for the caller.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = deque()
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= 2 * self.concurrency:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+
+    def close(self):
+        self.session.close()
+
+
+class UserSyncScript:
+    def __init__(self, endpoint: str, token: str, logger: logging.Logger, client: CoreApiClient = None,
+                 batch_size: int = 200):
+        self.endpoint = endpoint
+        self.token = token
+        self.logger = logger
+        self.client = client or CoreApiClient(endpoint, token)
+        self.batch_size = batch_size
 
     def fetch_user_list(self):
         try:
-            url = f"{self.endpoint}/core-api-metrics/people"
-            resp = requests.get(url, headers=self.headers, timeout=15)
-            resp.raise_for_status()
-            return resp.json().get("results", [])
+            return self.client.get_results("people")
         except Exception as e:
             self.logger.error(f"Error fetching user list: {e}")
             traceback.print_exc()
@@ -64,10 +166,7 @@ class UserSyncScript:
 
     def fetch_user_detail(self, uuid):
         try:
-            url = f"{self.endpoint}/core-api-metrics/people-details/{uuid}"
-            resp = requests.get(url, headers=self.headers, timeout=15)
-            resp.raise_for_status()
-            return resp.json().get("results", [])[0]
+            return self.client.get_results(f"people-details/{uuid}")[0]
         except Exception as e:
             self.logger.error(f"Error fetching user details for {uuid}: {e}")
             traceback.print_exc()
@@ -75,88 +174,130 @@ class UserSyncScript:
 
     def fetch_memberships_for_user(self, uuid: str):
         try:
-            url = f"{self.endpoint}/core-api-metrics/events/people-membership/{uuid}"
-            resp = requests.get(url, headers=self.headers, timeout=15)
-            resp.raise_for_status()
-            return resp.json().get("results", [])
+            return self.client.get_results(f"events/people-membership/{uuid}")
         except Exception as e:
             self.logger.error(f"Error fetching membership events for user {uuid}: {e}")
             traceback.print_exc()
             return []
 
-    def sync_users(self, db_mgr):
+    def fetch_user(self, uuid: str):
+        """(detail, memberships) of one user, or None when the details cannot be fetched."""
+        detail = self.fetch_user_detail(uuid)
+        if not detail:
+            return None
+        return detail, self.fetch_memberships_for_user(uuid)
+
+    def write_users(self, db_mgr, users: list) -> Tuple[int, int]:
+        """
+        Write a batch of (detail, memberships) with one upsert per table. Memberships are
+        diffed against the stored ones and only new or changed memberships are written.
+
+        :return: (users written, memberships written)
+        """
+        try:
+            user_ids = db_mgr.add_or_update_users([{
+                "user_uuid": detail.get("uuid"),
+                "user_email": detail.get("email"),
+                "active": detail.get("active"),
+                "name": detail.get("name"),
+                "affiliation": detail.get("affiliation"),
+                "registered_on": _timestamp(detail, "registered_on"),
+                "last_updated": _timestamp(detail, "last_updated"),
+                "google_scholar": detail.get("google_scholar"),
+                "scopus": detail.get("scopus"),
+                "bastion_login": detail.get("bastion_login")
+            } for detail, _ in users])
+            project_uuids = {m["project_uuid"] for _, memberships in users for m in memberships}
+            project_ids = db_mgr.get_project_ids_by_uuid(list(project_uuids))
+            missing = project_uuids - set(project_ids)
+            if missing:
+                project_ids.update(db_mgr.add_or_update_projects([{"project_uuid": uuid} for uuid in missing]))
+
+            stored = db_mgr.get_memberships_by_user(list(user_ids.values()))
+            stored = {membership_key(m): (m["end_time"], m["active"]) for rows in stored.values() for m in rows}
+            changed = []
+            for detail, memberships in users:
+                if detail.get("uuid") not in user_ids:
+                    continue
+                for m in memberships:
+                    row = {
+                        "user_id": user_ids[detail.get("uuid")],
+                        "project_id": project_ids[m["project_uuid"]],
+                        "start_time": _timestamp(m, "added_date"),
+                        "end_time": _timestamp(m, "removed_date"),
+                        "membership_type": m.get("membership_type"),
+                        "active": m.get("removed_date") is None
+                    }
+                    if stored.get(membership_key(row)) != (row["end_time"], row["active"]):
+                        changed.append(row)
+            memberships_written = db_mgr.add_or_update_memberships(changed)
+            for detail, _ in users:
+                self.logger.info(f"Updated user: {detail.get('email')} ({detail.get('uuid')})")
+            return len(users), memberships_written
+        except Exception as e:
+            self.logger.error(f"Failed to update {len(users)} users: {e}")
+            traceback.print_exc()
+            return 0, 0
+
+    def sync_users(self, db_mgr, incremental: bool = False) -> dict:
+        """
+        Fetch users' details and memberships concurrently and write them in batches while the
+        next ones are being fetched. The "users" watermark is advanced when every user was
+        written.
+
+        :param incremental: only fetch users updated since the last successful sync
+        :return: users listed, fetched and updated, memberships written, requests made, elapsed
+            seconds and users per second
+        """
+        started, requests_before = time.monotonic(), self.client.requests
         users = self.fetch_user_list()
         if not users:
             self.logger.warning("No users retrieved from API.")
-            return
-
-        updated_count = 0
-        for entry in users:
-            uuid = entry.get("uuid")
-            detail = self.fetch_user_detail(uuid)
-            if not detail:
-                continue
-
-            try:
-                # Add or update user
-                print(f'User: {detail.get("bastion_login")}')
-                user_id = db_mgr.add_or_update_user(
-                    user_uuid=detail.get("uuid"),
-                    user_email=detail.get("email"),
-                    active=detail.get("active"),
-                    name=detail.get("name"),
-                    affiliation=detail.get("affiliation"),
-                    registered_on=isoparse(detail["registered_on"]) if detail.get("registered_on") else None,
-                    last_updated=isoparse(detail["last_updated"]) if detail.get("last_updated") else None,
-                    google_scholar=detail.get("google_scholar"),
-                    scopus=detail.get("scopus"),
-                    bastion_login=detail.get("bastion_login")
-                )
-
-                # Fetch and store memberships
-                memberships = self.fetch_memberships_for_user(uuid)
-                for m in memberships:
-                    project_id = db_mgr.add_or_update_project(
-                        project_uuid=m["project_uuid"]
-                    )
-
-                    db_mgr.add_or_update_membership(
-                        user_id=user_id,
-                        project_id=project_id,
-                        start_time=isoparse(m["added_date"]) if m.get("added_date") else None,
-                        end_time=isoparse(m["removed_date"]) if m.get("removed_date") else None,
-                        membership_type=m.get("membership_type"),
-                        active=m.get("removed_date") is None
-                    )
-
-                updated_count += 1
-                self.logger.info(f"Updated user + memberships: {detail.get('email')} ({uuid})")
-            except Exception as e:
-                self.logger.error(f"Failed to update user {uuid}: {e}")
-                traceback.print_exc()
-
-        self.logger.info(f"Total users updated (incl. memberships): {updated_count}")
+            return {"users": 0, "updated": 0}
+
+        changed, newest = changed_since(users, db_mgr.get_sync_watermark("users") if incremental else None)
+        updated_count = memberships_written = failed = 0
+        batch = []
+        for i, (uuid, fetched) in enumerate(self.client.map(self.fetch_user, [e.get("uuid") for e in changed])):
+            if fetched is None:
+                failed += 1
+            else:
+                batch.append(fetched)
+            if batch and (len(batch) >= self.batch_size or i == len(changed) - 1):
+                written, memberships = self.write_users(db_mgr, batch)
+                failed += len(batch) - written
+                updated_count += written
+                memberships_written += memberships
+                batch = []
+
+        if failed:
+            self.logger.warning(f"{failed} users failed; users watermark not advanced")
+        else:
+            db_mgr.set_sync_watermark("users", newest)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        requests_made = self.client.requests - requests_before
+        stats = {"users": len(users), "fetched": len(changed), "updated": updated_count,
+                 "memberships": memberships_written, "failed": failed, "requests": requests_made,
+                 "seconds": round(elapsed, 3), "users_per_second": round(len(changed) / elapsed, 1)}
+        self.logger.info(f"Total users updated: {updated_count} of {len(users)}, memberships written: "
+                         f"{memberships_written}; {stats['users_per_second']} users/s, "
+                         f"{requests_made / elapsed:.1f} requests/s")
+        return stats
 
 
 class ProjectSyncScript:
-    def __init__(self, endpoint: str, token: str, logger: logging.Logger):
+    def __init__(self, endpoint: str, token: str, logger: logging.Logger, client: CoreApiClient = None,
+                 batch_size: int = 200):
         self.endpoint = endpoint
         self.token = token
         self.logger = logger
-
-    @property
-    def headers(self):
-        return {
-            "accept": "application/json",
-            "Authorization": f"Bearer {self.token}"
-        }
+        self.client = client or CoreApiClient(endpoint, token)
+        self.batch_size = batch_size
 
     def fetch_project_list(self):
         try:
-            url = f"{self.endpoint}/core-api-metrics/projects"
-            resp = requests.get(url, headers=self.headers, timeout=15)
-            resp.raise_for_status()
-            return resp.json().get("results", [])
+            return self.client.get_results("projects")
         except Exception as e:
             self.logger.error(f"Error fetching project list: {e}")
             traceback.print_exc()
@@ -164,51 +305,82 @@ class ProjectSyncScript:
 
     def fetch_project_detail(self, uuid):
         try:
-            url = f"{self.endpoint}/core-api-metrics/projects-details/{uuid}"
-            resp = requests.get(url, headers=self.headers, timeout=15)
-            resp.raise_for_status()
-            return resp.json().get("results", [])[0]
+            return self.client.get_results(f"projects-details/{uuid}")[0]
         except Exception as e:
             self.logger.error(f"Error fetching details for project {uuid}: {e}")
             traceback.print_exc()
             return None
 
-    def sync_projects(self, db_mgr):
+    def write_projects(self, db_mgr, projects: list) -> int:
+        """Write a batch of project details with one upsert."""
+        try:
+            db_mgr.add_or_update_projects([{
+                "project_uuid": detail.get("uuid"),
+                "project_name": detail.get("name"),
+                "project_type": detail.get("project_type"),
+                "active": detail.get("active"),
+                "created_date": _timestamp(detail, "created_date"),
+                "expires_on": _timestamp(detail, "expires_on"),
+                "retired_date": _timestamp(detail, "retired_date"),
+                "last_updated": _timestamp(detail, "last_updated")
+            } for detail in projects])
+            for detail in projects:
+                self.logger.info(f"Updated project: {detail.get('name')} ({detail.get('uuid')})")
+            return len(projects)
+        except Exception as e:
+            self.logger.error(f"Failed to update {len(projects)} projects: {e}")
+            traceback.print_exc()
+            return 0
+
+    def sync_projects(self, db_mgr, incremental: bool = False) -> dict:
+        """
+        Fetch projects' details concurrently and write them in batches while the next ones are
+        being fetched. The "projects" watermark is advanced when every project was written.
+
+        :param incremental: only fetch projects updated since the last successful sync
+        :return: projects listed, fetched and updated, requests made, elapsed seconds and projects per second
+        """
+        started, requests_before = time.monotonic(), self.client.requests
         projects = self.fetch_project_list()
         if not projects:
             self.logger.warning("No projects retrieved from API.")
-            return
+            return {"projects": 0, "updated": 0}
 
-        updated_count = 0
-        for entry in projects:
-            uuid = entry.get("uuid")
-            detail = self.fetch_project_detail(uuid)
+        changed, newest = changed_since(projects, db_mgr.get_sync_watermark("projects") if incremental else None)
+        updated_count = failed = 0
+        batch = []
+        for i, (uuid, detail) in enumerate(self.client.map(self.fetch_project_detail,
+                                                           [e.get("uuid") for e in changed])):
             if not detail:
-                continue
-
-            try:
-                db_mgr.add_or_update_project(
-                    project_uuid=detail.get("uuid"),
-                    project_name=detail.get("name"),
-                    project_type=detail.get("project_type"),
-                    active=detail.get("active"),
-                    created_date=isoparse(detail["created_date"]) if detail.get("created_date") else None,
-                    expires_on=isoparse(detail["expires_on"]) if detail.get("expires_on") else None,
-                    retired_date=isoparse(detail["retired_date"]) if detail.get("retired_date") else None,
-                    last_updated=isoparse(detail["last_updated"]) if detail.get("last_updated") else None
-                )
-                updated_count += 1
-                self.logger.info(f"Updated project: {detail.get('name')} ({uuid})")
-            except Exception as e:
-                self.logger.error(f"Failed to update project {uuid}: {e}")
-                traceback.print_exc()
-
-        self.logger.info(f"Total projects updated: {updated_count}")
+                failed += 1
+            else:
+                batch.append(detail)
+            if batch and (len(batch) >= self.batch_size or i == len(changed) - 1):
+                written = self.write_projects(db_mgr, batch)
+                failed += len(batch) - written
+                updated_count += written
+                batch = []
+
+        if failed:
+            self.logger.warning(f"{failed} projects failed; projects watermark not advanced")
+        else:
+            db_mgr.set_sync_watermark("projects", newest)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        requests_made = self.client.requests - requests_before
+        stats = {"projects": len(projects), "fetched": len(changed), "updated": updated_count, "failed": failed,
+                 "requests": requests_made, "seconds": round(elapsed, 3),
+                 "projects_per_second": round(len(changed) / elapsed, 1)}
+        self.logger.info(f"Total projects updated: {updated_count} of {len(projects)}; "
+                         f"{stats['projects_per_second']} projects/s, {requests_made / elapsed:.1f} requests/s")
+        return stats
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Sync users and projects from FABRIC Core API to Reports DB")
     parser.add_argument("--config", required=True, help="Path to YAML config file with core_api.host and token")
+    parser.add_argument("--full", action="store_true",
+                        help="Fetch every user and project instead of those updated since the last sync")
 
     args = parser.parse_args()
     config_path = Path(args.config)
@@ -246,7 +418,16 @@ if __name__ == "__main__":
         logger=logger
     )
 
+    client = CoreApiClient(endpoint, token,
+                           concurrency=core_api_cfg.get("concurrency", 8),
+                           rate_limit=core_api_cfg.get("rate_limit", 20),
+                           retries=core_api_cfg.get("retries", 3))
+    batch_size = core_api_cfg.get("batch_size", 200)
+
     logger.info("Starting sync for users and projects...")
-    ProjectSyncScript(endpoint, token, logger).sync_projects(db_mgr)
-    UserSyncScript(endpoint, token, logger).sync_users(db_mgr)
+    ProjectSyncScript(endpoint, token, logger, client=client,
+                      batch_size=batch_size).sync_projects(db_mgr, incremental=not args.full)
+    UserSyncScript(endpoint, token, logger, client=client,
+                   batch_size=batch_size).sync_users(db_mgr, incremental=not args.full)
+    client.close()
     logger.info("Completed sync.")
\ No newline at end of file
@@ -1,9 +1,16 @@
 import requests
 import json
 import os
+import time
+from datetime import datetime, timedelta
+
+CALENDAR_INTERVALS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
 
 
 class ReportsApi:
+    # Records per request of post_users_bulk() / post_projects_bulk(), the server's limit
+    BULK_MAX_RECORDS = 10000
+
     def __init__(self, base_url: str, token_file: str = None, token: str = None):
         self.base_url = base_url.rstrip("/")
         if token:
@@ -639,7 +646,7 @@ class ReportsApi:
         :type sliver_id: str
         :param sliver_payload: Dictionary containing the sliver specification
         :type sliver_payload: dict
-        :return: Server response as a dictionary
+        :return: Server response as a dictionary; status 202 when the server queues writes
         :rtype: dict
 
         Example sliver dictionary:
@@ -696,11 +703,76 @@ class ReportsApi:
 
         response = requests.post(url, headers=headers, json=sliver_payload)
 
-        if response.status_code in (200, 201):
+        if response.status_code in (200, 201, 202):
             return response.json()
         else:
             raise Exception(f"Failed to post sliver: {response.status_code} - {response.text}")
 
+    def post_slivers(self, slice_id: str, sliver_payloads: list) -> dict:
+        """
+        Create or update several slivers of one slice in a single request and transaction.
+
+        :param slice_id: UUID of the slice
+        :type slice_id: str
+        :param sliver_payloads: Sliver specifications as taken by post_sliver(); at most 500
+        :type sliver_payloads: list
+        :return: Per-sliver status ("created", "updated", "unchanged" or "rejected" with details) and counts
+        :rtype: dict
+        """
+        url = f"{self.base_url}/slices/{slice_id}/slivers"
+
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+
+        response = requests.post(url, headers=headers, json=sliver_payloads)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Failed to post slivers: {response.status_code} - {response.text}")
+
+    def _post_bulk(self, path: str, records: list) -> dict:
+        """POST records in requests of at most BULK_MAX_RECORDS and combine the responses."""
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+
+        combined = {"results": [], "total": 0, "created": 0, "updated": 0, "unchanged": 0, "rejected": 0}
+        for start in range(0, len(records), self.BULK_MAX_RECORDS):
+            response = requests.post(f"{self.base_url}/{path}", headers=headers,
+                                     json=records[start:start + self.BULK_MAX_RECORDS])
+            if response.status_code != 200:
+                raise Exception(f"Failed to post {path}: {response.status_code} - {response.text}")
+            result = response.json()
+            combined["results"].extend(result.get("results", []))
+            for key in ("total", "created", "updated", "unchanged", "rejected"):
+                combined[key] += result.get(key, 0)
+        return combined
+
+    def post_users_bulk(self, users: list) -> dict:
+        """
+        Create or update many users, upserted server-side with one statement per batch.
+
+        :param users: user records with user_uuid and optionally user_email, active, name, affiliation,
+            registered_on, last_updated, google_scholar, scopus and bastion_login; user_email is
+            required for users not stored yet
+        :type users: list
+        :return: Per-user status ("created", "updated", "unchanged" or "rejected" with details) and counts
+        :rtype: dict
+        """
+        return self._post_bulk("users/bulk", users)
+
+    def post_projects_bulk(self, projects: list) -> dict:
+        """
+        Create or update many projects, upserted server-side with one statement per batch.
+
+        :param projects: project records with project_uuid and optionally project_name, project_type,
+            active, created_date, expires_on, retired_date and last_updated
+        :type projects: list
+        :return: Per-project status ("created", "updated", "unchanged" or "rejected" with details) and counts
+        :rtype: dict
+        """
+        return self._post_bulk("projects/bulk", projects)
+
     def post_slice(self, slice_id: str, slice_payload: dict):
         """
         Create or update a slice.
@@ -709,7 +781,7 @@ class ReportsApi:
         :type slice_id: str
         :param slice_payload: Dictionary containing the slice specification
         :type slice_payload: dict
-        :return: Server response as a dictionary
+        :return: Server response as a dictionary; status 202 when the server queues writes
         :rtype: dict
 
         Example slice_payload:
@@ -730,7 +802,7 @@ class ReportsApi:
 
         response = requests.post(url, headers=headers, json=slice_payload)
 
-        if response.status_code in (200, 201):
+        if response.status_code in (200, 201, 202):
             return response.json()
         else:
             raise Exception(f"Failed to post slice: {response.status_code} - {response.text}")
@@ -821,7 +893,9 @@ class ReportsApi:
 
     def query_calendar(self, start_time: str, end_time: str, interval: str = "day",
                        site: list[str] = None, host: list[str] = None,
-                       exclude_site: list[str] = None, exclude_host: list[str] = None) -> dict:
+                       exclude_site: list[str] = None, exclude_host: list[str] = None,
+                       engine: str = None, format: str = None, level: str = None,
+                       decode: bool = True) -> dict:
         """
         Query the resource availability calendar.
 
@@ -832,6 +906,10 @@ class ReportsApi:
         :param host: List of hosts to include
         :param exclude_site: List of sites to exclude
         :param exclude_host: List of hosts to exclude
+        :param engine: Aggregation engine ('python' or 'sql'; default: server configuration)
+        :param format: Wire format ('full', 'compact' or 'changes'; default: 'full')
+        :param level: Aggregation level ('host' or 'site'; 'site' returns site totals only)
+        :param decode: Expand 'compact' and 'changes' responses into the 'full' layout
         :return: Calendar response dict with 'data', 'interval', 'query_start', 'query_end', 'total'
         """
         url = f"{self.base_url}/calendar"
@@ -844,16 +922,115 @@ class ReportsApi:
             "host": host,
             "exclude_site": exclude_site,
             "exclude_host": exclude_host,
+            "engine": engine,
+            "format": format,
+            "level": level,
         }
         filtered_params = {k: v for k, v in params.items() if v is not None}
 
         response = requests.get(url, headers=self.headers, params=filtered_params)
 
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            return self.decode_calendar(result) if decode else result
         else:
             raise Exception(f"Failed to fetch calendar: {response.status_code} - {response.text}")
 
+    def stream_calendar(self, start_time: str, end_time: str, interval: str = "day",
+                        site: list[str] = None, host: list[str] = None,
+                        exclude_site: list[str] = None, exclude_host: list[str] = None,
+                        engine: str = None, format: str = None, level: str = None):
+        """
+        Stream the resource availability calendar as NDJSON and yield one slot at a time,
+        in the 'full' slot layout, as the server produces them. Parameters as for query_calendar;
+        'compact' and 'changes' only reduce what is sent over the wire.
+        """
+        url = f"{self.base_url}/calendar"
+
+        params = {
+            "start_time": start_time,
+            "end_time": end_time,
+            "interval": interval,
+            "site": site,
+            "host": host,
+            "exclude_site": exclude_site,
+            "exclude_host": exclude_host,
+            "engine": engine,
+            "format": format,
+            "level": level,
+        }
+        filtered_params = {k: v for k, v in params.items() if v is not None}
+
+        headers = self.headers.copy()
+        headers["Accept"] = "application/x-ndjson"
+
+        with requests.get(url, headers=headers, params=filtered_params, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch calendar: {response.status_code} - {response.text}")
+            items = (json.loads(line) for line in response.iter_lines() if line)
+            header = next(items)
+            yield from self._calendar_slots(header, items)
+
+    @staticmethod
+    def decode_calendar(result: dict) -> dict:
+        """
+        Expand a 'compact' or 'changes' calendar response into the 'full' layout;
+        'full' responses are returned unchanged.
+        """
+        fmt = result.get("format")
+        if fmt not in ("compact", "changes"):
+            return result
+
+        items = result["allocations"] if fmt == "compact" else result["changes"]
+        data = list(ReportsApi._calendar_slots(result, items))
+        return {"data": data, "interval": result["interval"], "query_start": result["query_start"],
+                "query_end": result["query_end"], "total": len(data)}
+
+    @staticmethod
+    def _calendar_slots(header: dict, items):
+        """
+        Yield full-layout slots from the items that follow a calendar header: full slots,
+        compact records or change runs.
+        """
+        fmt = header.get("format", "full")
+
+        def expand(cap: dict, row: list) -> dict:
+            entry = {k: v for k, v in cap.items() if k != "components"}
+            for n, field in enumerate(("cores", "ram", "disk")):
+                entry[f"{field}_allocated"] = row[n]
+                entry[f"{field}_available"] = cap[f"{field}_capacity"] - row[n]
+            entry["components"] = {key: {"capacity": capacity, "allocated": row[3 + n],
+                                         "available": capacity - row[3 + n]}
+                                   for n, (key, capacity) in enumerate(cap["components"].items())}
+            return entry
+
+        query_end = datetime.fromisoformat(header["query_end"])
+        delta = CALENDAR_INTERVALS[header["interval"]]
+        slot_start = datetime.fromisoformat(header["query_start"])
+        for item in items:
+            if "error" in item:
+                raise Exception(f"Failed to fetch calendar: {item['error']}")
+            if fmt == "full":
+                yield item
+                continue
+            record = {k: v for k, v in item.items() if k not in ("slot", "count")}
+            for _ in range(item.get("count", 1)):
+                slot_end = min(slot_start + delta, query_end)
+                entry = {"start": slot_start.isoformat(), "end": slot_end.isoformat()}
+                if "hosts" in record:
+                    entry["hosts"] = [expand(cap, row) for cap, row in zip(header["hosts"], record["hosts"])]
+                entry["sites"] = [expand(cap, row) for cap, row in zip(header["sites"], record["sites"])]
+                if record.get("links"):
+                    entry["links"] = [dict(cap, bandwidth_allocated=allocated,
+                                           bandwidth_available=cap["bandwidth_capacity"] - allocated)
+                                      for cap, allocated in zip(header["links"], record["links"])]
+                if record.get("facility_ports"):
+                    entry["facility_ports"] = [dict(cap, vlans_allocated=allocated, vlans_available=available)
+                                               for cap, (allocated, available) in
+                                               zip(header["facility_ports"], record["facility_ports"])]
+                yield entry
+                slot_start = slot_end
+
     def find_slot(self, start_time: str, end_time: str, duration: int,
                   resources: list, max_results: int = 1) -> dict:
         """
@@ -886,6 +1063,140 @@ class ReportsApi:
         else:
             raise Exception(f"Failed to find slot: {response.status_code} - {response.text}")
 
+    def find_slot_batch(self, batch: list, joint: bool = False) -> dict:
+        """
+        Evaluate several find-slot requests against one capacity and occupancy snapshot.
+
+        :param batch: List of find-slot payloads, each with 'start', 'end', 'duration', 'resources'
+                         and optionally 'max_results'; start times must be whole hours apart
+        :param joint: Grant requests in order so the windows returned all fit together
+        :return: Dict with 'results' (one find_slot result per request), 'total', 'joint'
+                 and, in joint mode, 'feasible'
+        """
+        url = f"{self.base_url}/calendar/find-slot/batch"
+
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+
+        response = requests.post(url, headers=headers, json={"requests": batch, "joint": joint})
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Failed to find slots: {response.status_code} - {response.text}")
+
+    def submit_find_slot_job(self, start_time: str, end_time: str, duration: int,
+                             resources: list, max_results: int = 1) -> dict:
+        """
+        Run find_slot as a background job, for ranges and result counts beyond the
+        synchronous limits. Poll the returned job with get_job() / wait_for_job().
+
+        :return: Job dict with 'id', 'kind', 'status', 'progress'
+        """
+        url = f"{self.base_url}/calendar/find-slot/jobs"
+
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+
+        payload = {
+            "start": start_time,
+            "end": end_time,
+            "duration": duration,
+            "resources": resources,
+            "max_results": max_results
+        }
+
+        response = requests.post(url, headers=headers, json=payload)
+
+        if response.status_code == 202:
+            return response.json()
+        else:
+            raise Exception(f"Failed to submit find slot job: {response.status_code} - {response.text}")
+
+    def submit_calendar_job(self, start_time: str, end_time: str, interval: str = "day",
+                            site: list[str] = None, host: list[str] = None,
+                            exclude_site: list[str] = None, exclude_host: list[str] = None,
+                            engine: str = None, format: str = None, level: str = None) -> dict:
+        """
+        Compute a calendar as a background job; parameters as for query_calendar.
+        Poll the returned job with get_job() / wait_for_job().
+
+        :return: Job dict with 'id', 'kind', 'status', 'progress'
+        """
+        url = f"{self.base_url}/calendar/jobs"
+
+        headers = self.headers.copy()
+        headers["Content-Type"] = "application/json"
+
+        payload = {
+            "start_time": start_time,
+            "end_time": end_time,
+            "interval": interval,
+            "site": site,
+            "host": host,
+            "exclude_site": exclude_site,
+            "exclude_host": exclude_host,
+            "engine": engine,
+            "format": format,
+            "level": level,
+        }
+        payload = {k: v for k, v in payload.items() if v is not None}
+
+        response = requests.post(url, headers=headers, json=payload)
+
+        if response.status_code == 202:
+            return response.json()
+        else:
+            raise Exception(f"Failed to submit calendar job: {response.status_code} - {response.text}")
+
+    def get_job(self, job_id: str) -> dict:
+        """
+        Status of a background job: 'queued', 'running', 'cancelling', 'completed' (with 'result'),
+        'failed' (with 'error') or 'cancelled'; 'progress' has 'hours_scanned' and 'total_hours'.
+        """
+        url = f"{self.base_url}/calendar/jobs/{job_id}"
+
+        response = requests.get(url, headers=self.headers)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Failed to fetch job: {response.status_code} - {response.text}")
+
+    def cancel_job(self, job_id: str) -> dict:
+        """
+        Cancel a queued or running job, or discard the result of a finished one.
+        """
+        url = f"{self.base_url}/calendar/jobs/{job_id}"
+
+        response = requests.delete(url, headers=self.headers)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"Failed to cancel job: {response.status_code} - {response.text}")
+
+    def wait_for_job(self, job_id: str, poll_interval: float = 5.0, timeout: float = None,
+                     decode: bool = True) -> dict:
+        """
+        Poll a job until it finishes and return its result.
+
+        :param poll_interval: Seconds between polls
+        :param timeout: Give up after this many seconds (default: wait indefinitely)
+        :param decode: Expand 'compact' and 'changes' calendar results into the 'full' layout
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = self.get_job(job_id)
+            if job["status"] == "completed":
+                result = job["result"]
+                return self.decode_calendar(result) if decode and job["kind"] == "calendar" else result
+            if job["status"] in ("failed", "cancelled"):
+                raise Exception(f"Job {job_id} {job['status']}: {job.get('error', '')}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout} seconds")
+            time.sleep(poll_interval)
+
     def post_host_capacity(self, host_name: str, capacity_payload: dict) -> dict:
         """
         Create or update host capacity data.
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for POST /users/bulk and POST /projects/bulk, and the matching ReportsApi methods.
+
+The endpoint tests use a Flask test client with the database manager mocked out.
+"""
+import json
+import logging
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+import connexion
+from flask_testing import TestCase
+
+from reports_api.response_code import utils
+from reports_api.security.fabric_token import FabricToken
+from reports_client.fabric_reports_client.reports_api import ReportsApi
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_bulk_upsert")
+
+
+def record_statuses(rows, statuses, stored=("u-2",)):
+    """add_or_update_users stand-in: u-1 is new, stored users are unchanged, email-less new users are left out"""
+    for row in rows:
+        if row["user_uuid"] in stored:
+            statuses[row["user_uuid"]] = "unchanged"
+        elif row.get("user_email"):
+            statuses[row["user_uuid"]] = "created"
+    return {uuid: n for n, uuid in enumerate(statuses)}
+
+
+@patch('reports_api.response_code.users_controller.authorize', return_value={})
+@patch('reports_api.response_code.users_controller.GlobalsSingleton')
+@patch('reports_api.response_code.users_controller.DatabaseManager')
+class TestUsersBulkEndpoint(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def _post(self, mock_db, mock_gs, body):
+        mock_gs.get.return_value = _mock_globals
+        db_mgr = MagicMock()
+        db_mgr.add_or_update_users.side_effect = record_statuses
+        mock_db.return_value = db_mgr
+        response = self.client.post('/reports/users/bulk', data=json.dumps(body), content_type='application/json',
+                                    headers={'Authorization': 'Bearer special-key'})
+        return response, db_mgr
+
+    def test_records_are_validated_and_counted(self, mock_db, mock_gs, mock_auth):
+        response, db_mgr = self._post(mock_db, mock_gs, [
+            {"user_uuid": "u-1", "user_email": "a@example.com", "registered_on": "2024-01-01T00:00:00Z"},
+            {"user_uuid": "u-2", "active": True},
+            {"user_uuid": "u-3"},
+            {"user_uuid": "u-1", "user_email": "b@example.com"},
+            {"user_uuid": "u-4", "registered_on": "yesterday"},
+            {"user_uuid": "u-5", "nickname": "x"}])
+        self.assert200(response)
+        result = json.loads(response.data)
+        self.assertEqual([(r["uuid"], r["status"]) for r in result["results"]],
+                         [("u-1", "created"), ("u-2", "unchanged"), ("u-3", "rejected"), ("u-1", "rejected"),
+                          ("u-4", "rejected"), ("u-5", "rejected")])
+        self.assertEqual(result["results"][2]["details"], "'user_email' is required for users not stored yet")
+        self.assertEqual((result["total"], result["created"], result["updated"], result["unchanged"],
+                          result["rejected"]), (6, 1, 0, 1, 4))
+
+        [call] = db_mgr.add_or_update_users.call_args_list
+        rows = call.args[0]
+        self.assertEqual([r["user_uuid"] for r in rows], ["u-1", "u-2", "u-3"])
+        self.assertEqual(rows[0]["registered_on"], datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def test_records_are_written_in_batches(self, mock_db, mock_gs, mock_auth):
+        with patch.object(utils, "BULK_BATCH_SIZE", 2):
+            response, db_mgr = self._post(mock_db, mock_gs, [{"user_uuid": f"u-{n}", "user_email": "a@example.com"}
+                                                             for n in range(10, 15)])
+        self.assertEqual(json.loads(response.data)["created"], 5)
+        self.assertEqual([len(c.args[0]) for c in db_mgr.add_or_update_users.call_args_list], [2, 2, 1])
+
+    def test_empty_body_is_rejected(self, mock_db, mock_gs, mock_auth):
+        response, db_mgr = self._post(mock_db, mock_gs, [])
+        self.assert400(response)
+        db_mgr.add_or_update_users.assert_not_called()
+
+    def test_fabric_token_is_not_authorized(self, mock_db, mock_gs, mock_auth):
+        mock_auth.return_value = FabricToken(decoded_token={"uuid": "u-9", "email": "bob@example.com"},
+                                             token_hash="h")
+        response, db_mgr = self._post(mock_db, mock_gs, [{"user_uuid": "u-1", "user_email": "a@example.com"}])
+        self.assert401(response)
+        db_mgr.add_or_update_users.assert_not_called()
+
+
+@patch('reports_api.response_code.projects_controller.authorize', return_value={})
+@patch('reports_api.response_code.projects_controller.GlobalsSingleton')
+@patch('reports_api.response_code.projects_controller.DatabaseManager')
+class TestProjectsBulkEndpoint(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def test_projects(self, mock_db, mock_gs, mock_auth):
+        mock_gs.get.return_value = _mock_globals
+        db_mgr = MagicMock()
+        db_mgr.add_or_update_projects.side_effect = lambda rows, statuses: statuses.update(
+            {r["project_uuid"]: "updated" for r in rows})
+        mock_db.return_value = db_mgr
+        post = lambda body: self.client.post('/reports/projects/bulk', content_type='application/json',
+                                             data=json.dumps(body), headers={'Authorization': 'Bearer special-key'})
+        response = post([{"project_uuid": "p-1", "project_name": "Edge AI"},
+                         {"project_uuid": "p-2", "expires_on": "soon"}])
+        self.assert200(response)
+        result = json.loads(response.data)
+        self.assertEqual((result["updated"], result["rejected"]), (1, 1))
+        self.assertEqual(result["results"][1]["details"], "'expires_on' must be an ISO 8601 timestamp")
+
+        # Records that do not match the schema fail the whole request
+        self.assert400(post([{"project_uuid": "p-1", "active": "yes"}]))
+        self.assertEqual(db_mgr.add_or_update_projects.call_count, 1)
+
+
+class TestReportsApiBulk(unittest.TestCase):
+
+    def test_large_pushes_are_split_and_combined(self):
+        api = ReportsApi("http://reports/reports", token="t")
+        api.BULK_MAX_RECORDS = 2
+
+        def post(url, headers, json):
+            response = MagicMock(status_code=200)
+            response.json.return_value = {"results": [{"uuid": r["user_uuid"], "status": "created"} for r in json],
+                                          "total": len(json), "created": len(json)}
+            return response
+        with patch("reports_client.fabric_reports_client.reports_api.requests.post", side_effect=post) as mock_post:
+            result = api.post_users_bulk([{"user_uuid": f"u-{n}"} for n in range(5)])
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_post.call_args.args[0], "http://reports/reports/users/bulk")
+        self.assertEqual((result["total"], result["created"], result["rejected"]), (5, 5, 0))
+        self.assertEqual(len(result["results"]), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
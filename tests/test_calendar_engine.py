@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the calendar aggregation engines.
+
+The Python engine's per-slot aggregation is tested with mock data objects.
+The differential test between the Python and SQL engines needs PostgreSQL; it
+runs only when REPORTS_TEST_DB_HOST is set (with REPORTS_TEST_DB_USER,
+REPORTS_TEST_DB_PASSWORD and REPORTS_TEST_DB_NAME), and removes the rows it creates.
+"""
+import logging
+import os
+import random
+import unittest
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from reports_api.database import Components, Hosts, HostCapacities, Sites, Slivers
+from reports_api.database.db_manager import DatabaseManager
+
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "core", "ram", "disk", "lease_start", "lease_end"])
+
+
+def dt(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+class TestPythonAllocationBySlot(unittest.TestCase):
+
+    def test_slot_overlap(self):
+        slots = [(dt(2025, 7, 1), dt(2025, 7, 2)), (dt(2025, 7, 2), dt(2025, 7, 3)), (dt(2025, 7, 3), dt(2025, 7, 4))]
+        slivers = [SliverRow(1, 10, 4, 8, 100, dt(2025, 7, 1, 12), dt(2025, 7, 2)),
+                   SliverRow(2, 10, 2, None, 10, dt(2025, 7, 1, 23), dt(2025, 7, 3, 1))]
+        comp_by_sliver = {2: [("GPU-A100", "guid-1"), ("GPU-A100", "guid-2")]}
+        allocs = DatabaseManager._compute_allocation_by_slot(slots, slivers, comp_by_sliver)
+        self.assertEqual(len(allocs), 3)
+        self.assertEqual(allocs[0][0][10], {"cores": 6, "ram": 8, "disk": 110})
+        self.assertEqual(allocs[1][0][10], {"cores": 2, "ram": 0, "disk": 10})
+        self.assertEqual(allocs[2][0][10], {"cores": 2, "ram": 0, "disk": 10})
+        self.assertEqual(allocs[1][1][10], {"GPU-A100": 2})
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestCalendarEnginesAgree(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_calendar_engine"))
+        self.prefix = f"engine-test-{uuid.uuid4().hex[:8]}"
+        self.sites = [f"{self.prefix}-A", f"{self.prefix}-B"]
+        rng = random.Random(5)
+        session = self.db.get_session()
+        for n in range(4):
+            self.db.add_or_update_host_capacity(host_name=f"{self.prefix}-h{n}", site_name=self.sites[n % 2],
+                                                cores=64, ram=256, disk=2000,
+                                                components={"GPU-A100": 2, "SmartNIC-ConnectX-6": 2})
+        host_ids = [h.id for h in session.query(Hosts).filter(Hosts.name.like(f"{self.prefix}-%")).all()]
+        base = dt(2025, 7, 1)
+        for n in range(60):
+            start = base + timedelta(minutes=rng.randrange(-2000, 20000))
+            sliver = Slivers(host_id=rng.choice(host_ids), sliver_guid=f"{self.prefix}-s{n}",
+                             state=rng.choice([1, 2, 3, 4, 5, 6]), sliver_type="vm",
+                             core=rng.choice([None, 2, 8]), ram=rng.randrange(0, 64), disk=rng.randrange(0, 500),
+                             lease_start=start, lease_end=start + timedelta(minutes=rng.randrange(1, 5000)))
+            session.add(sliver)
+            session.flush()
+            for c in range(rng.randrange(0, 3)):
+                comp_type, model = rng.choice([("GPU", "A100"), ("SmartNIC", "ConnectX-6"), ("NVME", None)])
+                session.add(Components(sliver_id=sliver.id, component_guid=f"{self.prefix}-s{n}-c{c}",
+                                       type=comp_type, model=model))
+        session.commit()
+
+    def tearDown(self):
+        session = self.db.get_session()
+        sliver_ids = [s.id for s in session.query(Slivers.id).filter(Slivers.sliver_guid.like(f"{self.prefix}-%"))]
+        session.query(Components).filter(Components.sliver_id.in_(sliver_ids)).delete(synchronize_session=False)
+        session.query(Slivers).filter(Slivers.id.in_(sliver_ids)).delete(synchronize_session=False)
+        host_ids = [h.id for h in session.query(Hosts.id).filter(Hosts.name.like(f"{self.prefix}-%"))]
+        session.query(HostCapacities).filter(HostCapacities.host_id.in_(host_ids)).delete(synchronize_session=False)
+        session.query(Hosts).filter(Hosts.id.in_(host_ids)).delete(synchronize_session=False)
+        session.query(Sites).filter(Sites.name.in_(self.sites)).delete(synchronize_session=False)
+        session.commit()
+
+    def test_engines_agree(self):
+        for interval, end in (("hour", dt(2025, 7, 3, 5)), ("day", dt(2025, 7, 12)), ("week", dt(2025, 7, 30))):
+            with self.subTest(interval=interval):
+                kwargs = dict(start_time=dt(2025, 7, 1, 3), end_time=end, interval=interval, site=self.sites)
+                self.assertEqual(self.db.get_calendar(engine="python", **kwargs),
+                                 self.db.get_calendar(engine="sql", **kwargs))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            self.db.get_calendar(start_time=dt(2025, 7, 1), end_time=dt(2025, 7, 2), engine="spark")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the calendar response formats and the client-side decoding of them.
+
+Layouts and slot records are built from mock capacity maps; no database required.
+"""
+import json
+import unittest
+
+from reports_api.database.calendar_format import CalendarLayout, changes
+from reports_client.fabric_reports_client.reports_api import ReportsApi
+
+
+HOST_CAP_MAP = {
+    1: {"name": "renc-w1", "site": "RENC", "cores_capacity": 64, "ram_capacity": 256, "disk_capacity": 2000,
+        "components": {"GPU-A100": 2, "SmartNIC-ConnectX-6": 2}},
+    2: {"name": "renc-w2", "site": "RENC", "cores_capacity": 32, "ram_capacity": 128, "disk_capacity": 1000,
+        "components": {"GPU-A100": 1}},
+    3: {"name": "uky-w1", "site": "UKY", "cores_capacity": 16, "ram_capacity": 64, "disk_capacity": 500,
+        "components": {}},
+}
+LINK_CAP_MAP = {("RENC", "UKY"): {"name": "RENC-UKY", "site_a": "RENC", "site_b": "UKY", "layer": "L2",
+                                  "bandwidth_capacity": 100}}
+FP_CAP_MAP = {("Cloud-FP", "RENC", "dev", "port"): {"name": "Cloud-FP", "site": "RENC", "device_name": "dev",
+                                                    "local_name": "port", "vlan_range": "100-103",
+                                                    "total_vlans": 4}}
+QUERY_START = "2025-07-01T00:00:00+00:00"
+QUERY_END = "2025-07-01T05:30:00+00:00"
+SLOTS = [(f"2025-07-01T0{h}:00:00+00:00", f"2025-07-01T0{h + 1}:00:00+00:00") for h in range(5)] + \
+        [("2025-07-01T05:00:00+00:00", QUERY_END)]
+
+
+def slot_inputs():
+    """(alloc_map, comp_alloc_map, links, facility_ports) per slot; slots 1-3 are identical."""
+    busy = ({1: {"cores": 8, "ram": 32, "disk": 100}, 3: {"cores": 2, "ram": 4, "disk": 10}},
+            {1: {"gpu-a100": 1}}, [25], [[["101"], "100,102-103"]])
+    idle = ({}, {}, [0], [[[], "100-103"]])
+    return [idle, busy, busy, busy, idle, busy]
+
+
+def records(layout):
+    return [layout.record(*inputs) for inputs in slot_inputs()]
+
+
+def wire(result):
+    """What the client receives: the controller serialises with sort_keys."""
+    return json.loads(json.dumps(result, sort_keys=True))
+
+
+class TestCalendarFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.layout = CalendarLayout(HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP)
+        self.full = self.layout.response("full", SLOTS, records(self.layout), interval="hour",
+                                         query_start=QUERY_START, query_end=QUERY_END)
+
+    def test_full_slot(self):
+        slot = self.full["data"][1]
+        w1 = slot["hosts"][0]
+        self.assertEqual(w1["cores_allocated"], 8)
+        self.assertEqual(w1["cores_available"], 56)
+        self.assertEqual(w1["components"]["GPU-A100"], {"capacity": 2, "allocated": 1, "available": 1})
+        self.assertEqual(w1["components"]["SmartNIC-ConnectX-6"], {"capacity": 2, "allocated": 0, "available": 2})
+        renc = slot["sites"][0]
+        self.assertEqual((renc["name"], renc["cores_capacity"], renc["cores_allocated"]), ("RENC", 96, 8))
+        self.assertEqual(renc["components"]["GPU-A100"], {"capacity": 3, "allocated": 1, "available": 2})
+        self.assertEqual(slot["links"][0]["bandwidth_available"], 75)
+        self.assertEqual(slot["facility_ports"][0]["vlans_allocated"], ["101"])
+        self.assertEqual(self.full["total"], 6)
+
+    def test_changes_are_run_length_encoded(self):
+        runs = changes(records(self.layout))
+        self.assertEqual([(run["slot"], run["count"]) for run in runs], [(0, 1), (1, 3), (4, 1), (5, 1)])
+
+    def test_client_decodes_compact_and_changes(self):
+        for fmt in ("compact", "changes"):
+            with self.subTest(format=fmt):
+                result = wire(self.layout.response(fmt, SLOTS, records(self.layout), interval="hour",
+                                                   query_start=QUERY_START, query_end=QUERY_END))
+                self.assertEqual(result["format"], fmt)
+                self.assertEqual(ReportsApi.decode_calendar(result), wire(self.full))
+
+    def test_site_level(self):
+        site_layout = CalendarLayout(HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP, level="site")
+        site_records = records(site_layout)
+        self.assertNotIn("hosts", site_records[1])
+        self.assertEqual([r["sites"] for r in site_records], [r["sites"] for r in records(self.layout)])
+
+        result = wire(site_layout.response("changes", SLOTS, site_records, interval="hour",
+                                           query_start=QUERY_START, query_end=QUERY_END))
+        self.assertNotIn("hosts", result)
+        decoded = ReportsApi.decode_calendar(result)
+        self.assertEqual([slot["sites"] for slot in decoded["data"]],
+                         [slot["sites"] for slot in wire(self.full)["data"]])
+
+    def test_full_response_is_passed_through(self):
+        self.assertIs(ReportsApi.decode_calendar(self.full), self.full)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming the calendar as NDJSON / Server-Sent Events.
+
+The controller is called through a Flask test client with the database manager
+mocked out; its stream is produced from mock records by CalendarLayout.stream.
+"""
+import json
+import logging
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+
+import connexion
+from flask_testing import TestCase
+
+from reports_api.database.calendar_format import CalendarLayout
+from reports_api.database.db_manager import DatabaseManager
+from reports_client.fabric_reports_client.reports_api import ReportsApi
+from tests.test_calendar_format import HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP, QUERY_START, QUERY_END, SLOTS, \
+    records
+
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_calendar_stream")
+_mock_globals.config.runtime_config = {}
+
+
+def mock_stream(**kwargs):
+    layout = CalendarLayout(HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP, level=kwargs["level"])
+    rows = ((slot_start, slot_end, record) for (slot_start, slot_end), record in zip(SLOTS, records(layout)))
+    return layout.stream(kwargs["fmt"], rows, interval="hour", query_start=QUERY_START, query_end=QUERY_END,
+                         total=len(SLOTS))
+
+
+def full_slots():
+    layout = CalendarLayout(HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP)
+    result = layout.response("full", SLOTS, records(layout), interval="hour",
+                             query_start=QUERY_START, query_end=QUERY_END)
+    return json.loads(json.dumps(result["data"], sort_keys=True))
+
+
+@patch('reports_api.response_code.calendar_controller.authorize', return_value={"sub": "test"})
+@patch('reports_api.response_code.calendar_controller.GlobalsSingleton')
+@patch('reports_api.response_code.calendar_controller._get_db_manager')
+class TestCalendarStream(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def _get(self, accept, **params):
+        query = {"start_time": QUERY_START, "end_time": QUERY_END, "interval": "hour", **params}
+        return self.client.get('/reports/calendar', query_string=query,
+                               headers={'Accept': accept, 'Authorization': 'Bearer special-key'})
+
+    def _setup(self, mock_db, mock_gs):
+        mock_gs.get.return_value = _mock_globals
+        db_mgr = MagicMock()
+        db_mgr.stream_calendar.side_effect = mock_stream
+        mock_db.return_value = db_mgr
+        return db_mgr
+
+    def test_ndjson(self, mock_db, mock_gs, mock_auth):
+        self._setup(mock_db, mock_gs)
+        response = self._get("application/x-ndjson")
+        self.assert200(response)
+        self.assertTrue(response.content_type.startswith("application/x-ndjson"))
+        self.assertEqual(response.headers["X-Accel-Buffering"], "no")
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(lines[0]["total"], len(SLOTS))
+        self.assertEqual(lines[1:], full_slots())
+
+    def test_event_stream_of_changes(self, mock_db, mock_gs, mock_auth):
+        self._setup(mock_db, mock_gs)
+        response = self._get("text/event-stream", format="changes")
+        self.assert200(response)
+        events = [block.split("\n") for block in response.data.decode().strip().split("\n\n")]
+        names = [event[0] for event in events]
+        self.assertEqual(names[0], "event: header")
+        self.assertEqual(names[-1], "event: end")
+        header = json.loads(events[0][1][len("data: "):])
+        runs = [json.loads(event[1][len("data: "):]) for event in events[1:-1]]
+        self.assertEqual([run["count"] for run in runs], [1, 3, 1, 1])
+        self.assertEqual(list(ReportsApi._calendar_slots(header, runs)), full_slots())
+
+    def test_error_is_reported_in_band(self, mock_db, mock_gs, mock_auth):
+        db_mgr = self._setup(mock_db, mock_gs)
+
+        def failing(**kwargs):
+            yield from mock_stream(**kwargs)
+            raise RuntimeError("connection lost")
+        db_mgr.stream_calendar.side_effect = failing
+        lines = self._get("application/x-ndjson").data.decode().splitlines()
+        self.assertIn("connection lost", json.loads(lines[-1])["error"])
+
+    def test_json_is_not_streamed(self, mock_db, mock_gs, mock_auth):
+        db_mgr = self._setup(mock_db, mock_gs)
+        db_mgr.get_calendar.return_value = {"data": [], "total": 0}
+        response = self._get("application/json")
+        self.assert200(response)
+        db_mgr.stream_calendar.assert_not_called()
+        self.assertEqual(json.loads(response.data)["total"], 0)
+
+    def test_bad_format(self, mock_db, mock_gs, mock_auth):
+        self._setup(mock_db, mock_gs)
+        self.assert400(self._get("application/x-ndjson", format="bogus"))
+
+
+class TestCalendarChunks(unittest.TestCase):
+
+    def test_rows_are_computed_a_chunk_at_a_time(self):
+        db = DatabaseManager.__new__(DatabaseManager)
+        chunks = []
+
+        def chunk(session, layout, start_time, end_time, *args):
+            chunks.append((start_time, end_time))
+            yield start_time, end_time, {}
+
+        start = datetime(2025, 7, 1, tzinfo=timezone.utc)
+        end = start + timedelta(hours=400, minutes=30)
+        with patch.object(db, "_calendar_chunk", side_effect=chunk):
+            rows = db._calendar_rows(None, None, start, end, timedelta(hours=1), "python", {}, {}, {})
+            self.assertEqual(chunks, [])  # nothing is computed until the first slot is read
+            next(rows)
+            self.assertEqual(len(chunks), 1)
+            list(rows)
+        size = DatabaseManager.CALENDAR_CHUNK_SLOTS
+        self.assertEqual(chunks, [(start, start + timedelta(hours=size)),
+                                  (start + timedelta(hours=size), start + timedelta(hours=2 * size)),
+                                  (start + timedelta(hours=2 * size), end)])
+
+
+if __name__ == '__main__':
+    unittest.main()
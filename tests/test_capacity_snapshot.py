@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared capacity snapshot and its watermark revalidation.
+
+The watermark probe and the capacity queries are patched with mock data; no database required.
+"""
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+from reports_api.database.capacity_snapshot import CapacityCache, CapacitySnapshot
+from reports_api.database.db_manager import DatabaseManager, _parse_vlan_range
+
+HOST_CAP_MAP = {
+    1: {"name": "renc-w1", "site": "RENC", "cores_capacity": 64, "ram_capacity": 256, "disk_capacity": 2000,
+        "components": {"GPU-A100": 2}},
+    2: {"name": "renc-w2", "site": "RENC", "cores_capacity": 32, "ram_capacity": 128, "disk_capacity": 1000,
+        "components": {}},
+    3: {"name": "uky-w1", "site": "UKY", "cores_capacity": 16, "ram_capacity": 64, "disk_capacity": 500,
+        "components": {}},
+}
+LINK_CAP_MAP = {
+    ("RENC", "UKY"): {"name": "RENC-UKY", "site_a": "RENC", "site_b": "UKY", "layer": "L2",
+                      "bandwidth_capacity": 100},
+    ("STAR", "UKY"): {"name": "STAR-UKY", "site_a": "STAR", "site_b": "UKY", "layer": "L2",
+                      "bandwidth_capacity": 100},
+}
+FP_CAP_MAP = {("Cloud-FP", "RENC", "dev", "port"): {"name": "Cloud-FP", "site": "RENC", "device_name": "dev",
+                                                    "local_name": "port", "vlan_range": "100-103",
+                                                    "total_vlans": 4}}
+WATERMARK = (datetime(2025, 7, 1, tzinfo=timezone.utc), 3, None, 2, None, 1)
+
+
+def loader(calls):
+    def load(session, watermark):
+        calls.append(watermark)
+        return CapacitySnapshot(HOST_CAP_MAP, LINK_CAP_MAP, FP_CAP_MAP,
+                                {key: _parse_vlan_range(cap["vlan_range"]) for key, cap in FP_CAP_MAP.items()},
+                                watermark=watermark)
+    return load
+
+
+class TestCapacitySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = loader([])(None, WATERMARK)
+
+    def test_filters_match_the_query_filters(self):
+        self.assertIs(self.snapshot.hosts(), HOST_CAP_MAP)
+        self.assertEqual(list(self.snapshot.hosts(site=["RENC"])), [1, 2])
+        self.assertEqual(list(self.snapshot.hosts(host=["uky-w1", "renc-w2"])), [2, 3])
+        self.assertEqual(list(self.snapshot.hosts(exclude_site=["RENC"])), [3])
+        self.assertEqual(list(self.snapshot.hosts(site=["RENC"], exclude_host=["renc-w1"])), [2])
+        self.assertEqual(list(self.snapshot.links(site=["RENC"])), [("RENC", "UKY")])
+        self.assertEqual(list(self.snapshot.links(exclude_site=["RENC"])), [("STAR", "UKY")])
+        self.assertEqual(self.snapshot.facility_ports(site=["UKY"]), {})
+        self.assertEqual(self.snapshot.hosts_by_site, {"RENC": [1, 2], "UKY": [3]})
+
+
+class TestCapacityCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.watermark = WATERMARK
+        probe = patch("reports_api.database.capacity_snapshot.capacity_watermark",
+                      side_effect=lambda session: self.watermark)
+        probe.start()
+        self.addCleanup(probe.stop)
+        self.cache = CapacityCache(max_age_seconds=300)
+
+    def test_reloads_only_when_the_watermark_moves(self):
+        first = self.cache.snapshot(None, loader(self.calls))
+        self.assertIs(self.cache.snapshot(None, loader(self.calls)), first)
+        self.assertEqual(len(self.calls), 1)
+
+        self.watermark = WATERMARK[:1] + (4,) + WATERMARK[2:]  # a host capacity row was added
+        second = self.cache.snapshot(None, loader(self.calls))
+        self.assertIsNot(second, first)
+        self.assertEqual(self.calls, [WATERMARK, self.watermark])
+
+    def test_invalidate_and_max_age(self):
+        self.cache.snapshot(None, loader(self.calls))
+        self.cache.invalidate()
+        self.cache.snapshot(None, loader(self.calls))
+        self.assertEqual(len(self.calls), 2)
+        self.cache.max_age_seconds = -1
+        self.cache.snapshot(None, loader(self.calls))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_concurrent_callers_share_one_reload(self):
+        def slow(session, watermark):
+            time.sleep(0.05)
+            return loader(self.calls)(session, watermark)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.snapshot(None, slow)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+
+class TestDatabaseManagerUsesSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager.__new__(DatabaseManager)
+        CapacityCache.configure(max_age_seconds=300)
+        self.addCleanup(setattr, CapacityCache, "_instance", None)
+        probe = patch("reports_api.database.capacity_snapshot.capacity_watermark", return_value=WATERMARK)
+        probe.start()
+        self.addCleanup(probe.stop)
+        self.queries = [patch.object(DatabaseManager, "_query_host_capacities", return_value=([], HOST_CAP_MAP)),
+                        patch.object(DatabaseManager, "_query_link_capacities", return_value=([], LINK_CAP_MAP)),
+                        patch.object(DatabaseManager, "_query_fp_capacities", return_value=([], FP_CAP_MAP))]
+        self.mocks = [q.start() for q in self.queries]
+        for q in self.queries:
+            self.addCleanup(q.stop)
+
+    def test_capacity_joins_run_once(self):
+        session = MagicMock()
+        for _ in range(3):
+            host_cap_map, link_cap_map, fp_cap_map = self.db._calendar_capacities(
+                session, site=["UKY"], host=None, exclude_site=None, exclude_host=None)
+            self.assertEqual(list(host_cap_map), [3])
+            self.assertEqual(list(link_cap_map), [("RENC", "UKY"), ("STAR", "UKY")])
+            self.db._find_slot_capacities(session, None, links=True, facility_ports=False)
+        self.assertEqual([m.call_count for m in self.mocks], [1, 1, 1])
+        self.assertEqual(self.db._vlan_bitmaps(FP_CAP_MAP), [_parse_vlan_range("100-103")])
+
+        self.db._invalidate_capacities()
+        self.db._find_slot_capacities(session, ["RENC"], links=False, facility_ports=True)
+        self.assertEqual([m.call_count for m in self.mocks], [2, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for evaluating several find-slot requests against one occupancy build.
+
+Capacities and slivers are mock data; the database manager's queries are patched out.
+"""
+import json
+import logging
+import unittest
+from collections import namedtuple
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+import connexion
+from flask_testing import TestCase
+
+from reports_api.database.db_manager import DatabaseManager
+from reports_api.database.occupancy import HourlyOccupancy
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "core", "ram", "disk", "lease_start", "lease_end"])
+
+
+def dt(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+HOST_CAP_MAP = {
+    1: {"name": "renc-w1", "site": "RENC", "cores_capacity": 32, "ram_capacity": 128, "disk_capacity": 1000,
+        "components": {"GPU-A100": 1}},
+    2: {"name": "uky-w1", "site": "UKY", "cores_capacity": 16, "ram_capacity": 64, "disk_capacity": 500,
+        "components": {}},
+}
+LINK_CAP_MAP = {("RENC", "UKY"): {"name": "RENC-UKY", "site_a": "RENC", "site_b": "UKY", "layer": "L2",
+                                  "bandwidth_capacity": 100}}
+HOSTS_BY_SITE = {"RENC": [1], "UKY": [2]}
+SLIVERS = [
+    SliverRow(1, 1, 24, 64, 100, dt(2025, 7, 1, 0), dt(2025, 7, 1, 12)),
+    SliverRow(2, 2, 8, 16, 100, dt(2025, 7, 1, 6), dt(2025, 7, 2, 0)),
+    SliverRow(3, 1, 16, 16, 100, dt(2025, 7, 2, 4), dt(2025, 7, 2, 8)),
+]
+COMP_BY_SLIVER = {3: [("GPU-A100", "gpu")]}
+
+
+def mock_occupancy(session, start_time, total_hours, host_cap_map, link_cap_map, fp_cap_map):
+    return HourlyOccupancy.from_slivers(start_time=start_time, total_hours=total_hours, host_cap_map=host_cap_map,
+                                        slivers_in_range=SLIVERS, comp_by_sliver=COMP_BY_SLIVER)
+
+
+def request(start, end, duration, resources, max_results=3):
+    return {"start_time": start, "end_time": end, "duration": duration, "resources": resources,
+            "max_results": max_results}
+
+
+REQUESTS = [
+    request(dt(2025, 7, 1), dt(2025, 7, 3), 4, [{"type": "compute", "site": "RENC", "cores": 16}]),
+    request(dt(2025, 7, 1, 5), dt(2025, 7, 2, 12), 6, [{"type": "compute", "cores": 12, "ram": 32}]),
+    request(dt(2025, 7, 1, 2), dt(2025, 7, 3), 2, [{"type": "compute", "site": "RENC", "cores": 4,
+                                                   "components": {"GPU-A100": 1}},
+                                                  {"type": "link", "site_a": "UKY", "site_b": "RENC",
+                                                   "bandwidth": 40}]),
+]
+
+
+class TestFindSlotBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager.__new__(DatabaseManager)
+        self.patches = [
+            patch.object(self.db, "get_session", return_value=MagicMock()),
+            patch.object(self.db, "_find_slot_capacities",
+                         return_value=(HOST_CAP_MAP, LINK_CAP_MAP, {}, HOSTS_BY_SITE)),
+            patch.object(self.db, "_find_slot_occupancy", side_effect=mock_occupancy),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_batch_matches_single_requests(self):
+        result = self.db.find_slot_batch(REQUESTS)
+        self.assertEqual(result["total"], 3)
+        self.assertNotIn("feasible", result)
+        self.assertEqual(self.db._find_slot_occupancy.call_count, 1)
+        for req, batch_result in zip(REQUESTS, result["results"]):
+            self.assertEqual(batch_result, self.db.find_slot(**req))
+        self.assertTrue(all(r["windows"] for r in result["results"]))
+
+    def test_joint_requests_do_not_share_capacity(self):
+        both = [request(dt(2025, 7, 1), dt(2025, 7, 3), 8, [{"type": "compute", "site": "RENC", "cores": 8}]),
+                request(dt(2025, 7, 1), dt(2025, 7, 3), 8, [{"type": "compute", "site": "RENC", "cores": 8}])]
+        apart = self.db.find_slot_batch(both)
+        self.assertEqual(apart["results"][0]["windows"], apart["results"][1]["windows"])
+
+        joint = self.db.find_slot_batch(both, joint=True)
+        self.assertTrue(joint["feasible"])
+        first, second = (r["windows"] for r in joint["results"])
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first[0]["start"], dt(2025, 7, 1).isoformat())
+        # The first grant fills host 1 until hour 8
+        self.assertEqual(second[0]["start"], dt(2025, 7, 1, 8).isoformat())
+
+    def test_joint_reports_infeasible(self):
+        both = [request(dt(2025, 7, 1), dt(2025, 7, 1, 4), 4, [{"type": "link", "site_a": "RENC",
+                                                                "site_b": "UKY", "bandwidth": 60}])] * 2
+        self.assertEqual([r["total"] for r in self.db.find_slot_batch(both)["results"]], [1, 1])
+        result = self.db.find_slot_batch(both, joint=True)
+        self.assertFalse(result["feasible"])
+        self.assertEqual([r["total"] for r in result["results"]], [1, 0])
+
+    def test_window_matches_a_direct_build(self):
+        whole = mock_occupancy(None, dt(2025, 7, 1), 48, HOST_CAP_MAP, {}, {})
+        direct = mock_occupancy(None, dt(2025, 7, 1, 5), 30, HOST_CAP_MAP, {}, {})
+        view = whole.window(5, 30)
+        self.assertEqual(view.host_usage, direct.host_usage)
+        self.assertEqual(view.start_time, direct.start_time)
+        self.assertIs(whole.window(0, 48), whole)
+
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_find_slot_batch")
+_mock_globals.config.runtime_config = {}
+
+
+def wire(req):
+    return {"start": req["start_time"].isoformat(), "end": req["end_time"].isoformat(),
+            "duration": req["duration"], "resources": req["resources"], "max_results": req["max_results"]}
+
+
+@patch('reports_api.response_code.calendar_controller.authorize', return_value={"sub": "test"})
+@patch('reports_api.response_code.calendar_controller.GlobalsSingleton')
+@patch('reports_api.response_code.calendar_controller._get_db_manager')
+class TestFindSlotBatchValidation(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def _post(self, mock_db, mock_gs, body):
+        mock_gs.get.return_value = _mock_globals
+        db_mgr = MagicMock()
+        db_mgr.find_slot_batch.return_value = {"results": [], "total": 0, "joint": False}
+        mock_db.return_value = db_mgr
+        response = self.client.post('/reports/calendar/find-slot/batch', data=json.dumps(body),
+                                    content_type='application/json', headers={'Authorization': 'Bearer special-key'})
+        return response, db_mgr
+
+    def test_valid_batch(self, mock_db, mock_gs, mock_auth):
+        response, db_mgr = self._post(mock_db, mock_gs, {"requests": [wire(r) for r in REQUESTS], "joint": True})
+        self.assert200(response)
+        kwargs = db_mgr.find_slot_batch.call_args.kwargs
+        self.assertTrue(kwargs["joint"])
+        self.assertEqual(kwargs["requests"], REQUESTS)
+
+    def test_bad_request_is_reported_by_index(self, mock_db, mock_gs, mock_auth):
+        bad = [wire(REQUESTS[0]), dict(wire(REQUESTS[1]), end=wire(REQUESTS[1])["start"])]
+        response, _ = self._post(mock_db, mock_gs, {"requests": bad})
+        self.assert400(response)
+        self.assertIn("requests[1]", response.data.decode())
+
+    def test_starts_must_be_whole_hours_apart(self, mock_db, mock_gs, mock_auth):
+        skewed = dict(wire(REQUESTS[1]), start="2025-07-01T05:30:00+00:00")
+        response, db_mgr = self._post(mock_db, mock_gs, {"requests": [wire(REQUESTS[0]), skewed]})
+        self.assert400(response)
+        db_mgr.find_slot_batch.assert_not_called()
+
+    def test_union_range_is_limited(self, mock_db, mock_gs, mock_auth):
+        later = dict(wire(REQUESTS[0]), start="2025-09-20T00:00:00+00:00", end="2025-10-10T00:00:00+00:00")
+        response, _ = self._post(mock_db, mock_gs, {"requests": [wire(REQUESTS[0]), later]})
+        self.assert400(response)
+
+
+if __name__ == '__main__':
+    unittest.main()
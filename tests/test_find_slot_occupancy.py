@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the hourly occupancy timeline used by find_slot.
+
+These tests use mock data objects — no database required.
+"""
+import itertools
+import random
+import unittest
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from reports_api.database.occupancy import (HourlyOccupancy, LinkTimeline, RangeMax, find_windows, hour_span,
+                                             link_intervals)
+
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "core", "ram", "disk", "lease_start", "lease_end"])
+NetSliverRow = namedtuple("NetSliverRow", ["id", "bandwidth", "lease_start", "lease_end"])
+FpIfaceRow = namedtuple("FpIfaceRow", ["fp_name", "site_name", "vlan", "lease_start", "lease_end"])
+
+
+def dt(year, month, day, hour=0, minute=0):
+    return datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+
+
+def brute_force_hour_ok(hour_start, compute_requests, link_requests, fp_requests, host_cap_map, hosts_by_site,
+                        slivers, comp_by_sliver, link_cap_map, net_slivers, net_ifaces, fp_cap_map, fp_ifaces):
+    """Hour-by-hour rescan with exhaustive compute placement."""
+    hour_end = hour_start + timedelta(hours=1)
+    remaining = {hid: {"cores": c["cores_capacity"], "ram": c["ram_capacity"], "disk": c["disk_capacity"],
+                       "components": {k.lower(): v for k, v in c["components"].items()}}
+                 for hid, c in host_cap_map.items()}
+    for s in slivers:
+        if s.lease_start < hour_end and s.lease_end > hour_start and s.host_id in remaining:
+            remaining[s.host_id]["cores"] -= s.core or 0
+            remaining[s.host_id]["ram"] -= s.ram or 0
+            remaining[s.host_id]["disk"] -= s.disk or 0
+            for key, _ in comp_by_sliver.get(s.id, []):
+                if key.lower() in remaining[s.host_id]["components"]:
+                    remaining[s.host_id]["components"][key.lower()] -= 1
+    # Exhaustive assignment of compute requests to hosts
+    options = [hosts_by_site.get(req["site"], []) if req.get("site") else list(remaining) for req in compute_requests]
+    for assignment in itertools.product(*options):
+        used = defaultdict(lambda: [0, 0, 0])
+        for req, hid in zip(compute_requests, assignment):
+            used[hid][0] += req.get("cores", 0)
+            used[hid][1] += req.get("ram", 0)
+            used[hid][2] += req.get("disk", 0)
+        if all(remaining[hid]["cores"] >= u[0] and remaining[hid]["ram"] >= u[1] and remaining[hid]["disk"] >= u[2]
+               for hid, u in used.items()):
+            break
+    else:
+        return False
+    for req in link_requests:
+        pair = tuple(sorted([req["site_a"], req["site_b"]]))
+        used = sum(ns.bandwidth for ns in net_slivers
+                   if ns.lease_start < hour_end and ns.lease_end > hour_start
+                   and tuple(sorted(set(net_ifaces.get(ns.id, [])))) == pair)
+        if link_cap_map[pair]["bandwidth_capacity"] - used < req["bandwidth"]:
+            return False
+    for req in fp_requests:
+        cap = next(c for k, c in fp_cap_map.items() if k[0] == req["name"] and k[1] == req["site"])
+        in_use = {f.vlan for f in fp_ifaces
+                  if f.fp_name == req["name"] and f.site_name == req["site"]
+                  and f.lease_start < hour_end and f.lease_end > hour_start}
+        if cap["total_vlans"] - len(in_use) < req["vlans"]:
+            return False
+    return True
+
+
+class TestHourSpan(unittest.TestCase):
+
+    def test_aligned_lease(self):
+        self.assertEqual(hour_span(dt(2025, 7, 1, 2), dt(2025, 7, 1, 5), dt(2025, 7, 1), 24), (2, 5))
+
+    def test_partial_hours_round_outwards(self):
+        self.assertEqual(hour_span(dt(2025, 7, 1, 2, 30), dt(2025, 7, 1, 5, 10), dt(2025, 7, 1), 24), (2, 6))
+
+    def test_clamped_to_range(self):
+        self.assertEqual(hour_span(dt(2025, 6, 1), dt(2025, 8, 1), dt(2025, 7, 1), 24), (0, 24))
+
+    def test_outside_range_is_empty(self):
+        first, last = hour_span(dt(2025, 6, 1), dt(2025, 6, 2), dt(2025, 7, 1), 24)
+        self.assertGreaterEqual(first, last)
+
+
+class TestRangeMax(unittest.TestCase):
+
+    def test_query_matches_max(self):
+        rng = random.Random(7)
+        values = [rng.randrange(0, 100) for _ in range(53)]
+        table = RangeMax(values)
+        for lo in range(len(values)):
+            for hi in range(lo + 1, len(values) + 1):
+                self.assertEqual(table.query(lo, hi), max(values[lo:hi]))
+
+    def test_last_above(self):
+        table = RangeMax([0, 5, 0, 7, 0, 0])
+        self.assertEqual(table.last_above(0, 6, 4), 3)
+        self.assertEqual(table.last_above(0, 3, 4), 1)
+        self.assertEqual(table.last_above(4, 6, 4), -1)
+
+
+class TestLinkTimeline(unittest.TestCase):
+
+    def test_link_intervals_resolves_pairs(self):
+        net_slivers = [NetSliverRow(1, 10, dt(2025, 7, 1), dt(2025, 7, 2)),
+                       NetSliverRow(2, 20, dt(2025, 7, 1), dt(2025, 7, 2)),
+                       NetSliverRow(3, 30, dt(2025, 7, 1), dt(2025, 7, 2)),
+                       NetSliverRow(4, None, dt(2025, 7, 1), dt(2025, 7, 2))]
+        ifaces = {1: ["RENC", "CLEM", "RENC"], 2: ["RENC"], 3: ["RENC", "CLEM", "UTAH"], 4: ["RENC", "CLEM"]}
+        self.assertEqual(dict(link_intervals(net_slivers, ifaces)),
+                         {("CLEM", "RENC"): [(dt(2025, 7, 1), dt(2025, 7, 2), 10)]})
+
+    def test_matches_overlap_scan(self):
+        rng = random.Random(11)
+        base = dt(2025, 7, 1)
+        intervals = []
+        for _ in range(60):
+            s = base + timedelta(minutes=rng.randrange(0, 5000))
+            intervals.append((s, s + timedelta(minutes=rng.randrange(-30, 3000)), rng.randrange(1, 50)))
+        timeline = LinkTimeline(intervals)
+        for _ in range(300):
+            a = base + timedelta(minutes=rng.randrange(-100, 6000))
+            b = a + timedelta(minutes=rng.randrange(1, 2000))
+            expected = sum(bw for ls, le, bw in intervals if ls < b and le > a)
+            self.assertEqual(timeline.allocated(a, b), expected)
+
+    def test_touching_leases_do_not_overlap(self):
+        timeline = LinkTimeline([(dt(2025, 7, 1, 2), dt(2025, 7, 1, 4), 10)])
+        self.assertEqual(timeline.allocated(dt(2025, 7, 1), dt(2025, 7, 1, 2)), 0)
+        self.assertEqual(timeline.allocated(dt(2025, 7, 1, 4), dt(2025, 7, 1, 6)), 0)
+        self.assertEqual(timeline.allocated(dt(2025, 7, 1, 3), dt(2025, 7, 1, 5)), 10)
+
+
+class TestFindWindows(unittest.TestCase):
+
+    def test_all_feasible(self):
+        self.assertEqual(find_windows([True] * 6, [], duration=3, max_results=10), [0, 1, 2, 3])
+
+    def test_skips_past_blocked_hour(self):
+        ok = [True, True, False, True, True, True]
+        self.assertEqual(find_windows(ok, [], duration=3, max_results=10), [3])
+
+    def test_max_results(self):
+        self.assertEqual(find_windows([True] * 48, [], duration=2, max_results=2), [0, 1])
+
+    def test_nothing_fits(self):
+        self.assertEqual(find_windows([True, False] * 10, [], duration=2, max_results=5), [])
+
+    def test_range_check_blocks_window(self):
+        checks = [(RangeMax([0, 0, 9, 0, 0, 0]), 5)]
+        self.assertEqual(find_windows([True] * 6, checks, duration=2, max_results=10), [0, 3, 4])
+
+
+class TestHourlyOccupancy(unittest.TestCase):
+
+    def test_fp_vlan_counted_once_when_shared(self):
+        """Two slivers holding the same VLAN in the same hour use one VLAN."""
+        fp_ifaces = [
+            FpIfaceRow("FP", "RENC", "100", dt(2025, 7, 1), dt(2025, 7, 1, 4)),
+            FpIfaceRow("FP", "RENC", "100", dt(2025, 7, 1, 2), dt(2025, 7, 1, 6)),
+            FpIfaceRow("FP", "RENC", "101", dt(2025, 7, 1, 5), dt(2025, 7, 1, 6)),
+        ]
+        occupancy = HourlyOccupancy.from_slivers(
+            start_time=dt(2025, 7, 1), total_hours=8, host_cap_map={}, slivers_in_range=[],
+            comp_by_sliver={}, fp_iface_slivers=fp_ifaces)
+        self.assertEqual(occupancy.fp_usage[("FP", "RENC")], [1, 1, 1, 1, 1, 2, 0, 0])
+
+    def test_matches_hour_by_hour_rescan(self):
+        """Randomized differential check against the hour-by-hour rescan."""
+        rng = random.Random(42)
+        start = dt(2025, 7, 1)
+        total_hours = 96
+        host_cap_map = {
+            hid: {"name": f"h{hid}", "site": site, "cores_capacity": 64, "ram_capacity": 256,
+                  "disk_capacity": 2000, "components": {}}
+            for hid, site in [(1, "RENC"), (2, "RENC"), (3, "CLEM")]
+        }
+        hosts_by_site = defaultdict(list)
+        for hid, cap in host_cap_map.items():
+            hosts_by_site[cap["site"]].append(hid)
+        link_cap_map = {("CLEM", "RENC"): {"name": "l", "site_a": "CLEM", "site_b": "RENC",
+                                           "layer": "L2", "bandwidth_capacity": 100}}
+        fp_cap_map = {("FP", "RENC", "sw", "p1"): {"name": "FP", "site": "RENC", "device_name": "sw",
+                                                   "local_name": "p1", "vlan_range": "1-4", "total_vlans": 4}}
+
+        def lease():
+            s = start + timedelta(minutes=rng.randrange(-600, total_hours * 60))
+            return s, s + timedelta(minutes=rng.randrange(1, 2000))
+
+        slivers = [SliverRow(i, rng.choice([1, 2, 3]), rng.randrange(0, 40), rng.randrange(0, 100),
+                             rng.randrange(0, 500), *lease()) for i in range(40)]
+        net_slivers = [NetSliverRow(100 + i, rng.randrange(10, 60), *lease()) for i in range(10)]
+        net_ifaces = {ns.id: ["RENC", "CLEM"] for ns in net_slivers}
+        fp_ifaces = [FpIfaceRow("FP", "RENC", str(rng.randrange(1, 5)), *lease()) for _ in range(10)]
+
+        compute_requests = [{"type": "compute", "site": "RENC", "cores": 24, "ram": 64, "disk": 100},
+                            {"type": "compute", "cores": 16, "ram": 32, "disk": 100}]
+        link_requests = [{"type": "link", "site_a": "RENC", "site_b": "CLEM", "bandwidth": 40}]
+        fp_requests = [{"type": "facility_port", "name": "FP", "site": "RENC", "vlans": 2}]
+
+        occupancy = HourlyOccupancy.from_slivers(
+            start_time=start, total_hours=total_hours, host_cap_map=host_cap_map,
+            slivers_in_range=slivers, comp_by_sliver={},
+            net_slivers_in_range=net_slivers, net_sliver_interfaces=net_ifaces, fp_iface_slivers=fp_ifaces)
+        feasible = set(start for start, _ in occupancy.search(
+            duration=1, max_results=total_hours,
+            compute_requests=compute_requests, link_requests=link_requests, fp_requests=fp_requests,
+            host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+            link_cap_map=link_cap_map, fp_cap_map=fp_cap_map))
+        ok = [h in feasible for h in range(total_hours)]
+
+        expected = [brute_force_hour_ok(start + timedelta(hours=h), compute_requests, link_requests, fp_requests,
+                                        host_cap_map, hosts_by_site, slivers, {}, link_cap_map, net_slivers,
+                                        net_ifaces, fp_cap_map, fp_ifaces)
+                    for h in range(total_hours)]
+        self.assertEqual(ok, expected)
+        self.assertIn(True, ok)
+        self.assertIn(False, ok)
+
+        # Multi-hour windows are exactly the runs of feasible hours
+        windows = occupancy.search(
+            duration=6, max_results=total_hours,
+            compute_requests=compute_requests, link_requests=link_requests, fp_requests=fp_requests,
+            host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+            link_cap_map=link_cap_map, fp_cap_map=fp_cap_map)
+        self.assertEqual([start for start, _ in windows],
+                         [h for h in range(total_hours - 5) if all(expected[h:h + 6])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -132,11 +132,11 @@ class TestFindSlotValidation(BaseValidationTestCase):
         })
         self.assert400(response)
 
-    def test_range_exceeds_30_days(self, mock_gs, mock_auth):
+    def test_range_exceeds_90_days(self, mock_gs, mock_auth):
         mock_gs.get.return_value = _mock_globals
         response = self._post({
             "start": "2025-07-01T00:00:00+00:00",
-            "end": "2025-09-01T00:00:00+00:00",
+            "end": "2025-10-01T00:00:00+00:00",
             "duration": 24,
             "resources": [{"type": "compute", "cores": 2}]
         })
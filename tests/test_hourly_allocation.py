@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained hourly allocation tables.
+
+Hour arithmetic and the occupancy built from pre-aggregated rows are tested with
+mock data. The maintenance test needs PostgreSQL; it runs only when
+REPORTS_TEST_DB_HOST is set (with REPORTS_TEST_DB_USER, REPORTS_TEST_DB_PASSWORD
+and REPORTS_TEST_DB_NAME) and rebuilds the hourly tables of that database.
+"""
+import logging
+import os
+import random
+import unittest
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from reports_api.database import HostHourlyAllocation, HostHourlyComponentAllocation
+from reports_api.database.db_manager import DatabaseManager
+from reports_api.database.hourly_allocation import HourlyAllocation, HourlyAllocationStore, ceil_hour, floor_hour, \
+    is_hour_aligned
+from reports_api.database.occupancy import HourlyOccupancy, hour_span
+
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "core", "ram", "disk", "lease_start", "lease_end"])
+
+
+def dt(year, month, day, hour=0, minute=0):
+    return datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+
+
+class TestHourArithmetic(unittest.TestCase):
+
+    def test_floor_and_ceil(self):
+        self.assertEqual(floor_hour(dt(2025, 7, 1, 5, 30)), dt(2025, 7, 1, 5))
+        self.assertEqual(ceil_hour(dt(2025, 7, 1, 5, 30)), dt(2025, 7, 1, 6))
+        self.assertEqual(ceil_hour(dt(2025, 7, 1, 5)), dt(2025, 7, 1, 5))
+
+    def test_alignment_is_utc(self):
+        self.assertTrue(is_hour_aligned(dt(2025, 7, 1, 5)))
+        self.assertFalse(is_hour_aligned(datetime(2025, 7, 1, 10, tzinfo=timezone(timedelta(hours=5, minutes=30)))))
+
+    def test_hour_range_clamped_to_coverage(self):
+        covered = (dt(2025, 7, 1), dt(2025, 7, 2))
+        self.assertEqual(HourlyAllocationStore._hour_range(dt(2025, 6, 30, 12), dt(2025, 7, 1, 3, 10), *covered),
+                         (dt(2025, 7, 1), dt(2025, 7, 1, 4)))
+        self.assertIsNone(HourlyAllocationStore._hour_range(dt(2025, 7, 3), dt(2025, 7, 4), *covered))
+
+
+class TestOccupancyFromHourlyAllocation(unittest.TestCase):
+
+    def test_matches_occupancy_from_slivers(self):
+        rng = random.Random(9)
+        start = dt(2025, 7, 1)
+        n = 72
+        host_cap_map = {hid: {"name": f"h{hid}", "site": "RENC", "cores_capacity": 64, "ram_capacity": 256,
+                              "disk_capacity": 2000, "components": {"GPU-A100": 2}} for hid in (1, 2)}
+        slivers = []
+        for i in range(30):
+            s = start + timedelta(minutes=rng.randrange(-300, n * 60))
+            slivers.append(SliverRow(i, rng.choice([1, 2]), rng.randrange(0, 16), rng.randrange(0, 64),
+                                     rng.randrange(0, 100), s, s + timedelta(minutes=rng.randrange(1, 1500))))
+        comp_by_sliver = {i: [("GPU-A100", f"g{i}")] for i in range(0, 30, 4)}
+
+        # What the tables hold: each sliver's usage summed into every hour it overlaps
+        allocation = HourlyAllocation(start, n)
+        for s in slivers:
+            first, last = hour_span(s.lease_start, s.lease_end, start, n)
+            for h in range(first, last):
+                alloc = allocation.host[h][s.host_id]
+                alloc["cores"] += s.core
+                alloc["ram"] += s.ram
+                alloc["disk"] += s.disk
+                for key, _ in comp_by_sliver.get(s.id, []):
+                    allocation.comp[h][s.host_id][key] += 1
+
+        expected = HourlyOccupancy.from_slivers(start, n, host_cap_map, slivers, comp_by_sliver)
+        actual = HourlyOccupancy.from_hourly_allocation(allocation, host_cap_map)
+        self.assertEqual(actual.host_usage, expected.host_usage)
+
+        hosts_by_site = defaultdict(list, {"RENC": [1, 2]})
+        request = [{"type": "compute", "cores": 56, "ram": 64, "disk": 100, "components": {"GPU-A100": 1}}]
+        kwargs = dict(duration=3, max_results=n, compute_requests=request, link_requests=[], fp_requests=[],
+                      host_cap_map=host_cap_map, hosts_by_site=hosts_by_site, link_cap_map={}, fp_cap_map={})
+        self.assertEqual(actual.search(**kwargs), expected.search(**kwargs))
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestIncrementalMaintenance(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_hourly_allocation"))
+        self.prefix = f"hourly-test-{uuid.uuid4().hex[:8]}"
+
+    def _snapshot(self):
+        session = self.db.get_session()
+        hosts = sorted((r.host_id, r.hour, r.cores, r.ram, r.disk) for r in session.query(HostHourlyAllocation))
+        comps = sorted((r.host_id, r.hour, r.component, r.allocated)
+                       for r in session.query(HostHourlyComponentAllocation))
+        session.rollback()
+        return hosts, comps
+
+    def test_incremental_matches_rebuild(self):
+        self.db.rebuild_hourly_allocation()
+        site_id = self.db.add_or_update_site(f"{self.prefix}-site")
+        host_id = self.db.add_or_update_host(f"{self.prefix}-host", site_id)
+        now = floor_hour(datetime.now(timezone.utc))
+        sliver_id = self.db.add_or_update_sliver(
+            project_id=None, slice_id=None, user_id=None, host_id=host_id, site_id=site_id,
+            sliver_guid=f"{self.prefix}-s", state=4, sliver_type="VM", core=4, ram=16, disk=10,
+            lease_start=now + timedelta(minutes=30), lease_end=now + timedelta(hours=5))
+        self.db.add_or_update_component(sliver_id=sliver_id, component_guid=f"{self.prefix}-c",
+                                        component_type="GPU", model="A100", bdfs=None, node_id=None,
+                                        component_node_id=None)
+        # Extend the lease, then close the sliver
+        self.db.add_or_update_sliver(
+            project_id=None, slice_id=None, user_id=None, host_id=host_id, site_id=site_id,
+            sliver_guid=f"{self.prefix}-s", state=4, sliver_type="VM", lease_end=now + timedelta(hours=9))
+        incremental = self._snapshot()
+        self.db.rebuild_hourly_allocation()
+        self.assertEqual(incremental, self._snapshot())
+        self.assertIn((host_id, now + timedelta(hours=8), 4, 16, 10), incremental[0])
+
+        self.db.add_or_update_sliver(
+            project_id=None, slice_id=None, user_id=None, host_id=host_id, site_id=site_id,
+            sliver_guid=f"{self.prefix}-s", state=6, sliver_type="VM")
+        hosts, comps = self._snapshot()
+        self.assertFalse([r for r in hosts if r[0] == host_id])
+        self.assertFalse([r for r in comps if r[0] == host_id])
+
+
+if __name__ == '__main__':
+    unittest.main()
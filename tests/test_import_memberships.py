@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory replay of membership events in import_memberships_from_json.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from import_memberships_from_json import load_events, replay
+
+USER_IDS = {"u-1": 1, "u-2": 2}
+PROJECT_IDS = {"p-1": 10}
+
+
+def event(verb, timestamp, user="u-1", project="p-1"):
+    return {"file": f"{verb}-{timestamp}.json", "verb": verb,
+            "timestamp": datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc),
+            "user_uuid": user, "project_uuid": project}
+
+
+def stored(start_time, user_id=1, membership_type="member"):
+    return {"user_id": user_id, "project_id": 10, "start_time": datetime.fromisoformat(start_time),
+            "end_time": None, "membership_type": membership_type, "active": True}
+
+
+class TestLoadEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _write(self, name, verb, timestamp):
+        with open(os.path.join(self.dir, name), "w") as f:
+            json.dump({"csel_eventdetail_verb": verb, "csel_timestamp": timestamp,
+                       "csel_eventdetail_attr_value": "usr:u-1", "csel_identifier_prj_uuid": "p-1"}, f)
+
+    def test_events_are_sorted_by_timestamp(self):
+        self._write("a.json", "modify-remove", "2024-03-02 10:00:00,000")
+        self._write("b.json", "modify-add", "2024-03-01 10:00:00,000")
+        self._write("c.json", "create", "2024-03-01 09:00:00,000")
+        self._write("d.json", "modify-add", "not a timestamp")
+        with patch("builtins.print"):
+            events = load_events(self.dir)
+        self.assertEqual([(e["verb"], e["user_uuid"]) for e in events],
+                         [("modify-add", "u-1"), ("modify-remove", "u-1")])
+        self.assertEqual(events[0]["timestamp"], datetime(2024, 3, 1, 10, tzinfo=timezone.utc))
+
+
+class TestReplay(unittest.TestCase):
+
+    def _replay(self, events, active=()):
+        with patch("builtins.print") as mock_print:
+            rows = replay(events, USER_IDS, PROJECT_IDS, list(active))
+        return sorted(rows, key=lambda r: (r["user_id"], r["start_time"])), mock_print
+
+    def test_add_then_remove_is_one_closed_interval(self):
+        rows, _ = self._replay([event("modify-add", "2024-03-01T10:00:00"),
+                                event("modify-remove", "2024-03-05T10:00:00"),
+                                event("modify-add", "2024-04-01T10:00:00")])
+        self.assertEqual([(r["start_time"].day, r["end_time"] and r["end_time"].day, r["active"]) for r in rows],
+                         [(1, 5, False), (1, None, True)])
+
+    def test_remove_closes_a_stored_membership(self):
+        owner = stored("2023-01-01T00:00:00+00:00", user_id=2, membership_type="owner")
+        rows, _ = self._replay([event("modify-remove", "2024-03-05T10:00:00", user="u-2")], active=[owner])
+        [row] = rows
+        self.assertEqual((row["membership_type"], row["active"], row["end_time"].day), ("owner", False, 5))
+        self.assertTrue(owner["active"])
+
+    def test_remove_skips_memberships_that_start_later(self):
+        rows, _ = self._replay([event("modify-add", "2024-03-01T01:00:00"),
+                                event("modify-remove", "2024-03-01T02:00:00")],
+                               active=[stored("2024-03-01T10:00:00+00:00")])
+        [row] = rows
+        self.assertEqual((row["start_time"].hour, row["end_time"].hour, row["active"]), (1, 2, False))
+
+    def test_rerun_over_imported_events_updates_the_stored_row(self):
+        rows, _ = self._replay([event("modify-add", "2024-03-01T10:00:00"),
+                                event("modify-remove", "2024-03-05T10:00:00")],
+                               active=[stored("2024-03-01T10:00:00+00:00")])
+        [row] = rows
+        self.assertEqual((row["start_time"], row["end_time"].day, row["active"]),
+                         (datetime(2024, 3, 1, 10, tzinfo=timezone.utc), 5, False))
+
+    def test_unresolved_and_unmatched_events_are_skipped(self):
+        rows, mock_print = self._replay([event("modify-add", "2024-03-01T10:00:00", user="u-9"),
+                                         event("modify-remove", "2024-03-01T10:00:00")])
+        self.assertEqual(rows, [])
+        self.assertEqual(mock_print.call_count, 2)
+
+    def test_repeated_add_is_one_row(self):
+        rows, _ = self._replay([event("modify-add", "2024-03-01T10:00:00")] * 2)
+        self.assertEqual(len(rows), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
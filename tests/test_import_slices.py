@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the resumable bulk slice importer.
+
+Slice files are written to a temporary directory and parsed in real worker processes;
+the database manager is a stand-in that records the batches it is given.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from reports_api.sync.import_slices import SliceImporter, parse_slice_file
+
+
+def slice_json(n, **kwargs):
+    data = {"slice_id": f"slice-{n}", "slice_name": f"s{n}", "project_id": "p-1", "project_name": "Edge AI",
+            "user_id": "u-1", "user_email": "alice@example.com", "state": 4,
+            "lease_start": "2024-03-01T00:00:00+00:00", "lease_end": "2024-03-02T00:00:00+00:00",
+            "slivers": [{"sliver_id": f"sliver-{n}", "type": "VM", "state": "Active", "site": "RENC",
+                         "host": "renc-w1", "core": 2, "ram": 8,
+                         "components": [{"component_guid": f"gpu-{n}", "sliver_guid": f"sliver-{n}",
+                                         "type": "GPU", "model": "A100"}],
+                         "interfaces": {"total": 1, "data": [{"interface_id": f"eth-{n}", "vlan": "100"}]}}]}
+    data.update(kwargs)
+    return data
+
+
+class RecordingDb:
+    def __init__(self, fail_on_call=None):
+        self.batches = []
+        self.fail_on_call = fail_on_call
+
+    def import_slices(self, slices, skip_existing=True):
+        if self.fail_on_call is not None and len(self.batches) == self.fail_on_call:
+            raise RuntimeError("connection lost")
+        self.batches.append([s["slice_guid"] for s in slices])
+        rows = sum(1 + len(s["slivers"]) for s in slices)
+        return {"slices": len(slices), "skipped": 0, "slivers": len(slices), "rows": rows, "unchanged": 0}
+
+    def copy_load(self, slices, skip_existing=True):
+        return dict(RecordingDb.import_slices(self, slices, skip_existing), memberships=0)
+
+
+class TestParseSliceFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return path
+
+    def test_rows_match_the_bulk_writer(self):
+        status, value = parse_slice_file(self._write("slice_1.json", slice_json(1)))
+        self.assertEqual(status, "ok")
+        self.assertEqual((value["slice_guid"], value["state"]), ("slice-1", 4))
+        [sliver] = value["slivers"]
+        self.assertEqual((sliver["sliver_guid"], sliver["state"], sliver["sliver_type"]), ("sliver-1", 4, "VM"))
+        self.assertEqual(sliver["lease_end"], datetime(2024, 3, 2, tzinfo=timezone.utc))
+        self.assertEqual(sliver["components"][0]["component_guid"], "gpu-1")
+        self.assertEqual(sliver["interfaces"][0]["interface_guid"], "eth-1")
+
+    def test_skipped_and_broken_files(self):
+        self.assertEqual(parse_slice_file(self._write("slice_2.json", slice_json(2, lease_end=None))),
+                         ("skipped", None))
+        self.assertEqual(parse_slice_file(self._write("slice_3.json", slice_json(3, slivers=[]))), ("skipped", None))
+        status, message = parse_slice_file(self._write("slice_4.json", slice_json(4, state=None)))
+        self.assertEqual(status, "error")
+        with open(os.path.join(self.dir, "slice_5.json"), "w") as f:
+            f.write("{not json")
+        self.assertEqual(parse_slice_file(os.path.join(self.dir, "slice_5.json"))[0], "error")
+
+
+class TestSliceImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.slices_dir = os.path.join(self.dir, "slices")
+        os.mkdir(self.slices_dir)
+        self.checkpoint = os.path.join(self.dir, "checkpoint.json")
+        for n in range(10):
+            self._write(n)
+
+    def _write(self, n, **kwargs):
+        path = os.path.join(self.slices_dir, f"slice_{n}.json")
+        with open(path, "w") as f:
+            json.dump(slice_json(n, **kwargs), f)
+        os.utime(path, (1_700_000_000 + n, 1_700_000_000 + n))
+
+    def _importer(self, db):
+        return SliceImporter(db_mgr=db, slices_dir=self.slices_dir, checkpoint_path=self.checkpoint, workers=2,
+                             batch_size=3)
+
+    def test_interrupted_run_resumes_after_last_committed_batch(self):
+        failing = RecordingDb(fail_on_call=2)
+        with self.assertRaises(RuntimeError):
+            self._importer(failing).run()
+        self.assertEqual(failing.batches, [["slice-0", "slice-1", "slice-2"], ["slice-3", "slice-4", "slice-5"]])
+
+        db = RecordingDb()
+        totals = self._importer(db).run()
+        self.assertEqual(db.batches, [["slice-6", "slice-7", "slice-8"], ["slice-9"]])
+        self.assertEqual((totals["files"], totals["slices"], totals["rows"]), (4, 4, 8))
+
+        # Only files exported since are picked up by the next run
+        self._write(10)
+        db = RecordingDb()
+        self._importer(db).run()
+        self.assertEqual(db.batches, [["slice-10"]])
+
+    def test_copy_loader(self):
+        db = RecordingDb()
+        db.import_slices = MagicMock(side_effect=AssertionError("row path used"))
+        importer = SliceImporter(db_mgr=db, slices_dir=self.slices_dir, checkpoint_path=self.checkpoint, workers=2,
+                                 batch_size=5, use_copy=True)
+        self.assertEqual(importer.run()["slices"], 10)
+        self.assertEqual(len(db.batches), 2)
+
+    def test_parse_failures_are_recorded(self):
+        self._write(4, state=None)
+        db = RecordingDb()
+        totals = self._importer(db).run()
+        self.assertEqual(totals["failed"], 1)
+        self.assertNotIn("slice-4", sum(db.batches, []))
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["failed"], ["slice_4.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
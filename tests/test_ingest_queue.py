@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-behind ingest queue: the SQLite queue, folding of queued posts, the
+background writer against a mock database manager, and the 202 path of the POST endpoints.
+
+The drain test against the real import_slices() needs PostgreSQL; it runs only when
+REPORTS_TEST_DB_HOST is set (with REPORTS_TEST_DB_USER, REPORTS_TEST_DB_PASSWORD and
+REPORTS_TEST_DB_NAME).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import connexion
+from flask_testing import TestCase
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from reports_api.common.ingest_queue import IngestQueue, IngestWriter, fold
+from reports_api.database import Slivers
+from reports_api.database.db_manager import DatabaseManager
+
+SLICE_ID = "a3f41e9a-7e2b-4df7-baf7-12f48a3c8e6f"
+START = datetime(2025, 7, 1, tzinfo=timezone.utc)
+
+
+def slice_row(**kwargs):
+    row = {"slice_name": "edge", "project_uuid": "p-1", "project_name": "Edge AI", "user_uuid": "u-1",
+           "user_email": "alice@example.com", "state": 4, "lease_start": START, "lease_end": None}
+    row.update(kwargs)
+    return row
+
+
+def sliver_row(sliver_guid, **kwargs):
+    row = {"project_uuid": "p-1", "project_name": None, "user_uuid": "u-1", "user_email": None, "slice_name": None,
+           "site": "RENC", "host": "renc-w1", "sliver_guid": sliver_guid, "state": 4, "sliver_type": "VM",
+           "core": 2, "ram": 16, "lease_start": START, "lease_end": None,
+           "components": [{"component_guid": f"{sliver_guid}-gpu", "component_type": "GPU", "model": "A100"}],
+           "interfaces": []}
+    row.update(kwargs)
+    return row
+
+
+def entry(kind, slice_guid, row, seq=0):
+    return {"seq": seq, "kind": kind, "slice_guid": slice_guid, "row": row, "attempts": 0}
+
+
+class QueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.queue = IngestQueue(os.path.join(self.dir, "ingest.sqlite"))
+        self.addCleanup(self.queue.close)
+
+
+class TestIngestQueue(QueueTestCase):
+
+    def test_entries_round_trip_in_order(self):
+        self.queue.put("slice", "sl-1", slice_row())
+        self.queue.put("sliver", "sl-1", sliver_row("s-1"))
+        first, second = self.queue.take(10)
+        self.assertEqual((first["kind"], second["kind"]), ("slice", "sliver"))
+        self.assertEqual(first["row"]["lease_start"], START)
+        self.assertLess(first["seq"], second["seq"])
+        self.assertEqual(self.queue.stats()["depth"], 2)
+
+        self.queue.ack([first["seq"]])
+        self.assertEqual([e["seq"] for e in self.queue.take(10)], [second["seq"]])
+        with self.assertRaises(ValueError):
+            self.queue.put("project", "sl-1", {})
+
+    def test_entries_survive_a_reopen(self):
+        self.queue.put("slice", "sl-1", slice_row())
+        reopened = IngestQueue(self.queue.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened.take(10)), 1)
+
+    def test_entry_is_parked_after_max_attempts(self):
+        seq = self.queue.put("slice", "sl-1", slice_row())
+        self.assertFalse(self.queue.retry(seq, "boom", max_attempts=2))
+        self.assertEqual(self.queue.take(10)[0]["attempts"], 1)
+        self.assertTrue(self.queue.retry(seq, "boom", max_attempts=2))
+        self.assertEqual(self.queue.take(10), [])
+        self.assertEqual(self.queue.stats(), {"depth": 0, "failed": 1, "oldest_age_seconds": 0})
+
+
+class TestFold(unittest.TestCase):
+
+    def test_posts_of_a_slice_fold_into_one(self):
+        [s] = fold([entry("sliver", "sl-1", sliver_row("s-1", slice_name="edge", lease_end=START)),
+                    entry("slice", "sl-1", slice_row(slice_name=None, state=6)),
+                    entry("sliver", "sl-1", sliver_row("s-1", core=None, ram=32, host=None, components=[
+                        {"component_guid": "s-1-gpu", "model": None}, {"component_guid": "s-1-nic"}]))])
+        self.assertEqual((s["slice_guid"], s["slice_name"], s["state"], s["lease_end"]), ("sl-1", "edge", 6, START))
+        [sliver] = s["slivers"]
+        self.assertEqual((sliver["core"], sliver["ram"], sliver["host"]), (2, 32, None))
+        self.assertEqual([(c["component_guid"], c.get("model")) for c in sliver["components"]],
+                         [("s-1-gpu", "A100"), ("s-1-nic", None)])
+
+    def test_slices_keep_the_order_they_were_first_posted(self):
+        slices = fold([entry("sliver", "sl-2", sliver_row("s-2")), entry("slice", "sl-1", slice_row()),
+                       entry("slice", "sl-2", slice_row())])
+        self.assertEqual([s["slice_guid"] for s in slices], ["sl-2", "sl-1"])
+        self.assertIsNone(fold([entry("sliver", "sl-3", sliver_row("s-3"))])[0]["state"])
+
+
+class TestIngestWriter(QueueTestCase):
+
+    def _writer(self, fail=lambda slices: None):
+        db_mgr = MagicMock()
+
+        def import_slices(slices, skip_existing=True):
+            error = fail(slices)
+            if error is not None:
+                raise error
+            return {"slices": len(slices)}
+        db_mgr.import_slices.side_effect = import_slices
+        return IngestWriter(self.queue, db_mgr, batch_size=10, max_attempts=2,
+                            logger=logging.getLogger("test_ingest_queue")), db_mgr
+
+    def test_batch_is_written_in_one_call(self):
+        self.queue.put("slice", "sl-1", slice_row())
+        for n in range(3):
+            self.queue.put("sliver", "sl-1", sliver_row(f"s-{n}"))
+        writer, db_mgr = self._writer()
+        self.assertEqual(writer.drain_once(), {"taken": 4, "written": 4, "parked": 0, "outage": False})
+        [call] = db_mgr.import_slices.call_args_list
+        self.assertEqual(len(call.args[0][0]["slivers"]), 3)
+        self.assertEqual(call.kwargs, {"skip_existing": False})
+        self.assertEqual(self.queue.stats()["depth"], 0)
+
+    def test_failed_entry_holds_back_its_slice(self):
+        self.queue.put("sliver", "sl-1", sliver_row("bad"))
+        self.queue.put("sliver", "sl-1", sliver_row("s-1"))
+        self.queue.put("sliver", "sl-2", sliver_row("s-2"))
+
+        def fail(slices):
+            if any(s["sliver_guid"] == "bad" for sl in slices for s in sl["slivers"]):
+                return IntegrityError("INSERT", {}, Exception("null value in column \"state\""))
+        writer, db_mgr = self._writer(fail)
+
+        self.assertEqual(writer.drain_once()["written"], 1)
+        self.assertEqual([e["row"]["sliver_guid"] for e in self.queue.take(10)], ["bad", "s-1"])
+        # The second failure parks the entry, and the slice's next post goes through
+        self.assertEqual(writer.drain_once()["parked"], 1)
+        self.assertEqual(writer.drain_once()["written"], 1)
+        self.assertEqual(self.queue.stats()["failed"], 1)
+
+    def test_outage_charges_no_attempt(self):
+        self.queue.put("slice", "sl-1", slice_row())
+        writer, db_mgr = self._writer(lambda slices: OperationalError("SELECT", {}, Exception("connection refused")))
+        for _ in range(3):
+            self.assertTrue(writer.drain_once()["outage"])
+        self.assertEqual(db_mgr.import_slices.call_count, 3)
+        self.assertEqual(self.queue.take(10)[0]["attempts"], 0)
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestIngestWriterDrain(QueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_ingest_queue"))
+        self.writer = IngestWriter(self.queue, self.db, batch_size=10, max_attempts=2,
+                                   logger=logging.getLogger("test_ingest_queue"))
+
+    def test_sliver_posted_after_its_slice_is_written(self):
+        prefix = f"ingest-test-{uuid.uuid4().hex[:8]}"
+        refs = {"project_uuid": f"{prefix}-p", "user_uuid": f"{prefix}-u", "user_email": "alice@example.com"}
+        self.queue.put("slice", f"{prefix}-sl", slice_row(**refs))
+        self.assertEqual(self.writer.drain_once()["written"], 1)
+
+        # The slice was written in an earlier batch: the sliver folds to a slice without state
+        self.queue.put("sliver", f"{prefix}-sl", sliver_row(f"{prefix}-s", site=f"{prefix}-site",
+                                                            host=f"{prefix}-host", **refs))
+        self.assertEqual(self.writer.drain_once(), {"taken": 1, "written": 1, "parked": 0, "outage": False})
+        session = self.db.get_session()
+        self.assertEqual(session.query(Slivers).filter(Slivers.sliver_guid == f"{prefix}-s").count(), 1)
+        session.rollback()
+
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_ingest_queue")
+
+
+@patch('reports_api.response_code.ingest_controller.authorize', return_value={})
+@patch('reports_api.response_code.ingest_controller.GlobalsSingleton')
+@patch('reports_api.response_code.slivers_controller.authorize', return_value={})
+@patch('reports_api.response_code.slivers_controller.GlobalsSingleton')
+@patch('reports_api.response_code.slivers_controller.DatabaseManager')
+class TestQueuedPosts(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        queue = IngestQueue.configure(os.path.join(self.dir, "ingest.sqlite"))
+        self.addCleanup(setattr, IngestQueue, "_instance", None)
+        self.addCleanup(queue.close)
+
+    def _post(self, body, sliver_id="s-1"):
+        return self.client.post(f'/reports/slivers/{SLICE_ID}/{sliver_id}', data=json.dumps(body),
+                                content_type='application/json', headers={'Authorization': 'Bearer special-key'})
+
+    def test_sliver_post_is_queued(self, mock_db, mock_gs, mock_auth, mock_ingest_gs, mock_ingest_auth):
+        mock_gs.get.return_value = mock_ingest_gs.get.return_value = _mock_globals
+        body = {"project_id": "p-1", "slice_id": SLICE_ID, "user_id": "u-1", "sliver_id": "s-1", "state": "Active",
+                "sliver_type": "VM", "lease_start": "2025-07-01T00:00:00+00:00",
+                "components": {"total": 1, "data": [{"component_id": "s-1-gpu", "type": "GPU", "model": "A100"}]}}
+        response = self._post(body)
+        self.assertStatus(response, 202)
+        mock_db.assert_not_called()
+        [queued] = IngestQueue.get().take(10)
+        self.assertEqual((queued["kind"], queued["slice_guid"], queued["row"]["state"]), ("sliver", SLICE_ID, 4))
+        self.assertEqual(queued["row"]["lease_start"], START)
+
+        self.assert400(self._post(dict(body, sliver_type=None)))
+        self.assert400(self._post(body, sliver_id="s-2"))
+
+        response = self.client.get('/reports/ingest/queue', headers={'Authorization': 'Bearer special-key'})
+        metrics = json.loads(response.data)
+        self.assertEqual((metrics["enabled"], metrics["depth"], metrics["failed"]), (True, 1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
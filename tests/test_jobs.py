@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for background find-slot / calendar jobs.
+
+JobManager runs a stand-in runner in real worker processes; the controller tests
+use a Flask test client with the job manager mocked out. No database required.
+"""
+import json
+import logging
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+
+import connexion
+from flask_testing import TestCase
+
+from reports_api.common.jobs import JobCancelled, JobManager, reporter
+from reports_api.database.db_manager import DatabaseManager
+from reports_api.database.occupancy import HourlyOccupancy
+
+
+def fake_runner(job_id, kind, params, db_config, progress, cancelled):
+    """Stands in for run_job: reports a day of hours at a time."""
+    report = reporter(job_id, progress, cancelled)
+    total = params["hours"]
+    for h in range(0, total + 1, 24):
+        report(h, total)
+        time.sleep(params.get("delay", 0))
+    if params.get("fail"):
+        raise ValueError("no capacity data")
+    return {"kind": kind, "hours": total}
+
+
+def wait_for(job_mgr, job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_mgr.status(job_id)
+        if job is None or job["status"] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not reach {statuses}")
+
+
+class TestJobManager(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.job_mgr = JobManager(db_config={}, workers=2, result_ttl_seconds=3600, runner=fake_runner)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.job_mgr.shutdown()
+
+    def test_completed_job_keeps_result_and_progress(self):
+        job = self.job_mgr.submit("find_slot", {"hours": 24 * 180})
+        self.assertIn(job["status"], ("queued", "running"))
+        done = wait_for(self.job_mgr, job["id"], ("completed", "failed"))
+        self.assertEqual(done["status"], "completed")
+        self.assertEqual(done["result"], {"kind": "find_slot", "hours": 24 * 180})
+        self.assertEqual(done["progress"], {"hours_scanned": 24 * 180, "total_hours": 24 * 180})
+        self.assertIn("finished_at", done)
+
+    def test_failed_job_reports_error(self):
+        job = self.job_mgr.submit("calendar", {"hours": 48, "fail": True})
+        done = wait_for(self.job_mgr, job["id"], ("completed", "failed"))
+        self.assertEqual(done["status"], "failed")
+        self.assertIn("no capacity data", done["error"])
+
+    def test_running_job_is_cancelled(self):
+        job = self.job_mgr.submit("find_slot", {"hours": 24 * 1000, "delay": 0.02})
+        running = wait_for(self.job_mgr, job["id"], ("running",))
+        self.assertEqual(running["progress"]["total_hours"], 24 * 1000)
+        self.assertIn(self.job_mgr.cancel(job["id"])["status"], ("cancelling", "cancelled"))
+        done = wait_for(self.job_mgr, job["id"], ("cancelled", "completed"))
+        self.assertEqual(done["status"], "cancelled")
+        self.assertLess(done["progress"]["hours_scanned"], 24 * 1000)
+
+    def test_finished_job_is_discarded(self):
+        job = self.job_mgr.submit("calendar", {"hours": 24})
+        wait_for(self.job_mgr, job["id"], ("completed",))
+        self.assertEqual(self.job_mgr.cancel(job["id"])["status"], "completed")
+        self.assertIsNone(self.job_mgr.status(job["id"]))
+        self.assertIsNone(self.job_mgr.cancel("no-such-job"))
+
+    def test_results_expire(self):
+        job_mgr = JobManager(db_config={}, workers=1, result_ttl_seconds=0, runner=fake_runner)
+        try:
+            job = job_mgr.submit("calendar", {"hours": 24})
+            wait_for(job_mgr, job["id"], ("completed",))
+            time.sleep(0.01)
+            self.assertIsNone(job_mgr.status(job["id"]))
+        finally:
+            job_mgr.shutdown()
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            self.job_mgr.submit("report", {})
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_cancel_flag_stops_the_scan(self):
+        progress, cancelled = {}, {"job": True}
+        occupancy = HourlyOccupancy(datetime(2025, 7, 1, tzinfo=timezone.utc), 96)
+        with self.assertRaises(JobCancelled):
+            occupancy.search(duration=4, max_results=1, compute_requests=[], link_requests=[], fp_requests=[],
+                             host_cap_map={}, hosts_by_site={}, link_cap_map={}, fp_cap_map={},
+                             progress=reporter("job", progress, cancelled))
+        self.assertEqual(progress, {})
+
+    def test_calendar_reports_hours_per_chunk(self):
+        db = DatabaseManager.__new__(DatabaseManager)
+        reports = []
+
+        def chunk(session, layout, start_time, end_time, *args):
+            yield start_time, end_time, {}
+
+        start = datetime(2025, 7, 1, tzinfo=timezone.utc)
+        end = start + timedelta(days=30)
+        with patch.object(db, "_calendar_chunk", side_effect=chunk):
+            list(db._calendar_rows(None, None, start, end, timedelta(days=1), "python", {}, {}, {},
+                                   progress=lambda scanned, total: reports.append((scanned, total))))
+        self.assertEqual(reports, [(720, 720)])
+        with patch.object(db, "_calendar_chunk", side_effect=chunk):
+            reports.clear()
+            list(db._calendar_rows(None, None, start, end, timedelta(hours=1), "python", {}, {}, {},
+                                   progress=lambda scanned, total: reports.append((scanned, total))))
+        self.assertEqual(reports, [(168, 720), (336, 720), (504, 720), (672, 720), (720, 720)])
+
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_jobs")
+_mock_globals.config.runtime_config = {}
+
+FIND_SLOT_JOB = {
+    "start": "2025-07-01T00:00:00+00:00",
+    "end": "2025-12-28T00:00:00+00:00",
+    "duration": 72,
+    "max_results": 500,
+    "resources": [{"type": "compute", "site": "RENC", "cores": 8}],
+}
+
+
+@patch('reports_api.response_code.calendar_controller.authorize', return_value={"sub": "test"})
+@patch('reports_api.response_code.calendar_controller.GlobalsSingleton')
+@patch('reports_api.response_code.calendar_controller._get_job_manager')
+class TestJobEndpoints(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def _setup(self, mock_jobs, mock_gs):
+        mock_gs.get.return_value = _mock_globals
+        job_mgr = MagicMock()
+        job_mgr.submit.side_effect = lambda kind, params: {"id": "j1", "kind": kind, "status": "queued",
+                                                            "progress": {"hours_scanned": 0, "total_hours": 0}}
+        mock_jobs.return_value = job_mgr
+        return job_mgr
+
+    def _post(self, path, body):
+        return self.client.post(path, data=json.dumps(body), content_type='application/json',
+                                headers={'Authorization': 'Bearer special-key'})
+
+    def test_six_month_find_slot_job_is_accepted(self, mock_jobs, mock_gs, mock_auth):
+        job_mgr = self._setup(mock_jobs, mock_gs)
+        response = self._post('/reports/calendar/find-slot/jobs', FIND_SLOT_JOB)
+        self.assertStatus(response, 202)
+        self.assertEqual(json.loads(response.data)["id"], "j1")
+        kind, params = job_mgr.submit.call_args.args
+        self.assertEqual(kind, "find_slot")
+        self.assertEqual((params["max_results"], params["end_time"] - params["start_time"]),
+                         (500, timedelta(days=180)))
+
+    def test_find_slot_job_limits(self, mock_jobs, mock_gs, mock_auth):
+        job_mgr = self._setup(mock_jobs, mock_gs)
+        too_long = dict(FIND_SLOT_JOB, end="2026-07-10T00:00:00+00:00")
+        self.assert400(self._post('/reports/calendar/find-slot/jobs', too_long))
+        self.assert400(self._post('/reports/calendar/find-slot/jobs', dict(FIND_SLOT_JOB, max_results=5000)))
+        job_mgr.submit.assert_not_called()
+
+    def test_calendar_job(self, mock_jobs, mock_gs, mock_auth):
+        job_mgr = self._setup(mock_jobs, mock_gs)
+        response = self._post('/reports/calendar/jobs', {"start_time": "2025-07-01T00:00:00+00:00",
+                                                         "end_time": "2026-01-01T00:00:00+00:00",
+                                                         "interval": "hour", "format": "changes"})
+        self.assertStatus(response, 202)
+        kind, params = job_mgr.submit.call_args.args
+        self.assertEqual((kind, params["fmt"], params["interval"], params["level"]),
+                         ("calendar", "changes", "hour", "host"))
+        self.assert400(self._post('/reports/calendar/jobs', {"start_time": "2025-07-01T00:00:00+00:00",
+                                                             "end_time": "2025-07-01T00:00:00+00:00"}))
+
+    def test_get_and_cancel(self, mock_jobs, mock_gs, mock_auth):
+        job_mgr = self._setup(mock_jobs, mock_gs)
+        job_mgr.status.return_value = None
+        response = self.client.get('/reports/calendar/jobs/missing', headers={'Authorization': 'Bearer special-key'})
+        self.assert404(response)
+        job_mgr.cancel.return_value = {"id": "j1", "status": "cancelling"}
+        response = self.client.delete('/reports/calendar/jobs/j1', headers={'Authorization': 'Bearer special-key'})
+        self.assert200(response)
+        self.assertEqual(json.loads(response.data)["status"], "cancelling")
+        job_mgr.cancel.assert_called_once_with("j1")
+
+
+if __name__ == '__main__':
+    unittest.main()
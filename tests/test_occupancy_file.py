@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-mapped occupancy file.
+
+An HourlyAllocation filled with mock usage is published to a temporary
+directory and read back through OccupancyFile. No database required.
+"""
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from reports_api.database.hourly_allocation import HourlyAllocation
+from reports_api.database.occupancy_file import OccupancyFile, read_generation, write_occupancy_file
+
+
+def dt(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+START = dt(2025, 7, 1)
+N_HOURS = 96
+
+
+def mock_allocation() -> HourlyAllocation:
+    rng = random.Random(21)
+    allocation = HourlyAllocation(START, N_HOURS)
+    for h in range(N_HOURS):
+        for host_id in (1, 2, 3):
+            if rng.random() < 0.6:
+                allocation.host[h][host_id] = {"cores": rng.randrange(1, 64), "ram": rng.randrange(0, 256),
+                                               "disk": rng.randrange(0, 2000)}
+            if rng.random() < 0.3:
+                allocation.comp[h][host_id]["gpu-a100"] += rng.randrange(1, 3)
+        if rng.random() < 0.5:
+            allocation.link[("RENC", "UKY")][h] += rng.choice([10, 25, 100])
+        if rng.random() < 0.5:
+            allocation.fp[("Cloud-FP", "RENC")][h] |= 1 << rng.randrange(1, 4095)
+    return allocation
+
+
+class TestOccupancyFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "occupancy.bin")
+        self.allocation = mock_allocation()
+        self.reader = OccupancyFile(self.path, max_age_seconds=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_of_sub_range(self):
+        self.assertEqual(write_occupancy_file(self.path, self.allocation), 1)
+        start, n = START + timedelta(hours=10), 48
+        loaded = self.reader.load(start, n, host_ids=[1, 3, 99])
+        self.assertIsNotNone(loaded)
+        for h in range(n):
+            src = 10 + h
+            self.assertEqual(dict(loaded.host[h]), {k: v for k, v in self.allocation.host[src].items() if k != 2})
+            self.assertEqual({k: dict(v) for k, v in loaded.comp[h].items()},
+                             {k: dict(v) for k, v in self.allocation.comp[src].items() if k != 2})
+        self.assertEqual(loaded.link[("RENC", "UKY")], self.allocation.link[("RENC", "UKY")][10:58])
+        self.assertEqual(loaded.fp[("Cloud-FP", "RENC")], self.allocation.fp[("Cloud-FP", "RENC")][10:58])
+
+        without = self.reader.load(start, n, host_ids=[1], links=False, facility_ports=False)
+        self.assertFalse(without.link)
+        self.assertFalse(without.fp)
+
+    def test_uncovered_or_unaligned_range(self):
+        write_occupancy_file(self.path, self.allocation)
+        self.assertIsNone(self.reader.load(START - timedelta(hours=1), 4, host_ids=[1]))
+        self.assertIsNone(self.reader.load(START + timedelta(hours=N_HOURS - 2), 4, host_ids=[1]))
+        self.assertIsNone(self.reader.load(START + timedelta(minutes=30), 4, host_ids=[1]))
+        self.assertIsNone(OccupancyFile(os.path.join(self.tmp.name, "missing.bin")).load(START, 4, host_ids=[1]))
+
+    def test_new_generation_is_picked_up(self):
+        write_occupancy_file(self.path, self.allocation)
+        self.assertEqual(self.reader.generation, 1)
+        before = self.reader.load(START, 1, host_ids=[1, 2, 3])
+
+        updated = HourlyAllocation(START, N_HOURS)
+        updated.host[0][1] = {"cores": 7, "ram": 7, "disk": 7}
+        self.assertEqual(write_occupancy_file(self.path, updated), 2)
+        self.assertEqual(read_generation(self.path), 2)
+        self.assertEqual(self.reader.generation, 2)
+        self.assertEqual(dict(self.reader.load(START, 1, host_ids=[1, 2, 3]).host[0]),
+                         {1: {"cores": 7, "ram": 7, "disk": 7}})
+        # A result already returned is unaffected by the new generation
+        self.assertEqual(dict(before.host[0]), dict(self.allocation.host[0]))
+        self.assertEqual(os.listdir(self.tmp.name), ["occupancy.bin"])
+
+    def test_stale_file_is_ignored(self):
+        write_occupancy_file(self.path, self.allocation)
+        self.assertIsNone(OccupancyFile(self.path, max_age_seconds=-1).load(START, 4, host_ids=[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
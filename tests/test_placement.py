@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compute placement solver used by find_slot.
+
+These tests use plain capacity maps — no database required.
+"""
+import unittest
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+
+from reports_api.database.occupancy import HourlyOccupancy
+from reports_api.database.placement import PlacementSolver
+
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "core", "ram", "disk", "lease_start", "lease_end"])
+
+
+def dt(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+def make_hosts(hosts):
+    host_cap_map = {}
+    for hid, site, cores, ram, disk, comps in hosts:
+        host_cap_map[hid] = {"name": f"host-{hid}", "site": site, "cores_capacity": cores,
+                             "ram_capacity": ram, "disk_capacity": disk, "components": comps or {}}
+    hosts_by_site = defaultdict(list)
+    for hid, cap in host_cap_map.items():
+        hosts_by_site[cap["site"]].append(hid)
+    return host_cap_map, hosts_by_site
+
+
+def full_state(solver):
+    return tuple(solver.capacity)
+
+
+class TestPlacementSolver(unittest.TestCase):
+
+    def test_large_request_after_small_ones(self):
+        """First-fit in request order puts the small VM on the big host; sorting by size avoids that."""
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 64, 256, 1000, {}),
+                                                  (2, "RENC", 16, 64, 1000, {})])
+        requests = [{"type": "compute", "site": "RENC", "cores": 16, "ram": 32, "disk": 10},
+                    {"type": "compute", "site": "RENC", "cores": 60, "ram": 128, "disk": 10}]
+        solver = PlacementSolver(requests, host_cap_map, hosts_by_site)
+        self.assertIsNone(solver._first_fit(full_state(solver)))
+        self.assertEqual(solver.solve(full_state(solver)), {0: 2, 1: 1})
+
+    def test_search_finds_what_heuristics_miss(self):
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 10, 100, 100, {}),
+                                                  (2, "RENC", 10, 100, 100, {})])
+        requests = [{"type": "compute", "cores": c, "ram": 0, "disk": 0} for c in (6, 5, 5, 4)]
+        solver = PlacementSolver(requests, host_cap_map, hosts_by_site)
+        placement = solver.solve(full_state(solver))
+        self.assertIsNotNone(placement)
+        for hid in (1, 2):
+            self.assertEqual(sum(requests[i]["cores"] for i, h in placement.items() if h == hid), 10)
+
+    def test_components_and_sites(self):
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 64, 256, 1000, {}),
+                                                  (2, "CLEM", 64, 256, 1000, {"GPU-A100": 2})])
+        requests = [{"type": "compute", "cores": 8, "ram": 16, "disk": 10, "components": {"gpu-a100": 1}},
+                    {"type": "compute", "site": "RENC", "cores": 8, "ram": 16, "disk": 10}]
+        solver = PlacementSolver(requests, host_cap_map, hosts_by_site)
+        self.assertEqual(solver.solve(full_state(solver)), {0: 2, 1: 1})
+
+    def test_infeasible(self):
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 8, 16, 100, {})])
+        requests = [{"type": "compute", "cores": 6, "ram": 8, "disk": 10}] * 2
+        solver = PlacementSolver(requests, host_cap_map, hosts_by_site)
+        self.assertIsNone(solver.solve(full_state(solver)))
+
+    def test_identical_states_solved_once(self):
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 64, 256, 1000, {})])
+        requests = [{"type": "compute", "site": "RENC", "cores": 32, "ram": 64, "disk": 10}]
+        slivers = [SliverRow(1, 1, 48, 64, 10, dt(2025, 7, 1, 10), dt(2025, 7, 1, 12))]
+        occupancy = HourlyOccupancy.from_slivers(dt(2025, 7, 1), 24 * 7, host_cap_map, slivers, {})
+        solver = PlacementSolver(requests, host_cap_map, hosts_by_site)
+        ok = occupancy.compute_feasible_hours(solver)
+        self.assertEqual(ok.count(False), 2)
+        self.assertEqual(solver.misses, 2)
+
+    def test_window_placement_pins_hosts(self):
+        host_cap_map, hosts_by_site = make_hosts([(1, "RENC", 32, 256, 1000, {}),
+                                                  (2, "RENC", 32, 256, 1000, {})])
+        requests = [{"type": "compute", "site": "RENC", "cores": 24, "ram": 16, "disk": 10}]
+        # Host 1 is busy in the first hours, host 2 later: each hour fits, but no single host fits the window
+        slivers = [SliverRow(1, 1, 16, 16, 10, dt(2025, 7, 1, 0), dt(2025, 7, 1, 2)),
+                   SliverRow(2, 2, 16, 16, 10, dt(2025, 7, 1, 2), dt(2025, 7, 1, 4))]
+        occupancy = HourlyOccupancy.from_slivers(dt(2025, 7, 1), 8, host_cap_map, slivers, {})
+        found = occupancy.search(duration=4, max_results=2, compute_requests=requests, link_requests=[],
+                                 fp_requests=[], host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+                                 link_cap_map={}, fp_cap_map={})
+        self.assertEqual(found, [(0, None), (1, None)])
+        found = occupancy.search(duration=2, max_results=1, compute_requests=requests, link_requests=[],
+                                 fp_requests=[], host_cap_map=host_cap_map, hosts_by_site=hosts_by_site,
+                                 link_cap_map={}, fp_cap_map={})
+        self.assertEqual(found, [(0, {0: 2})])
+
+
+if __name__ == '__main__':
+    unittest.main()
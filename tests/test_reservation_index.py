@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-memory reservation index.
+
+The index is filled with mock sliver rows; its queries are checked against a
+brute-force overlap scan. No database required.
+"""
+import random
+import time
+import unittest
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from reports_api.database.reservation_index import IntervalList, ReservationIndex, _Snapshot
+
+
+SliverRow = namedtuple("SliverRow", ["id", "host_id", "sliver_type", "core", "ram", "disk", "bandwidth",
+                                     "lease_start", "lease_end"])
+IfaceRow = namedtuple("IfaceRow", ["sliver_id", "name", "vlan", "site_name"])
+
+
+def dt(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+def overlaps(ls, le, start, end):
+    return ls < end and le > start
+
+
+class TestIntervalList(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        base = dt(2025, 7, 1)
+        intervals = IntervalList()
+        leases = {}
+        for i in range(300):
+            ls = base + timedelta(minutes=rng.randrange(0, 20000))
+            # Includes malformed leases with end before start
+            le = ls + timedelta(minutes=rng.randrange(-60, 3000))
+            intervals.add(i, ls, le, i)
+            leases[i] = (ls, le)
+        for i in range(0, 300, 3):
+            intervals.remove(i, leases.pop(i)[0])
+
+        for _ in range(200):
+            start = base + timedelta(minutes=rng.randrange(-500, 21000))
+            end = start + timedelta(minutes=rng.randrange(1, 5000))
+            expected = sorted(i for i, (ls, le) in leases.items() if overlaps(ls, le, start, end))
+            self.assertEqual(sorted(intervals.overlapping(start, end)), expected)
+
+
+class TestReservationIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        base = dt(2025, 7, 1)
+        self.slivers = []
+        self.ifaces = {}
+        self.components = {}
+        for i in range(200):
+            ls = base + timedelta(minutes=rng.randrange(0, 20000))
+            le = ls + timedelta(minutes=rng.randrange(1, 4000))
+            if i % 4 == 0:
+                s = SliverRow(i, None, "l2ptp", None, None, None, rng.choice([10, 25]), ls, le)
+                self.ifaces[i] = [IfaceRow(i, None, None, "RENC"), IfaceRow(i, None, None, "UKY")]
+            elif i % 4 == 1:
+                s = SliverRow(i, None, "l2sts", None, None, None, None, ls, le)
+                self.ifaces[i] = [IfaceRow(i, "Cloud-FP", str(rng.randrange(100, 110)), "RENC")]
+            else:
+                s = SliverRow(i, rng.choice([1, 2, 3]), "vm", 2, 8, 10, None, ls, le)
+                if i % 3 == 0:
+                    self.components[i] = [("GPU-A100", f"g{i}")]
+            self.slivers.append(s)
+
+        self.index = ReservationIndex(max_age_seconds=300, history_days=7)
+        snapshot = _Snapshot()
+        for s in self.slivers:
+            snapshot.add(s, self.components.get(s.id, []), self.ifaces.get(s.id, []))
+        self.index._snapshot = snapshot
+        self.index.covered_from = base
+        self.index.loaded_at = time.monotonic()
+
+    def test_queries_match_brute_force(self):
+        start, end = dt(2025, 7, 5), dt(2025, 7, 8)
+        in_range = [s for s in self.slivers if overlaps(s.lease_start, s.lease_end, start, end)]
+
+        compute, comp_by_sliver = self.index.compute_slivers([1, 2], start, end)
+        self.assertEqual(sorted(s.id for s in compute),
+                         sorted(s.id for s in in_range if s.host_id in (1, 2)))
+        self.assertEqual(comp_by_sliver, {s.id: self.components[s.id] for s in compute if s.id in self.components})
+
+        net, net_ifaces = self.index.network_slivers({("RENC", "UKY"): {}}, start, end)
+        self.assertEqual(sorted(s.id for s in net),
+                         sorted(s.id for s in in_range if s.sliver_type in ("l2ptp", "l2sts")))
+        self.assertEqual(net_ifaces[net[0].id], [r.site_name for r in self.ifaces[net[0].id]])
+
+        ports = self.index.fp_slivers({("Cloud-FP", "RENC"): {}}, start, end)
+        self.assertEqual(len(ports), len([s for s in in_range if s.sliver_type == "l2sts"]))
+        self.assertEqual(self.index.fp_slivers({}, start, end), [])
+
+    def test_remove_sliver(self):
+        target = next(s for s in self.slivers if s.host_id)
+        self.index._snapshot.remove(target.id)
+        compute, _ = self.index.compute_slivers([1, 2, 3], target.lease_start, target.lease_end)
+        self.assertNotIn(target.id, [s.id for s in compute])
+
+    def test_coverage_and_staleness(self):
+        self.assertTrue(self.index.covers(dt(2025, 7, 2)))
+        self.assertFalse(self.index.covers(dt(2025, 6, 30)))
+        self.index.loaded_at = time.monotonic() - 301
+        self.assertFalse(self.index.covers(dt(2025, 7, 2)))
+        self.index.loaded_at = time.monotonic()
+        self.index.invalidate()
+        self.assertFalse(self.index.covers(dt(2025, 7, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk sliver ingest through POST /slices/{slice_id}/slivers.
+
+The endpoint tests use a Flask test client with the database manager mocked out. The
+ingest test needs PostgreSQL; it runs only when REPORTS_TEST_DB_HOST is set (with
+REPORTS_TEST_DB_USER, REPORTS_TEST_DB_PASSWORD and REPORTS_TEST_DB_NAME).
+"""
+import json
+import logging
+import os
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+
+import connexion
+from flask_testing import TestCase
+from sqlalchemy.dialects import postgresql
+
+from reports_api.database import Components, Interfaces, Slivers
+from reports_api.database.db_manager import DatabaseManager
+
+SLICE_ID = "a3f41e9a-7e2b-4df7-baf7-12f48a3c8e6f"
+
+
+def sliver(sliver_id, **kwargs):
+    body = {"project_id": "p-1", "project_name": "Edge AI", "slice_id": SLICE_ID, "slice_name": "edge",
+            "user_id": "u-1", "user_email": "alice@example.com", "host": "renc-w1", "site": "RENC",
+            "sliver_id": sliver_id, "state": "Active", "sliver_type": "VM", "core": 4, "ram": 16, "disk": 10,
+            "lease_start": "2025-07-01T00:00:00+00:00", "lease_end": "2025-07-02T00:00:00+00:00",
+            "components": {"total": 1, "data": [{"component_id": f"{sliver_id}-gpu", "type": "GPU",
+                                                 "model": "A100"}]},
+            "interfaces": {"total": 1, "data": [{"interface_id": f"{sliver_id}-eth0", "vlan": "100"}]}}
+    body.update(kwargs)
+    return body
+
+
+_mock_globals = MagicMock()
+_mock_globals.log = logging.getLogger("test_sliver_batch")
+
+
+@patch('reports_api.response_code.slivers_controller.authorize', return_value={"sub": "test"})
+@patch('reports_api.response_code.slivers_controller.GlobalsSingleton')
+@patch('reports_api.response_code.slivers_controller._get_db_manager')
+class TestSliverBatchEndpoint(TestCase):
+
+    def create_app(self):
+        app = connexion.App(__name__, specification_dir='../reports_api/openapi_server/openapi/')
+        app.app.json_encoder = None
+        app.add_api('openapi.yaml', pythonic_params=True)
+        return app.app
+
+    def _post(self, mock_db, mock_gs, body):
+        mock_gs.get.return_value = _mock_globals
+        db_mgr = MagicMock()
+        db_mgr.add_or_update_slivers.side_effect = lambda slice_guid, slivers: {
+            s["sliver_guid"]: "updated" if s["sliver_guid"] == "s-2" else "created" for s in slivers}
+        mock_db.return_value = db_mgr
+        response = self.client.post(f'/reports/slices/{SLICE_ID}/slivers', data=json.dumps(body),
+                                    content_type='application/json', headers={'Authorization': 'Bearer special-key'})
+        return response, db_mgr
+
+    def test_slivers_are_written_in_one_call(self, mock_db, mock_gs, mock_auth):
+        response, db_mgr = self._post(mock_db, mock_gs, [sliver("s-1"), sliver("s-2")])
+        self.assert200(response)
+        result = json.loads(response.data)
+        self.assertEqual([(r["sliver_id"], r["status"]) for r in result["results"]],
+                         [("s-1", "created"), ("s-2", "updated")])
+        self.assertEqual((result["total"], result["created"], result["updated"], result["rejected"]), (2, 1, 1, 0))
+
+        db_mgr.add_or_update_slivers.assert_called_once()
+        kwargs = db_mgr.add_or_update_slivers.call_args.kwargs
+        self.assertEqual(kwargs["slice_guid"], SLICE_ID)
+        row = kwargs["slivers"][0]
+        self.assertEqual((row["sliver_guid"], row["state"], row["project_uuid"], row["host"]),
+                         ("s-1", 4, "p-1", "renc-w1"))
+        self.assertEqual(row["components"][0]["component_guid"], "s-1-gpu")
+        self.assertEqual(row["interfaces"][0]["vlan"], "100")
+
+    def test_invalid_slivers_are_rejected_individually(self, mock_db, mock_gs, mock_auth):
+        body = [sliver("s-1"), sliver("s-3", slice_id="other-slice"), sliver("", state="Sleeping"),
+                sliver("s-1"), sliver("s-5", sliver_type="")]
+        response, db_mgr = self._post(mock_db, mock_gs, body)
+        self.assert200(response)
+        result = json.loads(response.data)
+        self.assertEqual([r["status"] for r in result["results"]],
+                         ["created", "rejected", "rejected", "rejected", "rejected"])
+        self.assertIn("slice_id", result["results"][1]["details"])
+        self.assertIn("sliver_id", result["results"][2]["details"])
+        self.assertIn("Duplicate", result["results"][3]["details"])
+        self.assertEqual([s["sliver_guid"] for s in db_mgr.add_or_update_slivers.call_args.kwargs["slivers"]],
+                         ["s-1"])
+
+    def test_nothing_valid_skips_the_database(self, mock_db, mock_gs, mock_auth):
+        response, db_mgr = self._post(mock_db, mock_gs, [sliver("s-3", slice_id="other-slice")])
+        self.assert200(response)
+        self.assertEqual(json.loads(response.data)["rejected"], 1)
+        db_mgr.add_or_update_slivers.assert_not_called()
+
+    def test_empty_batch(self, mock_db, mock_gs, mock_auth):
+        response, _ = self._post(mock_db, mock_gs, [])
+        self.assert400(response)
+
+
+class TestChildUpserts(unittest.TestCase):
+
+    def test_one_statement_keeps_stored_values(self):
+        session = MagicMock()
+        rows = [{"sliver_id": 1, "component_guid": f"c{i}", "type": "gpu", "model": None, "bdfs": None,
+                 "node_id": None, "component_node_id": None} for i in range(3)]
+        DatabaseManager._upsert(session, Components.__table__, ["sliver_id", "component_guid"], rows,
+                                keep=("type", "model", "bdfs", "node_id", "component_node_id"))
+        self.assertEqual(session.execute.call_count, 1)
+        sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (sliver_id, component_guid) DO UPDATE", sql)
+        self.assertIn("coalesce(excluded.model, components.model)", sql)
+        self.assertEqual(sql.count("%(sliver_id_m"), 3)
+
+        DatabaseManager._upsert(session, Interfaces.__table__, ["sliver_id", "interface_guid"], [])
+        self.assertEqual(session.execute.call_count, 1)
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestBulkIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_sliver_batch"))
+        self.prefix = f"bulk-test-{uuid.uuid4().hex[:8]}"
+
+    def _row(self, n, **kwargs):
+        now = datetime.now(timezone.utc)
+        row = {"project_uuid": f"{self.prefix}-p", "project_name": "bulk", "user_uuid": f"{self.prefix}-u",
+               "user_email": "bulk@example.com", "slice_name": "bulk", "site": f"{self.prefix}-site",
+               "host": f"{self.prefix}-host", "sliver_guid": f"{self.prefix}-s{n}", "state": 4, "sliver_type": "VM",
+               "core": 2, "ram": 8, "lease_start": now, "lease_end": now + timedelta(hours=n + 1),
+               "components": [{"component_guid": f"{self.prefix}-c{n}", "component_type": "GPU", "model": "A100"}],
+               "interfaces": [{"interface_guid": f"{self.prefix}-i{n}", "vlan": "100"}]}
+        row.update(kwargs)
+        return row
+
+    def test_created_then_updated(self):
+        slice_guid = f"{self.prefix}-slice"
+        self.db.add_or_update_slice(project_id=None, user_id=None, slice_guid=slice_guid, slice_name="bulk",
+                                    state=4, lease_start=None, lease_end=None)
+        statuses = self.db.add_or_update_slivers(slice_guid, [self._row(n) for n in range(3)])
+        self.assertEqual(set(statuses.values()), {"created"})
+
+        statuses = self.db.add_or_update_slivers(slice_guid, [self._row(0, core=None, ram=32,
+                                                                        components=[{"component_guid":
+                                                                                     f"{self.prefix}-c0"}])])
+        self.assertEqual(statuses, {f"{self.prefix}-s0": "updated"})
+        session = self.db.get_session()
+        s0 = session.query(Slivers).filter(Slivers.sliver_guid == f"{self.prefix}-s0").one()
+        self.assertEqual((s0.core, s0.ram), (2, 32))
+        component = session.query(Components).filter(Components.sliver_id == s0.id).one()
+        self.assertEqual((component.type, component.model), ("gpu", "a100"))
+        self.assertEqual(session.query(Slivers).filter(Slivers.slice_id == s0.slice_id).count(), 3)
+        session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
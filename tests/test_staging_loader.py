@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the COPY-based staging-and-merge loader.
+
+The unit tests run the loader against a mock DBAPI cursor. The load test needs PostgreSQL;
+it runs only when REPORTS_TEST_DB_HOST is set (with REPORTS_TEST_DB_USER,
+REPORTS_TEST_DB_PASSWORD and REPORTS_TEST_DB_NAME).
+"""
+import csv
+import logging
+import os
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from reports_api.database import Components, Membership, Slivers, Users
+from reports_api.database.db_manager import DatabaseManager, SLICE_OPTIONAL_COLUMNS, SLIVER_OPTIONAL_COLUMNS, \
+    COMPONENT_OPTIONAL_COLUMNS, INTERFACE_OPTIONAL_COLUMNS, TOUCH_COLUMNS
+from reports_api.database.staging_loader import StagingLoader, copy_buffer, merge_statements, staging_rows
+
+
+def slice_row(guid, n_slivers=1, **kwargs):
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    row = {"slice_guid": guid, "slice_name": "edge", "project_uuid": "p-1", "project_name": "Edge AI",
+           "user_uuid": "u-1", "user_email": "alice@example.com", "state": 4, "lease_start": start,
+           "lease_end": start + timedelta(days=1),
+           "slivers": [{"project_uuid": "p-1", "user_uuid": "u-1", "site": "RENC", "host": "renc-w1",
+                        "sliver_guid": f"{guid}-s{n}", "state": 4, "sliver_type": "VM", "core": 2, "ram": 0,
+                        "lease_start": start, "lease_end": start + timedelta(days=1),
+                        "components": [{"component_guid": f"{guid}-s{n}-gpu", "component_type": "GPU",
+                                        "model": "A100", "bdfs": ["0000:25:00.0"]}],
+                        "interfaces": [{"interface_guid": f"{guid}-s{n}-eth0", "vlan": "100"}]}
+                       for n in range(n_slivers)]}
+    row.update(kwargs)
+    return row
+
+
+class TestStagingRows(unittest.TestCase):
+
+    def test_rows_are_numbered_in_order_and_empty_values_are_null(self):
+        rows = staging_rows([slice_row("a", n_slivers=2)],
+                            [{"user_uuid": "u-1", "project_uuid": "p-1", "membership_type": "member"}])
+        self.assertEqual([len(rows[t]) for t in ("staging_slices", "staging_slivers", "staging_components",
+                                                 "staging_interfaces", "staging_memberships")], [1, 2, 2, 2, 1])
+        seqs = sorted(r[0] for table in rows.values() for r in table)
+        self.assertEqual(seqs, list(range(1, 9)))
+        sliver = rows["staging_slivers"][0]
+        self.assertEqual(sliver[2], "a-s0")
+        self.assertIn(2, sliver)
+        self.assertNotIn(0, sliver[1:])  # ram=0 never overwrites a stored value
+        self.assertTrue(rows["staging_memberships"][0][-1])
+
+    def test_csv_round_trip(self):
+        values = (1, 'say "hi", bye', None, "", True, datetime(2024, 3, 1, tzinfo=timezone.utc), ["x"])
+        line = copy_buffer([values]).read()
+        self.assertEqual(line, '1,"say ""hi"", bye",,"",t,2024-03-01T00:00:00+00:00,"[""x""]"\n')
+        self.assertEqual(next(csv.reader([line]))[1], 'say "hi", bye')
+
+
+class TestMergeStatements(unittest.TestCase):
+
+    def setUp(self):
+        self.statements = dict(merge_statements(SLICE_OPTIONAL_COLUMNS, SLIVER_OPTIONAL_COLUMNS,
+                                                COMPONENT_OPTIONAL_COLUMNS, INTERFACE_OPTIONAL_COLUMNS, TOUCH_COLUMNS))
+
+    def test_order_follows_foreign_keys(self):
+        self.assertEqual(list(self.statements), ["projects", "users", "sites", "hosts", "slices", "slivers",
+                                                 "components", "interfaces", "memberships"])
+
+    def test_ids_come_from_the_model_sequences(self):
+        for table in ("projects", "users", "sites", "hosts", "slices", "slivers"):
+            self.assertIn(f"nextval('\"{table}.id\"')", self.statements[table])
+
+    def test_upserts_keep_stored_values_like_the_row_path(self):
+        slivers = self.statements["slivers"]
+        self.assertIn("ON CONFLICT (sliver_guid) DO UPDATE", slivers)
+        self.assertIn("host_id = EXCLUDED.host_id", slivers)
+        self.assertIn("core = COALESCE(EXCLUDED.core, slivers.core)", slivers)
+        self.assertIn("state = COALESCE(EXCLUDED.state, slices.state)", self.statements["slices"])
+        self.assertIn("model = COALESCE(EXCLUDED.model, components.model)", self.statements["components"])
+        self.assertIn("ON CONFLICT (user_id, project_id, membership_type, start_time)", self.statements["memberships"])
+
+    def test_unchanged_rows_are_not_updated(self):
+        self.assertIn("WHERE slivers.project_id IS DISTINCT FROM EXCLUDED.project_id OR", self.statements["slivers"])
+        self.assertIn("components.bdfs::jsonb IS DISTINCT FROM (COALESCE(EXCLUDED.bdfs, components.bdfs))::jsonb",
+                      self.statements["components"])
+        self.assertNotIn("last_updated IS DISTINCT FROM", self.statements["projects"])
+        self.assertTrue(self.statements["interfaces"].strip().endswith("RETURNING interfaces.sliver_id"))
+
+
+class TestStagingLoader(unittest.TestCase):
+
+    def _load(self, **kwargs):
+        session = MagicMock()
+        cursor = session.connection.return_value.connection.cursor.return_value
+        cursor.rowcount = 1
+        cursor.fetchall.return_value = [(10, True), (11, False)]
+        loader = StagingLoader(session, SLICE_OPTIONAL_COLUMNS, SLIVER_OPTIONAL_COLUMNS, COMPONENT_OPTIONAL_COLUMNS,
+                               INTERFACE_OPTIONAL_COLUMNS, TOUCH_COLUMNS)
+        result = loader.load(**kwargs)
+        executed = [c.args[0].strip() for c in cursor.execute.call_args_list]
+        copied = [c.args[0] for c in cursor.copy_expert.call_args_list]
+        return result, executed, copied, cursor
+
+    def test_rows_are_copied_then_merged(self):
+        result, executed, copied, cursor = self._load(slices=[slice_row("a", n_slivers=2)])
+        self.assertEqual([c.split()[1] for c in copied],
+                         ["staging_slices", "staging_slivers", "staging_components", "staging_interfaces"])
+        self.assertTrue(all("FORMAT csv" in c for c in copied))
+        truncates = [i for i, s in enumerate(executed) if s.startswith("TRUNCATE")]
+        self.assertEqual(truncates, [5, len(executed) - 1])
+        self.assertTrue(executed[6].startswith("DELETE FROM staging_slices"))
+        self.assertEqual((result["sliver_ids"], result["created"], result["slivers"]), ([10, 11], 1, 2))
+        self.assertEqual((result["staged"], result["skipped"]), (7, 1))
+        cursor.close.assert_called_once()
+
+    def test_update_existing_does_not_prune(self):
+        _, executed, _, _ = self._load(slices=[slice_row("a")], skip_existing=False)
+        self.assertFalse(any(s.startswith("DELETE") for s in executed))
+
+    def test_memberships_alone(self):
+        result, _, copied, _ = self._load(memberships=[{"user_uuid": "u-1", "project_uuid": "p-1",
+                                                        "membership_type": "member"}])
+        self.assertEqual([c.split()[1] for c in copied], ["staging_memberships"])
+        self.assertEqual(result["memberships"], 1)
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestCopyLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_staging_loader"))
+        self.prefix = f"copy-test-{uuid.uuid4().hex[:8]}"
+
+    def _slice(self, n, **kwargs):
+        row = slice_row(f"{self.prefix}-{n}", n_slivers=2, project_uuid=f"{self.prefix}-p",
+                        user_uuid=f"{self.prefix}-u", **kwargs)
+        for sliver in row["slivers"]:
+            sliver.update(project_uuid=f"{self.prefix}-p", user_uuid=f"{self.prefix}-u",
+                          site=f"{self.prefix}-site", host=f"{self.prefix}-host")
+        return row
+
+    def test_load_then_skip_or_update(self):
+        result = self.db.copy_load(slices=[self._slice(n) for n in range(3)],
+                                   memberships=[{"user_uuid": f"{self.prefix}-u", "project_uuid": f"{self.prefix}-p",
+                                                 "membership_type": "member", "start_time": None}])
+        self.assertEqual((result["slices"], result["slivers"], result["memberships"]), (3, 6, 1))
+        self.assertEqual(result["rows"], 3 + 6 + 6 + 6 + 1)
+
+        again = self.db.copy_load(slices=[self._slice(0)])
+        self.assertEqual((again["slices"], again["skipped"], again["slivers"]), (0, 1, 0))
+
+        updated = self._slice(0, slice_name=None)
+        updated["slivers"][0].update(core=None, ram=32, components=[{"component_guid": f"{self.prefix}-0-s0-gpu"}])
+        self.db.copy_load(slices=[updated], skip_existing=False)
+
+        session = self.db.get_session()
+        s0 = session.query(Slivers).filter(Slivers.sliver_guid == f"{self.prefix}-0-s0").one()
+        self.assertEqual((s0.core, s0.ram), (2, 32))
+        component = session.query(Components).filter(Components.sliver_id == s0.id).one()
+        self.assertEqual((component.type, component.model), ("gpu", "a100"))
+        user = session.query(Users).filter(Users.user_uuid == f"{self.prefix}-u").one()
+        self.assertEqual(session.query(Membership).filter(Membership.user_id == user.id).count(), 1)
+        session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
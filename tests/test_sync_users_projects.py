@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for the user / project sync against a local mock Core API server.
+
+The server adds a fixed latency to every request, so the throughput printed by the
+tests shows the effect of running requests concurrently.
+"""
+import json
+import logging
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+from reports_api.sync.sync_users_projects import CoreApiClient, ProjectSyncScript, RateLimiter, UserSyncScript
+
+N_USERS = 60
+N_PROJECTS = 20
+LATENCY = 0.02
+TOKEN = "test-token"
+
+
+class MockCoreApi(BaseHTTPRequestHandler):
+    failures = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, results=None):
+        body = json.dumps({"results": results or []}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            return self._send(401)
+        with self.lock:
+            remaining = self.failures.get(self.path, 0)
+            if remaining:
+                self.failures[self.path] = remaining - 1
+                return self._send(503)
+
+        parts = self.path.split("/")
+        if self.path == "/core-api-metrics/people":
+            return self._send(200, [{"uuid": f"u-{n}", "last_updated": updated(n)} for n in range(N_USERS)])
+        if self.path == "/core-api-metrics/projects":
+            return self._send(200, [{"uuid": f"p-{n}", "last_updated": updated(n)} for n in range(N_PROJECTS)])
+        if parts[2] == "people-details":
+            return self._send(200, [{"uuid": parts[3], "email": f"{parts[3]}@example.com", "active": True,
+                                     "registered_on": "2024-01-01T00:00:00+00:00"}])
+        if parts[2] == "projects-details":
+            return self._send(200, [{"uuid": parts[3], "name": f"project {parts[3]}", "active": True}])
+        if parts[2:4] == ["events", "people-membership"]:
+            n = int(parts[4].split("-")[1])
+            return self._send(200, [{"project_uuid": f"p-{n % N_PROJECTS}", "membership_type": "member",
+                                     "added_date": "2024-02-01T00:00:00+00:00", "removed_date": None}])
+        return self._send(404)
+
+
+def updated(n):
+    """last_updated of user / project n: one minute apart"""
+    return (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=n)).isoformat()
+
+
+def recording_db(watermark=None, stored_memberships=None):
+    db = MagicMock()
+    db.get_sync_watermark.return_value = watermark
+    db.add_or_update_users.side_effect = lambda users: {u["user_uuid"]: int(u["user_uuid"][2:]) for u in users}
+    db.get_project_ids_by_uuid.return_value = {}
+    db.add_or_update_projects.side_effect = lambda projects: {p["project_uuid"]: 100 + int(p["project_uuid"][2:])
+                                                              for p in projects}
+    db.get_memberships_by_user.return_value = stored_memberships or {}
+    db.add_or_update_memberships.side_effect = len
+    return db
+
+
+class TestSync(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockCoreApi)
+        cls.endpoint = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.logger = logging.getLogger("test_sync_users_projects")
+        MockCoreApi.failures = {}
+
+    def _client(self, **kwargs):
+        client = CoreApiClient(self.endpoint, TOKEN, **dict(dict(concurrency=8, rate_limit=0, backoff=0.01),
+                                                            **kwargs))
+        self.addCleanup(client.close)
+        return client
+
+    def test_users_are_fetched_concurrently_and_written_in_batches(self):
+        db = recording_db()
+        sync = UserSyncScript(self.endpoint, TOKEN, self.logger, client=self._client(), batch_size=25)
+        stats = sync.sync_users(db)
+        print(f"\nusers: {stats['users_per_second']} users/s over {stats['requests']} requests")
+
+        self.assertEqual((stats["users"], stats["updated"], stats["requests"]), (N_USERS, N_USERS, 1 + 2 * N_USERS))
+        self.assertEqual([len(c.args[0]) for c in db.add_or_update_users.call_args_list], [25, 25, 10])
+        written = [c.args[0][0] for c in db.add_or_update_memberships.call_args_list]
+        self.assertEqual(written[0]["active"], True)
+        self.assertEqual(sum(len(c.args[0]) for c in db.add_or_update_memberships.call_args_list), N_USERS)
+        # Serial requests would take at least this long
+        self.assertLess(stats["seconds"], (1 + 2 * N_USERS) * LATENCY)
+
+    def test_projects(self):
+        db = recording_db()
+        stats = ProjectSyncScript(self.endpoint, TOKEN, self.logger, client=self._client()).sync_projects(db)
+        print(f"\nprojects: {stats['projects_per_second']} projects/s")
+        self.assertEqual(stats["updated"], N_PROJECTS)
+        [call] = db.add_or_update_projects.call_args_list
+        self.assertEqual(call.args[0][3]["project_name"], "project p-3")
+
+    def test_transient_errors_are_retried(self):
+        MockCoreApi.failures = {"/core-api-metrics/people-details/u-3": 2, "/core-api-metrics/people-details/u-4": 9}
+        db = recording_db()
+        sync = UserSyncScript(self.endpoint, TOKEN, self.logger, client=self._client(retries=3))
+        stats = sync.sync_users(db)
+        written = {u["user_uuid"] for c in db.add_or_update_users.call_args_list for u in c.args[0]}
+        self.assertIn("u-3", written)
+        self.assertNotIn("u-4", written)
+        self.assertEqual(stats["updated"], N_USERS - 1)
+
+    def test_incremental_sync_fetches_users_updated_since_the_watermark(self):
+        watermark = datetime.fromisoformat(updated(49))
+        # u-50's membership is already stored as the Core API reports it
+        stored = {50: [{"user_id": 50, "project_id": 110, "membership_type": "member",
+                        "start_time": datetime(2024, 2, 1, tzinfo=timezone.utc), "end_time": None, "active": True}]}
+        db = recording_db(watermark=watermark, stored_memberships=stored)
+        sync = UserSyncScript(self.endpoint, TOKEN, self.logger, client=self._client())
+        stats = sync.sync_users(db, incremental=True)
+
+        self.assertEqual((stats["users"], stats["fetched"], stats["updated"]), (N_USERS, 10, 10))
+        self.assertEqual(stats["requests"], 1 + 2 * 10)
+        self.assertEqual(stats["memberships"], 9)
+        [written] = [c.args[0] for c in db.add_or_update_memberships.call_args_list]
+        self.assertNotIn(50, [m["user_id"] for m in written])
+        db.set_sync_watermark.assert_called_once_with("users", datetime.fromisoformat(updated(N_USERS - 1)))
+
+        # Nothing changed since: only the list is fetched
+        db = recording_db(watermark=datetime.fromisoformat(updated(N_USERS - 1)))
+        stats = sync.sync_users(db, incremental=True)
+        self.assertEqual((stats["fetched"], stats["requests"]), (0, 1))
+        db.add_or_update_users.assert_not_called()
+
+    def test_failed_sync_keeps_the_watermark(self):
+        MockCoreApi.failures = {"/core-api-metrics/projects-details/p-15": 9}
+        db = recording_db(watermark=datetime.fromisoformat(updated(9)))
+        sync = ProjectSyncScript(self.endpoint, TOKEN, self.logger, client=self._client(retries=1))
+        stats = sync.sync_projects(db, incremental=True)
+        self.assertEqual((stats["fetched"], stats["updated"], stats["failed"]), (10, 9, 1))
+        db.set_sync_watermark.assert_not_called()
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(100)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the tstzrange overlap filters.
+
+The filters are compiled against the PostgreSQL dialect; no database required.
+"""
+import unittest
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from reports_api.database import Slices, Slivers
+from reports_api.database.time_filters import lease_overlaps, lease_overlaps_closed, membership_overlaps
+
+
+def sql(expr):
+    return str(expr.compile(dialect=postgresql.dialect()))
+
+
+START = datetime(2025, 7, 1, tzinfo=timezone.utc)
+END = datetime(2025, 7, 2, tzinfo=timezone.utc)
+
+
+class TestTimeFilters(unittest.TestCase):
+
+    def test_open_overlap_uses_range_operator(self):
+        text = sql(lease_overlaps(Slivers, START, END))
+        self.assertIn("slivers.lease_range && tstzrange(", text)
+        self.assertIn("slivers.lease_range IS NULL", text)
+
+    def test_closed_overlap_uses_range_operator(self):
+        text = sql(lease_overlaps_closed(Slices, START, END))
+        self.assertIn("slices.lease_range && tstzrange(", text)
+
+    def test_membership_overlap(self):
+        self.assertIn("membership.time_range && tstzrange(", sql(membership_overlaps(START, END)))
+
+    def test_inverted_window_falls_back_to_comparisons(self):
+        # tstzrange() rejects lower > upper, so these must not build a range
+        self.assertNotIn("tstzrange", sql(lease_overlaps(Slivers, END, START)))
+        self.assertNotIn("tstzrange", sql(lease_overlaps(Slivers, START, START)))
+        self.assertNotIn("tstzrange", sql(lease_overlaps_closed(Slivers, END, START)))
+        self.assertNotIn("tstzrange", sql(membership_overlaps(END, START)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tests for the INSERT ... ON CONFLICT upserts behind the add_or_update_* methods.
+
+The statements are captured from a mock session and compiled for PostgreSQL. The
+concurrency test needs PostgreSQL; it runs only when REPORTS_TEST_DB_HOST is set (with
+REPORTS_TEST_DB_USER, REPORTS_TEST_DB_PASSWORD and REPORTS_TEST_DB_NAME).
+"""
+import logging
+import os
+import threading
+import unittest
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from reports_api.database import Users
+from reports_api.database.db_manager import DatabaseManager
+
+
+def sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestUpsertStatements(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager.__new__(DatabaseManager)
+        self.session = MagicMock()
+        self.session.execute.return_value.all.return_value = [(7,)]
+        self.session.execute.return_value.first.return_value = (7,)
+        self.statements = lambda: [sql(c.args[0]) for c in self.session.execute.call_args_list]
+        for p in (patch.object(self.db, "get_session", return_value=self.session),
+                  patch("reports_api.database.db_manager.HourlyAllocationStore"),
+                  patch.object(DatabaseManager, "_mark_reservation_dirty"),
+                  patch.object(DatabaseManager, "_invalidate_capacities")):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_project_is_one_statement(self):
+        self.assertEqual(self.db.add_or_update_project(project_uuid="p-1", project_name="Edge AI"), 7)
+        [statement] = self.statements()
+        self.assertIn("ON CONFLICT (project_uuid) DO UPDATE", statement)
+        self.assertIn("project_name = coalesce(excluded.project_name, projects.project_name)", statement)
+        self.assertIn("last_updated = excluded.last_updated", statement)
+        self.assertNotIn("created_date = ", statement)
+        self.assertIn("RETURNING projects.id", statement)
+        self.session.commit.assert_called_once()
+
+        self.session.execute.reset_mock()
+        self.db.add_or_update_project(project_uuid="p-1", created_date=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.assertIn("created_date = excluded.created_date", self.statements()[0])
+
+    def test_sliver_overwrites_references_and_keeps_optional_columns(self):
+        self.db.add_or_update_sliver(project_id=1, slice_id=2, user_id=3, host_id=None, site_id=4,
+                                     sliver_guid="s-1", state=4, sliver_type="VM", core=0, ram=16)
+        [statement] = self.statements()
+        self.assertIn("ON CONFLICT (sliver_guid) DO UPDATE", statement)
+        self.assertIn("host_id = excluded.host_id", statement)
+        self.assertIn("core = coalesce(excluded.core, slivers.core)", statement)
+        params = self.session.execute.call_args.args[0].compile(dialect=postgresql.dialect()).params
+        self.assertIsNone(params["core_m0"])  # 0 never overwrote a stored value
+        self.assertEqual((params["ram_m0"], params["sliver_type_m0"]), (16, "vm"))
+
+    def test_host_and_site_keep_existing_rows(self):
+        self.db.add_or_update_host(host_name="renc-w1", site_id=3)
+        self.db.add_or_update_site(site_name="RENC")
+        host, site = self.statements()
+        self.assertIn("ON CONFLICT (name) DO UPDATE SET name = excluded.name", host)
+        self.assertNotIn("site_id = ", host)
+        self.assertIn("ON CONFLICT (name) DO UPDATE SET name = excluded.name WHERE false RETURNING sites.id", site)
+
+    def test_capacity_upsert_bumps_updated_at(self):
+        self.db.add_or_update_link_capacity(link_name="RENC-UKY", site_a_name="UKY", site_b_name="RENC",
+                                            layer="L2", bandwidth=100)
+        link = self.statements()[-1]
+        self.assertIn("ON CONFLICT (name) DO UPDATE", link)
+        self.assertIn("bandwidth_capacity = excluded.bandwidth_capacity", link)
+        self.assertIn("updated_at = now()", link)
+
+    def test_membership_conflicts_on_its_period(self):
+        self.db.add_or_update_membership(user_id=1, project_id=2, start_time=None, end_time=None,
+                                         membership_type="member", active=True)
+        [statement] = self.statements()
+        self.assertIn("ON CONFLICT (user_id, project_id, membership_type, start_time) DO UPDATE", statement)
+        self.assertIn("end_time = excluded.end_time", statement)
+
+    def test_memberships_are_one_statement(self):
+        rows = [{"user_id": 1, "project_id": 2, "start_time": None, "end_time": None, "membership_type": "member",
+                 "active": True} for _ in range(2)]
+        rows.append(dict(rows[0], user_id=3))
+        self.assertEqual(self.db.add_or_update_memberships(rows), 2)
+        [statement] = self.statements()
+        self.assertIn("ON CONFLICT (user_id, project_id, membership_type, start_time) DO UPDATE", statement)
+        self.session.commit.assert_called_once()
+        self.assertEqual(self.db.add_or_update_memberships([]), 0)
+
+    def test_bulk_users_group_by_registration_date(self):
+        self.session.execute.return_value.all.return_value = [("u-1", 7, True)]
+        statuses = {}
+        ids = self.db.add_or_update_users([
+            {"user_uuid": "u-1", "user_email": "a@example.com"},
+            {"user_uuid": "u-2", "user_email": "b@example.com",
+             "registered_on": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+            {"user_uuid": "u-3"}], statuses=statuses)
+        self.assertEqual(ids["u-1"], 7)
+        self.assertEqual(statuses, {"u-1": "created", "u-3": "updated"})
+        dated, update, undated = self.statements()
+        self.assertTrue(update.startswith("UPDATE users SET"))
+        self.assertNotIn("registered_on", update)
+        self.assertIn("registered_on = excluded.registered_on", dated)
+        self.assertNotIn("registered_on = ", undated)
+        self.session.commit.assert_called_once()
+
+    def test_missing_not_null_column_updates_in_place(self):
+        self.db.add_or_update_slice(project_id=1, user_id=2, slice_guid="sl-1", slice_name="edge", state=None,
+                                    lease_start=None, lease_end=None)
+        [statement] = self.statements()
+        self.assertTrue(statement.startswith("UPDATE slices SET"))
+        self.assertNotIn("lease_start", statement)
+        self.assertNotIn("state", statement.split("WHERE")[0])
+
+        # The slice does not exist: fall back to the upsert, which PostgreSQL rejects as before
+        self.session.execute.reset_mock()
+        self.session.execute.return_value.first.return_value = None
+        self.db.add_or_update_slice(project_id=1, user_id=2, slice_guid="sl-2", slice_name="edge", state=None,
+                                    lease_start=None, lease_end=None)
+        self.assertIn("ON CONFLICT (slice_guid)", self.statements()[2])
+
+    def test_unchanged_rows_are_not_updated(self):
+        self.db.add_or_update_project(project_uuid="p-1", project_name="Edge AI")
+        self.db.add_or_update_component(sliver_id=1, component_guid="c-1", component_type="GPU", model="A100",
+                                        bdfs=["0000:25:00.0"], node_id=None, component_node_id=None)
+        project, component = self.statements()
+        self.assertIn("WHERE projects.project_name IS DISTINCT FROM coalesce(excluded.project_name, "
+                      "projects.project_name)", project)
+        self.assertNotIn("projects.last_updated IS DISTINCT FROM", project)
+        self.assertIn("CAST(components.bdfs AS JSONB) IS DISTINCT FROM CAST(coalesce(excluded.bdfs, "
+                      "components.bdfs) AS JSONB)", component)
+
+    def test_unchanged_sliver_is_not_refreshed(self):
+        self.session.execute.return_value.all.side_effect = [[], [(7,)]]
+        self.assertEqual(self.db.add_or_update_sliver(project_id=1, slice_id=2, user_id=3, host_id=None, site_id=4,
+                                                      sliver_guid="s-1", state=4, sliver_type="VM"), 7)
+        upsert, lookup = self.statements()
+        self.assertIn("ON CONFLICT (sliver_guid) DO UPDATE", upsert)
+        self.assertTrue(lookup.startswith("SELECT slivers.id"))
+        self.session.commit.assert_not_called()
+        DatabaseManager._mark_reservation_dirty.assert_not_called()
+
+    def test_stateless_slice_is_updated_in_place(self):
+        self.session.execute.return_value.all.return_value = [("sl-1", 7)]
+        slices = [{"slice_guid": guid, "project_uuid": "p-1", "user_uuid": "u-1", "state": state, "slivers": []}
+                  for guid, state in (("sl-1", 4), ("sl-2", None))]
+        with patch.object(self.db, "_resolve_projects", return_value={"p-1": 1}), \
+                patch.object(self.db, "_resolve_users", return_value={"u-1": 2}), \
+                patch.object(self.db, "_write_slivers", return_value=({}, [])) as write_slivers:
+            self.db.import_slices(slices, skip_existing=False)
+        upsert, update = self.statements()
+        self.assertIn("ON CONFLICT (slice_guid) DO UPDATE", upsert)
+        self.assertTrue(update.startswith("UPDATE slices SET"))
+        self.assertNotIn("state", update.split("WHERE")[0])
+        self.assertEqual(write_slivers.call_args.args[2], {"sl-1": 7, "sl-2": 7})
+
+    def test_unchanged_slivers_still_commit_their_slice(self):
+        row = {"project_uuid": "p-1", "user_uuid": "u-1", "slice_name": "renamed", "site": "RENC",
+               "sliver_guid": "s-1", "state": 4, "sliver_type": "VM"}
+        with patch.object(self.db, "_resolve_projects", return_value={"p-1": 1}), \
+                patch.object(self.db, "_resolve_users", return_value={"u-1": 2}), \
+                patch.object(self.db, "_write_slivers", return_value=({"s-1": "unchanged"}, [])):
+            self.assertEqual(self.db.add_or_update_slivers("sl-1", [row]), {"s-1": "unchanged"})
+        self.assertTrue(self.statements()[0].startswith("UPDATE slices SET"))
+        self.session.commit.assert_called_once()
+        DatabaseManager._mark_reservation_dirty.assert_not_called()
+
+
+@unittest.skipUnless(os.environ.get("REPORTS_TEST_DB_HOST"), "REPORTS_TEST_DB_HOST not set")
+class TestConcurrentUpserts(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager(user=os.environ.get("REPORTS_TEST_DB_USER", "fabric"),
+                                  password=os.environ.get("REPORTS_TEST_DB_PASSWORD", "fabric"),
+                                  database=os.environ.get("REPORTS_TEST_DB_NAME", "analytics"),
+                                  db_host=os.environ["REPORTS_TEST_DB_HOST"],
+                                  logger=logging.getLogger("test_upserts"))
+
+    def test_one_row_per_user_uuid(self):
+        user_uuid = f"upsert-test-{uuid.uuid4().hex[:8]}"
+        ids = []
+        threads = [threading.Thread(target=lambda: ids.append(self.db.add_or_update_user(
+            user_uuid=user_uuid, user_email="u@example.com"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(ids)), 1)
+        session = self.db.get_session()
+        self.assertEqual(session.query(Users).filter(Users.user_uuid == user_uuid).count(), 1)
+        self.assertEqual(self.db.add_or_update_user(user_uuid=user_uuid), ids[0])
+        session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the facility-port VLAN bitmap helpers used by get_calendar.
+
+These tests need no database.
+"""
+import random
+import unittest
+
+from reports_api.database.db_manager import _format_vlan_bitmap, _parse_vlan_range, _vlan_bitmap_members
+
+
+def bits_of(vlans):
+    bits = 0
+    for v in vlans:
+        bits |= 1 << v
+    return bits
+
+
+class TestVlanBitmap(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(_parse_vlan_range("100-102, 105,110"), bits_of([100, 101, 102, 105, 110]))
+        self.assertEqual(_parse_vlan_range(""), 0)
+        self.assertEqual(_parse_vlan_range("1-4095").bit_count(), 4095)
+
+    def test_format(self):
+        self.assertEqual(_format_vlan_bitmap(bits_of([100, 101, 102, 105, 110])), "100-102,105,110")
+        self.assertEqual(_format_vlan_bitmap(0), "")
+        self.assertEqual(_format_vlan_bitmap(bits_of([0, 4095])), "0,4095")
+
+    def test_members_sorted_as_strings(self):
+        self.assertEqual(_vlan_bitmap_members(bits_of([9, 10, 100])), ["10", "100", "9"])
+
+    def test_available_matches_set_difference(self):
+        rng = random.Random(3)
+        capacity = _parse_vlan_range("1-1000,2000-2100,3000")
+        for _ in range(50):
+            allocated = set(rng.sample(range(1, 4096), rng.randrange(0, 300)))
+            available = (set(range(1, 1001)) | set(range(2000, 2101)) | {3000}) - allocated
+            self.assertEqual(capacity & ~bits_of(allocated), bits_of(available))
+            runs = _format_vlan_bitmap(bits_of(available)).split(",") if available else []
+            expanded = set()
+            for run in runs:
+                lo, _, hi = run.partition("-")
+                expanded.update(range(int(lo), int(hi or lo) + 1))
+            self.assertEqual(expanded, available)
+
+
+if __name__ == '__main__':
+    unittest.main()